@@ -4,8 +4,19 @@ Configuración del panel de administración de Django para camiones, remolques y
 Define las vistas, inlines y filtros para gestionar los vehículos desde el admin.
 """
 
-from django.contrib import admin
-from django.utils.html import format_html
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.utils import (
+    display_for_field, display_for_value, flatten_fieldsets, label_for_field, lookup_field, unquote,
+)
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.forms.models import BaseInlineFormSet, _get_foreign_key
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 from .models import (
     Empresa,
     Camion,
@@ -21,29 +32,289 @@ from .models import (
     EstadoRemolque,
     Contrato,
     AsignacionPermanente,
-    ModeloVehiculo
+    ModeloVehiculo,
+    ArchivoHistorico,
+    SesionCarga,
 )
+from .asignaciones import enganchar_remolque, reasignar_en_lote
 
 admin.site.register(Empresa)
 
+# --- HISTORIALES PAGINADOS ---
+
+class FormsetHistorialPaginado(BaseInlineFormSet):
+    """
+    Formset que solo carga la primera página del historial (las filas más recientes).
+    Las páginas anteriores se piden bajo demanda (ver HistorialPaginadoAdminMixin).
+    """
+    por_pagina = 10
+    url_historial = ''
+    columnas_historial = ()
+    tabla_archivo = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset()[:self.por_pagina]
+        return self._queryset
+
+    @property
+    def hay_mas_antiguos(self):
+        if not self.instance.pk:
+            return False
+        # Solo contamos si la primera página vino llena
+        if len(self.get_queryset()) == self.por_pagina and self.queryset.count() > self.por_pagina:
+            return True
+        return bool(self.tabla_archivo) and ArchivoHistorico.objects.filter(
+            tabla=self.tabla_archivo, camion=self.instance,
+        ).exists()
+
+
+class InlineHistorialPaginado(admin.TabularInline):
+    """
+    Inline para historiales que crecen sin límite: muestra las 'por_pagina' filas más recientes
+    (según 'ordering') y el resto se carga de a una página con el botón "Ver registros anteriores".
+    Con 'tabla_archivo' (ArchivoHistorico.TABLA_CHOICES) las páginas siguen con las filas archivadas del camión.
+    """
+    formset = FormsetHistorialPaginado
+    template = 'admin/core/edit_inline/tabular_paginado.html'
+    por_pagina = 10
+    extra = 0
+    tabla_archivo = None
+
+    class Media:
+        js = ('core/js/admin_historial.js',)
+
+    def prefijo_historial(self):
+        # Mismo prefijo que BaseInlineFormSet.get_default_prefix, sin construir el formset
+        fk = _get_foreign_key(self.parent_model, self.model, fk_name=self.fk_name)
+        return fk.remote_field.get_accessor_name(model=False).replace('+', '')
+
+    def campos_historial(self, request, obj=None):
+        fk = _get_foreign_key(self.parent_model, self.model, fk_name=self.fk_name)
+        return [c for c in flatten_fieldsets(self.get_fieldsets(request, obj)) if c != fk.name]
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.por_pagina = self.por_pagina
+        formset.tabla_archivo = self.tabla_archivo
+        if kwargs.get('fields', ...) is None:
+            # Llamada interna de get_fields(): solo necesita el form
+            return formset
+        formset.columnas_historial = [
+            label_for_field(c, self.model, model_admin=self) for c in self.campos_historial(request, obj)
+        ]
+        if obj is not None and obj.pk:
+            opts = self.parent_model._meta
+            formset.url_historial = reverse(
+                f'{self.admin_site.name}:{opts.app_label}_{opts.model_name}_historial',
+                args=[obj.pk, formset.get_default_prefix()],
+            )
+        return formset
+
+
+class HistorialPaginadoAdminMixin:
+    """
+    Agrega a un ModelAdmin el endpoint que entrega las páginas antiguas de sus InlineHistorialPaginado:
+    <objeto>/historial/<prefijo>/?pagina=N -> {"html": filas de solo lectura, "siguiente": N+1 o null}
+    """
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                '<path:object_id>/historial/<str:prefijo>/',
+                self.admin_site.admin_view(self.historial_view),
+                name=f'{opts.app_label}_{opts.model_name}_historial',
+            ),
+        ] + super().get_urls()
+
+    def historial_view(self, request, object_id, prefijo):
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            raise Http404
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+
+        for inline in self.get_inline_instances(request, obj):
+            if isinstance(inline, InlineHistorialPaginado) and inline.prefijo_historial() == prefijo:
+                break
+        else:
+            raise Http404
+        if not inline.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+
+        try:
+            pagina = max(int(request.GET.get('pagina', 2)), 2)
+        except ValueError:
+            pagina = 2
+
+        fk = _get_foreign_key(inline.parent_model, inline.model, fk_name=inline.fk_name)
+        inicio = (pagina - 1) * inline.por_pagina
+        # Pedimos una fila extra para saber si queda otra página (sin COUNT)
+        vivos = inline.get_queryset(request).filter(**{fk.name: obj})
+        registros = list(vivos[inicio:inicio + inline.por_pagina + 1])
+        if inline.tabla_archivo and len(registros) <= inline.por_pagina:
+            # Se acabaron las filas vivas: seguimos con las archivadas (más nuevas primero)
+            total_vivos = inicio + len(registros) if registros else vivos.count()
+            registros += ArchivoHistorico.objects.instancias(
+                inline.tabla_archivo, inline.model, obj,
+                omitir=max(inicio - total_vivos, 0), limite=inline.por_pagina + 1 - len(registros),
+            )
+        campos = inline.campos_historial(request, obj)
+
+        filas = []
+        for registro in registros[:inline.por_pagina]:
+            celdas = []
+            for campo in campos:
+                f, _attr, valor = lookup_field(campo, registro, inline)
+                celdas.append(display_for_field(valor, f, '-') if f else display_for_value(valor, '-'))
+            filas.append(celdas)
+
+        return JsonResponse({
+            'html': render_to_string('admin/core/edit_inline/filas_historial.html', {'filas': filas}),
+            'siguiente': pagina + 1 if len(registros) > inline.por_pagina else None,
+        })
+
+
+class ArchivadoAdminMixin:
+    """
+    ModelAdmin de una tabla que 'archivar_historial' mueve a ArchivoHistorico ('tabla_archivo'): el detalle de un
+    registro archivado lleva a la fila en el archivo que lo contiene en vez de decir que no existe.
+    """
+    tabla_archivo = None
+
+    def _get_obj_does_not_exist_redirect(self, request, opts, object_id):
+        archivo_admin = self.admin_site._registry.get(ArchivoHistorico)
+        if str(object_id).isdigit() and archivo_admin and archivo_admin.has_view_permission(request):
+            pk = int(object_id)
+            # Los rangos de ids de distintos camiones se traslapan: se busca la fila en cada candidato
+            for archivo in ArchivoHistorico.objects.con_id(self.tabla_archivo, pk):
+                if any(fila['pk'] == pk for fila in archivo.leer()):
+                    self.message_user(
+                        request, f"{opts.verbose_name} {pk} está archivado: se muestra desde el archivo histórico.",
+                        messages.INFO,
+                    )
+                    url = reverse(f'{self.admin_site.name}:core_archivohistorico_change', args=[archivo.pk])
+                    return HttpResponseRedirect(f'{url}#fila-{pk}')
+        return super()._get_obj_does_not_exist_redirect(request, opts, object_id)
+
+
+# --- ENGANCHES DESDE EL ADMIN ---
+
+CAMPOS_DUPLA = {'activo', 'camion', 'remolque'}
+
+
+def _es_enganche(nueva, activo, cambios):
+    """La fila activa una dupla nueva (alta activa, reactivación o cambio de unidad en una fila activa)."""
+    return bool(activo) and (nueva or bool(CAMPOS_DUPLA & set(cambios)))
+
+
+def _otros_cambios_enganche(nueva, activo, cambios):
+    """Campos corregidos junto con un enganche: la dupla nueva es otra fila y no hay dónde guardarlos."""
+    if not _es_enganche(nueva, activo, cambios):
+        return set()
+    return set(cambios) - CAMPOS_DUPLA - {'km_inicio_camion', 'fecha_desde'}
+
+
+class AsignacionAdminForm(forms.ModelForm):
+    """
+    Un enganche lo aplica core/asignaciones.py, que primero cierra la dupla activa anterior del camión o del
+    remolque: el formulario no rechaza el alta porque todavía exista esa dupla (la restricción de la BD
+    sigue protegiendo la escritura).
+    """
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if _es_enganche(self.instance._state.adding, self.cleaned_data.get('activo'), self.changed_data):
+            exclude |= {'camion', 'remolque'}
+        return exclude
+
+    def clean(self):
+        cleaned_data = super().clean()
+        otros = _otros_cambios_enganche(self.instance._state.adding, cleaned_data.get('activo'), self.changed_data)
+        if otros:
+            raise forms.ValidationError(
+                f"Un enganche crea una dupla nueva: guarde primero el enganche y corrija {', '.join(sorted(otros))} "
+                "en otra edición."
+            )
+        return cleaned_data
+
+
+def guardar_asignacion(obj, nueva, cambios):
+    """
+    Guarda una AsignacionTractoRemolque editada en el admin. Enganches y desenganches pasan por
+    core/asignaciones.py: se cierra la dupla anterior con fecha y km, se suman los km al remolque, el remolque
+    hereda la base y queda el historial. Las demás ediciones (correcciones de km o fechas) se guardan tal cual.
+    Con un enganche 'obj' pasa a ser la dupla nueva (para el mensaje y la redirección del admin).
+    Un enganche crea otra fila: si el mismo formulario corrige además otros campos se rechaza con
+    ValidationError (no habría dónde guardarlos). En un desenganche esas correcciones se guardan sobre la dupla
+    cerrada, encima de lo que escribió el servicio.
+    """
+    if _es_enganche(nueva, obj.activo, cambios):
+        otros = _otros_cambios_enganche(nueva, obj.activo, cambios)
+        if otros:
+            raise ValidationError(
+                f"El enganche de {obj.camion} no se guardó: corrija {', '.join(sorted(otros))} en otra edición."
+            )
+        activa = enganchar_remolque(obj.camion, obj.remolque, km_inicio_camion=obj.km_inicio_camion)
+        obj.pk, obj.fecha_desde = activa.pk, activa.fecha_desde
+        obj._state.adding = False
+    elif not nueva and 'activo' in cambios:
+        original = AsignacionTractoRemolque.objects.get(pk=obj.pk)
+        if not original.activo:
+            obj.save()
+            return
+        with transaction.atomic():
+            reasignar_en_lote([(original.camion_id, None)], km_por_camion={original.camion_id: obj.km_fin_camion})
+            otros = [campo for campo in cambios if campo != 'activo']
+            if otros:
+                obj.save(update_fields=otros)
+    else:
+        obj.save()
+
+
+class AsignacionesAdminMixin:
+    """ModelAdmin con AsignacionInline: los enganches del inline se guardan con guardar_asignacion()."""
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not AsignacionTractoRemolque:
+            return super().save_formset(request, form, formset, change)
+        formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            obj.delete()
+        pendientes = [(obj, True, ()) for obj in formset.new_objects]
+        pendientes += [(obj, False, cambios) for obj, cambios in formset.changed_objects]
+        for obj, nueva, cambios in pendientes:
+            try:
+                guardar_asignacion(obj, nueva, cambios)
+            except ValidationError as e:
+                # Solo ocurre si otra edición cambió las mismas unidades en paralelo
+                self.message_user(request, ' '.join(e.messages), messages.ERROR)
+
+
 # --- INLINES ---
 
-class AsignacionInline(admin.TabularInline):
+class AsignacionInline(InlineHistorialPaginado):
     model = AsignacionTractoRemolque
+    form = AsignacionAdminForm
     extra = 1
-    fields = ('remolque', 'km_inicio_camion', 'activo', 'fecha_desde', 'fecha_hasta')
+    ordering = ('-fecha_desde',)
+    autocomplete_fields = ('camion', 'remolque')
+    fields = ('remolque', 'km_inicio_camion', 'km_fin_camion', 'activo', 'fecha_desde', 'fecha_hasta')
     readonly_fields = ('fecha_desde',)
 
-class MantencionInline(admin.TabularInline):
+class MantencionInline(InlineHistorialPaginado):
     model = Mantencion
-    extra = 0
+    ordering = ('-fecha_mantencion', '-id_mantencion')
+    autocomplete_fields = ('remolque',)
     # Agregamos remolque para que se vea en el listado del camión si aplica
     fields = ('fecha_mantencion', 'taller', 'remolque', 'km_proxima_mantencion')
 
-class HistorialEstadoInline(admin.TabularInline):
+class HistorialEstadoInline(InlineHistorialPaginado):
     model = HistorialEstadoCamion
-    extra = 0
+    ordering = ('-fecha_evento',)
     readonly_fields = ('fecha_evento',)
+    tabla_archivo = 'HISTORIAL_CAMION'
 
 class DocumentoMantencionInline(admin.TabularInline):
     model = DocumentoMantencion
@@ -53,13 +324,14 @@ class DocumentoMantencionInline(admin.TabularInline):
     verbose_name = "Documento / Link de Drive"
     verbose_name_plural = "Documentos / Links de Drive"
 
-class HistorialEstadoRemolqueInline(admin.TabularInline):
+class HistorialEstadoRemolqueInline(InlineHistorialPaginado):
     model = HistorialEstadoRemolque
-    extra = 0
+    ordering = ('-fecha_evento',)
     readonly_fields = ('fecha_evento',)
 
 class AsignacionPermanenteInline(admin.TabularInline):
     model = AsignacionPermanente
+    autocomplete_fields = ('conductor',)
     extra = 2 # Esto muestra 2 espacios vacíos listos para llenar (tus duplas)
 # --- CONFIGURACIONES PRINCIPALES ---
 
@@ -73,7 +345,7 @@ class ModeloVehiculoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'marca', 'unidad_medida')
 
 @admin.register(Camion)
-class CamionAdmin(admin.ModelAdmin):
+class CamionAdmin(AsignacionesAdminMixin, HistorialPaginadoAdminMixin, admin.ModelAdmin):
     search_fields = ['patente']
     list_display = (
         'patente',
@@ -86,28 +358,43 @@ class CamionAdmin(admin.ModelAdmin):
     )
     list_filter = ('activo', 'rol_operativo', 'contrato')
     search_fields = ('patente',)
+    list_select_related = ('contrato',)
     # Agregamos AsignacionInline para enganchar/desenganchar remolques desde aquí
     inlines = [AsignacionInline, MantencionInline, HistorialEstadoInline, AsignacionPermanenteInline]
 
+    def get_queryset(self, request):
+        # Columnas calculadas en el mismo SELECT del listado (sin consultas por fila)
+        return super().get_queryset(request).annotate(
+            _estado_operativo=F('estado_actual__estado_operativo'),
+            _remolque_patente=F('asignacion_actual__remolque__patente'),
+        )
+
     def estado_actual_display(self, obj):
-        return getattr(obj.estado_actual, 'estado_operativo', 'SIN ESTADO')
+        return obj._estado_operativo or 'SIN ESTADO'
     
     def remolque_actual(self, obj):
-        asignacion = obj.asignaciontractoremolque_set.filter(activo=True).first()
-        return asignacion.remolque.patente if asignacion else "Sin Remolque"
+        return obj._remolque_patente or "Sin Remolque"
 
     estado_actual_display.short_description = 'Estado actual'
+    estado_actual_display.admin_order_field = '_estado_operativo'
     remolque_actual.short_description = 'Remolque Activo'
+    remolque_actual.admin_order_field = '_remolque_patente'
 
 @admin.register(Remolque)
-class RemolqueAdmin(admin.ModelAdmin):
+class RemolqueAdmin(AsignacionesAdminMixin, HistorialPaginadoAdminMixin, admin.ModelAdmin):
     search_fields = ['patente']
     list_display = ('patente', 'tipo_remolque', 'estado_actual_display', 'activo')
     inlines = [AsignacionInline, HistorialEstadoRemolqueInline] # Verás sus conductores y su historial
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _estado_operativo=F('estado_actual__estado_operativo'),
+        )
+
     def estado_actual_display(self, obj):
-        return getattr(obj.estado_actual, 'estado_operativo', 'SIN ESTADO')
+        return obj._estado_operativo or 'SIN ESTADO'
     estado_actual_display.short_description = 'Estado'
+    estado_actual_display.admin_order_field = '_estado_operativo'
 
 @admin.register(Conductor)
 class ConductorAdmin(admin.ModelAdmin):
@@ -140,18 +427,27 @@ class ConductorAdmin(admin.ModelAdmin):
 class AsignacionPermanenteAdmin(admin.ModelAdmin):
     list_display = ('camion', 'conductor', 'tipo_turno')
     list_filter = ('camion', 'tipo_turno')
+    list_select_related = ('camion', 'conductor')
+    autocomplete_fields = ('camion', 'conductor')
 
 @admin.register(AsignacionTractoRemolque)
 class AsignacionTractoRemolqueAdmin(admin.ModelAdmin):
+    form = AsignacionAdminForm
     list_display = ('camion', 'remolque', 'fecha_desde', 'activo')
+    list_select_related = ('camion', 'remolque')
+    autocomplete_fields = ('camion', 'remolque')
+
+    def save_model(self, request, obj, form, change):
+        guardar_asignacion(obj, not change, form.changed_data)
 
 @admin.register(Mantencion)
 class MantencionAdmin(admin.ModelAdmin):
     list_display = ('id_mantencion', 'get_unidad', 'fecha_mantencion', 'taller', 'km_mantencion', 'km_proxima_mantencion')
     list_filter = ('tipo_mantencion', 'taller', 'fecha_mantencion')
+    list_select_related = ('camion', 'remolque')
     
-    # ELIMINAMOS raw_id_fields para que no salga la lupa
-    # autocomplete_fields = ('camion', 'remolque') # <--- Opcional: activa esto si quieres que además de lista, puedas escribir para filtrar.
+    # Autocompletado en vez de un <select> con toda la flota
+    autocomplete_fields = ('camion', 'remolque')
 
     fieldsets = (
         ('Información de la Unidad', {
@@ -184,10 +480,13 @@ class MantencionAdmin(admin.ModelAdmin):
 class EstadoCamionAdmin(admin.ModelAdmin):
     list_display = ('camion', 'get_conductor_actual', 'kilometraje', 'estado_operativo', 'fecha_actualizacion')
     list_filter = ('estado_operativo', 'base_actual')
+    list_select_related = ('camion', 'conductor')
+    autocomplete_fields = ('camion',)
     
     def get_conductor_actual(self, obj):
         return obj.conductor.nombre if obj.conductor else "Sin conductor"
     get_conductor_actual.short_description = 'Conductor Actual'
+    get_conductor_actual.admin_order_field = 'conductor__nombre'
 
     # ESTA ES LA MAGIA: Filtra los conductores según el camión seleccionado
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
@@ -211,13 +510,21 @@ class EstadoRemolqueAdmin(admin.ModelAdmin):
     # Define los campos que se verán al editar para que no aparezca base_actual como input
     fields = ('remolque', 'estado_operativo', 'get_base_actual', 'observacion')
 
+    list_select_related = ('remolque',)
+    list_filter = ('estado_operativo', 'base_actual')
+    autocomplete_fields = ('remolque',)
+
     def get_base_actual(self, obj):
-        return obj.base_actual
+        return obj.base_actual_display
     get_base_actual.short_description = 'Ubicación (Heredada)'
+    get_base_actual.admin_order_field = 'base_actual'
 
 @admin.register(DocumentoMantencion)
 class DocumentoMantencionAdmin(admin.ModelAdmin):
     list_display = ('mantencion', 'nombre_archivo', 'tipo_documento', 'fecha_subida')
+    # Mantencion.__str__ usa la patente de la unidad: la traemos en el mismo JOIN
+    list_select_related = ('mantencion__camion', 'mantencion__remolque')
+    raw_id_fields = ('mantencion',)
 
 @admin.register(DocumentacionGeneral)
 class DocumentacionGeneralAdmin(admin.ModelAdmin):
@@ -225,6 +532,8 @@ class DocumentacionGeneralAdmin(admin.ModelAdmin):
     list_display = ('id_documento', 'tipo_entidad', 'get_vinculo', 'categoria', 'fecha_vencimiento', 'estado', 'ver_pdf')
     list_filter = ('tipo_entidad', 'categoria')
     list_display_links = ('id_documento', 'tipo_entidad')
+    # get_vinculo y __str__ recorren estas relaciones: un solo JOIN para todo el listado
+    list_select_related = ('camion', 'remolque', 'conductor')
     
     # 2. IMPORTANTE: El buscador ahora debe apuntar a campos que existan. 
     # Podemos buscar por patente de camión o nombre de conductor directamente:
@@ -262,3 +571,58 @@ class DocumentacionGeneralAdmin(admin.ModelAdmin):
             return format_html('<a href="{}" target="_blank" style="color: #264b5d; font-weight: bold;">📄 Ver PDF</a>', obj.archivo.url)
         return "—"
     ver_pdf.short_description = 'Archivo'
+
+
+@admin.register(ArchivoHistorico)
+class ArchivoHistoricoAdmin(admin.ModelAdmin):
+    """Solo lectura: lo escribe el comando 'archivar_historial'."""
+    list_display = ('tabla', 'camion', 'mes', 'filas', 'id_desde', 'id_hasta', 'actualizado')
+    list_filter = ('tabla', 'mes')
+    search_fields = ('camion__patente',)
+    list_select_related = ('camion',)
+    exclude = ('datos',)
+    readonly_fields = ('contenido',)
+
+    def contenido(self, obj):
+        """Las filas archivadas; de las relaciones de cada inspección (resultados, insumos...) solo la cantidad."""
+        filas = obj.leer() if obj.filas else []
+        if not filas:
+            return "—"
+        columnas = [columna for columna in filas[0] if columna != 'pk']
+        cuerpo = format_html_join('', '<tr id="fila-{}">{}</tr>', (
+            (fila['pk'], format_html_join('', '<td>{}</td>', (
+                (len(valor) if isinstance(valor, list) else valor,)
+                for valor in (fila.get(columna) for columna in columnas)
+            )))
+            for fila in filas
+        ))
+        return format_html(
+            '<table><thead><tr>{}</tr></thead><tbody>{}</tbody></table>',
+            format_html_join('', '<th>{}</th>', ((columna,) for columna in columnas)), cuerpo,
+        )
+    contenido.short_description = 'Filas archivadas'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SesionCarga)
+class SesionCargaAdmin(admin.ModelAdmin):
+    """Solo lectura: las sesiones las crea la API de subida por partes (core/cargas.py)."""
+    list_display = ('nombre_archivo', 'tipo_entidad', 'categoria', 'usuario', 'progreso', 'estado', 'actualizada')
+    list_filter = ('estado', 'tipo_entidad', 'categoria')
+    search_fields = ('nombre_archivo', 'camion__patente', 'remolque__patente', 'conductor__nombre')
+    list_select_related = ('usuario',)
+
+    def progreso(self, obj):
+        return f"{obj.recibido * 100 // obj.tamano}%" if obj.tamano else "—"
+    progreso.short_description = 'Progreso'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
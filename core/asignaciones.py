@@ -0,0 +1,212 @@
+"""
+core/asignaciones.py
+Enganche, desenganche e intercambio de remolques entre camiones (tractos).
+Es la vía única para cambiar la dupla activa: cada operación corre en UNA transacción corta que
+cierra las asignaciones anteriores (fecha_hasta + km), abre las nuevas, sincroniza los punteros
+Camion.asignacion_actual / Remolque.asignacion_actual, copia la base del camión al remolque
+(EstadoRemolque.base_actual) y deja el evento en los historiales.
+La unicidad la garantizan las restricciones parciales de la BD, no validaciones previas.
+"""
+
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .cache import CAMION, REMOLQUE, invalidar_al_confirmar
+from .models import (
+    Camion, Remolque, AsignacionTractoRemolque, EstadoCamion, EstadoRemolque,
+    HistorialEstadoCamion, HistorialEstadoRemolque,
+)
+
+
+def enganchar_remolque(camion, remolque, km_inicio_camion=None):
+    """
+    Engancha 'remolque' a 'camion'.
+    Si alguno de los dos ya tenía una dupla activa, la cierra antes de abrir la nueva.
+    Retorna la AsignacionTractoRemolque activa resultante.
+    """
+    km = {camion.pk: km_inicio_camion} if km_inicio_camion is not None else None
+    nuevas = reasignar_en_lote([(camion, remolque)], km_por_camion=km)
+    if nuevas:
+        return nuevas[0]
+    # Ya estaban enganchados entre sí: no hay cambios
+    return AsignacionTractoRemolque.objects.get(camion=camion, activo=True)
+
+
+def desenganchar_remolque(camion, km_fin_camion=None):
+    """
+    Desengancha el remolque activo del camión (si lo tiene).
+    Retorna la asignación cerrada o None.
+    """
+    asignacion_id = Camion.objects.filter(pk=camion.pk).values_list('asignacion_actual_id', flat=True).first()
+    km = {camion.pk: km_fin_camion} if km_fin_camion is not None else None
+    reasignar_en_lote([(camion, None)], km_por_camion=km)
+    if asignacion_id is None:
+        return None
+    return AsignacionTractoRemolque.objects.get(pk=asignacion_id)
+
+
+def intercambiar_remolques(camion_a, camion_b):
+    """
+    Intercambia los remolques de dos camiones en una sola transacción.
+    Retorna la lista de asignaciones nuevas.
+    """
+    actuales = dict(
+        AsignacionTractoRemolque.objects.filter(
+            camion__in=[camion_a.pk, camion_b.pk], activo=True
+        ).values_list('camion_id', 'remolque_id')
+    )
+    return reasignar_en_lote([
+        (camion_a, actuales.get(camion_b.pk)),
+        (camion_b, actuales.get(camion_a.pk)),
+    ])
+
+
+def _pk(valor):
+    """Acepta instancias o IDs."""
+    return getattr(valor, 'pk', valor)
+
+
+@transaction.atomic
+def reasignar_en_lote(pares, km_por_camion=None, descripcion=None):
+    """
+    Aplica muchas duplas de una vez (ej: cambio de turno en una base).
+
+    - pares: lista de (camion, remolque) con instancias o IDs; remolque=None deja al camión sin remolque.
+    - km_por_camion: {id_camion: km} opcional; por defecto se usa EstadoCamion.kilometraje.
+    - descripcion: texto para el historial (opcional).
+
+    Todo ocurre en una transacción con un número fijo de consultas, sin importar cuántas duplas sean.
+    Retorna la lista de asignaciones nuevas creadas.
+    """
+    destino = {}
+    for camion, remolque in pares:
+        camion_id, remolque_id = _pk(camion), _pk(remolque)
+        if camion_id in destino:
+            raise ValidationError(f"El camión {camion_id} aparece más de una vez en la reasignación.")
+        destino[camion_id] = remolque_id
+
+    remolques_destino = [r for r in destino.values() if r is not None]
+    if len(remolques_destino) != len(set(remolques_destino)):
+        raise ValidationError("Un remolque no puede quedar enganchado a dos camiones.")
+
+    # 1. Bloqueamos las asignaciones activas involucradas (serializa ediciones concurrentes)
+    activas = list(
+        AsignacionTractoRemolque.objects.select_for_update().filter(activo=True).filter(
+            Q(camion__in=list(destino)) | Q(remolque__in=remolques_destino)
+        ).order_by('pk')
+    )
+
+    # Las duplas que ya existen tal cual no se tocan
+    vigentes = {(a.camion_id, a.remolque_id) for a in activas}
+    a_cerrar = [a for a in activas if destino.get(a.camion_id, 'x') != a.remolque_id]
+    a_abrir = [(c, r) for c, r in destino.items() if r is not None and (c, r) not in vigentes]
+    if not a_cerrar and not a_abrir:
+        return []
+
+    # 2. Estados actuales de todas las unidades tocadas (una consulta por tabla)
+    camion_ids = {a.camion_id for a in a_cerrar} | {c for c, _ in a_abrir}
+    remolque_ids = {a.remolque_id for a in a_cerrar} | {r for _, r in a_abrir}
+    estados_camion = {e.camion_id: e for e in EstadoCamion.objects.filter(camion_id__in=camion_ids)}
+    estados_remolque = {e.remolque_id: e for e in EstadoRemolque.objects.filter(remolque_id__in=remolque_ids)}
+    remolques = {r.pk: r for r in Remolque.objects.select_for_update().filter(pk__in=remolque_ids).order_by('pk')}
+    patentes_camion = dict(Camion.objects.filter(pk__in=camion_ids).values_list('pk', 'patente'))
+
+    km_por_camion = km_por_camion or {}
+
+    def km_de(camion_id):
+        if camion_id in km_por_camion and km_por_camion[camion_id] is not None:
+            return Decimal(km_por_camion[camion_id])
+        estado = estados_camion.get(camion_id)
+        return Decimal(estado.kilometraje if estado else 0)
+
+    ahora = timezone.now()
+    historial_camion, historial_remolque = [], []
+
+    def registrar(camion_id, remolque_id, texto):
+        estado = estados_camion.get(camion_id)
+        historial_camion.append(HistorialEstadoCamion(
+            camion_id=camion_id,
+            kilometraje=int(km_de(camion_id)),
+            estado_operativo=estado.estado_operativo if estado else 'OPERATIVO',
+            id_conductor=estado.conductor_id if estado else None,
+            descripcion_evento=texto,
+            fecha_evento=ahora,
+        ))
+        historial_remolque.append(HistorialEstadoRemolque(
+            remolque_id=remolque_id,
+            kilometraje=remolques[remolque_id].kilometraje_acumulado,
+            estado_operativo=estados_remolque[remolque_id].estado_operativo if remolque_id in estados_remolque else 'OPERATIVO',
+            descripcion_evente=texto,
+        ))
+
+    try:
+        # 3. Cerramos las duplas anteriores y sumamos los km recorridos al remolque
+        for a in a_cerrar:
+            a.activo = False
+            a.fecha_hasta = ahora
+            a.km_fin_camion = km_de(a.camion_id)
+            recorrido = a.km_fin_camion - (a.km_inicio_camion or 0)
+            if recorrido > 0:
+                remolques[a.remolque_id].kilometraje_acumulado += recorrido
+            registrar(a.camion_id, a.remolque_id, descripcion or (
+                f"Desenganche remolque {remolques[a.remolque_id].patente} "
+                f"de {patentes_camion.get(a.camion_id, a.camion_id)}"
+            ))
+        if a_cerrar:
+            AsignacionTractoRemolque.objects.bulk_update(a_cerrar, ['activo', 'fecha_hasta', 'km_fin_camion'])
+            Remolque.objects.bulk_update(
+                [remolques[a.remolque_id] for a in a_cerrar], ['kilometraje_acumulado']
+            )
+            Camion.objects.filter(asignacion_actual__in=a_cerrar).update(asignacion_actual=None)
+            Remolque.objects.filter(asignacion_actual__in=a_cerrar).update(asignacion_actual=None)
+
+        # 4. Abrimos las nuevas duplas y apuntamos ambas unidades a ellas
+        nuevas = AsignacionTractoRemolque.objects.bulk_create([
+            AsignacionTractoRemolque(camion_id=c, remolque_id=r, km_inicio_camion=km_de(c), activo=True)
+            for c, r in a_abrir
+        ])
+        if nuevas:
+            Camion.objects.bulk_update(
+                [Camion(id_camion=a.camion_id, asignacion_actual=a) for a in nuevas], ['asignacion_actual']
+            )
+            for a in nuevas:
+                remolques[a.remolque_id].asignacion_actual = a
+            Remolque.objects.bulk_update([remolques[a.remolque_id] for a in nuevas], ['asignacion_actual'])
+
+        # 5. El remolque hereda la base del camión al que se engancha
+        bases_nuevas = {
+            a.remolque_id: estados_camion[a.camion_id].base_actual
+            for a in nuevas if a.camion_id in estados_camion
+        }
+        por_actualizar, por_crear = [], []
+        for remolque_id, base in bases_nuevas.items():
+            estado = estados_remolque.get(remolque_id)
+            if estado is None:
+                por_crear.append(EstadoRemolque(remolque_id=remolque_id, base_actual=base))
+            elif estado.base_actual != base:
+                estado.base_actual = base
+                por_actualizar.append(estado)
+        # El enganche ya queda en el historial del remolque (abajo): no se duplica el cambio de base
+        EstadoRemolque.objects.sin_historial().bulk_update(por_actualizar, ['base_actual'])
+        EstadoRemolque.objects.bulk_create(por_crear)
+
+        for a in nuevas:
+            registrar(a.camion_id, a.remolque_id, descripcion or (
+                f"Enganche remolque {remolques[a.remolque_id].patente} "
+                f"a {patentes_camion.get(a.camion_id, a.camion_id)}"
+            ))
+
+        # 6. Historial en bloque
+        HistorialEstadoCamion.objects.bulk_create(historial_camion)
+        HistorialEstadoRemolque.objects.bulk_create(historial_remolque)
+
+        # Los bulk_create/bulk_update no disparan señales: invalidamos la caché de las unidades a mano
+        invalidar_al_confirmar(CAMION, *camion_ids)
+        invalidar_al_confirmar(REMOLQUE, *remolque_ids)
+    except IntegrityError as e:
+        # Otra transacción activó una dupla en paralelo: la BD la rechazó
+        raise ValidationError(f"No se pudo aplicar la reasignación: {e}") from e
+
+    return nuevas
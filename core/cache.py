@@ -0,0 +1,180 @@
+"""
+core/cache.py
+Caché por entidad con claves versionadas, sobre el framework de caché de Django (CACHES en settings).
+Cada entidad (camión, remolque, modelo, catálogo del checklist) tiene una versión guardada en la caché; las
+claves de lo cacheado incluyen las versiones de las entidades de las que depende. Invalidar es cambiar la
+versión (ver core/signals.py): las entradas viejas dejan de leerse y expiran solas.
+
+Ej:
+    datos = en_cache('api_camion', [('camion', pk)], lambda: calcular(pk), extra=[date.today()])
+
+Con muchas dependencias (un grupo de unidades) se pasa sello(dependencias) en 'extra' en vez de la lista.
+
+Aciertos y fallos se cuentan por nombre (metricas(), comando 'metricas_cache'): cada proceso los suma en
+memoria y cada METRICAS_SEGUNDOS los vuelca a MetricaCache con un UPDATE atómico.
+La caché debe ser compartida por todos los procesos (FileBasedCache en CACHE_DIR, ver settings) para que la
+invalidación de uno llegue a los demás.
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import F
+
+PREFIJO = 'zmc'
+
+CAMION = 'camion'
+REMOLQUE = 'remolque'
+MODELO = 'modelo'
+CATALOGO = 'catalogo'
+# Cálculos de indicadores que dependen de tablas completas (ver indicadores/signals.py)
+INDICADOR = 'indicador'
+# Versión común de toda la flota: cambia con cualquier camión o remolque (listados completos)
+FLOTA = 'flota'
+
+CATALOGO_CHECKLIST = (CATALOGO, 'checklist')
+TODA_LA_FLOTA = (FLOTA, 'todas')
+
+METRICAS_SEGUNDOS = 30
+
+# Conteos de este proceso aún no volcados: {(nombre, 'aciertos' | 'fallos'): n}
+_pendientes = Counter()
+_bloqueo_metricas = threading.Lock()
+_volcado = {'ultimo': time.monotonic()}
+
+
+def _clave_version(entidad, pk):
+    return f'{PREFIJO}:v:{entidad}:{pk}'
+
+
+def _nueva_version():
+    # Basada en el reloj y no en un contador: si la versión se pierde (la caché la descarta por espacio)
+    # la nueva no coincide con ninguna anterior y no revive entradas viejas
+    return time.time_ns()
+
+
+def versiones(dependencias):
+    """Versión actual de cada (entidad, pk), en una sola lectura a la caché."""
+    claves = [_clave_version(entidad, pk) for entidad, pk in dependencias]
+    actuales = cache.get_many(claves)
+    faltantes = {clave: _nueva_version() for clave in claves if clave not in actuales}
+    if faltantes:
+        cache.set_many(faltantes, timeout=None)
+        actuales.update(faltantes)
+    return [actuales[clave] for clave in claves]
+
+
+def sello(dependencias):
+    """
+    Resumen corto de las dependencias y sus versiones, para usar en 'extra' de en_cache() cuando son muchas
+    (ej: todas las unidades de una base): cambia si cambia cualquiera de ellas o si se agrega o quita una.
+    """
+    dependencias = sorted(dependencias, key=str)
+    partes = [f'{entidad}{pk}.{v}' for (entidad, pk), v in zip(dependencias, versiones(dependencias))]
+    return hashlib.md5(':'.join(partes).encode()).hexdigest()
+
+
+def invalidar(entidad, *pks):
+    """Cambia la versión de las entidades (y la de la flota si son unidades)."""
+    claves = {_clave_version(entidad, pk): _nueva_version() for pk in pks if pk is not None}
+    if not claves:
+        return
+    if entidad in (CAMION, REMOLQUE):
+        claves[_clave_version(*TODA_LA_FLOTA)] = _nueva_version()
+    cache.set_many(claves, timeout=None)
+
+
+def invalidar_al_confirmar(entidad, *pks):
+    """invalidar() después del commit: antes, otra petición podría volver a cachear los datos viejos."""
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        transaction.on_commit(lambda: invalidar(entidad, *pks))
+
+
+def volcar_metricas():
+    """Suma a MetricaCache lo contado por este proceso (UPDATE ... + n en la BD, sin leer antes)."""
+    from .models import MetricaCache  # core.models importa este módulo
+
+    with _bloqueo_metricas:
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+        _volcado['ultimo'] = time.monotonic()
+    por_nombre = defaultdict(dict)
+    for (nombre, resultado), cantidad in pendientes.items():
+        por_nombre[nombre][resultado] = cantidad
+    # Siempre en la primaria, sin pasar por el router (no cuenta como escritura de la petición)
+    filas = MetricaCache.objects.using(DEFAULT_DB_ALIAS)
+    try:
+        for nombre, cuentas in por_nombre.items():
+            sumas = {campo: F(campo) + cantidad for campo, cantidad in cuentas.items()}
+            if not filas.filter(nombre=nombre).update(**sumas):
+                filas.get_or_create(nombre=nombre)
+                filas.filter(nombre=nombre).update(**sumas)
+            for resultado in cuentas:
+                del pendientes[(nombre, resultado)]
+    except DatabaseError:
+        # Lo que no se alcanzó a volcar queda para el siguiente intento
+        with _bloqueo_metricas:
+            _pendientes.update(pendientes)
+        raise
+
+
+def _contar(nombre, resultado):
+    with _bloqueo_metricas:
+        _pendientes[(nombre, resultado)] += 1
+        vencido = time.monotonic() - _volcado['ultimo'] >= METRICAS_SEGUNDOS
+    # Dentro de una transacción un rollback se llevaría el volcado: queda para la siguiente consulta
+    if vencido and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        try:
+            volcar_metricas()
+        except DatabaseError:
+            pass
+
+
+def en_cache(nombre, dependencias, calcular, extra=(), timeout=None):
+    """
+    Valor de 'calcular()' cacheado bajo 'nombre' + 'extra' (parámetros, ej: la fecha si depende del día)
+    y las versiones de 'dependencias' [(entidad, pk), ...]. Las excepciones de calcular() no se cachean.
+    """
+    partes = [str(p) for p in extra]
+    partes += [f'{entidad}{pk}.{v}' for (entidad, pk), v in zip(dependencias, versiones(dependencias))]
+    clave = f"{PREFIJO}:{nombre}:{':'.join(partes)}"
+
+    valor = cache.get(clave)
+    if valor is not None:
+        _contar(nombre, 'aciertos')
+        return valor
+    _contar(nombre, 'fallos')
+    valor = calcular()
+    cache.set(clave, valor, settings.CACHE_SEGUNDOS if timeout is None else timeout)
+    return valor
+
+
+def metricas():
+    """{nombre: {'aciertos', 'fallos', 'tasa_aciertos'}} de todos los procesos desde el último reinicio."""
+    from .models import MetricaCache
+
+    volcar_metricas()
+    resultado = {}
+    for nombre, aciertos, fallos in (
+        MetricaCache.objects.using(DEFAULT_DB_ALIAS).order_by('nombre').values_list('nombre', 'aciertos', 'fallos')
+    ):
+        total = aciertos + fallos
+        resultado[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total, 4) if total else None,
+        }
+    return resultado
+
+
+def reiniciar_metricas():
+    from .models import MetricaCache
+
+    with _bloqueo_metricas:
+        _pendientes.clear()
+    MetricaCache.objects.using(DEFAULT_DB_ALIAS).all().delete()
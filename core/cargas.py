@@ -0,0 +1,190 @@
+"""
+core/cargas.py
+Subida por partes y reanudable de escaneos de DocumentacionGeneral (padrón, revisión técnica, SOAP...) desde
+bases con conexión inestable. El cliente:
+    1. Abre una SesionCarga con el destino, nombre, tamaño y SHA-256 del archivo (iniciar_carga).
+    2. Envía bloques en orden desde el byte que el servidor ya tiene (recibir_bloque). Si se corta,
+       consulta 'recibido' y sigue desde ahí: solo se retransmite el bloque que falló.
+    3. Con el último bloque se verifica el SHA-256 y recién ahí se crea o actualiza el documento, con el
+       archivo guardado por el storage en path_documentos_general. Al reemplazar, el archivo anterior se
+       borra después del commit; si la transacción falla se borra el nuevo.
+Los parciales viven en settings.CARGAS_DIR; 'limpiar_cargas' borra las sesiones abandonadas.
+"""
+
+import hashlib
+import os
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .models import Camion, Conductor, DocumentacionGeneral, Remolque, SesionCarga
+
+# Campo de la entidad dueña según tipo_entidad
+CAMPO_ENTIDAD = {'CAMION': 'camion', 'REMOLQUE': 'remolque', 'CONDUCTOR': 'conductor'}
+MODELO_ENTIDAD = {'CAMION': Camion, 'REMOLQUE': Remolque, 'CONDUCTOR': Conductor}
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+TAMANO_LECTURA = 1024 * 1024
+
+
+def iniciar_carga(usuario, datos):
+    """
+    Abre una sesión de carga. 'datos': tipo_entidad, entidad_id, categoria, nombre_archivo, tamano, sha256 y
+    opcionalmente fecha_vencimiento y documento_id (documento existente de la misma entidad que se reemplaza).
+    """
+    tipo_entidad = datos.get('tipo_entidad')
+    if tipo_entidad not in CAMPO_ENTIDAD:
+        raise ValidationError(f"tipo_entidad debe ser uno de {', '.join(CAMPO_ENTIDAD)}.")
+    entidad = MODELO_ENTIDAD[tipo_entidad].objects.filter(pk=datos.get('entidad_id')).first()
+    if entidad is None:
+        raise ValidationError(f"No existe la entidad {tipo_entidad} {datos.get('entidad_id')}.")
+    if datos.get('categoria') not in dict(DocumentacionGeneral.CATEGORIA_CHOICES):
+        raise ValidationError("Categoría de documento inválida.")
+
+    try:
+        tamano = int(datos.get('tamano'))
+    except (TypeError, ValueError):
+        raise ValidationError("'tamano' debe ser un entero.")
+    if not 0 < tamano <= settings.CARGAS_TAMANO_MAXIMO:
+        raise ValidationError(f"El archivo debe pesar entre 1 byte y {settings.CARGAS_TAMANO_MAXIMO} bytes.")
+    sha256 = str(datos.get('sha256') or '').lower()
+    if not _SHA256.match(sha256):
+        raise ValidationError("'sha256' debe ser el hash hexadecimal del archivo completo.")
+    nombre_archivo = os.path.basename(str(datos.get('nombre_archivo') or '').replace('\\', '/'))
+    if not nombre_archivo:
+        raise ValidationError("Falta 'nombre_archivo'.")
+
+    documento = None
+    if datos.get('documento_id'):
+        documento = DocumentacionGeneral.objects.filter(
+            pk=datos['documento_id'], **{CAMPO_ENTIDAD[tipo_entidad]: entidad}
+        ).first()
+        if documento is None:
+            raise ValidationError("El documento a actualizar no existe o es de otra entidad.")
+
+    sesion = SesionCarga(
+        usuario=usuario,
+        tipo_entidad=tipo_entidad,
+        categoria=datos['categoria'],
+        fecha_vencimiento=datos.get('fecha_vencimiento') or None,
+        documento=documento,
+        nombre_archivo=nombre_archivo[:255],
+        tamano=tamano,
+        sha256=sha256,
+        **{CAMPO_ENTIDAD[tipo_entidad]: entidad},
+    )
+    sesion.full_clean()
+    sesion.save()
+    return sesion
+
+
+def recibir_bloque(sesion_id, usuario, desde, bloque, total=None):
+    """
+    Agrega 'bloque' (bytes) en la posición 'desde' del parcial y retorna la sesión actualizada.
+    'desde' debe ser lo ya recibido (ValidationError con code='desfase' si no: el cliente consulta y
+    reanuda); 'total', si viene (el de Content-Range), debe ser el tamaño declarado al iniciar.
+    Con el último bloque se completa la carga (ver _completar).
+    """
+    # Archivos que _completar() ya guardó en el storage: si la transacción no se confirma no los usa nadie
+    nuevos = []
+    try:
+        with transaction.atomic():
+            # El bloqueo de la fila serializa reintentos simultáneos del mismo bloque
+            sesion = SesionCarga.objects.select_for_update().get(pk=sesion_id, usuario=usuario)
+            if sesion.estado != 'ABIERTA':
+                return sesion
+            if total is not None and total != sesion.tamano:
+                raise ValidationError(
+                    f"El total de Content-Range ({total}) no es el tamaño de la carga ({sesion.tamano})."
+                )
+            if desde != sesion.recibido:
+                raise ValidationError(f"Se esperaba el byte {sesion.recibido}.", code='desfase')
+            if sesion.recibido + len(bloque) > sesion.tamano:
+                raise ValidationError("El bloque excede el tamaño declarado del archivo.")
+
+            os.makedirs(settings.CARGAS_DIR, exist_ok=True)
+            with open(sesion.ruta_parcial, 'r+b' if os.path.exists(sesion.ruta_parcial) else 'wb') as parcial:
+                # Descarta lo escrito por un intento anterior que no llegó a confirmarse
+                parcial.truncate(desde)
+                parcial.seek(desde)
+                parcial.write(bloque)
+                parcial.flush()
+                os.fsync(parcial.fileno())
+
+            sesion.recibido += len(bloque)
+            if sesion.recibido == sesion.tamano:
+                _completar(sesion, nuevos)
+            sesion.save()
+    except BaseException:
+        for archivo in nuevos:
+            archivo.delete(save=False)
+        raise
+    return sesion
+
+
+def _sha256(ruta):
+    digest = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for parte in iter(lambda: archivo.read(TAMANO_LECTURA), b''):
+            digest.update(parte)
+    return digest.hexdigest()
+
+
+def _completar(sesion, nuevos):
+    """
+    Verifica el SHA-256 y crea o actualiza el DocumentacionGeneral con el archivo ensamblado.
+    El archivo guardado se agrega a 'nuevos'; el que reemplaza se borra del storage al confirmar.
+    """
+    ruta = sesion.ruta_parcial
+    transaction.on_commit(lambda: _borrar_parcial(ruta))
+
+    if _sha256(ruta) != sesion.sha256:
+        # El archivo llegó corrupto: hay que abrir otra sesión
+        sesion.estado = 'ERROR'
+        return
+
+    documento = sesion.documento or DocumentacionGeneral(
+        tipo_entidad=sesion.tipo_entidad,
+        camion_id=sesion.camion_id,
+        remolque_id=sesion.remolque_id,
+        conductor_id=sesion.conductor_id,
+        categoria=sesion.categoria,
+    )
+    anterior = documento.archivo.name
+    if sesion.fecha_vencimiento:
+        documento.fecha_vencimiento = sesion.fecha_vencimiento
+    with open(ruta, 'rb') as archivo:
+        # upload_to=path_documentos_general arma la carpeta de la entidad
+        documento.archivo.save(sesion.nombre_archivo, File(archivo), save=False)
+    nuevos.append(documento.archivo)
+    documento.save()
+    if anterior and anterior != documento.archivo.name:
+        storage = documento.archivo.storage
+        transaction.on_commit(lambda: storage.delete(anterior))
+
+    sesion.documento = documento
+    sesion.estado = 'COMPLETA'
+
+
+def _borrar_parcial(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def limpiar_cargas(horas=None):
+    """Borra las sesiones no completadas sin actividad en 'horas' (y sus parciales). Retorna cuántas."""
+    horas = settings.CARGAS_EXPIRACION_HORAS if horas is None else horas
+    viejas = SesionCarga.objects.exclude(estado='COMPLETA').filter(
+        actualizada__lt=timezone.now() - timedelta(hours=horas)
+    )
+    total = 0
+    for sesion in viejas.iterator():
+        _borrar_parcial(sesion.ruta_parcial)
+        sesion.delete()
+        total += 1
+    return total
@@ -0,0 +1,130 @@
+"""
+core/descargas.py
+Entrega de archivos guardados con el storage de Django (reportes PDF, documentos).
+Si el servidor web está configurado (DESCARGAS_CABECERA_SENDFILE) se le delega el envío con
+X-Accel-Redirect (nginx) o X-Sendfile (Apache); si no, Django lo envía en bloques con soporte de Range
+para que el visor de PDF del navegador pueda pedir solo las partes que necesita.
+Con 'cache_segundos' la respuesta lleva Cache-Control privado y Last-Modified (304 si no cambió).
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header, http_date
+from django.views.static import was_modified_since
+
+TAMANO_BLOQUE = 64 * 1024
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parsear_rango(cabecera, tamano):
+    """
+    Interpreta 'Range: bytes=a-b' (un solo rango).
+    Retorna (inicio, fin) inclusivo, None si hay que enviar el archivo completo,
+    o False si el rango no se puede satisfacer.
+    """
+    if not cabecera:
+        return None
+    m = _RANGO.match(cabecera.strip())
+    if not m:
+        # Rangos múltiples o unidades desconocidas: se permite responder con el archivo completo
+        return None
+    inicio, fin = m.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # Sufijo: los últimos N bytes
+        largo = int(fin)
+        if largo == 0:
+            return False
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _leer_bloques(archivo, inicio, largo):
+    try:
+        archivo.seek(inicio)
+        while largo > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, largo))
+            if not bloque:
+                break
+            largo -= len(bloque)
+            yield bloque
+    finally:
+        archivo.close()
+
+
+def _cachear(response, cache_segundos):
+    if cache_segundos is not None:
+        # Privado: son archivos con permisos, ningún proxy intermedio debe guardarlos
+        patch_cache_control(response, private=True, max_age=cache_segundos)
+    return response
+
+
+def respuesta_archivo(request, nombre, nombre_descarga=None, adjunto=False, storage=None, cache_segundos=None):
+    """
+    Respuesta HTTP para el archivo 'nombre' del storage.
+    La vista que llama es responsable de validar permisos antes.
+    """
+    storage = storage or default_storage
+    nombre_descarga = nombre_descarga or os.path.basename(nombre)
+    tipo = mimetypes.guess_type(nombre_descarga)[0] or 'application/octet-stream'
+
+    cabecera = getattr(settings, 'DESCARGAS_CABECERA_SENDFILE', '')
+    if cabecera:
+        # El servidor web se encarga del envío, de Range y de Last-Modified/304
+        response = HttpResponse(content_type=tipo)
+        if cabecera == 'X-Sendfile':
+            response[cabecera] = storage.path(nombre)
+        else:
+            prefijo = getattr(settings, 'DESCARGAS_PREFIJO_INTERNO', '/media-protegida/')
+            response[cabecera] = prefijo.rstrip('/') + '/' + quote(nombre.lstrip('/'))
+        response['Content-Disposition'] = content_disposition_header(adjunto, nombre_descarga)
+        return _cachear(response, cache_segundos)
+
+    modificado = None
+    if cache_segundos is not None:
+        modificado = storage.get_modified_time(nombre).timestamp()
+        if not was_modified_since(request.headers.get('If-Modified-Since'), modificado):
+            response = HttpResponse(status=304)
+            response['Last-Modified'] = http_date(modificado)
+            return _cachear(response, cache_segundos)
+
+    tamano = storage.size(nombre)
+    rango = _parsear_rango(request.headers.get('Range'), tamano)
+
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamano}'
+        return response
+
+    if rango is None:
+        response = FileResponse(
+            storage.open(nombre, 'rb'), content_type=tipo, as_attachment=adjunto, filename=nombre_descarga
+        )
+        response['Accept-Ranges'] = 'bytes'
+        if modificado is not None:
+            response['Last-Modified'] = http_date(modificado)
+        return _cachear(response, cache_segundos)
+
+    inicio, fin = rango
+    largo = fin - inicio + 1
+    response = StreamingHttpResponse(
+        _leer_bloques(storage.open(nombre, 'rb'), inicio, largo), status=206, content_type=tipo
+    )
+    response['Content-Length'] = str(largo)
+    response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(adjunto, nombre_descarga)
+    if modificado is not None:
+        response['Last-Modified'] = http_date(modificado)
+    return _cachear(response, cache_segundos)
@@ -0,0 +1,25 @@
+"""
+core/management/commands/limpiar_cargas.py
+Borra las subidas por partes abandonadas (sesiones no completadas y sus archivos parciales). Ver core/cargas.py.
+
+Ejemplo (crontab, todas las noches):
+    15 4 * * * cd /app && python manage.py limpiar_cargas
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.cargas import limpiar_cargas
+
+
+class Command(BaseCommand):
+    help = 'Borra las sesiones de carga por partes abandonadas y sus archivos parciales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas', type=int, default=settings.CARGAS_EXPIRACION_HORAS,
+            help='Horas sin actividad tras las que una sesión se considera abandonada',
+        )
+
+    def handle(self, *args, **options):
+        total = limpiar_cargas(options['horas'])
+        self.stdout.write(self.style.SUCCESS(f"🧹 {total} sesiones de carga abandonadas eliminadas."))
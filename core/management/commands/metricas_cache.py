@@ -0,0 +1,34 @@
+"""
+core/management/commands/metricas_cache.py
+Aciertos y fallos de la caché por entidad (core/cache.py), por nombre de lo cacheado.
+Suma los contadores de todos los procesos (MetricaCache); lo de los otros procesos llega con hasta
+METRICAS_SEGUNDOS de atraso (core/cache.py).
+
+Ejemplo:
+    python manage.py metricas_cache
+    python manage.py metricas_cache --reiniciar
+"""
+
+from django.core.management.base import BaseCommand
+from core.cache import metricas, reiniciar_metricas
+
+
+class Command(BaseCommand):
+    help = 'Muestra (o reinicia) los aciertos y fallos de la caché por entidad'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Pone los contadores en cero')
+
+    def handle(self, *args, **options):
+        if options['reiniciar']:
+            reiniciar_metricas()
+            self.stdout.write(self.style.SUCCESS("🧹 Métricas de caché reiniciadas."))
+            return
+
+        datos = metricas()
+        if not datos:
+            self.stdout.write("Sin métricas registradas.")
+            return
+        for nombre, m in datos.items():
+            tasa = f"{m['tasa_aciertos']:.1%}" if m['tasa_aciertos'] is not None else '-'
+            self.stdout.write(f"{nombre:<28} aciertos={m['aciertos']:<8} fallos={m['fallos']:<8} tasa={tasa}")
@@ -0,0 +1,28 @@
+# Índices para resolver la última mantención real por unidad (DISTINCT ON).
+# La tabla 'mantenciones' no es administrada por Django (managed=False),
+# por eso los índices se crean con SQL directo.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0002_remolque_alter_documentaciongeneral_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS mantenciones_camion_tipo_fecha_idx "
+                "ON mantenciones (id_camion, tipo_mantencion, fecha_mantencion DESC);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS mantenciones_camion_tipo_fecha_idx;",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS mantenciones_remolque_tipo_fecha_idx "
+                "ON mantenciones (id_remolque, tipo_mantencion, fecha_mantencion DESC);"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS mantenciones_remolque_tipo_fecha_idx;",
+        ),
+    ]
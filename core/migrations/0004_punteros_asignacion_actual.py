@@ -0,0 +1,57 @@
+# Puntero desnormalizado a la asignación tracto-remolque activa en Camion y Remolque.
+# 'camiones' no es administrada por Django (managed=False): la columna se agrega con SQL.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0003_indices_ultima_mantencion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="camion",
+            name="asignacion_actual",
+            field=models.OneToOneField(
+                blank=True,
+                db_column="id_asignacion_actual",
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="core.asignaciontractoremolque",
+            ),
+        ),
+        migrations.RunSQL(
+            sql=(
+                "ALTER TABLE camiones ADD COLUMN IF NOT EXISTS id_asignacion_actual integer NULL UNIQUE "
+                "REFERENCES asignacion_tracto_remolque (id_asignacion) DEFERRABLE INITIALLY DEFERRED;"
+            ),
+            reverse_sql="ALTER TABLE camiones DROP COLUMN IF EXISTS id_asignacion_actual;",
+        ),
+        migrations.AddField(
+            model_name="remolque",
+            name="asignacion_actual",
+            field=models.OneToOneField(
+                blank=True,
+                db_column="id_asignacion_actual",
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="core.asignaciontractoremolque",
+            ),
+        ),
+        # Carga inicial de los punteros desde las asignaciones activas existentes
+        migrations.RunSQL(
+            sql=[
+                "UPDATE camiones c SET id_asignacion_actual = a.id_asignacion "
+                "FROM asignacion_tracto_remolque a WHERE a.id_camion = c.id_camion AND a.activo;",
+                "UPDATE remolques r SET id_asignacion_actual = a.id_asignacion "
+                "FROM asignacion_tracto_remolque a WHERE a.id_remolque = r.id_remolque AND a.activo;",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
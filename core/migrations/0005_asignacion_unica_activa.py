@@ -0,0 +1,58 @@
+# Unicidad de la dupla activa garantizada por la BD (índices únicos parciales WHERE activo)
+# y km de cierre de la asignación.
+
+from django.db import migrations, models
+
+# Antes de crear las restricciones, dejamos activa solo la asignación más reciente
+# de cada camión y de cada remolque (puede haber duplicados por carreras anteriores).
+DEPURAR_DUPLICADOS = [
+    "UPDATE asignacion_tracto_remolque a SET activo = false, fecha_hasta = COALESCE(a.fecha_hasta, now()) "
+    "WHERE a.activo AND EXISTS (SELECT 1 FROM asignacion_tracto_remolque b "
+    "WHERE b.activo AND b.id_camion = a.id_camion AND b.id_asignacion > a.id_asignacion);",
+    "UPDATE asignacion_tracto_remolque a SET activo = false, fecha_hasta = COALESCE(a.fecha_hasta, now()) "
+    "WHERE a.activo AND EXISTS (SELECT 1 FROM asignacion_tracto_remolque b "
+    "WHERE b.activo AND b.id_remolque = a.id_remolque AND b.id_asignacion > a.id_asignacion);",
+    "UPDATE camiones SET id_asignacion_actual = NULL WHERE id_asignacion_actual IN "
+    "(SELECT id_asignacion FROM asignacion_tracto_remolque WHERE NOT activo);",
+    "UPDATE remolques SET id_asignacion_actual = NULL WHERE id_asignacion_actual IN "
+    "(SELECT id_asignacion FROM asignacion_tracto_remolque WHERE NOT activo);",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0004_punteros_asignacion_actual"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="asignaciontractoremolque",
+            name="km_fin_camion",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                help_text="Kilometraje del camión al momento del desenganche",
+                max_digits=12,
+                null=True,
+            ),
+        ),
+        migrations.RunSQL(sql=DEPURAR_DUPLICADOS, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="asignaciontractoremolque",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("activo", True)),
+                fields=("camion",),
+                name="asignacion_activa_unica_camion",
+                violation_error_message="Error: El camión ya tiene un remolque activo asignado.",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="asignaciontractoremolque",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("activo", True)),
+                fields=("remolque",),
+                name="asignacion_activa_unica_remolque",
+                violation_error_message="Error: El remolque ya está activo con otro camión.",
+            ),
+        ),
+    ]
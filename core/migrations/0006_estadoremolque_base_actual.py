@@ -0,0 +1,38 @@
+# Base del remolque guardada como dato (heredada del camión enganchado).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0005_asignacion_unica_activa"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="estadoremolque",
+            name="base_actual",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("SOMBRERO", "Sombrero"),
+                    ("GREGORIO", "Gregorio"),
+                    ("CULLEN", "Cullen"),
+                    ("POSESION", "Posesión"),
+                    ("PUNTA_ARENAS", "Punta Arenas"),
+                ],
+                editable=False,
+                max_length=20,
+                null=True,
+            ),
+        ),
+        # Carga inicial desde el camión de la asignación activa
+        migrations.RunSQL(
+            sql=(
+                "UPDATE estado_remolque er SET base_actual = ec.base_actual "
+                "FROM asignacion_tracto_remolque a JOIN estado_camion ec ON ec.id_camion = a.id_camion "
+                "WHERE a.id_remolque = er.id_remolque AND a.activo;"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
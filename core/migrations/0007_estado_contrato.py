@@ -0,0 +1,41 @@
+# Contrato existe en la BD (core_contrato) pero nunca quedó en el estado de migraciones.
+# Se agrega al estado para que otros modelos puedan apuntarle; en la BD solo se crea si no existe.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_estadoremolque_base_actual"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=(
+                        "CREATE TABLE IF NOT EXISTS core_contrato ("
+                        "id bigserial PRIMARY KEY, "
+                        "nombre varchar(100) NOT NULL, "
+                        "logo_cliente varchar(100) NULL, "
+                        "activo boolean NOT NULL);"
+                    ),
+                    reverse_sql=migrations.RunSQL.noop,
+                ),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name="Contrato",
+                    fields=[
+                        ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                        ("nombre", models.CharField(max_length=100)),
+                        ("logo_cliente", models.ImageField(blank=True, null=True, upload_to="logos/contratos/")),
+                        ("activo", models.BooleanField(default=True)),
+                    ],
+                    options={
+                        "db_table": "core_contrato",
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# ModeloVehiculo existe en la BD (core_modelovehiculo) pero nunca quedó en el estado de migraciones.
+# Se agrega al estado para que otros modelos puedan apuntarle; en la BD solo se crea si no existe.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_estado_contrato"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=(
+                        "CREATE TABLE IF NOT EXISTS core_modelovehiculo ("
+                        "id bigserial PRIMARY KEY, "
+                        "nombre varchar(100) NOT NULL, "
+                        "marca varchar(50) NOT NULL, "
+                        "unidad_medida varchar(10) NOT NULL);"
+                    ),
+                    reverse_sql=migrations.RunSQL.noop,
+                ),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name="ModeloVehiculo",
+                    fields=[
+                        ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                        ("nombre", models.CharField(max_length=100)),
+                        ("marca", models.CharField(max_length=50)),
+                        (
+                            "unidad_medida",
+                            models.CharField(
+                                choices=[("KM", "Kilómetros"), ("HORAS", "Horas")], default="KM", max_length=10
+                            ),
+                        ),
+                    ],
+                ),
+            ],
+        ),
+    ]
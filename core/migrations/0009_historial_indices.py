@@ -0,0 +1,47 @@
+# Historial de estados escrito automáticamente: índices (unidad, fecha_evento) para líneas de tiempo e indicadores.
+# historial_estado_camion no es administrada por Django: el índice se crea con SQL y en el estado se agrega
+# la FK al camión (existía en la BD como id_camion pero no en el estado de migraciones).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0008_estado_modelovehiculo"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=(
+                        "CREATE INDEX IF NOT EXISTS historial_camion_fecha_idx "
+                        "ON historial_estado_camion (id_camion, fecha_evento);"
+                    ),
+                    reverse_sql="DROP INDEX IF EXISTS historial_camion_fecha_idx;",
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name="historialestadocamion",
+                    name="camion",
+                    field=models.ForeignKey(
+                        db_column="id_camion",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="historial_estados",
+                        to="core.camion",
+                    ),
+                    preserve_default=False,
+                ),
+                migrations.AddIndex(
+                    model_name="historialestadocamion",
+                    index=models.Index(fields=["camion", "fecha_evento"], name="historial_camion_fecha_idx"),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="historialestadoremolque",
+            index=models.Index(fields=["remolque", "fecha_evento"], name="historial_remolque_fecha_idx"),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Archivo en frío del historial antiguo (ver mantenciones/archivo.py).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0009_historial_indices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivoHistorico",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "tabla",
+                    models.CharField(
+                        choices=[
+                            ("INSPECCION", "Inspecciones (con resultados)"),
+                            ("REGISTRO_DIARIO", "Registros Diarios"),
+                            ("HISTORIAL_CAMION", "Historial de Estados de Camión"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("mes", models.DateField(help_text="Primer día del mes archivado")),
+                ("filas", models.PositiveIntegerField(default=0)),
+                ("id_desde", models.BigIntegerField()),
+                ("id_hasta", models.BigIntegerField()),
+                ("datos", models.BinaryField()),
+                ("actualizado", models.DateTimeField(auto_now=True)),
+                (
+                    "camion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archivos_historicos",
+                        to="core.camion",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Archivo Histórico",
+                "verbose_name_plural": "Archivo Histórico",
+                "indexes": [
+                    models.Index(fields=["tabla", "id_desde", "id_hasta"], name="archivo_historico_ids_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("tabla", "camion", "mes"), name="archivo_historico_unico"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Subidas por partes de documentos (ver core/cargas.py).
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0010_archivohistorico"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SesionCarga",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                (
+                    "tipo_entidad",
+                    models.CharField(
+                        choices=[("CAMION", "Camión"), ("CONDUCTOR", "Conductor"), ("REMOLQUE", "Remolque")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "categoria",
+                    models.CharField(
+                        choices=[
+                            ("PADRON", "Padrón / Certificado Inscripción"),
+                            ("PERMISO_CIRCULACION", "Permiso de Circulación"),
+                            ("SOAP", "Seguro Obligatorio (SOAP)"),
+                            ("REVISION_TECNICA", "Revisión Técnica"),
+                            ("TC8", "Certificado TC8 (Gases)"),
+                            ("SEC", "Certificado SEC"),
+                            ("HERMETICIDAD", "Prueba de Hermeticidad"),
+                            ("EXTINTOR", "Certificado Carga de Extintor"),
+                            ("SEGURO_CARGA", "Seguro Transporte Terrestre (Carga)"),
+                            ("SEGURO_RC", "Seguro Responsabilidad Civil"),
+                            ("LICENCIA", "Licencia de Conducir"),
+                            ("CONTRATO", "Contrato de Trabajo"),
+                            ("EXAMEN_PREOCUPACIONAL", "Examen Preocupacional"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("fecha_vencimiento", models.DateField(blank=True, null=True)),
+                ("nombre_archivo", models.CharField(max_length=255)),
+                ("tamano", models.PositiveBigIntegerField()),
+                ("sha256", models.CharField(max_length=64)),
+                ("recibido", models.PositiveBigIntegerField(default=0)),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[("ABIERTA", "Abierta"), ("COMPLETA", "Completa"), ("ERROR", "Error de verificación")],
+                        default="ABIERTA",
+                        max_length=10,
+                    ),
+                ),
+                ("creada", models.DateTimeField(auto_now_add=True)),
+                ("actualizada", models.DateTimeField(auto_now=True)),
+                (
+                    "camion",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="+",
+                        to="core.camion",
+                    ),
+                ),
+                (
+                    "conductor",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="+",
+                        to="core.conductor",
+                    ),
+                ),
+                (
+                    "documento",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Documento a actualizar; al completar queda el creado o actualizado",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="core.documentaciongeneral",
+                    ),
+                ),
+                (
+                    "remolque",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="+",
+                        to="core.remolque",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sesiones_carga",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Sesión de Carga",
+                "verbose_name_plural": "Sesiones de Carga",
+                "indexes": [models.Index(fields=["estado", "actualizada"], name="sesion_carga_estado_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Los índices de 0003 empezaban por (unidad, tipo_mantencion, fecha DESC), pero la consulta de la última
+# mantención real excluye las DIARIAS y ordena por (unidad, fecha DESC, id DESC): con tipo_mantencion en medio
+# el planificador no puede recorrer el índice en el orden del DISTINCT ON.
+# Se reemplazan por índices parciales sobre las mantenciones reales con las columnas del ORDER BY.
+# 'mantenciones' no es administrada por Django (managed=False), por eso se usa SQL directo.
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0011_sesioncarga"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "DROP INDEX IF EXISTS mantenciones_camion_tipo_fecha_idx;",
+                "CREATE INDEX IF NOT EXISTS mantenciones_camion_reales_idx "
+                "ON mantenciones (id_camion, fecha_mantencion DESC, id_mantencion DESC) "
+                "WHERE tipo_mantencion <> 'DIARIA' AND id_camion IS NOT NULL;",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS mantenciones_camion_reales_idx;",
+                "CREATE INDEX IF NOT EXISTS mantenciones_camion_tipo_fecha_idx "
+                "ON mantenciones (id_camion, tipo_mantencion, fecha_mantencion DESC);",
+            ],
+        ),
+        migrations.RunSQL(
+            sql=[
+                "DROP INDEX IF EXISTS mantenciones_remolque_tipo_fecha_idx;",
+                "CREATE INDEX IF NOT EXISTS mantenciones_remolque_reales_idx "
+                "ON mantenciones (id_remolque, fecha_mantencion DESC, id_mantencion DESC) "
+                "WHERE tipo_mantencion <> 'DIARIA' AND id_remolque IS NOT NULL;",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS mantenciones_remolque_reales_idx;",
+                "CREATE INDEX IF NOT EXISTS mantenciones_remolque_tipo_fecha_idx "
+                "ON mantenciones (id_remolque, tipo_mantencion, fecha_mantencion DESC);",
+            ],
+        ),
+    ]
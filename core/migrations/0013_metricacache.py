@@ -0,0 +1,24 @@
+# Contadores de aciertos y fallos de la caché (core/cache.py) en la BD, con incrementos atómicos.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0012_indices_parciales_ultima_mantencion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricaCache",
+            fields=[
+                ("nombre", models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ("aciertos", models.PositiveBigIntegerField(default=0)),
+                ("fallos", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Métrica de Caché",
+                "verbose_name_plural": "Métricas de Caché",
+            },
+        ),
+    ]
@@ -5,10 +5,17 @@ Define las entidades principales del sistema y sus relaciones: camiones, remolqu
 contratistas, conductores, mantenciones y documentación.
 """
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
 from datetime import date
+import gzip
+import json
+import uuid
+from django.conf import settings
 from django.core.exceptions import ValidationError
 import os
+from .cache import CAMION, REMOLQUE, invalidar_al_confirmar
 
 # Opciones de Base (Magallanes)
 BASE_CHOICES = [
@@ -110,18 +117,27 @@ class Camion(models.Model):
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField()
 
+    # Puntero a la asignación tracto-remolque activa (desnormalizado).
+    # Lo mantiene AsignacionTractoRemolque.save(); usar core.asignaciones para enganchar/desenganchar.
+    asignacion_actual = models.OneToOneField(
+        'AsignacionTractoRemolque',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_column='id_asignacion_actual',
+        related_name='+'
+    )
+
     class Meta:
         managed = False
         db_table = 'camiones'
 
-    @property
-    def asignacion_actual(self):
-        """Retorna la asignación activa del remolque al camión (si existe)."""
-        return self.asignaciontractoremolque_set.filter(activo=True).first()
-
     @property
     def tiene_remolque(self):
-        """Verifica si el camión tiene un remolque asignado actualmente."""
+        """Verifica si el camión tiene un remolque asignado actualmente (sin consultas)."""
+        return self.asignacion_actual_id is not None
+
     def __str__(self):
         return self.patente if self.patente else "Camión sin patente"
     
@@ -222,6 +238,17 @@ class Remolque(models.Model):
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    # Puntero a la asignación activa (mismo mecanismo que Camion.asignacion_actual)
+    asignacion_actual = models.OneToOneField(
+        'AsignacionTractoRemolque',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_column='id_asignacion_actual',
+        related_name='+'
+    )
+
     class Meta:
         db_table = 'remolques' # Forzamos el nombre de la tabla para que coincida con el SQL
         verbose_name = 'Remolque'
@@ -230,6 +257,29 @@ class Remolque(models.Model):
     def __str__(self):
         return self.patente if self.patente else "Remolque sin patente"
 
+class MantencionQuerySet(models.QuerySet):
+    """Consultas reutilizables sobre el historial de mantenciones."""
+
+    def reales(self):
+        """Excluye los checklists diarios: solo mantenciones de taller o emergencia."""
+        return self.exclude(tipo_mantencion='DIARIA')
+
+    def ultimas_por_camion(self):
+        """
+        Última mantención real de cada camión (una fila por camión).
+        Usa DISTINCT ON de PostgreSQL apoyado en el índice parcial
+        (id_camion, fecha_mantencion DESC, id_mantencion DESC) WHERE tipo_mantencion <> 'DIARIA'.
+        """
+        return self.reales().filter(camion__isnull=False).order_by(
+            'camion_id', '-fecha_mantencion', '-id_mantencion'
+        ).distinct('camion_id')
+
+    def ultimas_por_remolque(self):
+        """Igual que ultimas_por_camion, pero una fila por remolque."""
+        return self.reales().filter(remolque__isnull=False).order_by(
+            'remolque_id', '-fecha_mantencion', '-id_mantencion'
+        ).distinct('remolque_id')
+
 class Mantencion(models.Model):
     """Registra los eventos de mantenimiento de camiones y remolques (taller, diaria o emergencia)."""
     TIPOS_CHOICES = [
@@ -277,6 +327,9 @@ class Mantencion(models.Model):
     dias_revision_tecnica = models.IntegerField(blank=True, null=True)
     observaciones = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    objects = MantencionQuerySet.as_manager()
+
     class Meta:
         managed = False
         db_table = 'mantenciones'
@@ -330,55 +383,250 @@ class AsignacionTractoRemolque(models.Model):
         help_text="Kilometraje del camión al momento de realizar el enganche"
     )
     
+    km_fin_camion = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Kilometraje del camión al momento del desenganche"
+    )
+    
     activo = models.BooleanField(
         default=True,
         help_text="Indica si el remolque está actualmente enganchado a este camión"
     )
 
-    def clean(self):
-        # Solo validamos si el usuario está intentando activar esta asignación
+    def save(self, *args, **kwargs):
+        # La unicidad de la dupla activa la garantizan las restricciones parciales de la BD
+        # (ver Meta.constraints): sin consultas .exists() previas y sin carreras entre ediciones.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.actualizar_punteros()
+
+    def actualizar_punteros(self):
+        """
+        Sincroniza Camion.asignacion_actual y Remolque.asignacion_actual con esta asignación.
+        Si está activa, ambas unidades apuntan a ella y el remolque hereda la base del camión; si no, se limpian
+        los punteros que la referencien.
+        """
         if self.activo:
-            # 1. Verificar si el CAMIÓN ya tiene otro remolque activo
-            query_camion = AsignacionTractoRemolque.objects.filter(
-                camion=self.camion, 
-                activo=True
-            )
-            if self.pk: # Si estamos editando una existente, la excluimos de la búsqueda
-                query_camion = query_camion.exclude(pk=self.pk)
-            
-            if query_camion.exists():
-                raise ValidationError(
-                    f"Error: El camión {self.camion.patente} ya tiene un remolque activo asignado."
+            # Si se editó el camión o remolque de la asignación, primero soltamos los punteros antiguos
+            # (asignacion_actual es única: la nueva unidad no puede apuntarle mientras la anterior lo haga)
+            Camion.objects.filter(asignacion_actual=self).exclude(pk=self.camion_id).update(asignacion_actual=None)
+            Remolque.objects.filter(asignacion_actual=self).exclude(pk=self.remolque_id).update(asignacion_actual=None)
+            Camion.objects.filter(pk=self.camion_id).update(asignacion_actual=self)
+            Remolque.objects.filter(pk=self.remolque_id).update(asignacion_actual=self)
+            base = EstadoCamion.objects.filter(camion_id=self.camion_id).values_list('base_actual', flat=True).first()
+            if base:
+                # Igual que core/asignaciones.py: el cambio de base no se duplica en el historial
+                actualizados = EstadoRemolque.objects.filter(remolque_id=self.remolque_id).sin_historial().update(
+                    base_actual=base
                 )
-
-            # 2. Verificar si el REMOLQUE ya está enganchado a otro camión
-            query_remolque = AsignacionTractoRemolque.objects.filter(
-                remolque=self.remolque, 
-                activo=True
-            )
-            if self.pk:
-                query_remolque = query_remolque.exclude(pk=self.pk)
-
-            if query_remolque.exists():
-                raise ValidationError(
-                    f"Error: El remolque {self.remolque.patente} ya está activo con otro camión."
-                )
-    def save(self, *args, **kwargs):
-        # Forzamos la ejecución de clean() antes de guardar
-        self.full_clean()
-        super().save(*args, **kwargs)
+                if not actualizados:
+                    EstadoRemolque.objects.create(remolque_id=self.remolque_id, base_actual=base)
+        else:
+            Camion.objects.filter(asignacion_actual=self).update(asignacion_actual=None)
+            Remolque.objects.filter(asignacion_actual=self).update(asignacion_actual=None)
 
     class Meta:
         db_table = 'asignacion_tracto_remolque'
         verbose_name = 'Asignación Tracto-Remolque'
         verbose_name_plural = 'Asignaciones Tracto-Remolque'
+        constraints = [
+            # Un camión solo puede tener un remolque activo...
+            models.UniqueConstraint(
+                fields=['camion'],
+                condition=models.Q(activo=True),
+                name='asignacion_activa_unica_camion',
+                violation_error_message="Error: El camión ya tiene un remolque activo asignado.",
+            ),
+            # ...y un remolque solo puede estar enganchado a un camión
+            models.UniqueConstraint(
+                fields=['remolque'],
+                condition=models.Q(activo=True),
+                name='asignacion_activa_unica_remolque',
+                violation_error_message="Error: El remolque ya está activo con otro camión.",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.camion.patente} <-> {self.remolque.patente} ({self.fecha_desde.date()})"
 
 #---------ESTADOS-------
 
-class EstadoCamion(models.Model):
+class EstadoConHistorialQuerySet(models.QuerySet):
+    """
+    update() y bulk_update() que dejan en el historial una fila por estado que cambió en un campo seguido,
+    con un solo bulk_create (en la misma transacción). sin_historial() lo omite, ej: cuando quien llama
+    ya registra el evento con su propia descripción.
+    Como no disparan post_save, también invalidan la caché de las unidades tocadas (core/cache.py).
+    """
+    _sin_historial = False
+
+    def _clone(self):
+        copia = super()._clone()
+        copia._sin_historial = self._sin_historial
+        return copia
+
+    def sin_historial(self):
+        copia = self._chain()
+        copia._sin_historial = True
+        return copia
+
+    def _invalidar_cache(self, unidades):
+        entidad, _campo = self.model.UNIDAD_CACHE
+        invalidar_al_confirmar(entidad, *unidades)
+
+    def update(self, **kwargs):
+        campos = self.model.campos_seguidos(kwargs)
+        _entidad, campo_unidad = self.model.UNIDAD_CACHE
+        if self._sin_historial or not campos:
+            with transaction.atomic(using=self.db):
+                self._invalidar_cache(self.values_list(campo_unidad, flat=True))
+                return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            antes = {
+                fila['pk']: fila
+                for fila in self.select_for_update(of=('self',)).values('pk', campo_unidad, *self.model.CAMPOS_SEGUIDOS)
+            }
+            self._invalidar_cache(fila[campo_unidad] for fila in antes.values())
+            filas = super().update(**kwargs)
+            pares = []
+            for estado in self.model.objects.filter(pk__in=list(antes)):
+                cambios = estado.cambios(originales=antes[estado.pk], campos=campos)
+                if cambios:
+                    pares.append((estado, cambios))
+            self.model.registrar_historial(pares)
+        return filas
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        campos = self.model.campos_seguidos(fields)
+        if self._sin_historial or not campos:
+            with transaction.atomic(using=self.db):
+                # Dentro del bloque: se invalida al confirmar, después de escribir
+                self._invalidar_cache(getattr(obj, self.model.UNIDAD_CACHE[1]) for obj in objs)
+                return super().bulk_update(objs, fields, batch_size=batch_size)
+        pares = [(obj, obj.cambios(campos=campos)) for obj in objs]
+        with transaction.atomic(using=self.db):
+            filas = self.sin_historial().bulk_update(objs, fields, batch_size=batch_size)
+            self.model.registrar_historial([(obj, cambios) for obj, cambios in pares if cambios])
+        for obj in objs:
+            obj.recordar_originales(campos)
+        return filas
+
+
+class EstadoConHistorial(models.Model):
+    """
+    Estado actual de una unidad cuyo historial se escribe solo: al guardar, cada cambio en CAMPOS_SEGUIDOS
+    agrega una fila a MODELO_HISTORIAL en la misma transacción (registrar_historial).
+    El valor original de cada campo se recuerda al leer de la BD. 'motivo' (opcional, no se guarda)
+    antecede la descripción del evento, ej: "Inspección SM1 #120".
+    """
+    CAMPOS_SEGUIDOS = ()
+    # (entidad de core/cache.py, attname de la unidad) que se invalida en los update() masivos
+    UNIDAD_CACHE = (None, None)
+    # 'app.Modelo' del historial. Cada fila lleva la unidad, los CAMPOS_SEGUIDOS que el historial también
+    # tiene, CAMPOS_HISTORIAL, la descripción en CAMPO_DESCRIPCION y fecha_evento
+    MODELO_HISTORIAL = None
+    # {campo del historial: attname del estado, o ruta con '__' que se lee en una consulta para todo el lote}
+    CAMPOS_HISTORIAL = {}
+    CAMPO_DESCRIPCION = 'descripcion_evento'
+    motivo = None
+
+    objects = EstadoConHistorialQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._originales = {
+            campo: getattr(instancia, campo)
+            for campo in cls.CAMPOS_SEGUIDOS if campo in field_names
+        }
+        return instancia
+
+    @classmethod
+    def campos_seguidos(cls, campos):
+        """CAMPOS_SEGUIDOS incluidos en 'campos' (acepta nombres de campo o attname, ej: conductor)."""
+        attnames = {cls._meta.get_field(campo).attname for campo in campos}
+        return [campo for campo in cls.CAMPOS_SEGUIDOS if campo in attnames]
+
+    @classmethod
+    def registrar_historial(cls, pares):
+        """Crea en bloque las filas de historial de [(estado, cambios)]."""
+        if not pares:
+            return
+        historial = cls._meta.apps.get_model(cls.MODELO_HISTORIAL)
+        campos_historial = {campo.attname for campo in historial._meta.concrete_fields}
+        _entidad, campo_unidad = cls.UNIDAD_CACHE
+        copiados = [campo_unidad] + [campo for campo in cls.CAMPOS_SEGUIDOS if campo in campos_historial]
+        directos = {destino: origen for destino, origen in cls.CAMPOS_HISTORIAL.items() if '__' not in origen}
+        rutas = {destino: origen for destino, origen in cls.CAMPOS_HISTORIAL.items() if '__' in origen}
+        leidos = {}
+        if rutas:
+            leidos = {
+                fila[0]: dict(zip(rutas, fila[1:]))
+                for fila in cls.objects.filter(pk__in=[estado.pk for estado, _ in pares])
+                .values_list('pk', *rutas.values())
+            }
+        ahora = timezone.now()
+        filas = []
+        for estado, cambios in pares:
+            valores = {campo: getattr(estado, campo) for campo in copiados}
+            valores.update({destino: getattr(estado, origen) for destino, origen in directos.items()})
+            valores.update(leidos.get(estado.pk, {}))
+            valores[cls.CAMPO_DESCRIPCION] = estado.describir_cambios(cambios)
+            filas.append(historial(fecha_evento=ahora, **valores))
+        historial.objects.bulk_create(filas)
+
+    def recordar_originales(self, campos=None):
+        """Toma los valores actuales como originales (solo 'campos' si se indica: los que se guardaron)."""
+        originales = getattr(self, '_originales', None) or {}
+        for campo in self.CAMPOS_SEGUIDOS if campos is None else campos:
+            originales[campo] = getattr(self, campo)
+        self._originales = originales
+
+    def cambios(self, originales=None, campos=None):
+        """
+        {campo: (antes, después)} de los campos seguidos que cambiaron.
+        Una instancia que no viene de la BD (nueva) reporta todos sus campos con antes=None.
+        """
+        if originales is None:
+            originales = getattr(self, '_originales', None)
+        campos = self.CAMPOS_SEGUIDOS if campos is None else campos
+        if originales is None:
+            return {campo: (None, getattr(self, campo)) for campo in campos if getattr(self, campo) is not None}
+        return {
+            campo: (originales[campo], getattr(self, campo))
+            for campo in campos
+            if campo in originales and originales[campo] != getattr(self, campo)
+        }
+
+    def describir_cambios(self, cambios):
+        partes = []
+        for campo, (antes, despues) in cambios.items():
+            etiqueta = self._meta.get_field(campo).verbose_name.capitalize()
+            partes.append(f"{etiqueta}: {despues}" if antes is None else f"{etiqueta}: {antes} → {despues}")
+        texto = "; ".join(partes)
+        motivo = getattr(self, 'motivo', None)
+        return f"{motivo}. {texto}" if motivo else texto
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        campos = None if update_fields is None else self.campos_seguidos(update_fields)
+        cambios = self.cambios(campos=campos)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if cambios:
+                type(self).registrar_historial([(self, cambios)])
+        self.recordar_originales(campos)
+        self.motivo = None
+
+
+class EstadoCamion(EstadoConHistorial):
     id_estado = models.AutoField(primary_key=True)
 
     camion = models.OneToOneField(
@@ -409,14 +657,31 @@ class EstadoCamion(models.Model):
     observacion = models.TextField(blank=True, null=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    # Campos cuyo cambio queda en HistorialEstadoCamion (ver EstadoConHistorial)
+    CAMPOS_SEGUIDOS = ('estado_operativo', 'kilometraje', 'base_actual', 'conductor_id')
+    UNIDAD_CACHE = (CAMION, 'camion_id')
+    MODELO_HISTORIAL = 'core.HistorialEstadoCamion'
+    CAMPOS_HISTORIAL = {'id_conductor': 'conductor_id'}
+
     class Meta:
         managed = False
         db_table = 'estado_camion'
 
+    def save(self, *args, **kwargs):
+        originales = getattr(self, '_originales', {})
+        cambio_base = originales.get('base_actual') != self.base_actual
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if cambio_base:
+                # El remolque enganchado se mueve con el camión
+                EstadoRemolque.objects.filter(
+                    remolque__asignacion_actual__camion_id=self.camion_id
+                ).update(base_actual=self.base_actual)
+
     def __str__(self):
         return f"{self.camion.patente} - {self.estado_operativo} - {self.base_actual}"
 
-class EstadoRemolque(models.Model):
+class EstadoRemolque(EstadoConHistorial):
     id_estado = models.AutoField(primary_key=True, db_column='id_estado_remolque')
     remolque = models.OneToOneField( # OneToOne porque cada remolque tiene SOLO UN estado actual
         'Remolque', 
@@ -432,19 +697,31 @@ class EstadoRemolque(models.Model):
     observacion = models.TextField(blank=True, null=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    # Base heredada del camión: se copia al enganchar y cuando el camión cambia de base
+    # (ver core.asignaciones y EstadoCamion.save). Leerla no dispara consultas.
+    base_actual = models.CharField(
+        max_length=20,
+        choices=BASE_CHOICES,
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    # Campos cuyo cambio queda en HistorialEstadoRemolque (ver EstadoConHistorial)
+    CAMPOS_SEGUIDOS = ('estado_operativo', 'base_actual')
+    UNIDAD_CACHE = (REMOLQUE, 'remolque_id')
+    MODELO_HISTORIAL = 'core.HistorialEstadoRemolque'
+    # El km del historial es el acumulado del remolque
+    CAMPOS_HISTORIAL = {'kilometraje': 'remolque__kilometraje_acumulado'}
+    CAMPO_DESCRIPCION = 'descripcion_evente'
+
     @property
-    def base_actual(self):
-        # Buscamos la asignación donde este remolque esté activo
-        asignacion = self.remolque.asignaciontractoremolque_set.filter(activo=True).first()
-        
-        if asignacion and asignacion.camion.estado_actual:
-            # Retorna la base del camión usando el nombre "bonito" de BASE_CHOICES
-            return asignacion.camion.estado_actual.get_base_actual_display()
-        
-        return "SIN ASIGNACIÓN"
+    def base_actual_display(self):
+        """Nombre legible de la base, o 'SIN ASIGNACIÓN' si nunca se enganchó."""
+        return self.get_base_actual_display() if self.base_actual else "SIN ASIGNACIÓN"
 
     class Meta:
-        db_table = 'estado_remolque'    
+        db_table = 'estado_remolque'
 
 #---------HISTORIALES-------
 
@@ -465,6 +742,9 @@ class HistorialEstadoRemolque(models.Model):
 
     class Meta:
         db_table = 'historial_estado_remolque'
+        indexes = [
+            models.Index(fields=['remolque', 'fecha_evento'], name='historial_remolque_fecha_idx'),
+        ]
 
 class HistorialEstadoCamion(models.Model):
     id_historial = models.AutoField(primary_key=True)
@@ -488,6 +768,10 @@ class HistorialEstadoCamion(models.Model):
     class Meta:
         managed = False
         db_table = 'historial_estado_camion'
+        indexes = [
+            # Línea de tiempo de un camión e indicadores (disponibilidad, MTTR)
+            models.Index(fields=['camion', 'fecha_evento'], name='historial_camion_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.camion.patente} - {self.estado_operativo}"
@@ -617,4 +901,157 @@ class DocumentacionGeneral(models.Model):
             return "Vencido"
         elif diferencia <= 15:
             return "Próximo a vencer"
-        return "Vigente"
\ No newline at end of file
+        return "Vigente"
+
+#---------ARCHIVO-------
+
+class ArchivoHistoricoQuerySet(models.QuerySet):
+    """Lectura de historial archivado como si fueran filas normales (instancias sin guardar)."""
+
+    def con_id(self, tabla, pk):
+        """Archivos de 'tabla' cuyo rango de ids incluye 'pk'."""
+        return self.filter(tabla=tabla, id_desde__lte=pk, id_hasta__gte=pk)
+
+    def instancias(self, tabla, modelo, camion, omitir=0, limite=None):
+        """
+        Filas archivadas de 'tabla' para el camión como instancias de 'modelo', de la más nueva a la más antigua.
+        'omitir' y 'limite' permiten paginar: solo se descomprimen los meses necesarios.
+        """
+        resultado = []
+        for archivo in self.filter(tabla=tabla, camion=camion).order_by('-mes'):
+            if omitir >= archivo.filas:
+                omitir -= archivo.filas
+                continue
+            filas = list(reversed(archivo.leer()))[omitir:]
+            omitir = 0
+            resultado.extend(ArchivoHistorico.a_instancia(modelo, fila) for fila in filas)
+            if limite is not None and len(resultado) >= limite:
+                return resultado[:limite]
+        return resultado
+
+
+class ArchivoHistorico(models.Model):
+    """
+    Filas antiguas de las tablas de alto volumen, movidas aquí por 'archivar_historial'.
+    Un registro por tabla, camión y mes con las filas en JSON comprimido (gzip), ordenadas de la más antigua
+    a la más nueva. Así las tablas vivas y sus índices quedan chicos; las vistas que lo necesitan leen el
+    archivo con ArchivoHistorico.objects.instancias() / con_id().
+    """
+    TABLA_CHOICES = [
+        ('INSPECCION', 'Inspecciones (con resultados)'),
+        ('REGISTRO_DIARIO', 'Registros Diarios'),
+        ('HISTORIAL_CAMION', 'Historial de Estados de Camión'),
+    ]
+    tabla = models.CharField(max_length=20, choices=TABLA_CHOICES)
+    camion = models.ForeignKey(Camion, on_delete=models.CASCADE, related_name='archivos_historicos')
+    mes = models.DateField(help_text="Primer día del mes archivado")
+    filas = models.PositiveIntegerField(default=0)
+    id_desde = models.BigIntegerField()
+    id_hasta = models.BigIntegerField()
+    datos = models.BinaryField()
+    actualizado = models.DateTimeField(auto_now=True)
+
+    objects = ArchivoHistoricoQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Archivo Histórico"
+        verbose_name_plural = "Archivo Histórico"
+        constraints = [
+            models.UniqueConstraint(fields=['tabla', 'camion', 'mes'], name='archivo_historico_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['tabla', 'id_desde', 'id_hasta'], name='archivo_historico_ids_idx'),
+        ]
+
+    def leer(self):
+        return json.loads(gzip.decompress(bytes(self.datos)))
+
+    def agregar(self, filas):
+        """Suma 'filas' (dicts de values() con la pk repetida en 'pk') a las ya archivadas del mes."""
+        todas = (self.leer() if self.filas else []) + list(filas)
+        todas.sort(key=lambda f: f['pk'])
+        self.datos = gzip.compress(json.dumps(todas, cls=DjangoJSONEncoder).encode('utf-8'))
+        self.filas = len(todas)
+        self.id_desde = todas[0]['pk']
+        self.id_hasta = todas[-1]['pk']
+
+    @staticmethod
+    def a_instancia(modelo, fila):
+        """Instancia sin guardar de 'modelo' con los valores de la fila archivada (marcada con 'archivada')."""
+        instancia = modelo(**{
+            campo.attname: campo.to_python(fila[campo.attname])
+            for campo in modelo._meta.concrete_fields if campo.attname in fila
+        })
+        instancia.archivada = True
+        return instancia
+
+    def __str__(self):
+        return f"{self.get_tabla_display()} - {self.camion_id} - {self.mes:%Y-%m} ({self.filas})"
+
+#---------CARGAS-------
+
+class SesionCarga(models.Model):
+    """
+    Subida por partes (reanudable) del escaneo de un DocumentacionGeneral. Ver core/cargas.py.
+    Los bytes recibidos se acumulan en un archivo parcial; el documento se crea o actualiza recién
+    cuando llega el último bloque y el SHA-256 coincide.
+    """
+    ESTADOS = [
+        ('ABIERTA', 'Abierta'),
+        ('COMPLETA', 'Completa'),
+        ('ERROR', 'Error de verificación'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sesiones_carga')
+
+    # Destino: la entidad y categoría del documento (o el documento existente que se reemplaza)
+    tipo_entidad = models.CharField(max_length=10, choices=DocumentacionGeneral.ENTIDAD_CHOICES)
+    camion = models.ForeignKey('Camion', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    remolque = models.ForeignKey('Remolque', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    conductor = models.ForeignKey('Conductor', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    categoria = models.CharField(max_length=50, choices=DocumentacionGeneral.CATEGORIA_CHOICES)
+    fecha_vencimiento = models.DateField(null=True, blank=True)
+    documento = models.ForeignKey(
+        DocumentacionGeneral, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Documento a actualizar; al completar queda el creado o actualizado",
+    )
+
+    nombre_archivo = models.CharField(max_length=255)
+    tamano = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    recibido = models.PositiveBigIntegerField(default=0)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='ABIERTA')
+    creada = models.DateTimeField(auto_now_add=True)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sesión de Carga"
+        verbose_name_plural = "Sesiones de Carga"
+        indexes = [
+            models.Index(fields=['estado', 'actualizada'], name='sesion_carga_estado_idx'),
+        ]
+
+    @property
+    def ruta_parcial(self):
+        return os.path.join(settings.CARGAS_DIR, f'{self.pk}.part')
+
+    def __str__(self):
+        return f"{self.nombre_archivo} ({self.recibido}/{self.tamano}) - {self.get_estado_display()}"
+
+#---------CACHÉ-------
+
+class MetricaCache(models.Model):
+    """
+    Aciertos y fallos acumulados de core/cache.py por nombre de lo cacheado (comando 'metricas_cache').
+    Cada proceso suma en memoria y vuelca aquí con UPDATE ... + n: los contadores de varios workers no se pisan.
+    """
+    nombre = models.CharField(max_length=100, primary_key=True)
+    aciertos = models.PositiveBigIntegerField(default=0)
+    fallos = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Métrica de Caché"
+        verbose_name_plural = "Métricas de Caché"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.aciertos} aciertos, {self.fallos} fallos"
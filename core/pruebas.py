@@ -0,0 +1,143 @@
+"""
+core/pruebas.py
+Runner de 'manage.py test' (TEST_RUNNER en settings).
+Varias tablas (camiones, estado_camion, mantenciones, documentos...) se administran fuera de Django
+(managed=False): en producción ya existen y las migraciones (RunSQL, índices, cargas iniciales) las suponen
+creadas. En la base de pruebas se crean desde los modelos antes de migrar, así las migraciones corren
+completas igual que en un despliegue:
+    - pre_migrate: crea las tablas externas que ninguna migración crea. Sus FK hacia tablas administradas
+      quedan para el final (esas tablas aún no existen).
+    - post_migrate: aplica lo que los modelos tienen y las migraciones nunca registraron (lo que generaría
+      makemigrations, sin escribirlo), agrega esas FK y rehace desde el modelo las tablas que alguna
+      migración creó cuando todavía eran administradas (documentos_general), porque desde entonces cambian
+      por fuera de Django.
+La caché (FileBasedCache) va a una carpeta temporal propia: las pruebas no leen ni borran la de la aplicación.
+"""
+
+import shutil
+import tempfile
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.operations import CreateModel, SeparateDatabaseAndState
+from django.db.migrations.state import ProjectState
+from django.db.models.signals import post_migrate, pre_migrate
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+APPS_PROYECTO = ('core', 'mantenciones', 'indicadores')
+
+
+def _modelos_externos():
+    return [modelo for modelo in apps.get_models() if not modelo._meta.managed and not modelo._meta.proxy]
+
+
+def _operaciones_bd(operaciones):
+    for operacion in operaciones:
+        if isinstance(operacion, SeparateDatabaseAndState):
+            yield from _operaciones_bd(operacion.database_operations)
+        else:
+            yield operacion
+
+
+def _tablas_creadas(plan):
+    """db_table de los CreateModel administrados del plan de migraciones."""
+    tablas = set()
+    for migracion, atras in plan or []:
+        if atras:
+            continue
+        for operacion in _operaciones_bd(migracion.operations):
+            if isinstance(operacion, CreateModel) and operacion.options.get('managed', True):
+                tablas.add(operacion.options.get('db_table') or f"{migracion.app_label}_{operacion.name_lower}")
+    return tablas
+
+
+def _tablas(sentencia):
+    """Tablas que menciona una sentencia diferida del schema_editor (Statement con referencias)."""
+    return {
+        parte.table for parte in getattr(sentencia, 'parts', {}).values()
+        if isinstance(getattr(parte, 'table', None), str)
+    }
+
+
+class RunnerPruebas(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._carpeta_cache = tempfile.mkdtemp(prefix='zmc_cache_')
+        self._cache = override_settings(CACHES={
+            'default': {**settings.CACHES['default'], 'LOCATION': self._carpeta_cache},
+        })
+        self._cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.disable()
+        shutil.rmtree(self._carpeta_cache, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        # Por alias: (tablas a rehacer después de migrar, SQL diferido pendiente)
+        self._pendientes = {}
+        pre_migrate.connect(self._crear_tablas_externas, dispatch_uid='zmc_crear_tablas_externas')
+        post_migrate.connect(self._completar_tablas_externas, dispatch_uid='zmc_completar_tablas_externas')
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(dispatch_uid='zmc_crear_tablas_externas')
+            post_migrate.disconnect(dispatch_uid='zmc_completar_tablas_externas')
+
+    def _crear_tablas_externas(self, using, plan=None, **kwargs):
+        # pre_migrate se envía una vez por app antes de migrar: basta con la primera
+        if using in self._pendientes:
+            return
+        conexion = connections[using]
+        modelos = _modelos_externos()
+        externas = {modelo._meta.db_table for modelo in modelos}
+        creadas = _tablas_creadas(plan)
+        existentes = set(conexion.introspection.table_names())
+        with conexion.schema_editor() as editor:
+            for modelo in modelos:
+                if modelo._meta.db_table not in existentes | creadas:
+                    editor.create_model(modelo)
+            propias, despues = [], []
+            for sentencia in editor.deferred_sql:
+                (propias if _tablas(sentencia) <= externas else despues).append(sentencia)
+            editor.deferred_sql = propias
+        rehacer = [modelo for modelo in modelos if modelo._meta.db_table in creadas - existentes]
+        self._pendientes[using] = (rehacer, despues)
+
+    def _completar_tablas_externas(self, using, **kwargs):
+        rehacer, despues = self._pendientes.get(using) or ([], [])
+        if not (rehacer or despues):
+            return
+        self._pendientes[using] = ([], [])
+        conexion = connections[using]
+        _aplicar_cambios_sin_migracion(conexion)
+        with conexion.schema_editor() as editor:
+            for sentencia in despues:
+                editor.execute(sentencia)
+            for modelo in rehacer:
+                editor.execute(f"DROP TABLE {editor.quote_name(modelo._meta.db_table)} CASCADE")
+                editor.create_model(modelo)
+                # El CASCADE también borró las FK que apuntaban a la tabla
+                for origen in apps.get_models():
+                    for campo in origen._meta.local_concrete_fields:
+                        if campo.is_relation and campo.related_model is modelo and campo.db_constraint \
+                                and origen is not modelo:
+                            editor.execute(editor._create_fk_sql(origen, campo, "_fk_%(to_table)s_%(to_column)s"))
+
+
+def _aplicar_cambios_sin_migracion(conexion):
+    """Lleva la BD migrada a los modelos actuales de APPS_PROYECTO (cambios sin migración escrita)."""
+    cargador = MigrationLoader(conexion)
+    estado = cargador.project_state()
+    cambios = MigrationAutodetector(estado, ProjectState.from_apps(apps)).changes(
+        graph=cargador.graph, trim_to_apps=set(APPS_PROYECTO),
+    )
+    with conexion.schema_editor() as editor:
+        for app in APPS_PROYECTO:
+            for migracion in cambios.get(app, []):
+                estado = migracion.apply(estado, editor)
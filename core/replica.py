@@ -0,0 +1,116 @@
+"""
+core/replica.py
+Lecturas en la réplica de PostgreSQL para vistas de solo consulta (listados, detalles, APIs de estado,
+exportaciones e indicadores), para que no compitan con las escrituras de inspecciones.
+
+- RouterReplica: manda a la réplica las lecturas hechas dentro de una vista @solo_lectura; todo lo demás
+  (escrituras, transacciones, comandos) va a 'default'. Sin alias 'replica' en DATABASES no hace nada.
+- ReplicaMiddleware: después de una escritura (o de un POST) deja la cookie 'zmc_primaria' por
+  REPLICA_PRIMARIA_SEGUNDOS, y mientras esté el navegador lee todo de la primaria: así quien acaba de
+  guardar una inspección la ve aunque la réplica venga atrasada.
+"""
+
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+COOKIE_PRIMARIA = 'zmc_primaria'
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+# True dentro de una vista @solo_lectura
+_lectura = ContextVar('replica_lectura', default=False)
+# Estado de la petición en curso (lo crea ReplicaMiddleware): {'primaria': bool, 'escribio': bool}
+_peticion = ContextVar('replica_peticion', default=None)
+
+
+def replica_configurada():
+    return REPLICA in connections.databases
+
+
+def _primaria_fija():
+    peticion = _peticion.get()
+    return bool(peticion and (peticion['primaria'] or peticion['escribio']))
+
+
+class RouterReplica:
+
+    def db_for_read(self, model, **hints):
+        if not _lectura.get() or not replica_configurada() or _primaria_fija():
+            return None
+        # Dentro de una transacción en la primaria se lee lo que ella ve
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        peticion = _peticion.get()
+        if peticion is not None:
+            peticion['escribio'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son la misma base de datos
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
+
+
+def _en_replica(iterable):
+    """Itera el contenido de una respuesta streaming leyendo de la réplica (se consume fuera de la vista)."""
+    iterador = iter(iterable)
+    while True:
+        token = _lectura.set(True)
+        try:
+            valor = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            _lectura.reset(token)
+        yield valor
+
+
+def solo_lectura(vista):
+    """
+    Las consultas de la vista (y de su contenido streaming) leen de la réplica.
+    Va debajo de @login_required: la sesión y el usuario se leen siempre de la primaria.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        token = _lectura.set(True)
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        finally:
+            _lectura.reset(token)
+        # El middleware ya no está activo cuando se consume: se decide ahora
+        if getattr(respuesta, 'streaming', False) and not _primaria_fija():
+            respuesta.streaming_content = _en_replica(respuesta.streaming_content)
+        return respuesta
+    return envoltura
+
+
+class ReplicaMiddleware:
+    """Lectura fija en la primaria para el navegador que acaba de escribir (ver módulo)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        peticion = {
+            'primaria': request.method not in METODOS_SEGUROS or COOKIE_PRIMARIA in request.COOKIES,
+            'escribio': False,
+        }
+        token = _peticion.set(peticion)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _peticion.reset(token)
+        if peticion['escribio'] or request.method not in METODOS_SEGUROS:
+            respuesta.set_cookie(
+                COOKIE_PRIMARIA, '1', max_age=settings.REPLICA_PRIMARIA_SEGUNDOS, httponly=True, samesite='Lax',
+            )
+        return respuesta
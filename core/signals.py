@@ -0,0 +1,71 @@
+"""
+core/signals.py
+Invalidación de core/cache.py: al guardar o borrar un modelo del que dependen datos cacheados se cambia la
+versión del camión, remolque, modelo o catálogo afectado (después del commit).
+Los update()/bulk_update() masivos no disparan señales: ver EstadoConHistorialQuerySet y
+core/asignaciones.py, que invalidan por su cuenta. Se conectan en CoreConfig.ready().
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .cache import CAMION, CATALOGO_CHECKLIST, MODELO, REMOLQUE, invalidar_al_confirmar
+from .models import EstadoCamion, Mantencion
+
+
+def _unidades(instancia):
+    """Invalida el camión y/o remolque al que apunta la instancia (campos camion / remolque)."""
+    invalidar_al_confirmar(CAMION, getattr(instancia, 'camion_id', None))
+    invalidar_al_confirmar(REMOLQUE, getattr(instancia, 'remolque_id', None))
+
+
+@receiver([post_save, post_delete], sender='core.Camion')
+def camion_cambiado(sender, instance, **kwargs):
+    invalidar_al_confirmar(CAMION, instance.pk)
+
+
+@receiver([post_save, post_delete], sender='core.Remolque')
+def remolque_cambiado(sender, instance, **kwargs):
+    invalidar_al_confirmar(REMOLQUE, instance.pk)
+
+
+@receiver([post_save, post_delete], sender='core.Mantencion')
+@receiver([post_save, post_delete], sender='core.DocumentacionGeneral')
+@receiver([post_save, post_delete], sender='core.EstadoCamion')
+@receiver([post_save, post_delete], sender='core.EstadoRemolque')
+@receiver([post_save, post_delete], sender='core.AsignacionTractoRemolque')
+@receiver([post_save, post_delete], sender='mantenciones.Inspeccion')
+def unidad_cambiada(sender, instance, **kwargs):
+    _unidades(instance)
+
+
+@receiver([post_save, post_delete], sender='core.DocumentoMantencion')
+def documento_mantencion_cambiado(sender, instance, **kwargs):
+    # Los links de Drive se muestran en la unidad de la mantención
+    unidades = Mantencion.objects.filter(pk=instance.mantencion_id).values('camion_id', 'remolque_id').first()
+    if unidades:
+        invalidar_al_confirmar(CAMION, unidades['camion_id'])
+        invalidar_al_confirmar(REMOLQUE, unidades['remolque_id'])
+
+
+@receiver([post_save, pre_delete], sender='core.Conductor')
+def conductor_cambiado(sender, instance, **kwargs):
+    # El detalle y las APIs del camión muestran al conductor de su estado actual. Al borrar se busca antes:
+    # el SET_NULL de EstadoCamion.conductor no dispara post_save
+    camiones = EstadoCamion.objects.filter(conductor_id=instance.pk).values_list('camion_id', flat=True)
+    invalidar_al_confirmar(CAMION, *camiones)
+
+
+@receiver([post_save, post_delete], sender='core.ModeloVehiculo')
+def modelo_cambiado(sender, instance, **kwargs):
+    invalidar_al_confirmar(MODELO, instance.pk)
+
+
+@receiver([post_save, post_delete], sender='mantenciones.CronogramaPlan')
+def plan_cambiado(sender, instance, **kwargs):
+    invalidar_al_confirmar(MODELO, instance.modelo_id)
+
+
+@receiver([post_save, post_delete], sender='mantenciones.ItemChecklist')
+@receiver([post_save, post_delete], sender='mantenciones.CategoriaChecklist')
+def catalogo_cambiado(sender, instance, **kwargs):
+    invalidar_al_confirmar(*CATALOGO_CHECKLIST)
@@ -0,0 +1,28 @@
+/**
+ * Carga bajo demanda las páginas antiguas de los inlines de historial del admin
+ * (InlineHistorialPaginado en core/admin.py).
+ */
+document.addEventListener('click', function (evento) {
+    const boton = evento.target.closest('.historial-cargar-mas');
+    if (!boton) return;
+
+    const contenedor = boton.closest('.historial-paginado');
+    const url = `${contenedor.dataset.url}?pagina=${contenedor.dataset.pagina}`;
+    boton.disabled = true;
+
+    fetch(url, { credentials: 'same-origin' })
+        .then(respuesta => respuesta.json())
+        .then(data => {
+            const tabla = contenedor.querySelector('table');
+            tabla.hidden = false;
+            tabla.querySelector('tbody').insertAdjacentHTML('beforeend', data.html);
+
+            if (data.siguiente) {
+                contenedor.dataset.pagina = data.siguiente;
+                boton.disabled = false;
+            } else {
+                boton.remove();
+            }
+        })
+        .catch(() => { boton.disabled = false; });
+});
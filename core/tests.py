@@ -1,3 +1,974 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import Permission, User
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from . import cache as cache_entidades
+from .asignaciones import desenganchar_remolque, enganchar_remolque, intercambiar_remolques, reasignar_en_lote
+from .cargas import iniciar_carga, recibir_bloque
+from . import views as vistas_core
+from .replica import COOKIE_PRIMARIA, REPLICA, ReplicaMiddleware, RouterReplica, solo_lectura
+from .models import (
+    AsignacionTractoRemolque, Camion, Conductor, DocumentacionGeneral, EstadoCamion, EstadoRemolque,
+    HistorialEstadoCamion, HistorialEstadoRemolque, Mantencion, MetricaCache, Remolque, SesionCarga,
+)
+from .utils import prefetch_ultima_mantencion, ultima_mantencion_real
 
-# Create your tests here.
+
+def crear_camion(patente, **campos):
+    return Camion.objects.create(
+        patente=patente, tipo_camion='TRACTO', rol_operativo='TITULAR', capacidad_m3=30,
+        taller_mantencion='ZMC', fecha_creacion=timezone.now(), **campos,
+    )
+
+
+def crear_estado(camion, km=1000, base='CULLEN', estado='OPERATIVO'):
+    return EstadoCamion.objects.create(camion=camion, kilometraje=km, estado_operativo=estado, base_actual=base)
+
+
+def crear_mantencion(fecha, tipo='TALLER', **unidad):
+    return Mantencion.objects.create(taller='ZMC', tipo_mantencion=tipo, fecha_mantencion=fecha, **unidad)
+
+
+class UltimaMantencionTests(TestCase):
+    """Última mantención real por unidad con DISTINCT ON (MantencionQuerySet y core.utils)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.camion = crear_camion('ABCD12')
+        crear_mantencion(date(2025, 1, 1), camion=cls.camion)
+        cls.emergencia = crear_mantencion(date(2025, 3, 1), 'EMERGENCIA', camion=cls.camion)
+        crear_mantencion(date(2025, 5, 1), 'DIARIA', camion=cls.camion)
+        cls.solo_diarias = crear_camion('EFGH34')
+        crear_mantencion(date(2025, 5, 1), 'DIARIA', camion=cls.solo_diarias)
+
+        cls.remolque = Remolque.objects.create(patente='JK1234')
+        crear_mantencion(date(2025, 2, 1), remolque=cls.remolque)
+        cls.ultima_del_dia = crear_mantencion(date(2025, 2, 1), remolque=cls.remolque)
+
+    def test_ultimas_por_camion_excluye_diarias(self):
+        ultimas = {m.camion_id: m.pk for m in Mantencion.objects.ultimas_por_camion()}
+
+        self.assertEqual(ultimas, {self.camion.pk: self.emergencia.pk})
+
+    def test_empate_de_fecha_gana_la_ultima_registrada(self):
+        self.assertEqual(
+            [m.pk for m in Mantencion.objects.ultimas_por_remolque()], [self.ultima_del_dia.pk],
+        )
+
+    def test_prefetch_resuelve_todas_las_unidades_en_una_consulta(self):
+        with self.assertNumQueries(2):
+            camiones = list(Camion.objects.order_by('patente').prefetch_related(prefetch_ultima_mantencion('mantenciones')))
+            ultimas = [ultima_mantencion_real(c) for c in camiones]
+
+        self.assertEqual(ultimas, [self.emergencia, None])
+        # Sin prefetch hace su propia consulta con el mismo resultado
+        self.assertEqual(ultima_mantencion_real(Camion.objects.get(pk=self.camion.pk)), self.emergencia)
+
+    def test_indice_parcial_sirve_al_distinct_on(self):
+        with connection.cursor() as cursor:
+            # Con pocas filas el planificador prefiere leer la tabla: se le quita esa opción
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan_camion = Mantencion.objects.ultimas_por_camion().explain()
+            plan_remolque = Mantencion.objects.ultimas_por_remolque().explain()
+
+        self.assertIn('mantenciones_camion_reales_idx', plan_camion)
+        self.assertIn('mantenciones_remolque_reales_idx', plan_remolque)
+
+
+class PunterosAsignacionTests(TestCase):
+    """Camion.asignacion_actual y Remolque.asignacion_actual siguen a la dupla activa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.camion = crear_camion('ABCD12')
+        crear_estado(cls.camion)
+        cls.remolque = Remolque.objects.create(patente='JK1234')
+        cls.otro_remolque = Remolque.objects.create(patente='JK5678')
+
+    def _punteros(self):
+        return (
+            Camion.objects.get(pk=self.camion.pk).asignacion_actual_id,
+            Remolque.objects.get(pk=self.remolque.pk).asignacion_actual_id,
+        )
+
+    def test_enganche_y_desenganche_mueven_los_punteros(self):
+        asignacion = enganchar_remolque(self.camion, self.remolque)
+        self.assertEqual(self._punteros(), (asignacion.pk, asignacion.pk))
+        self.assertTrue(Camion.objects.get(pk=self.camion.pk).tiene_remolque)
+
+        cerrada = desenganchar_remolque(self.camion)
+
+        self.assertEqual(cerrada.pk, asignacion.pk)
+        self.assertFalse(cerrada.activo)
+        self.assertEqual(self._punteros(), (None, None))
+        self.assertFalse(Camion.objects.get(pk=self.camion.pk).tiene_remolque)
+
+    def test_save_de_la_asignacion_sincroniza_los_punteros(self):
+        asignacion = AsignacionTractoRemolque.objects.create(
+            camion=self.camion, remolque=self.remolque, km_inicio_camion=1000,
+        )
+        self.assertEqual(self._punteros(), (asignacion.pk, asignacion.pk))
+
+        # Cambiar el remolque de la dupla activa suelta el puntero del anterior
+        asignacion.remolque = self.otro_remolque
+        asignacion.save()
+        self.assertEqual(self._punteros(), (asignacion.pk, None))
+        self.assertEqual(Remolque.objects.get(pk=self.otro_remolque.pk).asignacion_actual_id, asignacion.pk)
+
+        asignacion.activo = False
+        asignacion.save()
+        self.assertIsNone(Camion.objects.get(pk=self.camion.pk).asignacion_actual_id)
+        self.assertIsNone(Remolque.objects.get(pk=self.otro_remolque.pk).asignacion_actual_id)
+
+    def test_api_remolque_asignado_lee_el_puntero(self):
+        enganchar_remolque(self.camion, self.remolque)
+        self.client.force_login(User.objects.create_user('inspector', password='clave'))
+
+        datos = self.client.get(reverse('mantenciones:api_remolque_asignado', args=[self.camion.pk])).json()
+
+        self.assertTrue(datos['tiene_remolque'])
+        self.assertEqual(datos['remolque_patente'], 'JK1234')
+
+
+class ReasignacionTests(TestCase):
+    """Enganches por core/asignaciones.py y la unicidad de la dupla activa en la BD."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@zmc.cl', 'clave')
+        cls.camion_a = crear_camion('ABCD12')
+        cls.camion_b = crear_camion('EFGH34')
+        crear_estado(cls.camion_a, km=1000)
+        crear_estado(cls.camion_b, km=5000, base='GREGORIO')
+        cls.remolque_1 = Remolque.objects.create(patente='JK1234')
+        cls.remolque_2 = Remolque.objects.create(patente='JK5678')
+
+    def test_la_bd_rechaza_dos_duplas_activas_por_unidad(self):
+        AsignacionTractoRemolque.objects.create(camion=self.camion_a, remolque=self.remolque_1, km_inicio_camion=1000)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AsignacionTractoRemolque.objects.create(camion=self.camion_a, remolque=self.remolque_2, km_inicio_camion=1000)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AsignacionTractoRemolque.objects.create(camion=self.camion_b, remolque=self.remolque_1, km_inicio_camion=5000)
+
+    def test_intercambio_cierra_con_km_y_deja_historial(self):
+        enganchar_remolque(self.camion_a, self.remolque_1)
+        enganchar_remolque(self.camion_b, self.remolque_2)
+        EstadoCamion.objects.filter(camion=self.camion_a).update(kilometraje=1800)
+
+        nuevas = intercambiar_remolques(self.camion_a, self.camion_b)
+
+        self.assertEqual({(a.camion_id, a.remolque_id) for a in nuevas}, {
+            (self.camion_a.pk, self.remolque_2.pk), (self.camion_b.pk, self.remolque_1.pk),
+        })
+        cerrada = AsignacionTractoRemolque.objects.get(camion=self.camion_a, remolque=self.remolque_1)
+        self.assertFalse(cerrada.activo)
+        self.assertIsNotNone(cerrada.fecha_hasta)
+        self.assertEqual(cerrada.km_fin_camion, Decimal(1800))
+        self.assertEqual(Remolque.objects.get(pk=self.remolque_1.pk).kilometraje_acumulado, 800)
+        self.assertEqual(Camion.objects.get(pk=self.camion_a.pk).asignacion_actual.remolque_id, self.remolque_2.pk)
+        # El remolque 1 pasa a la base del camión B
+        self.assertEqual(EstadoRemolque.objects.get(remolque=self.remolque_1).base_actual, 'GREGORIO')
+        # Dos enganches + dos desenganches + dos enganches
+        self.assertEqual(HistorialEstadoCamion.objects.filter(descripcion_evento__startswith='Enganche').count(), 4)
+        self.assertEqual(HistorialEstadoRemolque.objects.filter(descripcion_evente__startswith='Desenganche').count(), 2)
+
+    def test_lote_con_unidades_repetidas_no_escribe_nada(self):
+        with self.assertRaises(ValidationError):
+            reasignar_en_lote([(self.camion_a, self.remolque_1), (self.camion_b, self.remolque_1)])
+        with self.assertRaises(ValidationError):
+            reasignar_en_lote([(self.camion_a, self.remolque_1), (self.camion_a, self.remolque_2)])
+
+        self.assertFalse(AsignacionTractoRemolque.objects.exists())
+
+    def _editar_en_admin(self, asignacion, **cambios):
+        datos = {
+            'camion': asignacion.camion_id, 'remolque': asignacion.remolque_id,
+            'km_inicio_camion': asignacion.km_inicio_camion, 'km_fin_camion': '',
+            'fecha_hasta_0': '', 'fecha_hasta_1': '', 'activo': 'on',
+        }
+        datos.update(cambios)
+        datos = {campo: valor for campo, valor in datos.items() if valor is not None}
+        self.client.force_login(self.usuario)
+        return self.client.post(
+            reverse('admin:core_asignaciontractoremolque_change', args=[asignacion.pk]), datos,
+        )
+
+    def test_desenganche_en_admin_guarda_tambien_las_correcciones(self):
+        asignacion = enganchar_remolque(self.camion_a, self.remolque_1)
+
+        respuesta = self._editar_en_admin(asignacion, activo=None, km_inicio_camion='900', km_fin_camion='1500')
+
+        self.assertEqual(respuesta.status_code, 302)
+        asignacion.refresh_from_db()
+        self.assertFalse(asignacion.activo)
+        self.assertIsNotNone(asignacion.fecha_hasta)
+        self.assertEqual(asignacion.km_inicio_camion, Decimal(900))
+        self.assertEqual(asignacion.km_fin_camion, Decimal(1500))
+        self.assertIsNone(Camion.objects.get(pk=self.camion_a.pk).asignacion_actual_id)
+
+    def test_enganche_en_admin_con_otras_correcciones_se_rechaza(self):
+        asignacion = enganchar_remolque(self.camion_a, self.remolque_1)
+
+        respuesta = self._editar_en_admin(asignacion, remolque=self.remolque_2.pk, km_fin_camion='1500')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'guarde primero el enganche')
+        asignacion.refresh_from_db()
+        self.assertTrue(asignacion.activo)
+        self.assertEqual(asignacion.remolque_id, self.remolque_1.pk)
+
+
+class BaseRemolqueTests(TestCase):
+    """EstadoRemolque.base_actual se copia del camión: al enganchar y cuando el camión cambia de base."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.camion = crear_camion('ABCD12')
+        cls.estado = crear_estado(cls.camion, base='CULLEN')
+        cls.remolque = Remolque.objects.create(patente='JK1234')
+        cls.suelto = Remolque.objects.create(patente='JK5678')
+        EstadoRemolque.objects.create(remolque=cls.suelto, base_actual='CULLEN')
+
+    def _base(self, remolque):
+        return EstadoRemolque.objects.get(remolque=remolque).base_actual
+
+    def test_enganche_copia_la_base_del_camion(self):
+        enganchar_remolque(self.camion, self.remolque)
+
+        self.assertEqual(self._base(self.remolque), 'CULLEN')
+
+    def test_cambio_de_base_del_camion_mueve_solo_al_remolque_enganchado(self):
+        enganchar_remolque(self.camion, self.remolque)
+        estado = EstadoCamion.objects.get(pk=self.estado.pk)
+
+        estado.base_actual = 'SOMBRERO'
+        estado.save()
+
+        self.assertEqual(self._base(self.remolque), 'SOMBRERO')
+        self.assertEqual(self._base(self.suelto), 'CULLEN')
+
+    def test_remolque_nunca_enganchado_se_muestra_sin_asignacion(self):
+        self.assertEqual(EstadoRemolque(remolque=self.remolque).base_actual_display, 'SIN ASIGNACIÓN')
+        self.assertEqual(EstadoRemolque(remolque=self.remolque, base_actual='CULLEN').base_actual_display, 'Cullen')
+
+
+class HistorialEstadosTests(TestCase):
+    """EstadoConHistorial.registrar_historial: una fila por estado cambiado en save(), update() y bulk_update()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.conductor = Conductor.objects.create(nombre='Juan Pérez', rut='11.111.111-1')
+        cls.camiones = [crear_camion(f'ABCD1{i}') for i in range(2)]
+        for camion in cls.camiones:
+            crear_estado(camion)
+        cls.remolque = Remolque.objects.create(patente='JK1234', kilometraje_acumulado=Decimal('5400.50'))
+        EstadoRemolque.objects.create(remolque=cls.remolque, base_actual='CULLEN')
+        HistorialEstadoCamion.objects.all().delete()
+        HistorialEstadoRemolque.objects.all().delete()
+
+    def test_save_del_camion_copia_los_campos_del_historial(self):
+        estado = EstadoCamion.objects.get(camion=self.camiones[0])
+        estado.estado_operativo = 'EN_MANTENCION'
+        estado.conductor = self.conductor
+        estado.motivo = 'Inspección SM1 #120'
+
+        estado.save()
+
+        fila = HistorialEstadoCamion.objects.get()
+        self.assertEqual(
+            (fila.camion_id, fila.kilometraje, fila.estado_operativo, fila.id_conductor),
+            (self.camiones[0].pk, 1000, 'EN_MANTENCION', self.conductor.pk),
+        )
+        self.assertTrue(fila.descripcion_evento.startswith('Inspección SM1 #120. '))
+        self.assertIn('OPERATIVO → EN_MANTENCION', fila.descripcion_evento)
+        self.assertIsNotNone(fila.fecha_evento)
+
+    def test_save_del_remolque_lee_el_km_acumulado(self):
+        estado = EstadoRemolque.objects.get(remolque=self.remolque)
+        estado.estado_operativo = 'NO_OPERATIVO'
+
+        estado.save()
+
+        fila = HistorialEstadoRemolque.objects.get()
+        self.assertEqual(
+            (fila.remolque_id, fila.kilometraje, fila.estado_operativo),
+            (self.remolque.pk, Decimal('5400.50'), 'NO_OPERATIVO'),
+        )
+        self.assertIn('OPERATIVO → NO_OPERATIVO', fila.descripcion_evente)
+
+    def test_update_registra_solo_los_que_cambian(self):
+        EstadoCamion.objects.filter(camion=self.camiones[0]).update(estado_operativo='NO_OPERATIVO')
+
+        EstadoCamion.objects.update(estado_operativo='NO_OPERATIVO')
+
+        self.assertEqual(
+            sorted(HistorialEstadoCamion.objects.values_list('camion_id', flat=True)),
+            sorted(c.pk for c in self.camiones),
+        )
+
+    def test_bulk_update_registra_una_fila_por_estado(self):
+        estados = list(EstadoCamion.objects.all())
+        for i, estado in enumerate(estados):
+            estado.kilometraje = 2000 + i
+
+        EstadoCamion.objects.bulk_update(estados, ['kilometraje'])
+
+        self.assertEqual(
+            dict(HistorialEstadoCamion.objects.values_list('camion_id', 'kilometraje')),
+            {estado.camion_id: estado.kilometraje for estado in estados},
+        )
+
+    def test_campos_no_seguidos_y_sin_historial_no_registran(self):
+        EstadoCamion.objects.update(observacion='Sin novedad')
+        EstadoCamion.objects.sin_historial().update(estado_operativo='NO_OPERATIVO')
+        estados = list(EstadoCamion.objects.all())
+        for estado in estados:
+            estado.kilometraje = 3000
+        EstadoCamion.objects.sin_historial().bulk_update(estados, ['kilometraje'])
+        EstadoRemolque.objects.sin_historial().update(estado_operativo='NO_OPERATIVO')
+
+        self.assertFalse(HistorialEstadoCamion.objects.exists())
+        self.assertFalse(HistorialEstadoRemolque.objects.exists())
+
+
+class AdminListadosTests(TestCase):
+    """Los listados del admin hacen las mismas consultas sin importar cuántas filas muestren."""
+
+    LISTADOS = (
+        'camion', 'remolque', 'mantencion', 'estadocamion', 'estadoremolque', 'asignaciontractoremolque',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@zmc.cl', 'clave')
+        cls._crear_flota(0, 2)
+
+    @staticmethod
+    def _crear_flota(desde, hasta):
+        for i in range(desde, hasta):
+            camion = crear_camion(f'CAM{i:03}')
+            crear_estado(camion)
+            remolque = Remolque.objects.create(patente=f'REM{i:03}')
+            enganchar_remolque(camion, remolque)
+            crear_mantencion(date(2025, 1, 1), camion=camion)
+            crear_mantencion(date(2025, 1, 1), remolque=remolque)
+
+    def _consultas(self, modelo):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse(f'admin:core_{modelo}_changelist'))
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_listados_con_consultas_constantes(self):
+        self.client.force_login(self.usuario)
+        con_pocas_filas = {modelo: self._consultas(modelo) for modelo in self.LISTADOS}
+
+        self._crear_flota(2, 8)
+
+        for modelo in self.LISTADOS:
+            with self.subTest(modelo=modelo), self.assertNumQueries(con_pocas_filas[modelo]):
+                self.client.get(reverse(f'admin:core_{modelo}_changelist'))
+
+
+class InlinesPaginadosTests(TestCase):
+    """Los inlines de historial cargan 10 filas con la ficha y el resto por páginas desde su endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@zmc.cl', 'clave')
+        cls.camion = crear_camion('ABCD12')
+        cls.mantenciones = [crear_mantencion(date(2025, 1, dia), camion=cls.camion) for dia in range(1, 13)]
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _formset(self, respuesta, modelo):
+        return next(f.formset for f in respuesta.context['inline_admin_formsets'] if f.formset.model is modelo)
+
+    def test_la_ficha_solo_trae_la_primera_pagina(self):
+        respuesta = self.client.get(reverse('admin:core_camion_change', args=[self.camion.pk]))
+
+        formset = self._formset(respuesta, Mantencion)
+        self.assertEqual(
+            [form.instance.pk for form in formset.initial_forms],
+            [m.pk for m in reversed(self.mantenciones)][:10],
+        )
+        self.assertTrue(formset.hay_mas_antiguos)
+        self.assertFalse(self._formset(respuesta, AsignacionTractoRemolque).hay_mas_antiguos)
+
+    def test_endpoint_entrega_las_paginas_antiguas(self):
+        respuesta = self.client.get(reverse('admin:core_camion_change', args=[self.camion.pk]))
+        url = self._formset(respuesta, Mantencion).url_historial
+
+        datos = self.client.get(url, {'pagina': 2}).json()
+
+        self.assertIsNone(datos['siguiente'])
+        self.assertEqual(datos['html'].count('<tr>'), 2)
+        self.assertEqual(self.client.get(url.replace('/mantenciones/', '/otro/')).status_code, 404)
+
+    def test_endpoint_exige_permiso_sobre_la_ficha(self):
+        self.client.force_login(User.objects.create_user('staff', password='clave', is_staff=True))
+
+        respuesta = self.client.get(
+            reverse('admin:core_camion_historial', args=[self.camion.pk, 'mantenciones']), {'pagina': 2},
+        )
+
+        self.assertEqual(respuesta.status_code, 403)
+
+
+@mock.patch('core.replica.replica_configurada', return_value=True)
+class RouterReplicaTests(SimpleTestCase):
+    """Qué lecturas van a la réplica: solo dentro de @solo_lectura y nunca después de escribir."""
+
+    def setUp(self):
+        self.router = RouterReplica()
+        self.factory = RequestFactory()
+
+    def _destino(self, request, vista=None):
+        """Alias de lectura que ve la vista (o del contenido streaming que retorne) pasando por el middleware."""
+        destinos = []
+
+        @solo_lectura
+        def consulta(request):
+            destinos.append(self.router.db_for_read(Camion))
+            return vista(request) if vista else HttpResponse()
+
+        respuesta = ReplicaMiddleware(consulta)(request)
+        return destinos, respuesta
+
+    def test_fuera_de_una_vista_de_solo_lectura_lee_de_la_primaria(self, _configurada):
+        self.assertIsNone(self.router.db_for_read(Camion))
+
+    def test_get_de_solo_lectura_va_a_la_replica(self, _configurada):
+        destinos, respuesta = self._destino(self.factory.get('/'))
+
+        self.assertEqual(destinos, [REPLICA])
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_sin_replica_configurada_no_cambia_nada(self, configurada):
+        configurada.return_value = False
+
+        destinos, _respuesta = self._destino(self.factory.get('/'))
+
+        self.assertEqual(destinos, [None])
+
+    def test_cookie_de_escritura_reciente_lee_de_la_primaria(self, _configurada):
+        request = self.factory.get('/')
+        request.COOKIES[COOKIE_PRIMARIA] = '1'
+
+        destinos, _respuesta = self._destino(request)
+
+        self.assertEqual(destinos, [None])
+
+    def test_post_lee_de_la_primaria_y_deja_la_cookie(self, _configurada):
+        destinos, respuesta = self._destino(self.factory.post('/'))
+
+        self.assertEqual(destinos, [None])
+        self.assertIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_despues_de_escribir_la_peticion_sigue_en_la_primaria(self, _configurada):
+        def escribe_y_lee(request):
+            self.assertEqual(self.router.db_for_write(Camion), 'default')
+            self.destino_posterior = self.router.db_for_read(Camion)
+            return HttpResponse()
+
+        destinos, respuesta = self._destino(self.factory.get('/'), escribe_y_lee)
+
+        self.assertEqual(destinos, [REPLICA])
+        self.assertIsNone(self.destino_posterior)
+        self.assertIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_contenido_streaming_se_lee_de_la_replica(self, _configurada):
+        def filas():
+            for _ in range(2):
+                yield f"{self.router.db_for_read(Camion)}\n"
+
+        _destinos, respuesta = self._destino(self.factory.get('/'), lambda request: StreamingHttpResponse(filas()))
+
+        # Se consume después de salir de la vista y del middleware, como lo hace el servidor
+        self.assertEqual(b''.join(respuesta.streaming_content), b'replica\nreplica\n')
+        self.assertIsNone(self.router.db_for_read(Camion))
+
+    def test_dentro_de_una_transaccion_lee_de_la_primaria(self, _configurada):
+        def en_transaccion(request):
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.destino_transaccion = self.router.db_for_read(Camion)
+            return HttpResponse()
+
+        self._destino(self.factory.get('/'), en_transaccion)
+
+        self.assertIsNone(self.destino_transaccion)
+
+    def test_no_migra_la_replica(self, _configurada):
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+class InvalidacionCacheTests(TestCase):
+    """core/signals.py: lo cacheado de un camión se vuelve a calcular cuando cambia algo que muestra."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.conductor = Conductor.objects.create(nombre='Juan Pérez', rut='11.111.111-1')
+        cls.camion = crear_camion('ABCD12')
+        estado = crear_estado(cls.camion)
+        estado.conductor = cls.conductor
+        estado.save()
+        cls.usuario = User.objects.create_user('supervisor', password='clave')
+
+    def setUp(self):
+        cache_entidades.cache.clear()
+        self.client.force_login(self.usuario)
+
+    def _version(self):
+        return cache_entidades.versiones([(cache_entidades.CAMION, self.camion.pk)])[0]
+
+    def test_editar_el_conductor_cambia_el_detalle_cacheado(self):
+        url = reverse('core:camion_detail', args=[self.camion.pk])
+        self.assertContains(self.client.get(url), 'Juan Pérez')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conductor.nombre = 'Juan Soto'
+            self.conductor.save()
+
+        self.assertContains(self.client.get(url), 'Juan Soto')
+
+    def test_borrar_el_conductor_invalida_su_camion(self):
+        version = self._version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conductor.delete()
+
+        self.assertNotEqual(self._version(), version)
+
+    def test_guardar_el_estado_invalida_recien_al_confirmar(self):
+        version = self._version()
+        estado = EstadoCamion.objects.get(camion=self.camion)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            estado.kilometraje = 2000
+            estado.save()
+            self.assertEqual(self._version(), version)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(self._version(), version)
+
+    def test_update_masivo_invalida_las_unidades_tocadas(self):
+        otro = crear_camion('EFGH34')
+        version_otro = cache_entidades.versiones([(cache_entidades.CAMION, otro.pk)])[0]
+        version = self._version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EstadoCamion.objects.filter(camion=self.camion).update(base_actual='GREGORIO')
+
+        self.assertNotEqual(self._version(), version)
+        self.assertEqual(cache_entidades.versiones([(cache_entidades.CAMION, otro.pk)])[0], version_otro)
+
+    def test_en_cache_recalcula_con_la_version_nueva(self):
+        calculos = []
+
+        def calcular():
+            calculos.append(1)
+            return EstadoCamion.objects.get(camion=self.camion).base_actual
+
+        dependencias = [(cache_entidades.CAMION, self.camion.pk)]
+        self.assertEqual(cache_entidades.en_cache('prueba', dependencias, calcular), 'CULLEN')
+        self.assertEqual(cache_entidades.en_cache('prueba', dependencias, calcular), 'CULLEN')
+        with self.captureOnCommitCallbacks(execute=True):
+            EstadoCamion.objects.filter(camion=self.camion).update(base_actual='GREGORIO')
+
+        self.assertEqual(cache_entidades.en_cache('prueba', dependencias, calcular), 'GREGORIO')
+        self.assertEqual(len(calculos), 2)
+
+    def test_bulk_update_invalida_despues_de_escribir(self):
+        # Fuera de los atomic propios de la prueba on_commit corre en el acto, como en autocommit
+        conexion = connections['default']
+        bloques_prueba = len(conexion.atomic_blocks)
+        on_commit = transaction.on_commit
+
+        def on_commit_autocommit(funcion, using=None, robust=False):
+            if len(conexion.atomic_blocks) <= bloques_prueba:
+                funcion()
+            else:
+                on_commit(funcion, using=using, robust=robust)
+
+        vistos = []
+        estado = EstadoCamion.objects.get(camion=self.camion)
+        estado.kilometraje = 2500
+        with mock.patch.object(cache_entidades.transaction, 'on_commit', on_commit_autocommit), \
+                mock.patch.object(cache_entidades, 'invalidar', lambda *args: vistos.append(
+                    EstadoCamion.objects.get(camion=self.camion).kilometraje
+                )), self.captureOnCommitCallbacks(execute=True):
+            EstadoCamion.objects.bulk_update([estado], ['kilometraje'])
+            EstadoCamion.objects.sin_historial().bulk_update([estado], ['kilometraje'])
+
+        # Cada invalidación ya ve el km nuevo
+        self.assertTrue(vistos)
+        self.assertEqual(set(vistos), {2500})
+
+
+class MetricasCacheTests(TestCase):
+    """Contadores de aciertos y fallos: cada proceso suma los suyos a MetricaCache sin pisar los de otros."""
+
+    def setUp(self):
+        cache_entidades.cache.clear()
+        cache_entidades.reiniciar_metricas()
+
+    def test_suma_a_lo_volcado_por_otros_procesos(self):
+        for _ in range(3):
+            cache_entidades.en_cache('prueba', [], lambda: 'valor')
+        # Otro worker volcó lo suyo entre medio
+        MetricaCache.objects.create(nombre='prueba', aciertos=10, fallos=4)
+
+        self.assertEqual(
+            cache_entidades.metricas(), {'prueba': {'aciertos': 12, 'fallos': 5, 'tasa_aciertos': 0.7059}},
+        )
+
+    def test_volcado_vencido_espera_a_salir_de_la_transaccion(self):
+        with mock.patch.object(cache_entidades, 'METRICAS_SEGUNDOS', 0):
+            # La prueba corre dentro de un atomic: un rollback se llevaría lo volcado
+            cache_entidades.en_cache('prueba', [], lambda: 'valor')
+            self.assertFalse(MetricaCache.objects.exists())
+
+            sin_transaccion = {'default': mock.Mock(in_atomic_block=False)}
+            with mock.patch.object(cache_entidades, 'connections', sin_transaccion), \
+                    mock.patch.object(cache_entidades, 'volcar_metricas') as volcar:
+                cache_entidades.en_cache('prueba', [], lambda: 'valor')
+
+        volcar.assert_called_once_with()
+
+    def test_reiniciar_descarta_lo_pendiente(self):
+        cache_entidades.en_cache('prueba', [], lambda: 'valor')
+        cache_entidades.metricas()
+        cache_entidades.en_cache('prueba', [], lambda: 'valor')
+
+        cache_entidades.reiniciar_metricas()
+
+        self.assertEqual(cache_entidades.metricas(), {})
+
+
+class CamionListTests(TestCase):
+    """camion_list: página enviada por partes y un fragmento cacheado por base que solo invalidan sus unidades."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cullen = [crear_camion(f'CULL0{i}') for i in range(2)]
+        for camion in cls.cullen:
+            crear_estado(camion, base='CULLEN')
+        cls.gregorio = crear_camion('GREG01')
+        crear_estado(cls.gregorio, base='GREGORIO')
+        crear_estado(crear_camion('NADA01'), base='')
+        cls.usuario = User.objects.create_user('supervisor', password='clave')
+
+    def setUp(self):
+        cache_entidades.cache.clear()
+        self.client.force_login(self.usuario)
+
+    def _listar(self, **params):
+        """HTML completo y las bases que se renderizaron (no salieron de la caché), en orden."""
+        with mock.patch.object(vistas_core, '_render_grupo', wraps=vistas_core._render_grupo) as render:
+            respuesta = self.client.get(reverse('core:camion_list'), params)
+            self.assertTrue(respuesta.streaming)
+            html = b''.join(respuesta.streaming_content).decode()
+        return html, [llamada.args[0] for llamada in render.call_args_list]
+
+    def test_grupos_en_orden_dentro_de_la_pagina(self):
+        html, renderizadas = self._listar()
+
+        self.assertEqual(renderizadas, ['CULLEN', 'GREGORIO', vistas_core.SIN_BASE])
+        self.assertNotIn(str(vistas_core.MARCADOR_GRUPOS), html)
+        self.assertLess(html.index('<html'), html.index('CULL00'))
+        self.assertLess(html.index('CULL01'), html.index('GREG01'))
+        self.assertLess(html.index('GREG01'), html.index('NADA01'))
+        self.assertLess(html.index('NADA01'), html.index('</html>'))
+
+    def test_cambio_en_una_unidad_solo_rehace_su_base(self):
+        primera, _ = self._listar()
+        with self.captureOnCommitCallbacks(execute=True):
+            EstadoCamion.objects.filter(camion=self.gregorio).update(estado_operativo='EN_MANTENCION')
+
+        segunda, renderizadas = self._listar()
+
+        self.assertEqual(renderizadas, ['GREGORIO'])
+        self.assertNotEqual(segunda, primera)
+        self.assertEqual(self._listar()[1], [])
+
+    def test_unidad_nueva_en_la_base_rehace_su_grupo(self):
+        self._listar()
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_estado(crear_camion('CULL09'), base='CULLEN')
+
+        html, renderizadas = self._listar()
+
+        self.assertEqual(renderizadas, ['CULLEN'])
+        self.assertIn('CULL09', html)
+
+    def test_filtro_por_patente_tiene_su_propio_fragmento(self):
+        self._listar()
+
+        html, renderizadas = self._listar(q='greg01')
+
+        self.assertEqual(renderizadas, ['CULLEN', 'GREGORIO', vistas_core.SIN_BASE])
+        self.assertIn('GREG01', html)
+        self.assertNotIn('CULL00', html)
+
+    def test_orden_por_urgencia_no_usa_la_cache(self):
+        self._listar(orden='urgencia')
+
+        html, renderizadas = self._listar(orden='urgencia')
+
+        self.assertEqual(len(renderizadas), 3)
+        self.assertIn('GREG01', html)
+
+
+class MediaProtegidaTests(TestCase):
+    """media_protegida: cada carpeta de MEDIA pide el permiso de lo que guarda."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp()
+        cls.ajustes = override_settings(MEDIA_ROOT=cls.media, DESCARGAS_CABECERA_SENDFILE='')
+        cls.ajustes.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.ajustes.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.camion = crear_camion('ABCD12')
+        cls.remolque = Remolque.objects.create(patente='JK1234')
+        cls.doc_camion = cls._documento('CAMION', camion=cls.camion)
+        cls.doc_remolque = cls._documento('REMOLQUE', remolque=cls.remolque)
+        for nombre in ('reportes/Checklist_ABCD12.pdf', 'logos/contratos/enap.png', 'otros/secreto.txt'):
+            default_storage.save(nombre, ContentFile(b'contenido'))
+        default_storage.save('documentos/CAMION/huerfano.pdf', ContentFile(b'sin registro'))
+
+    @staticmethod
+    def _documento(tipo_entidad, **entidad):
+        nombre = default_storage.save(f'documentos/{tipo_entidad}/padron.pdf', ContentFile(b'%PDF ' + tipo_entidad.encode()))
+        return DocumentacionGeneral.objects.create(tipo_entidad=tipo_entidad, categoria='PADRON', archivo=nombre, **entidad)
+
+    def _login(self, *permisos):
+        usuario = User.objects.create_user('supervisor', password='clave')
+        usuario.user_permissions.add(*Permission.objects.filter(codename__in=permisos))
+        self.client.force_login(usuario)
+
+    def _get(self, nombre):
+        return self.client.get(reverse('media_protegida', args=[nombre]))
+
+    def test_sin_sesion_redirige_al_login(self):
+        respuesta = self._get(self.doc_camion.archivo.name)
+
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertIn('login', respuesta['Location'])
+
+    def test_documento_pide_el_permiso_de_su_entidad(self):
+        self._login('view_camion')
+
+        self.assertEqual(self._get(self.doc_remolque.archivo.name).status_code, 403)
+        respuesta = self._get(self.doc_camion.archivo.name)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(b''.join(respuesta.streaming_content), b'%PDF CAMION')
+
+    def test_reportes_piden_ver_inspecciones(self):
+        self._login('view_camion')
+
+        self.assertEqual(self._get('reportes/Checklist_ABCD12.pdf').status_code, 403)
+
+    def test_reportes_con_permiso(self):
+        self._login('view_inspeccion')
+
+        self.assertEqual(self._get('reportes/Checklist_ABCD12.pdf').status_code, 200)
+
+    def test_logos_basta_con_la_sesion(self):
+        self._login()
+
+        self.assertEqual(self._get('logos/contratos/enap.png').status_code, 200)
+
+    def test_sin_permiso_no_se_delega_al_servidor_web(self):
+        self._login()
+
+        with self.settings(DESCARGAS_CABECERA_SENDFILE='X-Accel-Redirect'):
+            respuesta = self._get(self.doc_camion.archivo.name)
+
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertNotIn('X-Accel-Redirect', respuesta)
+
+    def test_rutas_no_servibles_son_404(self):
+        self._login('view_camion', 'view_inspeccion')
+
+        for nombre in (
+            'otros/secreto.txt',  # Carpeta sin regla
+            'documentos/CAMION/huerfano.pdf',  # Archivo sin DocumentacionGeneral
+            'reportes/no_existe.pdf',
+            'reportes/../otros/secreto.txt',
+            'reportes/../../zmc/settings.py',
+        ):
+            with self.subTest(nombre=nombre):
+                self.assertEqual(self._get(nombre).status_code, 404)
+
+
+class CargasTests(TestCase):
+    """Subida por partes de DocumentacionGeneral (core/cargas.py y sus vistas)."""
+
+    CONTENIDO = b'%PDF-1.4 padron escaneado'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp()
+        cls.ajustes = override_settings(MEDIA_ROOT=cls.media, CARGAS_DIR=os.path.join(cls.media, 'cargas'))
+        cls.ajustes.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.ajustes.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@zmc.cl', 'clave')
+        cls.camion = crear_camion('ABCD12')
+
+    def _iniciar(self, contenido=CONTENIDO, **extra):
+        datos = {
+            'tipo_entidad': 'CAMION',
+            'entidad_id': self.camion.pk,
+            'categoria': 'PADRON',
+            'nombre_archivo': 'padron.pdf',
+            'tamano': len(contenido),
+            'sha256': hashlib.sha256(contenido).hexdigest(),
+            **extra,
+        }
+        return iniciar_carga(self.usuario, datos)
+
+    def _put_bloque(self, sesion, inicio, bloque, total=None):
+        fin = inicio + len(bloque) - 1
+        return self.client.put(
+            reverse('core:api_carga_bloque', args=[sesion.pk]),
+            data=bloque,
+            content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {inicio}-{fin}/{sesion.tamano if total is None else total}'},
+        )
+
+    def _documento_con_archivo(self):
+        documento = DocumentacionGeneral(tipo_entidad='CAMION', camion=self.camion, categoria='SOAP')
+        documento.archivo.save('soap_2025.pdf', ContentFile(b'%PDF-1.4 soap anterior'))
+        return documento
+
+    def _archivos_del_camion(self):
+        return set(default_storage.listdir(f'documentos/CAMION/{self.camion.pk}')[1])
+
+    def test_bloque_fuera_de_orden_responde_409(self):
+        self.client.force_login(self.usuario)
+        sesion = self._iniciar()
+
+        respuesta = self._put_bloque(sesion, 5, self.CONTENIDO[5:10])
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['carga']['recibido'], 0)
+
+        self.assertEqual(self._put_bloque(sesion, 0, self.CONTENIDO[:5]).status_code, 200)
+        # Reintento de un bloque ya confirmado: el cliente debe seguir desde 'recibido'
+        respuesta = self._put_bloque(sesion, 0, self.CONTENIDO[:5])
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['carga']['recibido'], 5)
+
+    def test_sha256_distinto_deja_la_carga_en_error(self):
+        sesion = self._iniciar(sha256=hashlib.sha256(b'otro archivo').hexdigest())
+
+        sesion = recibir_bloque(sesion.pk, self.usuario, 0, self.CONTENIDO)
+
+        self.assertEqual(sesion.estado, 'ERROR')
+        self.assertIsNone(sesion.documento_id)
+        self.assertFalse(DocumentacionGeneral.objects.exists())
+
+    def test_ultimo_bloque_crea_el_documento(self):
+        sesion = self._iniciar(fecha_vencimiento='2027-03-31')
+
+        recibir_bloque(sesion.pk, self.usuario, 0, self.CONTENIDO[:10])
+        sesion = recibir_bloque(sesion.pk, self.usuario, 10, self.CONTENIDO[10:])
+
+        self.assertEqual(sesion.estado, 'COMPLETA')
+        documento = DocumentacionGeneral.objects.get(pk=sesion.documento_id)
+        self.assertEqual(documento.camion, self.camion)
+        self.assertEqual(documento.categoria, 'PADRON')
+        self.assertEqual(str(documento.fecha_vencimiento), '2027-03-31')
+        self.assertTrue(documento.archivo.name.startswith(f'documentos/CAMION/{self.camion.pk}/'))
+        with documento.archivo.open('rb') as archivo:
+            self.assertEqual(archivo.read(), self.CONTENIDO)
+
+    def test_carga_con_documento_id_reemplaza_el_archivo(self):
+        documento = DocumentacionGeneral.objects.create(tipo_entidad='CAMION', camion=self.camion, categoria='SOAP')
+        sesion = self._iniciar(categoria='SOAP', documento_id=documento.pk)
+
+        sesion = recibir_bloque(sesion.pk, self.usuario, 0, self.CONTENIDO)
+
+        self.assertEqual(sesion.documento_id, documento.pk)
+        self.assertEqual(DocumentacionGeneral.objects.count(), 1)
+        documento.refresh_from_db()
+        self.assertTrue(documento.archivo.name.endswith('.pdf'))
+
+    def test_reemplazo_borra_el_archivo_anterior_al_confirmar(self):
+        documento = self._documento_con_archivo()
+        anterior = documento.archivo.name
+        archivos = self._archivos_del_camion()
+        sesion = self._iniciar(categoria='SOAP', documento_id=documento.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            recibir_bloque(sesion.pk, self.usuario, 0, self.CONTENIDO)
+        self.assertTrue(default_storage.exists(anterior))
+        for callback in callbacks:
+            callback()
+
+        documento.refresh_from_db()
+        self.assertFalse(default_storage.exists(anterior))
+        self.assertEqual(
+            self._archivos_del_camion(),
+            archivos - {os.path.basename(anterior)} | {os.path.basename(documento.archivo.name)},
+        )
+
+    def test_rollback_borra_el_archivo_nuevo(self):
+        documento = self._documento_con_archivo()
+        anterior = documento.archivo.name
+        archivos = self._archivos_del_camion()
+        sesion = self._iniciar(categoria='SOAP', documento_id=documento.pk)
+
+        with mock.patch.object(SesionCarga, 'save', side_effect=DatabaseError('conexión perdida')), \
+                self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError):
+                recibir_bloque(sesion.pk, self.usuario, 0, self.CONTENIDO)
+
+        documento.refresh_from_db()
+        self.assertEqual(documento.archivo.name, anterior)
+        self.assertEqual(self._archivos_del_camion(), archivos)
+        self.assertEqual(SesionCarga.objects.get(pk=sesion.pk).recibido, 0)
+
+    def test_total_de_content_range_distinto_al_de_la_carga_responde_400(self):
+        self.client.force_login(self.usuario)
+        sesion = self._iniciar()
+
+        respuesta = self._put_bloque(sesion, 0, self.CONTENIDO[:10], total=len(self.CONTENIDO) + 1)
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('Content-Range', respuesta.json()['error'])
+        self.assertEqual(SesionCarga.objects.get(pk=sesion.pk).recibido, 0)
@@ -1,6 +1,6 @@
 """
 core/urls.py
-Rutas URL de la aplicación core para listados, detalles y APIs de camiones y remolques.
+Rutas URL de la aplicación core para listados, detalles y APIs de camiones y remolques, y la subida por partes de documentos.
 """
 
 from django.urls import path
@@ -15,4 +15,7 @@ urlpatterns = [
     path('api/camion/<int:camion_id>/', views.api_camion_detalle, name='api_camion_detalle'),
     path("api/camiones/estado/", api_estado_camiones, name="api_estado_camiones"),
     path('remolque/<int:pk>/', views.remolque_detail, name='remolque_detail'),
+    path('api/cargas/', views.api_carga_iniciar, name='api_carga_iniciar'),
+    path('api/cargas/<uuid:carga_id>/', views.api_carga_estado, name='api_carga_estado'),
+    path('api/cargas/<uuid:carga_id>/bloque/', views.api_carga_bloque, name='api_carga_bloque'),
 ]
@@ -1,4 +1,5 @@
 from datetime import date
+from django.db.models import Prefetch
 
 # Prioridades: Menor número = Mayor Urgencia (para ordenar)
 # 1: VENCIDA/O, 2: CRITICA/O, 3: OK
@@ -8,6 +9,64 @@ PRIORIDAD_MAP = {
     "CRITICA": 2, "CRITICO": 2,
     "OK": 3, "SIN_DATOS": 4
 }
+
+def prefetch_ultima_mantencion(lookup, remolque=False):
+    """
+    Prefetch que trae SOLO la última mantención real de cada unidad (DISTINCT ON),
+    en vez de todo el historial. Deja el resultado en '_ultimas_mantenciones'.
+    - lookup: ruta de la relación, ej: 'mantenciones' o 'asignacion_actual__remolque__mantenciones_remolque'
+    - remolque: True si la relación apunta a mantenciones de remolques
+    """
+    from core.models import Mantencion
+    queryset = Mantencion.objects.ultimas_por_remolque() if remolque else Mantencion.objects.ultimas_por_camion()
+    return Prefetch(lookup, queryset=queryset, to_attr='_ultimas_mantenciones')
+
+def ultima_mantencion_real(entidad):
+    """
+    Retorna la última mantención real (sin DIARIAS) de un camión o remolque.
+    Si la vista ya usó prefetch_ultima_mantencion no dispara consultas; si no, hace una sola.
+    """
+    if hasattr(entidad, '_ultimas_mantenciones'):
+        return entidad._ultimas_mantenciones[0] if entidad._ultimas_mantenciones else None
+
+    if hasattr(entidad, 'id_camion'):
+        relacion = entidad.mantenciones
+    else:
+        relacion = entidad.mantenciones_remolque
+    return relacion.reales().order_by('-fecha_mantencion', '-id_mantencion').first()
+
+def documentos_drive(camion_ids=(), remolque_ids=()):
+    """
+    Links de Drive de las mantenciones reales, agrupados por unidad en una sola consulta.
+    Solo carga los documentos con link (no el historial completo de mantenciones).
+    Retorna: ({id_camion: [docs]}, {id_remolque: [docs]}) con docs como dicts
+    {'nombre_archivo', 'ruta_archivo'} ordenados del más reciente al más antiguo.
+    """
+    from core.models import DocumentoMantencion
+    from django.db.models import Q
+
+    camion_ids, remolque_ids = set(camion_ids), set(remolque_ids)
+    por_camion, por_remolque = {}, {}
+    if not camion_ids and not remolque_ids:
+        return por_camion, por_remolque
+
+    docs = DocumentoMantencion.objects.filter(
+        Q(mantencion__camion_id__in=camion_ids) | Q(mantencion__remolque_id__in=remolque_ids),
+        ruta_archivo__contains='http',
+    ).exclude(
+        mantencion__tipo_mantencion='DIARIA'
+    ).order_by(
+        '-mantencion__fecha_mantencion', 'id_documento'
+    ).values('mantencion__camion_id', 'mantencion__remolque_id', 'nombre_archivo', 'ruta_archivo')
+
+    for d in docs:
+        doc = {'nombre_archivo': d['nombre_archivo'], 'ruta_archivo': d['ruta_archivo']}
+        if d['mantencion__camion_id'] in camion_ids:
+            por_camion.setdefault(d['mantencion__camion_id'], []).append(doc)
+        if d['mantencion__remolque_id'] in remolque_ids:
+            por_remolque.setdefault(d['mantencion__remolque_id'], []).append(doc)
+    return por_camion, por_remolque
+
 def evaluar_salud_entidad(entidad):
     """
     Evalúa el estado general de un camión o remolque verificando:
@@ -26,14 +85,12 @@ def evaluar_salud_entidad(entidad):
     
     # 2. LÓGICA MECÁNICA: Prioridad absoluta a la tabla Mantencion
     if es_camion:
-        ultima_m = entidad.mantenciones.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion').first()  
+        ultima_m = ultima_mantencion_real(entidad)
         km_actual = entidad.estado_actual.kilometraje if entidad.estado_actual else 0
         
         # --- NUEVA REGLA DINÁMICA DE INTERVALO ---
-        from core.models import AsignacionTractoRemolque
-        tiene_remolque = AsignacionTractoRemolque.objects.filter(camion=entidad, activo=True).exists()
-        
-        if tiene_remolque:
+        # El puntero a la asignación activa evita una consulta por camión
+        if entidad.tiene_remolque:
             intervalo = 40000  # Tracto con remolque asociado
         else:
             intervalo = 25000  # Camión solo o rígido
@@ -41,7 +98,7 @@ def evaluar_salud_entidad(entidad):
         
     else:
         # Lógica para Remolques
-        ultima_m = entidad.mantenciones_remolque.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion').first()
+        ultima_m = ultima_mantencion_real(entidad)
         km_actual = float(getattr(entidad, 'kilometraje_acumulado', 0))
         intervalo = 25000 # O el que definas para los tanques
 
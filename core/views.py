@@ -4,80 +4,88 @@ Vistas para la visualización de camiones y remolques con sistema de salud e ins
 Implementa listados agrupados por base, filtrado por patente/estado, y API de detalles.
 """
 
+import json
+import posixpath
+import re
 from datetime import date
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.files.storage import default_storage
 from django.shortcuts import render, get_object_or_404
-from .models import Camion, EstadoCamion, Mantencion, DocumentacionGeneral, Remolque, AsignacionTractoRemolque
-from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from .models import (
+    BASE_CHOICES, Camion, EstadoCamion, Mantencion, DocumentacionGeneral, Remolque, AsignacionTractoRemolque, SesionCarga,
+)
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.db.models import Max, Prefetch
-from .utils import evaluar_salud_entidad
+from .utils import evaluar_salud_entidad, prefetch_ultima_mantencion, ultima_mantencion_real, documentos_drive
 from itertools import groupby
 from operator import attrgetter
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_http_methods
+from .replica import solo_lectura
+from .cache import CAMION, REMOLQUE, TODA_LA_FLOTA, en_cache, sello
+from .descargas import respuesta_archivo
+from .cargas import iniciar_carga, recibir_bloque
 
+SIN_BASE = "SIN_BASE"
+NOMBRES_BASE = dict(BASE_CHOICES)
 
+# Lugar de la página donde van los grupos por base (camion_list envía la página en partes)
+MARCADOR_GRUPOS = mark_safe('<!-- grupos por base -->')
 
-@login_required
-def camion_list(request):
+
+def _unidades_evaluadas(camion_ids):
     """
-    Listado principal de camiones activos con estado de salud.
-    Agrupa los camiones por base operativa, filtra por patente/estado y ordena por urgencia.
+    Camiones activos de 'camion_ids' listos para el listado: última mantención, links de Drive y salud
+    calculada, del tracto y de su remolque enganchado (en 'remolque_vinculado').
     """
-    # 1. Prefetch para TRACTO: Excluimos DIARIAS y ordenamos (2026 arriba)
-    prefetch_mants_camion = Prefetch(
-        'mantenciones', 
-        queryset=Mantencion.objects.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion').prefetch_related('documentos'),
-        to_attr='mantenciones_reales'
-    )
+    # 1. Prefetch para TRACTO: solo la última mantención real (DISTINCT ON), no el historial completo
+    prefetch_mants_camion = prefetch_ultima_mantencion('mantenciones')
 
-    # 2. Prefetch para REMOLQUE: Lo mismo
-    prefetch_mants_remolque = Prefetch(
-    'asignaciontractoremolque_set__remolque__mantenciones_remolque',
-    queryset=Mantencion.objects.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion').prefetch_related('documentos'),
-    to_attr='mants_reales_rem'
+    # 2. Prefetch para REMOLQUE: su última mantención, llegando por el puntero de la asignación activa
+    prefetch_mants_remolque = prefetch_ultima_mantencion(
+        'asignacion_actual__remolque__mantenciones_remolque', remolque=True
     )
 
-    # 3. Queryset Maestro
-    queryset = Camion.objects.filter(activo=True).select_related(
-        "estado_actual"
+    # 3. Queryset Maestro: la dupla activa viene en el mismo JOIN (select_related)
+    queryset = Camion.objects.filter(activo=True, pk__in=list(camion_ids)).select_related(
+        "estado_actual",
+        "asignacion_actual__remolque__estado_actual",
     ).prefetch_related(
         prefetch_mants_camion,
         prefetch_mants_remolque,
-        "asignaciontractoremolque_set__remolque__estado_actual"
+        "documentos_general",
+        "asignacion_actual__remolque__documentos_general",
     )
+    camiones = list(queryset)
 
-    camiones_data = []
-    for c in queryset:
-        # Ahora c.mantenciones_reales[0] será SÍ O SÍ la del 10/01/26
-        c.ultima_m = c.mantenciones_reales[0] if c.mantenciones_reales else None
-        c.docs_drive = []
-        if c.mantenciones_reales:
-            for m in c.mantenciones_reales:
-                for d in m.documentos.all():
-                    if d.ruta_archivo and 'http' in d.ruta_archivo:
-                        c.docs_drive.append(d)
+    # Links de Drive de todas las unidades en una sola consulta liviana
+    drive_camion, drive_remolque = documentos_drive(
+        camion_ids=[c.id_camion for c in camiones],
+        remolque_ids=[c.asignacion_actual.remolque_id for c in camiones if c.asignacion_actual_id],
+    )
 
+    camiones_data = []
+    for c in camiones:
+        c.ultima_m = ultima_mantencion_real(c)
+        c.docs_drive = drive_camion.get(c.id_camion, [])
         c.salud_calculada = evaluar_salud_entidad(c)    
         
         # Lógica de Remolque
-        asignacion = c.asignaciontractoremolque_set.filter(activo=True).first()
+        asignacion = c.asignacion_actual
         if asignacion and asignacion.remolque:
             rem = asignacion.remolque
-            m_rem = getattr(rem, 'mants_reales_rem', [])
-            rem.ultima_m = m_rem[0] if m_rem else None
-            rem.docs_drive = []
-            for mr in m_rem:
-                for dr in mr.documentos.all():
-                    if dr.ruta_archivo and 'http' in dr.ruta_archivo:
-                        rem.docs_drive.append(dr)
+            rem.ultima_m = ultima_mantencion_real(rem)
+            rem.docs_drive = drive_remolque.get(rem.id_remolque, [])
             rem.salud_calculada = evaluar_salud_entidad(rem)
             c.remolque_vinculado = rem
         
         camiones_data.append(c)
-        
-    # 2. FILTROS
-    q = request.GET.get("q", "").strip().upper() # Capturamos la patente buscada
-    estado_filtro = request.GET.get("estado")
+    return camiones_data
 
+def _filtrar_unidades(camiones_data, q, estado_filtro):
     # Filtro 1: Por Patente (Tracto o Remolque)
     if q:
         camiones_data = [
@@ -93,9 +101,9 @@ def camion_list(request):
             if (c.salud_calculada["codigo"] == estado_filtro) or 
                (hasattr(c, 'remolque_vinculado') and c.remolque_vinculado.salud_calculada["codigo"] == estado_filtro)
         ]
-    # 3. ORDENAMIENTO (Crucial para que groupby no falle)
-    ordenar = request.GET.get("orden")
-    
+    return camiones_data
+
+def _llave_orden(ordenar):
     def obtener_llave_orden(c):
         # La base es lo más importante para el agrupamiento visual
         base_id = str(c.estado_actual.base_actual) if (c.estado_actual and c.estado_actual.base_actual) else "ZZZ"
@@ -119,50 +127,103 @@ def camion_list(request):
         
         # SI NO HAY ORDEN ESPECIAL: La base va PRIMERO para que groupby funcione
         return (base_id, prioridad_final)
+    return obtener_llave_orden
+
+def _base_de(camion):
+    return camion.estado_actual.base_actual if (camion.estado_actual and camion.estado_actual.base_actual) else SIN_BASE
+
+def _render_grupo(base_code, camiones):
+    """Filas de un grupo de base (encabezado + unidades) como HTML."""
+    if not camiones:
+        return ''
+    return render_to_string('core/camion_list_grupo.html', {
+        'base': NOMBRES_BASE.get(base_code, "Unidades sin Base Asignada"),
+        'camiones': camiones,
+    })
+
+def _grupo_por_base(base_code, unidades, q, estado_filtro):
+    """
+    HTML de una base, cacheado como fragmento: la clave lleva la base, los filtros, el día (la salud depende
+    de la fecha) y un sello con las versiones de sus camiones y remolques. Un cambio en una unidad de
+    Cullen solo invalida el fragmento de Cullen.
+    """
+    dependencias = [(CAMION, camion_id) for camion_id, _remolque_id in unidades]
+    dependencias += [(REMOLQUE, remolque_id) for _camion_id, remolque_id in unidades if remolque_id]
 
-    # Ejecutamos el sort
-    camiones_data.sort(key=obtener_llave_orden)
+    def calcular():
+        camiones = _filtrar_unidades(_unidades_evaluadas(c for c, _r in unidades), q, estado_filtro)
+        camiones.sort(key=_llave_orden(None))
+        return _render_grupo(base_code, camiones)
 
-    # 4. AGRUPAMIENTO (Aquí estaba el error)
-    camiones_por_base = []
-    # Usamos la misma lógica de la llave de ordenamiento para agrupar
-    for base_code, grupo in groupby(camiones_data, key=lambda c: c.estado_actual.base_actual if (c.estado_actual and c.estado_actual.base_actual) else "SIN_BASE"):
-        lista_grupo = list(grupo)
-        
-        # Buscamos el nombre bonito de la base
-        if base_code != "SIN_BASE":
-            base_display = lista_grupo[0].estado_actual.get_base_actual_display()
-        else:
-            base_display = "Unidades sin Base Asignada"
-
-        camiones_por_base.append({
-            "base": base_display,
-            "camiones": lista_grupo
-        })
+    return en_cache(
+        'camion_list_grupo', [], calcular,
+        extra=[base_code, q, estado_filtro or '', date.today(), sello(dependencias)],
+    )
+
+@login_required
+@solo_lectura
+def camion_list(request):
+    """
+    Listado principal de camiones activos con estado de salud.
+    Agrupa los camiones por base operativa, filtra por patente/estado y ordena por urgencia.
+    La respuesta se envía por partes: la página y luego cada base apenas se calcula (o se lee de la caché).
+    """
+    # 2. FILTROS
+    q = request.GET.get("q", "").strip().upper() # Capturamos la patente buscada
+    estado_filtro = request.GET.get("estado")
+    # 3. ORDENAMIENTO
+    ordenar = request.GET.get("orden")
 
     context = {
-        "camiones_por_base": camiones_por_base,
+        "marcador_grupos": MARCADOR_GRUPOS,
         "estado_seleccionado": estado_filtro,
         "orden": ordenar,
     }
-    return render(request, "core/camion_list.html", context)
+    pagina = render_to_string("core/camion_list.html", context, request=request)
+    inicio, fin = pagina.split(MARCADOR_GRUPOS)
 
-@login_required
-def camion_detail(request, pk):
-    """
-    Detalle completo de un camión: histórico de mantenciones, documentos y remolque vinculado.
-    """
+    def grupos():
+        if ordenar == "urgencia":
+            # El orden por urgencia mezcla las bases: se evalúa toda la flota y los grupos no se cachean
+            camiones_data = _filtrar_unidades(
+                _unidades_evaluadas(Camion.objects.filter(activo=True).values_list('pk', flat=True)),
+                q, estado_filtro,
+            )
+            camiones_data.sort(key=_llave_orden(ordenar))
+            for base_code, grupo in groupby(camiones_data, key=_base_de):
+                yield _render_grupo(base_code, list(grupo))
+            return
+
+        # 4. AGRUPAMIENTO: una consulta liviana para saber qué unidades hay en cada base
+        por_base = {}
+        for camion_id, base, remolque_id in Camion.objects.filter(activo=True).values_list(
+            'pk', 'estado_actual__base_actual', 'asignacion_actual__remolque_id'
+        ):
+            por_base.setdefault(base or SIN_BASE, []).append((camion_id, remolque_id))
+        # Mismo orden que la llave de ordenamiento: bases por código y las sin base al final
+        for base_code in sorted(por_base, key=lambda b: "ZZZ" if b == SIN_BASE else str(b)):
+            yield _grupo_por_base(base_code, por_base[base_code], q, estado_filtro)
+
+    def contenido():
+        yield inicio
+        yield from grupos()
+        yield fin
+
+    return StreamingHttpResponse(contenido(), content_type='text/html; charset=utf-8')
+
+def _contexto_camion_detail(pk):
+    """Contexto de camion_detail (se cachea por camión y día, ver core/cache.py)."""
     # 1. Prefetch filtrado: Solo mantenciones reales para el historial técnico
     # Así el usuario ve reparaciones, no checklists infinitos
     prefetch_reales = Prefetch(
         'mantenciones', 
-        queryset=Mantencion.objects.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion'),
+        queryset=Mantencion.objects.reales().order_by('-fecha_mantencion'),
         to_attr='historial_tecnico'
     )
 
     # 2. Obtenemos el camión
     camion = get_object_or_404(
-        Camion.objects.select_related('estado_actual').prefetch_related(
+        Camion.objects.select_related('estado_actual', 'asignacion_actual__remolque').prefetch_related(
             prefetch_reales, 
             'mantenciones__documentos', # Necesitamos los docs de todas para el historial
             'documentos_general'
@@ -176,30 +237,35 @@ def camion_detail(request, pk):
     documentos = camion.documentos_general.all()
     
     # 4. Remolque vinculado
-    asignacion = camion.asignaciontractoremolque_set.filter(activo=True).first()
+    asignacion = camion.asignacion_actual
     remolque_vinculado = asignacion.remolque if asignacion else None
 
     # 5. Calculamos salud (evaluar_salud_entidad ya debería usar el filtro interno)
     salud = evaluar_salud_entidad(camion)
 
-    context = {
+    return {
         'camion': camion,
         'mantenciones': mantenciones,
         'documentos': documentos,
         'remolque_vinculado': remolque_vinculado,
         'estado_mant': salud 
     }
-    return render(request, 'core/camion_detail.html', context)
 
 @login_required
-def remolque_detail(request, pk):
+@solo_lectura
+def camion_detail(request, pk):
     """
-    Detalle completo de un remolque: mantenciones, documentación y camión vinculado.
+    Detalle completo de un camión: histórico de mantenciones, documentos y remolque vinculado.
     """
+    context = en_cache('camion_detail', [(CAMION, pk)], lambda: _contexto_camion_detail(pk), extra=[date.today()])
+    return render(request, 'core/camion_detail.html', context)
+
+def _contexto_remolque_detail(pk):
+    """Contexto de remolque_detail (se cachea por remolque y día)."""
     # 1. Obtenemos el remolque optimizado
     # Traemos de un golpe documentos y mantenciones para que la salud no dispare más queries
     remolque = get_object_or_404(
-        Remolque.objects.prefetch_related(
+        Remolque.objects.select_related('asignacion_actual__camion', 'estado_actual').prefetch_related(
             'mantenciones_remolque', 
             'documentos_general'
         ), 
@@ -210,100 +276,111 @@ def remolque_detail(request, pk):
     mantenciones = remolque.mantenciones_remolque.all().order_by('-fecha_mantencion')
     documentos = remolque.documentos_general.all().order_by('fecha_vencimiento')
     
-    # 3. Camión vinculado (usando la relación inversa de tu modelo)
-    # AsignacionTractoRemolque tiene un ForeignKey a Remolque con related_name por defecto o el que definiste
-    asignacion = remolque.asignaciontractoremolque_set.filter(activo=True).first()
+    # 3. Camión vinculado (puntero a la asignación activa, ya viene en el select_related)
+    asignacion = remolque.asignacion_actual
     camion_vinculado = asignacion.camion if asignacion else None
 
     # 4. LA MAGIA: Usamos la "Única Verdad"
     # Esta función detectará que es un Remolque y aplicará sus reglas específicas
     salud = evaluar_salud_entidad(remolque)
 
-    context = {
+    return {
         'remolque': remolque,
         'mantenciones': mantenciones,
         'documentos': documentos,
         'camion_vinculado': camion_vinculado,
         'estado_mant': salud  # Contiene: codigo, label, css, prioridad y motivos
     }
-    return render(request, 'core/remolque_detail.html', context)
 
-def api_camion_detalle(request, camion_id):
+@login_required
+@solo_lectura
+def remolque_detail(request, pk):
     """
-    API que retorna detalles de un camión: estado, kilometraje, última mantención y documentos.
+    Detalle completo de un remolque: mantenciones, documentación y camión vinculado.
     """
-    # Traemos con prefetch para los documentos
+    context = en_cache(
+        'remolque_detail', [(REMOLQUE, pk)], lambda: _contexto_remolque_detail(pk), extra=[date.today()],
+    )
+    return render(request, 'core/remolque_detail.html', context)
+
+def _api_camion_detalle(camion_id):
+    """Respuesta de api_camion_detalle."""
     camion = get_object_or_404(
-        Camion.objects.prefetch_related('mantenciones__documentos'), 
+        Camion.objects.select_related('estado_actual').prefetch_related(
+            prefetch_ultima_mantencion('mantenciones'), 'documentos_general'
+        ),
         id_camion=camion_id
     )
 
     estado = camion.estado_actual.estado_operativo if hasattr(camion, 'estado_actual') else None
     kilometraje = camion.estado_actual.kilometraje if hasattr(camion, 'estado_actual') else None
 
-    # Buscamos la última real para la fecha
-    m_reales = camion.mantenciones.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion')
-    u_m = m_reales.first()
-    
-    docs_drive = []
-    for m in m_reales:
-        for d in m.documentos.all():
-            if d.ruta_archivo and 'http' in d.ruta_archivo:
-                docs_drive.append({
-                    "nombre": d.nombre_archivo or "Documento",
-                    "ruta": d.ruta_archivo
-                })
-
-    return JsonResponse({
+    # Última real para la fecha y links de Drive sin cargar el historial
+    u_m = ultima_mantencion_real(camion)
+    drive_camion, _ = documentos_drive(camion_ids=[camion.id_camion])
+    docs_drive = [
+        {"nombre": d["nombre_archivo"] or "Documento", "ruta": d["ruta_archivo"]}
+        for d in drive_camion.get(camion.id_camion, [])
+    ]
+
+    return {
         "id_camion": camion.id_camion,
         "patente": camion.patente,
         "estado_operativo": estado,
         "kilometraje_actual": kilometraje,
-        "km_restantes": camion.km_restantes(),
+        "km_restantes": evaluar_salud_entidad(camion)["km_restantes"],
         "ultima_mantencion_real": u_m.fecha_mantencion.strftime('%d/%m/%Y') if u_m else "Sin datos",
         "documentos_drive": docs_drive,
-    })
+    }
 
-def api_estado_camiones(request):
+@solo_lectura
+def api_camion_detalle(request, camion_id):
     """
-    API que retorna el estado completo de todos los camiones (salud, documentos, estado del remolque).
+    API que retorna detalles de un camión: estado, kilometraje, última mantención y documentos.
     """
-    # API Corregida: Filtra DIARIAS y ordena por fecha descendente.
-    
-    camiones = Camion.objects.filter(activo=True).select_related(
-        "estado_actual"
+    datos = en_cache(
+        'api_camion_detalle', [(CAMION, camion_id)], lambda: _api_camion_detalle(camion_id), extra=[date.today()],
+    )
+    return JsonResponse(datos)
+
+def _api_estado_camiones():
+    """Respuesta de api_estado_camiones (se cachea para toda la flota)."""
+    # Solo la última mantención real por unidad (DISTINCT ON) en vez del historial completo
+    camiones = list(Camion.objects.filter(activo=True).select_related(
+        "estado_actual",
+        "asignacion_actual__remolque",
     ).prefetch_related(
-        "mantenciones__documentos",
-        "asignaciontractoremolque_set__remolque__mantenciones_remolque__documentos"
+        prefetch_ultima_mantencion('mantenciones'),
+        prefetch_ultima_mantencion('asignacion_actual__remolque__mantenciones_remolque', remolque=True),
+        "documentos_general",
+        "asignacion_actual__remolque__documentos_general",
+    ))
+
+    drive_camion, drive_remolque = documentos_drive(
+        camion_ids=[c.id_camion for c in camiones],
+        remolque_ids=[c.asignacion_actual.remolque_id for c in camiones if c.asignacion_actual_id],
     )
 
+    resultado = []
     for camion in camiones:
         salud_tracto = evaluar_salud_entidad(camion)
         
-        # --- B. DOCUMENTOS Y FECHA TRACTO (FILTRADO Y ORDENADO) ---
-        docs_tracto = []
-        # Excluimos las diarias y ponemos la más reciente (2026) arriba
-        m_reales = camion.mantenciones.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion')
-        
-        u_m_t = m_reales.first()
+        # --- B. DOCUMENTOS Y FECHA TRACTO ---
+        u_m_t = ultima_mantencion_real(camion)
         fecha_um_t = u_m_t.fecha_mantencion.strftime('%d/%m/%y') if u_m_t and u_m_t.fecha_mantencion else ""
-        
-        for m in m_reales:
-            for d in m.documentos.all():
-                if d.ruta_archivo and 'http' in d.ruta_archivo:
-                    docs_tracto.append({
-                        "nombre": d.nombre_archivo or "Ver Mantención",
-                        "ruta": d.ruta_archivo
-                    })
-
-        # --- C. DATOS DEL REMOLQUE (FILTRADO Y ORDENADO) ---
+        docs_tracto = [
+            {"nombre": d["nombre_archivo"] or "Ver Mantención", "ruta": d["ruta_archivo"]}
+            for d in drive_camion.get(camion.id_camion, [])
+        ]
+
+        # --- C. DATOS DEL REMOLQUE ---
         motivos_remolque = []
         docs_remolque = []
         fecha_um_r = ""
         id_remolque = None
         estado_rem_css = "estado-ok"
         
-        asignacion = camion.asignacion_actual 
+        asignacion = camion.asignacion_actual
         if asignacion:
             rem = asignacion.remolque
             id_remolque = rem.id_remolque
@@ -311,18 +388,12 @@ def api_estado_camiones(request):
             motivos_remolque = salud_rem["motivos"]
             estado_rem_css = salud_rem["css"]
             
-            # Filtro igual para el remolque
-            m_reales_rem = rem.mantenciones_remolque.exclude(tipo_mantencion='DIARIA').order_by('-fecha_mantencion')
-            u_m_r = m_reales_rem.first()
+            u_m_r = ultima_mantencion_real(rem)
             fecha_um_r = u_m_r.fecha_mantencion.strftime('%d/%m/%y') if u_m_r and u_m_r.fecha_mantencion else ""
-            
-            for mr in m_reales_rem:
-                for dr in mr.documentos.all():
-                    if dr.ruta_archivo and 'http' in dr.ruta_archivo:
-                        docs_remolque.append({
-                            "nombre": dr.nombre_archivo or "Ver Doc",
-                            "ruta": dr.ruta_archivo
-                        })
+            docs_remolque = [
+                {"nombre": d["nombre_archivo"] or "Ver Doc", "ruta": d["ruta_archivo"]}
+                for d in drive_remolque.get(rem.id_remolque, [])
+            ]
 
         resultado.append({
             "id_camion": camion.id_camion,
@@ -338,15 +409,24 @@ def api_estado_camiones(request):
             "estado_remolque_css": estado_rem_css
         })
 
-    return JsonResponse(resultado, safe=False)
+    return resultado
 
-def api_remolque_detalle(request, remolque_id):
+@solo_lectura
+def api_estado_camiones(request):
     """
-    Retorna los datos técnicos y de salud de un remolque para modales o detalles rápidos.
+    API que retorna el estado completo de todos los camiones (salud, documentos, estado del remolque).
     """
-    # 1. Traemos el remolque optimizado
+    datos = en_cache('api_estado_camiones', [TODA_LA_FLOTA], _api_estado_camiones, extra=[date.today()])
+    return JsonResponse(datos, safe=False)
+
+def _api_remolque_detalle(remolque_id):
+    """Respuesta de api_remolque_detalle."""
+    # 1. Traemos el remolque con su última mantención real ya resuelta
     rem = get_object_or_404(
-        Remolque.objects.prefetch_related('mantenciones_remolque', 'documentos_general'), 
+        Remolque.objects.prefetch_related(
+            prefetch_ultima_mantencion('mantenciones_remolque', remolque=True),
+            'documentos_general'
+        ), 
         id_remolque=remolque_id
     )
     
@@ -354,15 +434,15 @@ def api_remolque_detalle(request, remolque_id):
     salud = evaluar_salud_entidad(rem)
     
     # 3. Datos técnicos específicos
-    ultima_m = rem.mantenciones_remolque.all().first() # Ya viene ordenado si usas el prefetch de la view anterior
-    km_proxima = ultima_m.km_proxima_mantencion if ultima_m else 0
+    ultima_m = ultima_mantencion_real(rem)
+    km_proxima = ultima_m.km_proxima_mantencion if ultima_m and ultima_m.km_proxima_mantencion else 0
     km_actual = float(rem.kilometraje_acumulado)
     
     # Calculamos km_restantes de forma consistente
     km_restantes = km_proxima - km_actual if km_proxima > 0 else 0
 
     # 4. Construimos la respuesta unificada
-    return JsonResponse({
+    return {
         "id_remolque": rem.id_remolque,
         "patente": rem.patente,
         "estado_operativo": rem.get_estado_operativo_display(),
@@ -375,16 +455,26 @@ def api_remolque_detalle(request, remolque_id):
         "motivos": salud["motivos"],
         # Cantidad de alertas (filtrando de la lista de motivos de salud)
         "total_alertas": len(salud["motivos"]),
-    })
+    }
 
-def api_estado_salud_remolque(request, remolque_id):
+@solo_lectura
+def api_remolque_detalle(request, remolque_id):
     """
-    Evalúa mantenciones y documentos usando la lógica centralizada
-    para mantener consistencia en todo el sistema.
+    Retorna los datos técnicos y de salud de un remolque para modales o detalles rápidos.
     """
-    # 1. Traemos el remolque con sus documentos y mantenciones de una vez (Optimizado)
+    datos = en_cache(
+        'api_remolque_detalle', [(REMOLQUE, remolque_id)], lambda: _api_remolque_detalle(remolque_id),
+        extra=[date.today()],
+    )
+    return JsonResponse(datos)
+
+def _api_estado_salud_remolque(remolque_id):
+    """Respuesta de api_estado_salud_remolque."""
+    # 1. Traemos el remolque con sus documentos y solo su última mantención real
     rem = get_object_or_404(
-        Remolque.objects.prefetch_related('documentos_general', 'mantenciones_remolque'), 
+        Remolque.objects.prefetch_related(
+            'documentos_general', prefetch_ultima_mantencion('mantenciones_remolque', remolque=True)
+        ), 
         id_remolque=remolque_id
     )
 
@@ -393,9 +483,148 @@ def api_estado_salud_remolque(request, remolque_id):
     salud = evaluar_salud_entidad(rem)
 
     # 3. Retornamos el JSON que el JavaScript ya conoce
-    return JsonResponse({
+    return {
         "estado": salud["codigo"],
         "css": salud["css"],
         "label": salud["label"],
         "motivos": salud["motivos"]
-    })
+    }
+
+@solo_lectura
+def api_estado_salud_remolque(request, remolque_id):
+    """
+    Evalúa mantenciones y documentos usando la lógica centralizada
+    para mantener consistencia en todo el sistema.
+    """
+    datos = en_cache(
+        'api_estado_salud_remolque', [(REMOLQUE, remolque_id)], lambda: _api_estado_salud_remolque(remolque_id),
+        extra=[date.today()],
+    )
+    return JsonResponse(datos)
+
+# Permiso para ver un documento según la entidad dueña (DocumentacionGeneral.tipo_entidad)
+PERMISOS_DOCUMENTO = {
+    'CAMION': 'core.view_camion',
+    'REMOLQUE': 'core.view_remolque',
+    'CONDUCTOR': 'core.view_conductor',
+}
+# Carpetas de MEDIA y el permiso que piden ('' = basta con estar autenticado)
+PERMISOS_CARPETA = {
+    'reportes/': 'mantenciones.view_inspeccion',
+    'inspecciones/evidencia/': 'mantenciones.view_inspeccion',
+    'logos/contratos/': '',
+}
+
+def _permiso_media(nombre):
+    """Permiso necesario para ver el archivo 'nombre' de MEDIA (Http404 si no es un archivo servible)."""
+    if nombre.startswith('documentos/'):
+        tipo_entidad = DocumentacionGeneral.objects.filter(archivo=nombre).values_list('tipo_entidad', flat=True).first()
+        if tipo_entidad not in PERMISOS_DOCUMENTO:
+            raise Http404("No existe el documento.")
+        return PERMISOS_DOCUMENTO[tipo_entidad]
+    for carpeta, permiso in PERMISOS_CARPETA.items():
+        if nombre.startswith(carpeta):
+            return permiso
+    raise Http404("No existe el archivo.")
+
+@login_required
+@solo_lectura
+def media_protegida(request, nombre):
+    """
+    Sirve los archivos de MEDIA (documentos, reportes, evidencias, logos) después de validar permisos.
+    Con DESCARGAS_CABECERA_SENDFILE el envío lo hace nginx/Apache y el worker de Django queda libre.
+    """
+    nombre = posixpath.normpath(nombre)
+    if nombre.startswith(('..', '/')):
+        raise Http404("Ruta inválida.")
+
+    permiso = _permiso_media(nombre)
+    if permiso and not request.user.has_perm(permiso):
+        raise PermissionDenied
+    if not default_storage.exists(nombre):
+        raise Http404("El archivo no está en el almacenamiento.")
+
+    return respuesta_archivo(request, nombre, cache_segundos=settings.MEDIA_CACHE_SEGUNDOS)
+
+# --- SUBIDA POR PARTES (core/cargas.py) ---
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+def _datos_carga(sesion):
+    return {
+        'id': str(sesion.pk),
+        'estado': sesion.estado,
+        'recibido': sesion.recibido,
+        'tamano': sesion.tamano,
+        'tamano_bloque': settings.CARGAS_TAMANO_BLOQUE,
+        'documento_id': sesion.documento_id,
+    }
+
+@login_required
+@require_http_methods(["POST"])
+def api_carga_iniciar(request):
+    """
+    Abre una subida por partes. Cuerpo JSON: tipo_entidad, entidad_id, categoria, nombre_archivo, tamano,
+    sha256 y opcionalmente fecha_vencimiento y documento_id (para reemplazar el archivo de un documento).
+    """
+    try:
+        datos = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+    if not isinstance(datos, dict):
+        return JsonResponse({'success': False, 'error': 'Se esperaba un objeto JSON.'}, status=400)
+
+    permiso = 'core.change_documentaciongeneral' if datos.get('documento_id') else 'core.add_documentaciongeneral'
+    if not request.user.has_perm(permiso):
+        return JsonResponse({'success': False, 'error': 'Sin permiso para subir documentos.'}, status=403)
+    try:
+        sesion = iniciar_carga(request.user, datos)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+    return JsonResponse({'success': True, 'carga': _datos_carga(sesion)})
+
+@login_required
+@require_http_methods(["GET"])
+def api_carga_estado(request, carga_id):
+    """Estado de la subida: el cliente reanuda enviando desde 'recibido'."""
+    sesion = SesionCarga.objects.filter(pk=carga_id, usuario=request.user).first()
+    if sesion is None:
+        return JsonResponse({'success': False, 'error': 'No existe la carga.'}, status=404)
+    return JsonResponse({'success': True, 'carga': _datos_carga(sesion)})
+
+@login_required
+@require_http_methods(["PUT"])
+def api_carga_bloque(request, carga_id):
+    """
+    Recibe un bloque crudo con 'Content-Range: bytes inicio-fin/total'. Responde 409 con lo ya recibido
+    si el bloque no empieza donde corresponde. Con el último bloque queda COMPLETA (o ERROR si el
+    SHA-256 no coincide) y 'documento_id' apunta al DocumentacionGeneral creado o actualizado.
+    """
+    m = _CONTENT_RANGE.match(request.headers.get('Content-Range', '').strip())
+    if not m:
+        return JsonResponse({'success': False, 'error': "Falta 'Content-Range: bytes inicio-fin/total'."}, status=400)
+    inicio, fin, total = (int(x) for x in m.groups())
+    if fin - inicio + 1 > settings.CARGAS_TAMANO_BLOQUE:
+        return JsonResponse(
+            {'success': False, 'error': f'Máximo {settings.CARGAS_TAMANO_BLOQUE} bytes por bloque.'}, status=413
+        )
+    bloque = request.body
+    if len(bloque) != fin - inicio + 1:
+        return JsonResponse({'success': False, 'error': 'El bloque no coincide con Content-Range.'}, status=400)
+
+    try:
+        sesion = recibir_bloque(carga_id, request.user, inicio, bloque, total=total)
+    except SesionCarga.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'No existe la carga.'}, status=404)
+    except ValidationError as e:
+        if e.code == 'desfase':
+            sesion = SesionCarga.objects.get(pk=carga_id)
+            return JsonResponse({'success': False, 'error': e.message, 'carga': _datos_carga(sesion)}, status=409)
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
+
+    if sesion.estado == 'ERROR':
+        return JsonResponse({
+            'success': False, 'error': 'El SHA-256 del archivo no coincide: abra una nueva carga.',
+            'carga': _datos_carga(sesion),
+        }, status=400)
+    return JsonResponse({'success': True, 'carga': _datos_carga(sesion)})
@@ -0,0 +1,40 @@
+"""
+indicadores/admin.py
+Tablas de resumen en solo lectura (se llenan con refrescar_indicadores).
+"""
+
+from django.contrib import admin
+from .models import DisponibilidadMensual, MarcaRefresco, TasaFallaItem
+
+
+class SoloLecturaAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TasaFallaItem)
+class TasaFallaItemAdmin(SoloLecturaAdmin):
+    list_display = ('semana', 'item', 'modelo', 'base', 'total', 'regulares', 'malos')
+    list_filter = ('base', 'modelo', 'item__es_critico')
+    list_select_related = ('item', 'modelo')
+    date_hierarchy = 'semana'
+
+@admin.register(MarcaRefresco)
+class MarcaRefrescoAdmin(SoloLecturaAdmin):
+    list_display = ('nombre', 'ultimo_id', 'actualizado')
+
+
+@admin.register(DisponibilidadMensual)
+class DisponibilidadMensualAdmin(SoloLecturaAdmin):
+    list_display = ('mes', 'base', 'contrato', 'camiones', 'porcentaje_disponible')
+    list_filter = ('base', 'contrato')
+    list_select_related = ('contrato',)
+    date_hierarchy = 'mes'
+
+    def porcentaje_disponible(self, obj):
+        return f"{obj.disponibilidad:.1%}"
+
+    porcentaje_disponible.short_description = '% Operativo'
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class IndicadoresConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "indicadores"
+
+    def ready(self):
+        # Ediciones y borrados de filas ya procesadas por los rollups y la caché de confiabilidad
+        from . import signals  # noqa: F401
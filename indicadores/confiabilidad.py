@@ -0,0 +1,155 @@
+"""
+indicadores/confiabilidad.py
+Indicadores de confiabilidad para decidir reemplazos de unidades:
+- MTBF: km y días promedio entre mantenciones de EMERGENCIA consecutivas de un camión.
+- MTTR: horas promedio que un camión tarda en volver a OPERATIVO después de salir de ese estado
+  (según HistorialEstadoCamion, incluidos los eventos archivados: indicadores/fuentes.py).
+Se calculan por camión en una sola pasada ordenada sobre cada tabla y se suman por ModeloVehiculo y
+tipo_operacion (promedios ponderados por cantidad de intervalos, no promedio de promedios).
+El resultado queda en caché; la clave incluye el último id de cada tabla (las filas nuevas, incluso las de
+bulk_create) y una versión que cambia al editar o borrar emergencias o eventos (indicadores/signals.py).
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from core.cache import INDICADOR, versiones
+from core.models import Camion, HistorialEstadoCamion, Mantencion
+from .fuentes import eventos_camion
+
+CACHE_SEGUNDOS = 60 * 60
+VERSION_CACHE = (INDICADOR, 'confiabilidad')
+TAMANO_CURSOR = 5000
+
+AGRUPACIONES = ('camion', 'modelo', 'tipo_operacion')
+
+
+def _nuevo_acumulado():
+    return {'fallas': 0, 'intervalos_km': 0, 'suma_km': 0, 'intervalos_dias': 0, 'suma_dias': 0,
+            'reparaciones': 0, 'suma_horas_reparacion': 0.0}
+
+
+def _fallas_por_camion(desde, hasta, acumulado):
+    """Intervalos entre EMERGENCIAS consecutivas (mismo camión, ordenadas por fecha)."""
+    qs = Mantencion.objects.filter(tipo_mantencion='EMERGENCIA', camion__isnull=False)
+    if desde:
+        qs = qs.filter(fecha_mantencion__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_mantencion__lte=hasta)
+    filas = (
+        qs.order_by('camion_id', 'fecha_mantencion', 'id_mantencion')
+        .values_list('camion_id', 'fecha_mantencion', 'km_mantencion')
+        .iterator(chunk_size=TAMANO_CURSOR)
+    )
+    for camion_id, eventos in groupby(filas, key=lambda f: f[0]):
+        datos = acumulado[camion_id]
+        anterior = None
+        for _camion, fecha, km in eventos:
+            datos['fallas'] += 1
+            if anterior:
+                fecha_ant, km_ant = anterior
+                datos['intervalos_dias'] += 1
+                datos['suma_dias'] += (fecha - fecha_ant).days
+                # Sin km o con odómetro corregido hacia atrás no hay distancia confiable
+                if km is not None and km_ant is not None and km > km_ant:
+                    datos['intervalos_km'] += 1
+                    datos['suma_km'] += km - km_ant
+            anterior = (fecha, km)
+
+
+def _reparaciones_por_camion(desde, hasta, acumulado):
+    """Tiempo desde que un camión deja OPERATIVO hasta su siguiente evento OPERATIVO."""
+    # Límites como datetime (no __date) para que use el índice (id_camion, fecha_evento)
+    filas = eventos_camion(
+        timezone.make_aware(datetime.combine(desde, time.min)) if desde else None,
+        timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min)) if hasta else None,
+    )
+    for camion_id, eventos in groupby(filas, key=lambda f: f[0]):
+        datos = acumulado[camion_id]
+        fuera_desde = None
+        operativo = None
+        for _camion, fecha, estado, _pk in eventos:
+            if estado == 'OPERATIVO':
+                if fuera_desde is not None:
+                    datos['reparaciones'] += 1
+                    datos['suma_horas_reparacion'] += (fecha - fuera_desde).total_seconds() / 3600
+                fuera_desde = None
+                operativo = True
+            else:
+                # Solo cuenta si se vio la salida desde OPERATIVO (no se sabe cuándo empezó si no)
+                if operativo and fuera_desde is None:
+                    fuera_desde = fecha
+                operativo = False
+
+
+def _resumen(datos):
+    return {
+        'fallas': datos['fallas'],
+        'mtbf_km': round(datos['suma_km'] / datos['intervalos_km']) if datos['intervalos_km'] else None,
+        'mtbf_dias': round(datos['suma_dias'] / datos['intervalos_dias'], 1) if datos['intervalos_dias'] else None,
+        'reparaciones': datos['reparaciones'],
+        'mttr_horas': (
+            round(datos['suma_horas_reparacion'] / datos['reparaciones'], 1) if datos['reparaciones'] else None
+        ),
+    }
+
+
+def calcular_confiabilidad(desde=None, hasta=None):
+    """
+    MTBF/MTTR por camión, por modelo y por tipo de operación en el rango de fechas (ambos opcionales).
+    Retorna {'camion': [...], 'modelo': [...], 'tipo_operacion': [...]}.
+    """
+    acumulado = defaultdict(_nuevo_acumulado)
+    _fallas_por_camion(desde, hasta, acumulado)
+    _reparaciones_por_camion(desde, hasta, acumulado)
+
+    camiones = {
+        c['pk']: c for c in Camion.objects.filter(pk__in=list(acumulado))
+        .values('pk', 'patente', 'modelo_id', 'modelo__nombre', 'tipo_operacion')
+    }
+    por_modelo = defaultdict(_nuevo_acumulado)
+    por_tipo = defaultdict(_nuevo_acumulado)
+    filas_camion = []
+    for camion_id, datos in acumulado.items():
+        camion = camiones.get(camion_id)
+        if camion is None:
+            continue
+        for destino in (por_modelo[(camion['modelo_id'], camion['modelo__nombre'])], por_tipo[camion['tipo_operacion']]):
+            for campo, valor in datos.items():
+                destino[campo] += valor
+        filas_camion.append({
+            'camion_id': camion_id, 'patente': camion['patente'], 'modelo_id': camion['modelo_id'],
+            'tipo_operacion': camion['tipo_operacion'], **_resumen(datos),
+        })
+
+    return {
+        'camion': sorted(filas_camion, key=lambda f: f['patente']),
+        'modelo': [
+            {'modelo_id': modelo_id, 'modelo__nombre': nombre, **_resumen(datos)}
+            for (modelo_id, nombre), datos in sorted(por_modelo.items(), key=lambda i: i[0][1] or '')
+        ],
+        'tipo_operacion': [
+            {'tipo_operacion': tipo, **_resumen(datos)} for tipo, datos in sorted(por_tipo.items())
+        ],
+    }
+
+
+def confiabilidad(desde=None, hasta=None):
+    """
+    calcular_confiabilidad() con caché. Se recalcula si hay emergencias o eventos nuevos, si se editó o borró
+    alguno, o al vencer.
+    """
+    ultimos = (
+        Mantencion.objects.filter(tipo_mantencion='EMERGENCIA').aggregate(m=Max('pk'))['m'],
+        HistorialEstadoCamion.objects.aggregate(m=Max('pk'))['m'],
+    )
+    [version] = versiones([VERSION_CACHE])
+    clave = f"indicadores:confiabilidad:{desde}:{hasta}:{ultimos[0]}:{ultimos[1]}:{version}"
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = {'generado': timezone.now().isoformat(), **calcular_confiabilidad(desde, hasta)}
+        cache.set(clave, resultado, CACHE_SEGUNDOS)
+    return resultado
@@ -0,0 +1,219 @@
+"""
+indicadores/disponibilidad.py
+Disponibilidad de la flota (% del tiempo en cada estado operativo) por base, contrato y mes.
+HistorialEstadoCamion guarda cada cambio de estado con su fecha_evento: cada evento abre un intervalo que dura
+hasta el siguiente evento del mismo camión (o hasta ahora). refrescar_disponibilidad() recorre los eventos
+ordenados por camión y fecha en un solo cursor, reparte cada intervalo en los meses que cruza y guarda las sumas
+en DisponibilidadMensual. Solo se recalculan los meses desde el evento nuevo más antiguo (o desde el evento ya
+procesado que se editó o borró: MarcaRefresco.pendiente_desde, ver indicadores/signals.py).
+
+La base y el contrato son los actuales del camión (el historial no guarda la base de cada evento).
+El tiempo anterior al primer evento de un camión no cuenta (no se sabe en qué estado estaba).
+Los eventos archivados en frío se leen desde ArchivoHistorico (indicadores/fuentes.py).
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from core.models import Camion, HistorialEstadoCamion
+from .fuentes import estados_archivados_previos, eventos_camion, primer_mes_archivado
+from .models import DisponibilidadMensual, MarcaRefresco
+
+NOMBRE_MARCA = 'disponibilidad'
+
+# Eventos que confirmaron tarde con un id menor a la marca
+VENTANA_SEGURIDAD = timedelta(days=2)
+
+CAMPO_ESTADO = {
+    'OPERATIVO': 'segundos_operativo',
+    'EN_MANTENCION': 'segundos_en_mantencion',
+    'NO_OPERATIVO': 'segundos_no_operativo',
+    'FUERA_DE_SERVICIO': 'segundos_fuera_de_servicio',
+}
+
+AGRUPACIONES = {
+    'mes': ('mes',),
+    'base': ('base',),
+    'contrato': ('contrato_id', 'contrato__nombre'),
+}
+
+TAMANO_CURSOR = 5000
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _mes_siguiente(mes):
+    return mes.replace(year=mes.year + 1, month=1) if mes.month == 12 else mes.replace(month=mes.month + 1)
+
+
+def _inicio_mes_local(mes):
+    """Medianoche local del primer día del mes (aware)."""
+    return timezone.make_aware(datetime(mes.year, mes.month, 1))
+
+
+def _repartir(desde, hasta, estado, clave, acumulado):
+    """Suma el intervalo [desde, hasta) al mes de cada tramo, cortando en los cambios de mes."""
+    campo = CAMPO_ESTADO.get(estado)
+    if campo is None:
+        return
+    while desde < hasta:
+        mes = inicio_mes(timezone.localtime(desde).date())
+        corte = min(hasta, _inicio_mes_local(_mes_siguiente(mes)))
+        acumulado[(mes, *clave)][campo] += (corte - desde).total_seconds()
+        desde = corte
+
+
+def _intervalos_camion(tiempos, estados, inicio, ahora, estado_inicial, clave, acumulado):
+    """
+    Intervalos de un camión a partir de sus eventos ya ordenados (tiempos[i] con estados[i]).
+    'estado_inicial' es el estado vigente en 'inicio' (último evento anterior) o None.
+    Los segundos se suman en 'acumulado' y el camión cuenta una vez en cada mes donde tuvo algún intervalo.
+    """
+    propio = defaultdict(lambda: defaultdict(float))
+    if estado_inicial is not None:
+        _repartir(inicio, tiempos[0] if tiempos else ahora, estado_inicial, clave, propio)
+    for i, desde in enumerate(tiempos):
+        hasta = tiempos[i + 1] if i + 1 < len(tiempos) else ahora
+        _repartir(desde, hasta, estados[i], clave, propio)
+
+    for llave, segundos in propio.items():
+        destino = acumulado[llave]
+        for campo, valor in segundos.items():
+            destino[campo] += valor
+        destino['camiones'] += 1
+
+
+def calcular_disponibilidad(inicio, ahora):
+    """
+    Segundos por estado entre 'inicio' y 'ahora' agrupados por (mes, base, contrato_id).
+    Retorna {(mes, base, contrato_id): {campo: segundos, 'camiones': n}}.
+    """
+    estado_previo = (
+        HistorialEstadoCamion.objects
+        .filter(camion_id=OuterRef('pk'), fecha_evento__lt=inicio)
+        .order_by('-fecha_evento', '-pk')
+        .values('estado_operativo')[:1]
+    )
+    camiones = {
+        pk: ((base or '', contrato_id), estado)
+        for pk, base, contrato_id, estado in Camion.objects.annotate(estado_previo=Subquery(estado_previo))
+        .values_list('pk', 'estado_actual__base_actual', 'contrato_id', 'estado_previo')
+        .order_by()
+    }
+
+    # Sin evento vivo anterior: el estado previo puede estar en el archivo
+    archivados = estados_archivados_previos(
+        [pk for pk, (_clave, estado) in camiones.items() if estado is None], inicio,
+    )
+    for pk, estado in archivados.items():
+        camiones[pk] = (camiones[pk][0], estado)
+
+    acumulado = defaultdict(lambda: defaultdict(float))
+    eventos = eventos_camion(inicio, ahora)
+    con_eventos = set()
+    for camion_id, filas in groupby(eventos, key=lambda f: f[0]):
+        if camion_id not in camiones:
+            continue
+        filas = list(filas)
+        clave, estado_inicial = camiones[camion_id]
+        _intervalos_camion(
+            [f[1] for f in filas], [f[2] for f in filas], inicio, ahora, estado_inicial, clave, acumulado,
+        )
+        con_eventos.add(camion_id)
+    # Camiones sin cambios en el periodo: todo el periodo en el estado previo
+    for camion_id, (clave, estado_inicial) in camiones.items():
+        if camion_id not in con_eventos and estado_inicial is not None:
+            _intervalos_camion([], [], inicio, ahora, estado_inicial, clave, acumulado)
+    return acumulado
+
+
+def refrescar_disponibilidad(completo=False, ahora=None):
+    """
+    Recalcula los meses desde el evento nuevo más antiguo (o desde el último refresco, porque los intervalos
+    abiertos siguen creciendo) hasta 'ahora'. Con 'completo' rehace todo el historial.
+    Retorna la cantidad de meses recalculados.
+    """
+    ahora = ahora or timezone.now()
+    with transaction.atomic():
+        marca, creada = MarcaRefresco.objects.select_for_update().get_or_create(nombre=NOMBRE_MARCA)
+        hasta_id = HistorialEstadoCamion.objects.aggregate(m=Max('pk'))['m'] or 0
+
+        eventos = HistorialEstadoCamion.objects.all()
+        if not completo and not creada:
+            eventos = eventos.filter(
+                Q(pk__gt=marca.ultimo_id) | Q(fecha_evento__gte=ahora - VENTANA_SEGURIDAD)
+            )
+        desde = eventos.aggregate(m=Min('fecha_evento'))['m']
+        if completo or creada:
+            # Los eventos archivados son anteriores a todos los vivos
+            archivado = primer_mes_archivado('HISTORIAL_CAMION')
+            if archivado:
+                desde = _inicio_mes_local(archivado)
+        if not completo and not creada:
+            desde = min(desde, marca.actualizado) if desde else marca.actualizado
+            if marca.pendiente_desde:
+                desde = min(desde, marca.pendiente_desde)
+        if desde is None:
+            desde = ahora
+
+        mes_inicio = inicio_mes(timezone.localtime(min(desde, ahora)).date())
+        if completo:
+            DisponibilidadMensual.objects.all().delete()
+        else:
+            DisponibilidadMensual.objects.filter(mes__gte=mes_inicio).delete()
+
+        acumulado = calcular_disponibilidad(_inicio_mes_local(mes_inicio), ahora)
+        DisponibilidadMensual.objects.bulk_create(
+            [
+                DisponibilidadMensual(
+                    mes=mes,
+                    base=base,
+                    contrato_id=contrato_id,
+                    camiones=int(segundos.pop('camiones', 0)),
+                    **{campo: round(valor) for campo, valor in segundos.items()},
+                )
+                for (mes, base, contrato_id), segundos in acumulado.items()
+            ],
+            batch_size=1000,
+        )
+
+        marca.ultimo_id = hasta_id
+        marca.pendiente_desde = None
+        marca.save()
+    return len({mes for mes, _base, _contrato in acumulado})
+
+
+def disponibilidad(desde=None, hasta=None, base=None, contrato=None, agrupar=('mes', 'base', 'contrato')):
+    """
+    Porcentaje del tiempo en cada estado sumado según 'agrupar' (subconjunto de mes, base, contrato).
+    Ej: agrupar=('contrato',) da la disponibilidad de cada contrato en todo el periodo.
+    """
+    qs = DisponibilidadMensual.objects.all()
+    if desde:
+        qs = qs.filter(mes__gte=inicio_mes(desde))
+    if hasta:
+        qs = qs.filter(mes__lte=hasta)
+    if base:
+        qs = qs.filter(base=base)
+    if contrato:
+        qs = qs.filter(contrato_id=contrato)
+
+    campos = [c for clave in agrupar for c in AGRUPACIONES[clave]]
+    filas = (
+        qs.values(*campos)
+        .annotate(**{campo: Sum(campo) for campo in CAMPO_ESTADO.values()})
+        .order_by(*campos)
+    )
+    resultado = []
+    for fila in filas:
+        total = sum(fila[campo] or 0 for campo in CAMPO_ESTADO.values())
+        fila['horas'] = round(total / 3600, 1)
+        for estado, campo in CAMPO_ESTADO.items():
+            fila[f"pct_{estado.lower()}"] = round(100 * (fila.pop(campo) or 0) / total, 2) if total else 0
+        resultado.append(fila)
+    return resultado
@@ -0,0 +1,231 @@
+"""
+indicadores/fallas.py
+Tasas de falla de los ítems del checklist por modelo, base y semana.
+refrescar_tasas_falla() vuelve a agregar (GROUP BY en la BD) solo las semanas que tienen inspecciones nuevas
+desde la corrida anterior, más las posteriores a una edición o borrado de algo ya procesado
+(MarcaRefresco.pendiente_desde, ver indicadores/signals.py). Las inspecciones archivadas en frío se suman
+desde ArchivoHistorico (indicadores/fuentes.py).
+Las consultas y las alertas de tendencia leen de la tabla TasaFallaItem.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Count, DateField, Max, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from core.models import Camion
+from mantenciones.models import Inspeccion, ItemChecklist, ResultadoItem
+from .fuentes import inspecciones_archivadas
+from .models import MarcaRefresco, TasaFallaItem
+
+NOMBRE_MARCA = 'tasas_falla'
+
+# Inspecciones que confirmaron tarde con un id menor a la marca: se revisa siempre esta ventana
+VENTANA_SEGURIDAD = timedelta(days=2)
+
+AGRUPACIONES = {
+    'item': ('item_id', 'item__nombre', 'item__es_critico'),
+    'modelo': ('modelo_id',),
+    'base': ('base',),
+    'semana': ('semana',),
+}
+
+
+def inicio_semana(fecha):
+    """Lunes de la semana de 'fecha'."""
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def _semana_inspeccion(campo):
+    return TruncWeek(campo, output_field=DateField())
+
+
+def _inicio_semana_local(momento):
+    """Medianoche local del lunes de la semana de 'momento' (aware)."""
+    return timezone.make_aware(datetime.combine(inicio_semana(timezone.localtime(momento).date()), time.min))
+
+
+def _agregar_semanas(inicio, fin, incluida, semanas):
+    """
+    Crea las filas de TasaFallaItem de las semanas con inspecciones en [inicio, fin) (aware, opcionales) para
+    las que incluida(semana) es verdadero: GROUP BY sobre las tablas vivas más las inspecciones archivadas.
+    Agrega a 'semanas' las semanas con datos.
+    """
+    conteos = defaultdict(lambda: {'total': 0, 'buenos': 0, 'regulares': 0, 'malos': 0})
+    filas = ResultadoItem.objects.all()
+    if inicio:
+        filas = filas.filter(inspeccion__fecha_ingreso__gte=inicio)
+    if fin:
+        filas = filas.filter(inspeccion__fecha_ingreso__lt=fin)
+    filas = (
+        filas.annotate(semana=_semana_inspeccion('inspeccion__fecha_ingreso'))
+        .values('item_id', 'inspeccion__camion__modelo_id', 'inspeccion__base', 'semana')
+        .annotate(
+            total=Count('pk'),
+            buenos=Count('pk', filter=Q(estado='B')),
+            regulares=Count('pk', filter=Q(estado='R')),
+            malos=Count('pk', filter=Q(estado='M')),
+        )
+        .order_by()
+    )
+    for f in filas.iterator():
+        if incluida(f['semana']):
+            clave = (f['item_id'], f['inspeccion__camion__modelo_id'], f['inspeccion__base'] or '', f['semana'])
+            destino = conteos[clave]
+            for campo in destino:
+                destino[campo] += f[campo]
+
+    # Las archivadas se suman en Python, con el modelo actual del camión (igual que el JOIN de arriba).
+    # Los resultados de ítems ya borrados del catálogo se omiten (en las tablas vivas se borraron en cascada)
+    modelos = items = None
+    campo_estado = {'B': 'buenos', 'R': 'regulares', 'M': 'malos'}
+    for inspeccion in inspecciones_archivadas(inicio, fin):
+        semana = inicio_semana(timezone.localtime(inspeccion['fecha_ingreso']).date())
+        if not incluida(semana):
+            continue
+        if modelos is None:
+            modelos = dict(Camion.objects.values_list('pk', 'modelo_id'))
+            items = set(ItemChecklist.objects.values_list('pk', flat=True))
+        modelo_id = modelos.get(inspeccion['camion_id'])
+        for resultado in inspeccion.get('resultados', []):
+            if resultado['item_id'] not in items:
+                continue
+            destino = conteos[(resultado['item_id'], modelo_id, inspeccion['base'] or '', semana)]
+            destino['total'] += 1
+            if resultado['estado'] in campo_estado:
+                destino[campo_estado[resultado['estado']]] += 1
+
+    TasaFallaItem.objects.bulk_create(
+        [
+            TasaFallaItem(item_id=item_id, modelo_id=modelo_id, base=base, semana=semana, **totales)
+            for (item_id, modelo_id, base, semana), totales in conteos.items()
+        ],
+        batch_size=1000,
+    )
+    semanas.update(semana for _item, _modelo, _base, semana in conteos)
+
+
+def refrescar_tasas_falla(completo=False):
+    """
+    Recalcula las semanas con inspecciones nuevas (todas si 'completo', ej: después de borrar inspecciones).
+    Retorna la cantidad de semanas recalculadas.
+    """
+    with transaction.atomic():
+        # El lock sobre la marca evita dos refrescos simultáneos
+        marca, _ = MarcaRefresco.objects.select_for_update().get_or_create(nombre=NOMBRE_MARCA)
+        hasta_id = Inspeccion.objects.aggregate(m=Max('pk'))['m'] or 0
+
+        nuevas = Inspeccion.objects.all()
+        desde = None  # Con ediciones o borrados: todas las semanas desde la del cambio
+        if not completo:
+            filtro = Q(pk__gt=marca.ultimo_id) | Q(fecha_ingreso__gte=timezone.now() - VENTANA_SEGURIDAD)
+            if marca.pendiente_desde:
+                desde = _inicio_semana_local(marca.pendiente_desde)
+                filtro |= Q(fecha_ingreso__gte=desde)
+            nuevas = nuevas.filter(filtro)
+        semanas = set(
+            nuevas.annotate(semana=_semana_inspeccion('fecha_ingreso'))
+            .order_by().values_list('semana', flat=True).distinct()
+        )
+
+        if completo:
+            TasaFallaItem.objects.all().delete()
+            _agregar_semanas(None, None, lambda semana: True, semanas)
+        elif semanas or desde:
+            # Se rehacen todas aunque queden vacías (ej: se borró la única inspección de la semana)
+            rehacer = Q(semana__in=semanas)
+            if desde:
+                rehacer |= Q(semana__gte=timezone.localtime(desde).date())
+            TasaFallaItem.objects.filter(rehacer).delete()
+            if desde:
+                semana_desde = timezone.localtime(desde).date()
+                _agregar_semanas(desde, None, lambda semana: semana in semanas or semana >= semana_desde, semanas)
+            else:
+                zona = timezone.get_current_timezone()
+                inicio = timezone.make_aware(datetime.combine(min(semanas), time.min), zona)
+                fin = timezone.make_aware(datetime.combine(max(semanas) + timedelta(days=7), time.min), zona)
+                _agregar_semanas(inicio, fin, semanas.__contains__, semanas)
+
+        marca.ultimo_id = hasta_id
+        marca.pendiente_desde = None
+        marca.save()
+    return len(semanas)
+
+
+def _con_tasas(fila):
+    total = fila['total'] or 0
+    fila['tasa_falla'] = round(fila['malos'] / total, 4) if total else 0
+    fila['tasa_regular'] = round(fila['regulares'] / total, 4) if total else 0
+    return fila
+
+
+def tasas_falla(desde=None, hasta=None, base=None, modelo=None, item=None, agrupar=('item', 'modelo', 'base', 'semana')):
+    """
+    Tasas de falla sumadas según 'agrupar' (subconjunto de item, modelo, base, semana).
+    Ej: agrupar=('item',) da la tasa de cada ítem en todo el periodo y toda la flota.
+    """
+    qs = TasaFallaItem.objects.all()
+    if desde:
+        qs = qs.filter(semana__gte=inicio_semana(desde))
+    if hasta:
+        qs = qs.filter(semana__lte=hasta)
+    if base:
+        qs = qs.filter(base=base)
+    if modelo:
+        qs = qs.filter(modelo_id=modelo)
+    if item:
+        qs = qs.filter(item_id=item)
+
+    campos = [c for clave in agrupar for c in AGRUPACIONES[clave]]
+    filas = (
+        qs.values(*campos)
+        .annotate(total=Sum('total'), buenos=Sum('buenos'), regulares=Sum('regulares'), malos=Sum('malos'))
+        .order_by(*campos)
+    )
+    return [_con_tasas(f) for f in filas]
+
+
+def tendencias_criticas(semanas=4, hasta=None, umbral=0.25, min_resultados=20):
+    """
+    Ítems críticos (es_critico) cuya tasa de falla va en alza, por ítem y modelo (todas las bases).
+    Compara las últimas 'semanas' semanas completas con las 'semanas' anteriores: alerta si la tasa
+    reciente supera a la anterior en más de 'umbral' (relativo) con al menos 'min_resultados' en cada periodo.
+    """
+    fin = inicio_semana(hasta or timezone.localdate())  # La semana en curso todavía no está completa
+    corte = fin - timedelta(weeks=semanas)
+    inicio = corte - timedelta(weeks=semanas)
+
+    reciente = Q(semana__gte=corte)
+    anterior = Q(semana__lt=corte)
+    filas = (
+        TasaFallaItem.objects
+        .filter(item__es_critico=True, semana__gte=inicio, semana__lt=fin)
+        .values('item_id', 'item__nombre', 'modelo_id')
+        .annotate(
+            total_reciente=Sum('total', filter=reciente),
+            malos_reciente=Sum('malos', filter=reciente),
+            total_anterior=Sum('total', filter=anterior),
+            malos_anterior=Sum('malos', filter=anterior),
+        )
+        .order_by('item_id', 'modelo_id')
+    )
+
+    alertas = []
+    for f in filas:
+        total_rec, total_ant = f['total_reciente'] or 0, f['total_anterior'] or 0
+        if total_rec < min_resultados or total_ant < min_resultados:
+            continue
+        tasa_rec = (f['malos_reciente'] or 0) / total_rec
+        tasa_ant = (f['malos_anterior'] or 0) / total_ant
+        if tasa_rec > 0 and tasa_rec > tasa_ant * (1 + umbral):
+            alertas.append({
+                'item_id': f['item_id'],
+                'item__nombre': f['item__nombre'],
+                'modelo_id': f['modelo_id'],
+                'tasa_anterior': round(tasa_ant, 4),
+                'tasa_reciente': round(tasa_rec, 4),
+                'desde': corte,
+                'hasta': fin - timedelta(days=1),
+            })
+    return sorted(alertas, key=lambda a: a['tasa_reciente'] - a['tasa_anterior'], reverse=True)
@@ -0,0 +1,100 @@
+"""
+indicadores/fuentes.py
+Lectura de las tablas de origen de los indicadores junto con lo archivado en frío (mantenciones/archivo.py).
+'archivar_historial' mueve las inspecciones y el historial de estados antiguos a ArchivoHistorico: los
+indicadores los siguen viendo aquí, así archivar no cambia ningún resultado (ni 'refrescar_indicadores --completo').
+Los archivos son por camión y mes: se descomprimen solo los meses del rango pedido.
+"""
+
+import heapq
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models import ArchivoHistorico, HistorialEstadoCamion
+
+TAMANO_CURSOR = 5000
+
+
+def _meses(tabla, desde, hasta):
+    """Archivos de 'tabla' que pueden tener filas en [desde, hasta) (datetimes aware, ambos opcionales)."""
+    qs = ArchivoHistorico.objects.filter(tabla=tabla)
+    if desde:
+        qs = qs.filter(mes__gte=timezone.localtime(desde).date().replace(day=1))
+    if hasta:
+        qs = qs.filter(mes__lte=timezone.localtime(hasta).date())
+    return qs
+
+
+def primer_mes_archivado(tabla):
+    """Mes más antiguo archivado de 'tabla' (date) o None: desde ahí rehace todo un refresco completo."""
+    return ArchivoHistorico.objects.filter(tabla=tabla).aggregate(m=Min('mes'))['m']
+
+
+def _en_rango(fecha, desde, hasta):
+    return (desde is None or fecha >= desde) and (hasta is None or fecha < hasta)
+
+
+def _eventos_archivados(desde, hasta):
+    for archivo in _meses('HISTORIAL_CAMION', desde, hasta).order_by('camion_id', 'mes').iterator(chunk_size=100):
+        filas = []
+        for fila in archivo.leer():
+            fecha = parse_datetime(fila['fecha_evento'])
+            if _en_rango(fecha, desde, hasta):
+                filas.append((fila['camion_id'], fecha, fila['estado_operativo'], fila['pk']))
+        yield from sorted(filas, key=lambda f: (f[1], f[3]))
+
+
+def eventos_camion(desde=None, hasta=None):
+    """
+    (camion_id, fecha_evento, estado_operativo, pk) de HistorialEstadoCamion en [desde, hasta), vivos y
+    archivados, ordenados por camión, fecha e id.
+    """
+    vivos = HistorialEstadoCamion.objects.all()
+    if desde:
+        vivos = vivos.filter(fecha_evento__gte=desde)
+    if hasta:
+        vivos = vivos.filter(fecha_evento__lt=hasta)
+    vivos = (
+        vivos.order_by('camion_id', 'fecha_evento', 'pk')
+        .values_list('camion_id', 'fecha_evento', 'estado_operativo', 'pk')
+        .iterator(chunk_size=TAMANO_CURSOR)
+    )
+    # Cada archivo es un camión y mes, y los meses no se traslapan: ambas fuentes ya vienen ordenadas
+    return heapq.merge(vivos, _eventos_archivados(desde, hasta), key=lambda f: (f[0], f[1], f[3]))
+
+
+def estados_archivados_previos(camiones, antes_de):
+    """
+    {camion_id: estado_operativo} del último evento archivado antes de 'antes_de' de cada camión de 'camiones'.
+    Solo hace falta cuando el camión no tiene eventos vivos antes de 'antes_de' (los archivados son más antiguos).
+    """
+    if not camiones:
+        return {}
+    resultado = {}
+    meses = (
+        _meses('HISTORIAL_CAMION', None, antes_de).filter(camion_id__in=camiones)
+        .order_by('camion_id', '-mes').values_list('pk', 'camion_id')
+    )
+    for pk, camion_id in meses:
+        if camion_id in resultado:
+            continue
+        previos = [
+            (parse_datetime(fila['fecha_evento']), fila['pk'], fila['estado_operativo'])
+            for fila in ArchivoHistorico.objects.get(pk=pk).leer()
+        ]
+        previos = [previo for previo in previos if previo[0] < antes_de]
+        if previos:
+            resultado[camion_id] = max(previos)[2]
+    return resultado
+
+
+def inspecciones_archivadas(desde=None, hasta=None):
+    """
+    Inspecciones archivadas con fecha_ingreso en [desde, hasta): dicts de ArchivoHistorico (con 'resultados')
+    con la fecha ya convertida a datetime.
+    """
+    for archivo in _meses('INSPECCION', desde, hasta).order_by('mes', 'camion_id').iterator(chunk_size=100):
+        for fila in archivo.leer():
+            fecha = parse_datetime(fila['fecha_ingreso'])
+            if _en_rango(fecha, desde, hasta):
+                yield {**fila, 'fecha_ingreso': fecha}
@@ -0,0 +1,25 @@
+"""
+indicadores/management/commands/refrescar_indicadores.py
+Actualiza las tablas de resumen de indicadores con lo nuevo desde la corrida anterior.
+Pensado para correr desde cron (ej: cada hora); --completo las reconstruye desde cero.
+
+Ejemplo (crontab):
+    15 * * * * cd /app && python manage.py refrescar_indicadores
+"""
+
+from django.core.management.base import BaseCommand
+from indicadores.disponibilidad import refrescar_disponibilidad
+from indicadores.fallas import refrescar_tasas_falla
+
+
+class Command(BaseCommand):
+    help = 'Refresca los indicadores de flota (tasas de falla del checklist y disponibilidad)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Recalcula todo el historial')
+
+    def handle(self, *args, **options):
+        semanas = refrescar_tasas_falla(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"📊 Tasas de falla: {semanas} semanas recalculadas."))
+        meses = refrescar_disponibilidad(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f"🚛 Disponibilidad: {meses} meses recalculados."))
@@ -0,0 +1,76 @@
+# Tablas de resumen de indicadores: marca de refresco y tasas de falla por ítem.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("core", "0008_estado_modelovehiculo"),
+        ("mantenciones", "0009_inspeccion_base"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarcaRefresco",
+            fields=[
+                ("nombre", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("ultimo_id", models.BigIntegerField(default=0)),
+                ("actualizado", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TasaFallaItem",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "base",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("SOMBRERO", "Sombrero"),
+                            ("GREGORIO", "Gregorio"),
+                            ("CULLEN", "Cullen"),
+                            ("POSESION", "Posesión"),
+                            ("PUNTA_ARENAS", "Punta Arenas"),
+                        ],
+                        default="",
+                        max_length=20,
+                    ),
+                ),
+                ("semana", models.DateField()),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("buenos", models.PositiveIntegerField(default=0)),
+                ("regulares", models.PositiveIntegerField(default=0)),
+                ("malos", models.PositiveIntegerField(default=0)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="mantenciones.itemchecklist",
+                    ),
+                ),
+                (
+                    "modelo",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.modelovehiculo",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tasa de Falla por Ítem",
+                "verbose_name_plural": "Tasas de Falla por Ítem",
+                "indexes": [
+                    models.Index(fields=["semana", "item"], name="tasa_falla_semana_item_idx"),
+                    models.Index(fields=["item", "semana"], name="tasa_falla_item_semana_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Rollup mensual de disponibilidad (segundos por estado operativo) por base y contrato.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0008_estado_modelovehiculo"),
+        ("indicadores", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DisponibilidadMensual",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("mes", models.DateField(help_text="Primer día del mes")),
+                (
+                    "base",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("SOMBRERO", "Sombrero"),
+                            ("GREGORIO", "Gregorio"),
+                            ("CULLEN", "Cullen"),
+                            ("POSESION", "Posesión"),
+                            ("PUNTA_ARENAS", "Punta Arenas"),
+                        ],
+                        default="",
+                        max_length=20,
+                    ),
+                ),
+                ("camiones", models.PositiveIntegerField(default=0)),
+                ("segundos_operativo", models.BigIntegerField(default=0)),
+                ("segundos_en_mantencion", models.BigIntegerField(default=0)),
+                ("segundos_no_operativo", models.BigIntegerField(default=0)),
+                ("segundos_fuera_de_servicio", models.BigIntegerField(default=0)),
+                (
+                    "contrato",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.contrato",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Disponibilidad Mensual",
+                "verbose_name_plural": "Disponibilidad Mensual",
+                "indexes": [models.Index(fields=["mes", "base"], name="disponibilidad_mes_base_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Fecha desde la que rehacer un rollup cuando se editan o borran filas que ya procesó (indicadores/signals.py).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("indicadores", "0002_disponibilidadmensual"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="marcarefresco",
+            name="pendiente_desde",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
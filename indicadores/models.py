@@ -0,0 +1,111 @@
+"""
+indicadores/models.py
+Tablas de resumen (rollups) para indicadores de flota.
+Se llenan con 'refrescar_indicadores' a partir de las tablas operativas; las APIs y reportes leen solo de aquí.
+"""
+
+from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Least
+from core.models import BASE_CHOICES
+
+
+class MarcaRefresco(models.Model):
+    """
+    Hasta qué registro se procesó cada rollup (refresco incremental).
+    Las filas nuevas se detectan por id; las ya procesadas que se editan o borran dejan en 'pendiente_desde'
+    la fecha desde la que hay que rehacer (ver marcar_cambio e indicadores/signals.py).
+    """
+    nombre = models.CharField(max_length=50, primary_key=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    pendiente_desde = models.DateTimeField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def marcar_cambio(cls, nombre, pk, *fechas):
+        """
+        La fila 'pk' (de la tabla que sigue la marca) cambió o se borró: si el rollup ya la procesó, el próximo
+        refresco rehace desde la menor de 'fechas' (valores o expresiones, ej: la fecha guardada antes de editar).
+        """
+        fechas = [
+            fecha if hasattr(fecha, 'resolve_expression') else Value(fecha, output_field=models.DateTimeField())
+            for fecha in fechas if fecha is not None
+        ]
+        if pk is None or not fechas:
+            return
+        # LEAST de PostgreSQL ignora los NULL: sirve también sin marca previa
+        cls.objects.filter(nombre=nombre, ultimo_id__gte=pk).update(pendiente_desde=Least('pendiente_desde', *fechas))
+
+    def __str__(self):
+        return f"{self.nombre} (hasta {self.ultimo_id})"
+
+
+class TasaFallaItem(models.Model):
+    """
+    Resultados B/R/M de un ítem del checklist por modelo de camión, base y semana (lunes).
+    La tasa de falla es malos / total; la de regular, regulares / total.
+    """
+    item = models.ForeignKey('mantenciones.ItemChecklist', on_delete=models.CASCADE, related_name='+')
+    modelo = models.ForeignKey('core.ModeloVehiculo', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    base = models.CharField(max_length=20, choices=BASE_CHOICES, blank=True, default='')
+    semana = models.DateField()
+
+    total = models.PositiveIntegerField(default=0)
+    buenos = models.PositiveIntegerField(default=0)
+    regulares = models.PositiveIntegerField(default=0)
+    malos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Tasa de Falla por Ítem"
+        verbose_name_plural = "Tasas de Falla por Ítem"
+        indexes = [
+            models.Index(fields=['semana', 'item'], name='tasa_falla_semana_item_idx'),
+            models.Index(fields=['item', 'semana'], name='tasa_falla_item_semana_idx'),
+        ]
+
+    @property
+    def tasa_falla(self):
+        return self.malos / self.total if self.total else 0
+
+    @property
+    def tasa_regular(self):
+        return self.regulares / self.total if self.total else 0
+
+    def __str__(self):
+        return f"{self.item_id} - {self.base or 'SIN BASE'} - {self.semana}"
+
+
+class DisponibilidadMensual(models.Model):
+    """
+    Segundos que los camiones de una base y contrato pasaron en cada estado operativo durante un mes.
+    Se arma con los intervalos entre eventos de HistorialEstadoCamion; el mes en curso llega hasta el último refresco.
+    """
+    mes = models.DateField(help_text="Primer día del mes")
+    base = models.CharField(max_length=20, choices=BASE_CHOICES, blank=True, default='')
+    contrato = models.ForeignKey('core.Contrato', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    camiones = models.PositiveIntegerField(default=0)
+
+    segundos_operativo = models.BigIntegerField(default=0)
+    segundos_en_mantencion = models.BigIntegerField(default=0)
+    segundos_no_operativo = models.BigIntegerField(default=0)
+    segundos_fuera_de_servicio = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Disponibilidad Mensual"
+        verbose_name_plural = "Disponibilidad Mensual"
+        indexes = [
+            models.Index(fields=['mes', 'base'], name='disponibilidad_mes_base_idx'),
+        ]
+
+    @property
+    def segundos_total(self):
+        return (self.segundos_operativo + self.segundos_en_mantencion
+                + self.segundos_no_operativo + self.segundos_fuera_de_servicio)
+
+    @property
+    def disponibilidad(self):
+        total = self.segundos_total
+        return self.segundos_operativo / total if total else 0
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} - {self.base or 'SIN BASE'} - {self.contrato_id or 'SIN CONTRATO'}"
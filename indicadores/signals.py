@@ -0,0 +1,89 @@
+"""
+indicadores/signals.py
+Cambios en filas que los indicadores ya usaron. El refresco incremental y la caché de confiabilidad detectan
+las filas nuevas por id (también las de bulk_create, que no disparan señales); las ediciones y borrados se
+avisan aquí:
+    - Inspecciones y resultados del checklist: tasas de falla (MarcaRefresco 'tasas_falla').
+    - Eventos de HistorialEstadoCamion: disponibilidad (MarcaRefresco 'disponibilidad') y confiabilidad.
+    - Mantenciones de emergencia: confiabilidad (versión de su caché, después del commit).
+Los borrados de archivar_historial no cuentan: las filas se movieron a ArchivoHistorico, que los indicadores
+también leen (indicadores/fuentes.py). Se conectan en IndicadoresConfig.ready().
+"""
+
+from django.db.models import Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from core.cache import invalidar_al_confirmar
+from core.models import HistorialEstadoCamion
+from mantenciones.archivo import archivando
+from mantenciones.models import Inspeccion
+from . import disponibilidad, fallas
+from .confiabilidad import VERSION_CACHE
+from .models import MarcaRefresco
+
+# Campos de la inspección que usa el rollup de tasas de falla
+CAMPOS_INSPECCION = {'fecha_ingreso', 'camion', 'camion_id', 'base'}
+
+
+def _fecha_guardada(modelo, pk, campo):
+    """La fecha que la fila tiene en la BD (antes de guardar), como subconsulta del UPDATE de la marca."""
+    return Subquery(modelo.objects.filter(pk=pk).values(campo)[:1])
+
+
+@receiver(pre_save, sender='mantenciones.Inspeccion')
+def inspeccion_editada(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and not CAMPOS_INSPECCION & set(update_fields)):
+        return
+    MarcaRefresco.marcar_cambio(
+        fallas.NOMBRE_MARCA, instance.pk,
+        _fecha_guardada(Inspeccion, instance.pk, 'fecha_ingreso'), instance.fecha_ingreso,
+    )
+
+
+@receiver(post_delete, sender='mantenciones.Inspeccion')
+def inspeccion_borrada(sender, instance, **kwargs):
+    if archivando():
+        return
+    MarcaRefresco.marcar_cambio(fallas.NOMBRE_MARCA, instance.pk, instance.fecha_ingreso)
+
+
+@receiver(pre_save, sender='mantenciones.ResultadoItem')
+@receiver(post_delete, sender='mantenciones.ResultadoItem')
+def resultado_cambiado(sender, instance, **kwargs):
+    if archivando():
+        return
+    # También al crear: un resultado nuevo en una inspección ya procesada cambia su semana
+    MarcaRefresco.marcar_cambio(
+        fallas.NOMBRE_MARCA, instance.inspeccion_id,
+        _fecha_guardada(Inspeccion, instance.inspeccion_id, 'fecha_ingreso'),
+    )
+
+
+@receiver(pre_save, sender='core.HistorialEstadoCamion')
+def evento_editado(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    MarcaRefresco.marcar_cambio(
+        disponibilidad.NOMBRE_MARCA, instance.pk,
+        _fecha_guardada(HistorialEstadoCamion, instance.pk, 'fecha_evento'), instance.fecha_evento,
+    )
+
+
+@receiver(post_delete, sender='core.HistorialEstadoCamion')
+def evento_borrado(sender, instance, **kwargs):
+    if archivando():
+        return
+    MarcaRefresco.marcar_cambio(disponibilidad.NOMBRE_MARCA, instance.pk, instance.fecha_evento)
+
+
+@receiver([post_save, post_delete], sender='core.HistorialEstadoCamion')
+def evento_cambiado(sender, instance, created=False, **kwargs):
+    if not created and not archivando():
+        invalidar_al_confirmar(*VERSION_CACHE)
+
+
+@receiver([post_save, post_delete], sender='core.Mantencion')
+def mantencion_cambiada(sender, instance, created=False, **kwargs):
+    # Una edición puede cambiar el tipo desde o hacia EMERGENCIA
+    if instance.tipo_mantencion == 'EMERGENCIA' or not created:
+        invalidar_al_confirmar(*VERSION_CACHE)
@@ -0,0 +1,379 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from core.models import Camion, Contrato, EstadoCamion, HistorialEstadoCamion, Mantencion, ModeloVehiculo
+from mantenciones.archivo import archivar
+from mantenciones.models import CategoriaChecklist, Inspeccion, ItemChecklist, ResultadoItem
+from .confiabilidad import calcular_confiabilidad, confiabilidad
+from .disponibilidad import _intervalos_camion, _repartir, calcular_disponibilidad, refrescar_disponibilidad
+from .fallas import refrescar_tasas_falla, tasas_falla, tendencias_criticas
+from .models import DisponibilidadMensual, MarcaRefresco, TasaFallaItem
+
+HORA = 3600
+DIA = 24 * HORA
+
+
+def _local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+def _acumulado():
+    return defaultdict(lambda: defaultdict(float))
+
+
+class RepartoIntervalosTests(SimpleTestCase):
+    """Corte de los intervalos de estado en los meses que cruzan (hora local)."""
+
+    def test_intervalo_se_corta_en_el_cambio_de_mes(self):
+        acumulado = _acumulado()
+
+        _repartir(_local(2026, 1, 31, 22), _local(2026, 2, 1, 3), 'OPERATIVO', ('CULLEN', 1), acumulado)
+
+        self.assertEqual(acumulado[(date(2026, 1, 1), 'CULLEN', 1)]['segundos_operativo'], 2 * HORA)
+        self.assertEqual(acumulado[(date(2026, 2, 1), 'CULLEN', 1)]['segundos_operativo'], 3 * HORA)
+
+    def test_intervalo_de_varios_meses(self):
+        acumulado = _acumulado()
+
+        _repartir(_local(2026, 1, 31), _local(2026, 3, 2), 'NO_OPERATIVO', ('', None), acumulado)
+
+        self.assertEqual(
+            {mes: segundos['segundos_no_operativo'] for (mes, _base, _contrato), segundos in acumulado.items()},
+            {date(2026, 1, 1): DIA, date(2026, 2, 1): 28 * DIA, date(2026, 3, 1): DIA},
+        )
+
+    def test_estado_desconocido_no_suma(self):
+        acumulado = _acumulado()
+
+        _repartir(_local(2026, 1, 1), _local(2026, 1, 2), 'DESCONOCIDO', ('', None), acumulado)
+
+        self.assertEqual(acumulado, {})
+
+    def test_estado_inicial_cubre_hasta_el_primer_evento(self):
+        acumulado = _acumulado()
+        inicio, ahora = _local(2026, 3, 1), _local(2026, 3, 20)
+
+        _intervalos_camion([_local(2026, 3, 10)], ['EN_MANTENCION'], inicio, ahora, 'OPERATIVO', ('CULLEN', 1), acumulado)
+
+        segundos = acumulado[(date(2026, 3, 1), 'CULLEN', 1)]
+        self.assertEqual(segundos['segundos_operativo'], 9 * DIA)
+        self.assertEqual(segundos['segundos_en_mantencion'], 10 * DIA)
+        self.assertEqual(segundos['camiones'], 1)
+
+    def test_sin_estado_inicial_no_cuenta_el_tiempo_previo(self):
+        acumulado = _acumulado()
+        inicio, ahora = _local(2026, 3, 1), _local(2026, 3, 20)
+
+        _intervalos_camion([_local(2026, 3, 10)], ['EN_MANTENCION'], inicio, ahora, None, ('CULLEN', 1), acumulado)
+
+        segundos = acumulado[(date(2026, 3, 1), 'CULLEN', 1)]
+        self.assertNotIn('segundos_operativo', segundos)
+        self.assertEqual(segundos['segundos_en_mantencion'], 10 * DIA)
+
+    def test_camion_cuenta_una_vez_por_mes(self):
+        acumulado = _acumulado()
+        tiempos = [_local(2026, 1, 5), _local(2026, 1, 20), _local(2026, 2, 3)]
+
+        _intervalos_camion(
+            tiempos, ['OPERATIVO', 'NO_OPERATIVO', 'OPERATIVO'], _local(2026, 1, 1), _local(2026, 2, 10),
+            None, ('CULLEN', 1), acumulado,
+        )
+
+        self.assertEqual(acumulado[(date(2026, 1, 1), 'CULLEN', 1)]['camiones'], 1)
+        self.assertEqual(acumulado[(date(2026, 2, 1), 'CULLEN', 1)]['camiones'], 1)
+
+
+class CalcularDisponibilidadTests(TestCase):
+    """calcular_disponibilidad() sobre HistorialEstadoCamion: estado previo al periodo y cortes de mes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.contrato = Contrato.objects.create(nombre='ENAP')
+        cls.camion = cls._camion('ABCD12', contrato=cls.contrato)
+        # Estado actual (su propio evento de historial queda después del periodo calculado)
+        EstadoCamion.objects.create(camion=cls.camion, kilometraje=1000, estado_operativo='OPERATIVO', base_actual='CULLEN')
+        cls._evento(cls.camion, _local(2026, 1, 10), 'OPERATIVO')
+        cls._evento(cls.camion, _local(2026, 1, 31, 12), 'EN_MANTENCION')
+
+        cls.sin_cambios = cls._camion('EFGH34')
+        cls._evento(cls.sin_cambios, _local(2026, 1, 1), 'NO_OPERATIVO')
+
+        cls.sin_historial = cls._camion('IJKL56')
+
+    @staticmethod
+    def _camion(patente, contrato=None):
+        return Camion.objects.create(
+            patente=patente, tipo_camion='TRACTO', rol_operativo='TITULAR', capacidad_m3=30,
+            taller_mantencion='ZMC', fecha_creacion=timezone.now(), contrato=contrato,
+        )
+
+    @staticmethod
+    def _evento(camion, fecha, estado):
+        HistorialEstadoCamion.objects.create(camion=camion, estado_operativo=estado, fecha_evento=fecha)
+
+    def test_reparte_por_mes_desde_el_estado_previo(self):
+        acumulado = calcular_disponibilidad(_local(2026, 1, 30), _local(2026, 2, 2))
+
+        enero = acumulado[(date(2026, 1, 1), 'CULLEN', self.contrato.pk)]
+        self.assertEqual(enero['segundos_operativo'], 36 * HORA)
+        self.assertEqual(enero['segundos_en_mantencion'], 12 * HORA)
+        self.assertEqual(enero['camiones'], 1)
+        febrero = acumulado[(date(2026, 2, 1), 'CULLEN', self.contrato.pk)]
+        self.assertEqual(febrero['segundos_en_mantencion'], DIA)
+        self.assertNotIn('segundos_operativo', febrero)
+
+    def test_camion_sin_eventos_en_el_periodo_queda_en_su_estado_previo(self):
+        acumulado = calcular_disponibilidad(_local(2026, 1, 30), _local(2026, 2, 2))
+
+        self.assertEqual(acumulado[(date(2026, 1, 1), '', None)]['segundos_no_operativo'], 2 * DIA)
+        self.assertEqual(acumulado[(date(2026, 2, 1), '', None)]['segundos_no_operativo'], DIA)
+        # Sin historial no se sabe su estado: no suma camiones en ningún grupo
+        self.assertEqual(sum(s['camiones'] for s in acumulado.values()), 4)
+
+    def test_periodo_anterior_al_primer_evento_no_cuenta(self):
+        acumulado = calcular_disponibilidad(_local(2025, 12, 1), _local(2025, 12, 31))
+
+        self.assertEqual(acumulado, {})
+
+
+class TasasFallaTests(TestCase):
+    """Rollup semanal de resultados B/R/M (TasaFallaItem) y las consultas que leen de él."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.modelo = ModeloVehiculo.objects.create(nombre='Actros', marca='Mercedes-Benz')
+        cls.camion = Camion.objects.create(
+            patente='ABCD12', tipo_camion='TRACTO', rol_operativo='TITULAR', capacidad_m3=30,
+            taller_mantencion='ZMC', fecha_creacion=timezone.now(), modelo=cls.modelo,
+        )
+        categoria = CategoriaChecklist.objects.create(nombre='FRENOS', orden=1)
+        cls.frenos = ItemChecklist.objects.create(categoria=categoria, nombre='Frenos', es_critico=True)
+        cls.luces = ItemChecklist.objects.create(categoria=categoria, nombre='Luces')
+
+    def _inspeccion(self, fecha, base='CULLEN', **estados):
+        inspeccion = Inspeccion.objects.create(camion_id=self.camion.pk, km_registro=1000, responsable='Inspector', base=base)
+        Inspeccion.objects.filter(pk=inspeccion.pk).update(fecha_ingreso=fecha)
+        for nombre, estado in estados.items():
+            ResultadoItem.objects.create(inspeccion=inspeccion, item=getattr(self, nombre), estado=estado)
+        return inspeccion
+
+    def test_agrupa_por_item_modelo_base_y_semana(self):
+        # Lunes 2 y miércoles 4 de marzo caen en la misma semana; el lunes 9 en la siguiente
+        self._inspeccion(_local(2026, 3, 2, 10), frenos='M', luces='B')
+        self._inspeccion(_local(2026, 3, 4, 10), frenos='B', luces='R')
+        self._inspeccion(_local(2026, 3, 9, 10), base='GREGORIO', frenos='M')
+
+        self.assertEqual(refrescar_tasas_falla(completo=True), 2)
+
+        por_semana = {
+            (f['item_id'], f['base'], f['semana']): (f['total'], f['malos'], f['tasa_falla'])
+            for f in tasas_falla()
+        }
+        self.assertEqual(por_semana, {
+            (self.frenos.pk, 'CULLEN', date(2026, 3, 2)): (2, 1, 0.5),
+            (self.frenos.pk, 'GREGORIO', date(2026, 3, 9)): (1, 1, 1.0),
+            (self.luces.pk, 'CULLEN', date(2026, 3, 2)): (2, 0, 0),
+        })
+        [frenos] = tasas_falla(item=self.frenos.pk, agrupar=('item',))
+        self.assertEqual((frenos['total'], frenos['malos'], frenos['tasa_falla']), (3, 2, 0.6667))
+        self.assertEqual([f['modelo_id'] for f in tasas_falla(agrupar=('modelo',))], [self.modelo.pk])
+
+    def test_refresco_incremental_solo_rehace_las_semanas_nuevas(self):
+        self._inspeccion(_local(2026, 3, 2, 10), frenos='M')
+        refrescar_tasas_falla(completo=True)
+        anterior = TasaFallaItem.objects.get(semana=date(2026, 3, 2))
+
+        self._inspeccion(_local(2026, 3, 9, 10), frenos='B')
+        self.assertEqual(refrescar_tasas_falla(), 1)
+
+        self.assertEqual(TasaFallaItem.objects.get(semana=date(2026, 3, 2)).pk, anterior.pk)
+        self.assertEqual(TasaFallaItem.objects.get(semana=date(2026, 3, 9)).buenos, 1)
+        self.assertEqual(refrescar_tasas_falla(), 0)
+
+    def test_editar_un_resultado_procesado_rehace_su_semana(self):
+        inspeccion = self._inspeccion(_local(2026, 3, 2, 10), frenos='M')
+        self._inspeccion(_local(2026, 3, 9, 10), frenos='M')
+        refrescar_tasas_falla(completo=True)
+
+        resultado = inspeccion.resultados.get()
+        resultado.estado = 'B'
+        resultado.save()
+        self.assertEqual(MarcaRefresco.objects.get(nombre='tasas_falla').pendiente_desde, _local(2026, 3, 2, 10))
+
+        self.assertEqual(refrescar_tasas_falla(), 2)
+        self.assertEqual(TasaFallaItem.objects.get(semana=date(2026, 3, 2)).malos, 0)
+        self.assertIsNone(MarcaRefresco.objects.get(nombre='tasas_falla').pendiente_desde)
+
+    def test_borrar_la_unica_inspeccion_de_una_semana_la_vacia(self):
+        inspeccion = self._inspeccion(_local(2026, 3, 2, 10), frenos='M')
+        refrescar_tasas_falla(completo=True)
+
+        inspeccion.delete()
+        refrescar_tasas_falla()
+
+        self.assertFalse(TasaFallaItem.objects.exists())
+
+    def test_inspeccion_nueva_no_marca_cambios(self):
+        refrescar_tasas_falla(completo=True)
+
+        self._inspeccion(_local(2026, 3, 2, 10), frenos='M')
+
+        self.assertIsNone(MarcaRefresco.objects.get(nombre='tasas_falla').pendiente_desde)
+
+    def test_tendencia_critica_en_alza(self):
+        # 4 semanas anteriores con 1 de 10 malos y 4 recientes con 5 de 10
+        for semana in range(8):
+            lunes = _local(2026, 1, 5, 10) + timedelta(weeks=semana)
+            malos = 1 if semana < 4 else 5
+            for i in range(10):
+                self._inspeccion(lunes, frenos='M' if i < malos else 'B', luces='B')
+        refrescar_tasas_falla(completo=True)
+
+        [alerta] = tendencias_criticas(semanas=4, hasta=date(2026, 3, 2), min_resultados=20)
+
+        self.assertEqual(alerta['item_id'], self.frenos.pk)
+        self.assertEqual((alerta['tasa_anterior'], alerta['tasa_reciente']), (0.1, 0.5))
+        self.assertEqual(alerta['desde'], date(2026, 2, 2))
+
+
+class CambiosProcesadosTests(TestCase):
+    """Ediciones y borrados de eventos y emergencias ya usados por disponibilidad y confiabilidad."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.camion = Camion.objects.create(
+            patente='ABCD12', tipo_camion='TRACTO', rol_operativo='TITULAR', capacidad_m3=30,
+            taller_mantencion='ZMC', fecha_creacion=timezone.now(),
+        )
+        cls.inicio = HistorialEstadoCamion.objects.create(
+            camion=cls.camion, estado_operativo='OPERATIVO', fecha_evento=_local(2026, 1, 1),
+        )
+        cls.falla = HistorialEstadoCamion.objects.create(
+            camion=cls.camion, estado_operativo='NO_OPERATIVO', fecha_evento=_local(2026, 1, 21),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _segundos_enero(self, campo):
+        return DisponibilidadMensual.objects.filter(mes=date(2026, 1, 1)).values_list(campo, flat=True).get()
+
+    def test_evento_editado_rehace_los_meses_desde_su_fecha_anterior(self):
+        refrescar_disponibilidad(completo=True, ahora=_local(2026, 3, 1))
+        self.assertEqual(self._segundos_enero('segundos_operativo'), 20 * DIA)
+
+        self.falla.fecha_evento = _local(2026, 2, 11)
+        self.falla.save()
+        refrescar_disponibilidad(ahora=_local(2026, 3, 1))
+
+        self.assertEqual(self._segundos_enero('segundos_operativo'), 31 * DIA)
+        self.assertEqual(self._segundos_enero('segundos_no_operativo'), 0)
+
+    def test_evento_borrado_rehace_los_meses_desde_su_fecha(self):
+        refrescar_disponibilidad(completo=True, ahora=_local(2026, 3, 1))
+
+        self.falla.delete()
+        refrescar_disponibilidad(ahora=_local(2026, 3, 1))
+
+        self.assertEqual(self._segundos_enero('segundos_operativo'), 31 * DIA)
+
+    def test_confiabilidad_se_recalcula_al_borrar_una_emergencia(self):
+        primera = Mantencion.objects.create(
+            taller='ZMC', tipo_mantencion='EMERGENCIA', fecha_mantencion=date(2026, 1, 5), camion=self.camion,
+        )
+        Mantencion.objects.create(taller='ZMC', tipo_mantencion='EMERGENCIA', fecha_mantencion=date(2026, 1, 25), camion=self.camion)
+        self.assertEqual(confiabilidad()['camion'][0]['fallas'], 2)
+
+        # No es la de mayor id: sin la versión la clave de la caché no cambiaría
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.delete()
+
+        self.assertEqual(confiabilidad()['camion'][0]['fallas'], 1)
+
+    def test_confiabilidad_se_recalcula_al_editar_un_evento(self):
+        HistorialEstadoCamion.objects.create(camion=self.camion, estado_operativo='OPERATIVO', fecha_evento=_local(2026, 1, 22))
+        self.assertEqual(confiabilidad()['camion'][0]['mttr_horas'], 24)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.falla.fecha_evento = _local(2026, 1, 20)
+            self.falla.save()
+
+        self.assertEqual(confiabilidad()['camion'][0]['mttr_horas'], 48)
+
+
+class ArchivoIndicadoresTests(TestCase):
+    """Los indicadores leen también lo archivado: archivar_historial no cambia ningún resultado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        modelo = ModeloVehiculo.objects.create(nombre='Actros', marca='Mercedes-Benz')
+        cls.camion = Camion.objects.create(
+            patente='ABCD12', tipo_camion='TRACTO', rol_operativo='TITULAR', capacidad_m3=30,
+            taller_mantencion='ZMC', fecha_creacion=timezone.now(), modelo=modelo,
+        )
+        EstadoCamion.objects.create(camion=cls.camion, kilometraje=1000, estado_operativo='OPERATIVO', base_actual='CULLEN')
+        for fecha, estado in [
+            (_local(2025, 3, 5), 'OPERATIVO'), (_local(2025, 4, 10), 'NO_OPERATIVO'),
+            (_local(2025, 4, 12), 'OPERATIVO'), (_local(2026, 2, 1), 'EN_MANTENCION'),
+        ]:
+            HistorialEstadoCamion.objects.create(camion=cls.camion, estado_operativo=estado, fecha_evento=fecha)
+        categoria = CategoriaChecklist.objects.create(nombre='FRENOS', orden=1)
+        frenos = ItemChecklist.objects.create(categoria=categoria, nombre='Frenos', es_critico=True)
+        for fecha, estado in [(_local(2025, 3, 3, 10), 'M'), (_local(2025, 3, 5, 10), 'B'), (_local(2026, 3, 2, 10), 'R')]:
+            inspeccion = Inspeccion.objects.create(camion=cls.camion, km_registro=1000, responsable='Inspector', base='CULLEN')
+            Inspeccion.objects.filter(pk=inspeccion.pk).update(fecha_ingreso=fecha)
+            ResultadoItem.objects.create(inspeccion=inspeccion, item=frenos, estado=estado)
+
+    def setUp(self):
+        cache.clear()
+
+    def _archivar(self):
+        archivados = archivar(_local(2026, 1, 1))
+        self.assertEqual((archivados['INSPECCION'], archivados['HISTORIAL_CAMION']), (2, 3))
+
+    def _disponibilidad(self):
+        return sorted(DisponibilidadMensual.objects.values_list(
+            'mes', 'camiones', 'segundos_operativo', 'segundos_no_operativo', 'segundos_en_mantencion',
+        ))
+
+    def test_tasas_de_falla_iguales_despues_de_archivar(self):
+        refrescar_tasas_falla(completo=True)
+        antes = tasas_falla()
+
+        self._archivar()
+        self.assertIsNone(MarcaRefresco.objects.get(nombre='tasas_falla').pendiente_desde)
+        refrescar_tasas_falla(completo=True)
+
+        self.assertEqual(tasas_falla(), antes)
+        self.assertEqual(len(antes), 2)
+
+    def test_disponibilidad_igual_despues_de_archivar(self):
+        ahora = _local(2026, 3, 1)
+        refrescar_disponibilidad(completo=True, ahora=ahora)
+        antes = self._disponibilidad()
+
+        self._archivar()
+        self.assertIsNone(MarcaRefresco.objects.get(nombre='disponibilidad').pendiente_desde)
+        refrescar_disponibilidad(completo=True, ahora=ahora)
+
+        self.assertEqual(self._disponibilidad(), antes)
+        self.assertEqual(antes[0][0], date(2025, 3, 1))
+
+    def test_estado_previo_desde_el_archivo(self):
+        # Mayo de 2025 no tiene eventos: su estado es el del último evento (archivado) de abril
+        antes = calcular_disponibilidad(_local(2025, 5, 1), _local(2025, 6, 1))
+
+        self._archivar()
+
+        self.assertEqual(calcular_disponibilidad(_local(2025, 5, 1), _local(2025, 6, 1)), antes)
+        self.assertEqual(antes[(date(2025, 5, 1), 'CULLEN', None)]['segundos_operativo'], 31 * DIA)
+
+    def test_confiabilidad_igual_despues_de_archivar(self):
+        antes = calcular_confiabilidad(hasta=date(2025, 12, 31))
+
+        self._archivar()
+
+        self.assertEqual(calcular_confiabilidad(hasta=date(2025, 12, 31)), antes)
+        self.assertEqual(antes['camion'][0]['mttr_horas'], 48)
@@ -0,0 +1,15 @@
+"""
+indicadores/urls.py
+Rutas de las APIs de indicadores de flota.
+"""
+
+from django.urls import path
+from . import views
+
+app_name = 'indicadores'
+
+urlpatterns = [
+    path('api/fallas/', views.api_tasas_falla, name='api_tasas_falla'),
+    path('api/disponibilidad/', views.api_disponibilidad, name='api_disponibilidad'),
+    path('api/confiabilidad/', views.api_confiabilidad, name='api_confiabilidad'),
+]
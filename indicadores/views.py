@@ -0,0 +1,94 @@
+"""
+indicadores/views.py
+APIs de indicadores de flota. Leen de las tablas de resumen (ver refrescar_indicadores).
+"""
+
+from datetime import date
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from core.replica import solo_lectura
+from .confiabilidad import AGRUPACIONES as AGRUPACIONES_CONFIABILIDAD, confiabilidad
+from .disponibilidad import AGRUPACIONES as AGRUPACIONES_DISPONIBILIDAD, disponibilidad
+from .fallas import AGRUPACIONES, tasas_falla, tendencias_criticas
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if valor else None
+
+
+def _agrupar(request, validas, por_defecto):
+    agrupar = [a for a in request.GET.get('agrupar', por_defecto).split(',') if a]
+    invalidas = set(agrupar) - set(validas)
+    if invalidas:
+        raise ValueError(f"Agrupación desconocida: {', '.join(sorted(invalidas))}")
+    return agrupar
+
+
+@login_required
+@require_http_methods(["GET"])
+@solo_lectura
+def api_tasas_falla(request):
+    """
+    Tasas de falla/regular de los ítems del checklist.
+    Parámetros GET: desde, hasta (AAAA-MM-DD), base, modelo, item y
+    agrupar (lista separada por comas de item, modelo, base, semana; por defecto las cuatro).
+    Incluye las alertas de ítems críticos con tendencia al alza.
+    """
+    try:
+        agrupar = _agrupar(request, AGRUPACIONES, 'item,modelo,base,semana')
+        filas = tasas_falla(
+            desde=_fecha(request.GET.get('desde')),
+            hasta=_fecha(request.GET.get('hasta')),
+            base=request.GET.get('base') or None,
+            modelo=request.GET.get('modelo') or None,
+            item=request.GET.get('item') or None,
+            agrupar=agrupar,
+        )
+        return JsonResponse({
+            'success': True,
+            'filas': filas,
+            'alertas': tendencias_criticas(),
+        })
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["GET"])
+@solo_lectura
+def api_disponibilidad(request):
+    """
+    Porcentaje del tiempo en cada estado operativo (pct_operativo = disponibilidad).
+    Parámetros GET: desde, hasta (AAAA-MM-DD, se toma el mes), base, contrato y
+    agrupar (lista separada por comas de mes, base, contrato; por defecto las tres).
+    """
+    try:
+        filas = disponibilidad(
+            desde=_fecha(request.GET.get('desde')),
+            hasta=_fecha(request.GET.get('hasta')),
+            base=request.GET.get('base') or None,
+            contrato=request.GET.get('contrato') or None,
+            agrupar=_agrupar(request, AGRUPACIONES_DISPONIBILIDAD, 'mes,base,contrato'),
+        )
+        return JsonResponse({'success': True, 'filas': filas})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["GET"])
+@solo_lectura
+def api_confiabilidad(request):
+    """
+    MTBF (km y días entre emergencias) y MTTR (horas hasta volver a OPERATIVO).
+    Parámetros GET: desde, hasta (AAAA-MM-DD) y agrupar: camion, modelo o tipo_operacion (por defecto modelo).
+    """
+    try:
+        agrupar = request.GET.get('agrupar', 'modelo')
+        if agrupar not in AGRUPACIONES_CONFIABILIDAD:
+            raise ValueError(f"Agrupación desconocida: {agrupar}")
+        resultado = confiabilidad(desde=_fecha(request.GET.get('desde')), hasta=_fecha(request.GET.get('hasta')))
+        return JsonResponse({'success': True, 'generado': resultado['generado'], 'filas': resultado[agrupar]})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
@@ -4,9 +4,11 @@ Configuración del panel de administración para inspecciones, categorías, item
 """
 
 from django.contrib import admin
+from core.admin import ArchivadoAdminMixin
 from .models import (
     Inspeccion, CategoriaChecklist, ItemChecklist, 
-    ResultadoItem, RegistroLubricantes,RegistroDiario,CronogramaPlan,Componente, Repuesto, KitComponente, InsumoUtilizado
+    ResultadoItem, RegistroLubricantes,RegistroDiario,CronogramaPlan,Componente, Repuesto, KitComponente, InsumoUtilizado,
+    DestinatarioNotificacion, NotificacionPendiente
 )
 
 # Esto permite editar los ítems directamente dentro de la categoría
@@ -32,14 +34,16 @@ class RegistroLubricantesInline(admin.TabularInline):
     extra = 1
 
 @admin.register(Inspeccion)
-class InspeccionAdmin(admin.ModelAdmin):
+class InspeccionAdmin(ArchivadoAdminMixin, admin.ModelAdmin):
     # Usamos los nombres reales de tu modelo
+    tabla_archivo = 'INSPECCION'
     list_display = ('id_inspeccion', 'camion', 'km_registro', 'tipo_inspeccion', 'es_apto_operar')
     list_filter = ('tipo_inspeccion', 'es_apto_operar', 'camion')
     search_fields = ('camion__patente',)
 
 @admin.register(RegistroDiario)
-class RegistroDiarioAdmin(admin.ModelAdmin):
+class RegistroDiarioAdmin(ArchivadoAdminMixin, admin.ModelAdmin):
+    tabla_archivo = 'REGISTRO_DIARIO'
     list_display = ('vehiculo', 'fecha', 'km_actual', 'revisado_por', 'es_apto')
     list_filter = ('es_apto', 'fecha')
 
@@ -81,4 +85,18 @@ class KitComponenteAdmin(admin.ModelAdmin):
 class InsumoUtilizadoAdmin(admin.ModelAdmin):
     list_display = ('inspeccion', 'repuesto', 'cantidad_usada')
     list_filter = ('repuesto__tipo',)
-    date_hierarchy = 'inspeccion__fecha_ingreso'
\ No newline at end of file
+    date_hierarchy = 'inspeccion__fecha_ingreso'
+
+
+@admin.register(DestinatarioNotificacion)
+class DestinatarioNotificacionAdmin(admin.ModelAdmin):
+    list_display = ('correo', 'nombre', 'base', 'contrato', 'modo', 'intervalo_minutos', 'adjuntar_zip', 'activo', 'ultimo_resumen')
+    list_filter = ('modo', 'base', 'contrato', 'activo')
+    search_fields = ('correo', 'nombre')
+
+@admin.register(NotificacionPendiente)
+class NotificacionPendienteAdmin(admin.ModelAdmin):
+    list_display = ('destinatario', 'inspeccion', 'creado', 'enviado')
+    list_filter = ('enviado',)
+    list_select_related = ('destinatario', 'inspeccion__camion')
+    raw_id_fields = ('inspeccion',)
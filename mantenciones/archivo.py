@@ -0,0 +1,164 @@
+"""
+mantenciones/archivo.py
+Archivo en frío del historial antiguo: inspecciones (con sus resultados, lubricantes e insumos), registros
+diarios e historial de estados de camión anteriores a la retención se mueven a core.ArchivoHistorico
+(un registro comprimido por tabla, camión y mes) y se borran de las tablas vivas.
+Cada camión/mes se archiva en su propia transacción: si el proceso se corta, se retoma donde quedó.
+
+No se archiva:
+- El último evento de historial de cada camión (los indicadores lo usan como estado inicial).
+- Inspecciones con reporte o notificación pendiente.
+
+Los indicadores leen también lo archivado (indicadores/fuentes.py): archivar no cambia sus resultados, y los
+borrados hechos al archivar no marcan los rollups para rehacer (ver archivando()).
+"""
+
+from contextvars import ContextVar
+from datetime import datetime
+from django.db import transaction
+from django.db.models import DateField, Exists, OuterRef, Subquery
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from core.models import ArchivoHistorico, HistorialEstadoCamion
+from .models import Inspeccion, InsumoUtilizado, NotificacionPendiente, RegistroDiario, RegistroLubricantes, ResultadoItem
+
+# Relaciones de la inspección que se archivan junto con ella (related_name -> modelo)
+RELACIONES_INSPECCION = {
+    'resultados': ResultadoItem,
+    'lubricantes': RegistroLubricantes,
+    'insumos_usados': InsumoUtilizado,
+}
+
+
+def _archivables_inspeccion():
+    pendientes = NotificacionPendiente.objects.filter(inspeccion=OuterRef('pk'), enviado__isnull=True)
+    return Inspeccion.objects.filter(reporte_pendiente=False).exclude(Exists(pendientes))
+
+
+def _archivables_historial():
+    ultimo = (
+        HistorialEstadoCamion.objects.filter(camion_id=OuterRef('camion_id'))
+        .order_by('-fecha_evento', '-pk').values('pk')[:1]
+    )
+    return HistorialEstadoCamion.objects.exclude(pk=Subquery(ultimo))
+
+
+_archivando = ContextVar('archivando', default=False)
+
+
+def archivando():
+    """True mientras archivar() borra filas que ya copió a ArchivoHistorico (se movieron, no se eliminaron)."""
+    return _archivando.get()
+
+
+# tabla de ArchivoHistorico -> (queryset de filas archivables, campo de fecha, campo del camión)
+TABLAS = {
+    'INSPECCION': (_archivables_inspeccion, 'fecha_ingreso', 'camion_id'),
+    'REGISTRO_DIARIO': (RegistroDiario.objects.all, 'fecha', 'vehiculo_id'),
+    'HISTORIAL_CAMION': (_archivables_historial, 'fecha_evento', 'camion_id'),
+}
+
+
+def _campos(modelo):
+    return [campo.attname for campo in modelo._meta.concrete_fields]
+
+
+def _filas(modelo, qs):
+    """values() de todos los campos concretos, con la pk repetida en 'pk' (ArchivoHistorico ordena por ella)."""
+    campos = _campos(modelo)
+    pk = modelo._meta.pk.attname
+    return [{**fila, 'pk': fila[pk]} for fila in qs.values(*campos)]
+
+
+def _con_relaciones(filas):
+    """Agrega a cada inspección sus filas relacionadas (una consulta por relación)."""
+    por_id = {fila['pk']: fila for fila in filas}
+    for fila in filas:
+        for relacion in RELACIONES_INSPECCION:
+            fila[relacion] = []
+    for relacion, modelo in RELACIONES_INSPECCION.items():
+        for hija in modelo.objects.filter(inspeccion_id__in=list(por_id)).order_by('pk').values(*_campos(modelo)):
+            por_id[hija['inspeccion_id']][relacion].append(hija)
+    return filas
+
+
+def _archivar_mes(tabla, qs, campo_fecha, campo_camion, camion_id, mes):
+    modelo = qs.model
+    siguiente = mes.replace(year=mes.year + 1, month=1) if mes.month == 12 else mes.replace(month=mes.month + 1)
+    with transaction.atomic():
+        del_mes = qs.filter(**{
+            campo_camion: camion_id,
+            f'{campo_fecha}__gte': timezone.make_aware(datetime(mes.year, mes.month, 1)),
+            f'{campo_fecha}__lt': timezone.make_aware(datetime(siguiente.year, siguiente.month, 1)),
+        })
+        # Bloqueo para que no se agreguen hijos a una inspección mientras se copia
+        ids = list(del_mes.select_for_update().values_list('pk', flat=True))
+        filas = _filas(modelo, modelo.objects.filter(pk__in=ids).order_by('pk'))
+        if not filas:
+            return 0
+        if tabla == 'INSPECCION':
+            _con_relaciones(filas)
+        archivo = (
+            ArchivoHistorico.objects.select_for_update()
+            .filter(tabla=tabla, camion_id=camion_id, mes=mes).first()
+        ) or ArchivoHistorico(tabla=tabla, camion_id=camion_id, mes=mes)
+        archivo.agregar(filas)
+        archivo.save()
+        # Los hijos se borran por CASCADE
+        marca = _archivando.set(True)
+        try:
+            modelo.objects.filter(pk__in=ids).delete()
+        finally:
+            _archivando.reset(marca)
+    return len(filas)
+
+
+def archivar(antes_de, tablas=None, simular=False):
+    """
+    Archiva las filas con fecha anterior a 'antes_de' (datetime aware) de 'tablas' (por defecto todas).
+    Con 'simular' solo cuenta. Retorna {tabla: filas archivadas (o archivables)}.
+    """
+    resultado = {}
+    for tabla in tablas or TABLAS:
+        queryset, campo_fecha, campo_camion = TABLAS[tabla]
+        qs = queryset().filter(**{f'{campo_fecha}__lt': antes_de})
+        if simular:
+            resultado[tabla] = qs.count()
+            continue
+        grupos = (
+            qs.annotate(mes=TruncMonth(campo_fecha, output_field=DateField()))
+            .values_list(campo_camion, 'mes').order_by(campo_camion, 'mes').distinct()
+        )
+        resultado[tabla] = sum(
+            _archivar_mes(tabla, qs, campo_fecha, campo_camion, camion_id, mes)
+            for camion_id, mes in list(grupos)
+        )
+    return resultado
+
+
+def _queryset_cargado(modelo, instancias):
+    """QuerySet ya evaluado con 'instancias', como lo deja prefetch_related."""
+    qs = modelo.objects.none()
+    qs._result_cache = instancias
+    qs._prefetch_done = True
+    return qs
+
+
+def inspeccion_archivada(pk):
+    """
+    La inspección 'pk' reconstruida desde el archivo (sin guardar, con 'archivada' = True), o None.
+    Sus resultados, lubricantes e insumos quedan precargados: inspeccion.resultados.all() no consulta la BD.
+    """
+    for archivo in ArchivoHistorico.objects.con_id('INSPECCION', pk):
+        for fila in archivo.leer():
+            if fila['pk'] != pk:
+                continue
+            inspeccion = ArchivoHistorico.a_instancia(Inspeccion, fila)
+            inspeccion._prefetched_objects_cache = {
+                relacion: _queryset_cargado(modelo, [
+                    ArchivoHistorico.a_instancia(modelo, hija) for hija in fila.get(relacion, [])
+                ])
+                for relacion, modelo in RELACIONES_INSPECCION.items()
+            }
+            return inspeccion
+    return None
@@ -0,0 +1,332 @@
+"""
+mantenciones/exportaciones.py
+Exportación a CSV o XLSX del historial: mantenciones (con sus documentos), inspecciones (una fila por ítem
+del checklist) y documentación general. Filtros: rango de fechas, base, contrato y unidad (patente).
+Las filas se leen con iterator(chunk_size=...) (cursor del lado del servidor en PostgreSQL) y se escriben
+una a una, así una exportación de varios años no se carga completa en memoria. El XLSX se arma aquí mismo
+(una hoja con celdas inline, sin estilos) dentro de un zip que se escribe sin seek: trozos_xlsx() entrega los
+bytes comprimidos a medida que se leen las filas, igual que el CSV.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape, quoteattr
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from core.models import DocumentacionGeneral, Mantencion
+from .models import Inspeccion, ResultadoItem
+
+TAMANO_CURSOR = 2000
+
+# Excel en configuración regional es-CL usa ';' como separador de listas
+DELIMITADOR = ';'
+
+# Filas del XLSX entre cada entrega de bytes al cliente
+FILAS_POR_TROZO = 500
+
+# Caracteres de control (pegados desde otros sistemas) que XML no admite: dejan el archivo ilegible para Excel
+_ILEGALES_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_HOJA = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_RELACIONES = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_NS_DOCUMENTO = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_PARTES_XLSX = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        f'<Relationships xmlns="{_NS_RELACIONES}">'
+        f'<Relationship Id="rId1" Type="{_NS_DOCUMENTO}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        f'<Relationships xmlns="{_NS_RELACIONES}">'
+        f'<Relationship Id="rId1" Type="{_NS_DOCUMENTO}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_NS_DOCUMENTO}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{_NS_HOJA}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="1"><xf xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: retorna la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _fecha_hora(valor):
+    return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M') if valor else ''
+
+
+def _filtro_contrato(campo, contrato):
+    """'contrato' puede ser el ID o el nombre (igual que en regenerar_reportes)."""
+    contrato = str(contrato)
+    if contrato.isdigit():
+        return Q(**{f'{campo}_id': int(contrato)})
+    return Q(**{f'{campo}__nombre__iexact': contrato})
+
+
+def _filtro_unidad(unidad):
+    unidad = unidad.upper()
+    return Q(camion__patente=unidad) | Q(remolque__patente=unidad)
+
+
+def _rango_fecha_hora(campo, desde, hasta):
+    """Filtro por días locales sobre un DateTimeField, sin __date para no anular el índice."""
+    filtro = Q()
+    if desde:
+        filtro &= Q(**{f'{campo}__gte': timezone.make_aware(datetime.combine(desde, time.min))})
+    if hasta:
+        filtro &= Q(**{f'{campo}__lt': timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))})
+    return filtro
+
+
+def filas_mantenciones(desde=None, hasta=None, base=None, contrato=None, unidad=None):
+    yield [
+        'ID', 'Tipo', 'Fecha', 'Camión', 'Remolque', 'Contrato', 'Base', 'Taller', 'KM',
+        'KM Próxima', 'Observaciones', 'Documentos',
+    ]
+    qs = Mantencion.objects.all()
+    if desde:
+        qs = qs.filter(fecha_mantencion__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_mantencion__lte=hasta)
+    if base:
+        qs = qs.filter(Q(camion__estado_actual__base_actual=base) | Q(remolque__estado_actual__base_actual=base))
+    if contrato:
+        qs = qs.filter(_filtro_contrato('camion__contrato', contrato))
+    if unidad:
+        qs = qs.filter(_filtro_unidad(unidad))
+
+    qs = (
+        qs.select_related('camion__contrato', 'camion__estado_actual', 'remolque__estado_actual')
+        .prefetch_related('documentos')
+        .order_by('fecha_mantencion', 'id_mantencion')
+    )
+    for m in qs.iterator(chunk_size=TAMANO_CURSOR):
+        estado = getattr(m.camion, 'estado_actual', None) if m.camion else getattr(m.remolque, 'estado_actual', None)
+        yield [
+            m.pk, m.tipo_mantencion, m.fecha_mantencion.isoformat(),
+            m.camion.patente if m.camion else '', m.remolque.patente if m.remolque else '',
+            m.camion.contrato.nombre if m.camion and m.camion.contrato else '',
+            (estado.base_actual or '') if estado else '',
+            m.taller, m.km_mantencion if m.km_mantencion is not None else '',
+            m.km_proxima_mantencion if m.km_proxima_mantencion is not None else '',
+            m.observaciones or '',
+            ' | '.join(f"{d.nombre_archivo} ({d.ruta_archivo})" for d in m.documentos.all()),
+        ]
+
+
+def filas_inspecciones(desde=None, hasta=None, base=None, contrato=None, unidad=None):
+    """Una fila por resultado del checklist; las inspecciones sin resultados salen en una fila sin ítem."""
+    yield [
+        'ID Inspección', 'Tipo', 'Fecha Ingreso', 'Camión', 'Remolque', 'Contrato', 'Base', 'KM',
+        'Responsable', 'Apto', 'Renovó Aceite', 'Observaciones', 'Categoría', 'Ítem', 'Crítico', 'Estado',
+        'Observación Ítem',
+    ]
+    qs = Inspeccion.objects.filter(_rango_fecha_hora('fecha_ingreso', desde, hasta))
+    if base:
+        qs = qs.filter(base=base)
+    if contrato:
+        qs = qs.filter(_filtro_contrato('camion__contrato', contrato))
+    if unidad:
+        qs = qs.filter(_filtro_unidad(unidad))
+
+    qs = (
+        qs.select_related('camion__contrato', 'remolque')
+        .prefetch_related(Prefetch(
+            'resultados', queryset=ResultadoItem.objects.select_related('item__categoria').order_by('pk'),
+        ))
+        .order_by('fecha_ingreso', 'pk')
+    )
+    for insp in qs.iterator(chunk_size=TAMANO_CURSOR):
+        comunes = [
+            insp.pk, insp.tipo_inspeccion, _fecha_hora(insp.fecha_ingreso), insp.camion.patente,
+            insp.remolque.patente if insp.remolque else '',
+            insp.camion.contrato.nombre if insp.camion.contrato else '',
+            insp.base or '', insp.km_registro, insp.responsable,
+            'SI' if insp.es_apto_operar else 'NO', 'SI' if insp.renovó_aceite else 'NO', insp.observaciones or '',
+        ]
+        resultados = insp.resultados.all()
+        if not resultados:
+            yield comunes + [''] * 5
+        for r in resultados:
+            yield comunes + [
+                r.item.categoria.nombre, r.item.nombre, 'SI' if r.item.es_critico else 'NO',
+                r.estado, r.observacion or '',
+            ]
+
+
+def filas_documentos(desde=None, hasta=None, base=None, contrato=None, unidad=None):
+    """Documentación general; el rango de fechas se aplica al vencimiento."""
+    yield ['ID', 'Entidad', 'Camión', 'Remolque', 'Conductor', 'Contrato', 'Categoría', 'Vencimiento', 'Estado', 'Archivo']
+    qs = DocumentacionGeneral.objects.all()
+    if desde:
+        qs = qs.filter(fecha_vencimiento__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_vencimiento__lte=hasta)
+    if base:
+        qs = qs.filter(Q(camion__estado_actual__base_actual=base) | Q(remolque__estado_actual__base_actual=base))
+    if contrato:
+        qs = qs.filter(_filtro_contrato('camion__contrato', contrato))
+    if unidad:
+        qs = qs.filter(_filtro_unidad(unidad))
+
+    qs = qs.select_related('camion__contrato', 'remolque', 'conductor').order_by('fecha_vencimiento', 'pk')
+    for doc in qs.iterator(chunk_size=TAMANO_CURSOR):
+        yield [
+            doc.pk, doc.tipo_entidad,
+            doc.camion.patente if doc.camion else '', doc.remolque.patente if doc.remolque else '',
+            doc.conductor.nombre if doc.conductor else '',
+            doc.camion.contrato.nombre if doc.camion and doc.camion.contrato else '',
+            doc.get_categoria_display(),
+            doc.fecha_vencimiento.isoformat() if doc.fecha_vencimiento else '',
+            doc.estado, doc.archivo.name if doc.archivo else (doc.url_drive or ''),
+        ]
+
+
+EXPORTACIONES = {
+    'mantenciones': filas_mantenciones,
+    'inspecciones': filas_inspecciones,
+    'documentos': filas_documentos,
+}
+
+# Permiso que pide la descarga desde la web de cada exportación (el comando no lo pide)
+PERMISOS_EXPORTACION = {
+    'mantenciones': 'core.view_mantencion',
+    'inspecciones': 'mantenciones.view_inspeccion',
+    'documentos': 'core.view_documentaciongeneral',
+}
+
+
+def lineas_csv(tipo, **filtros):
+    """
+    Genera el CSV de 'tipo' línea a línea (str). La primera lleva el BOM para que Excel reconozca UTF-8.
+    Lanza KeyError si el tipo no existe.
+    """
+    filas = EXPORTACIONES[tipo](**filtros)
+    escritor = csv.writer(_Eco(), delimiter=DELIMITADOR)
+    yield '\ufeff'
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+class _Trozos:
+    """Destino del zip sin seek: guarda lo escrito hasta que trozos_xlsx() lo entrega."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _columna(indice):
+    """Letra de la columna (0 -> A, 26 -> AA)."""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def _fila_xml(numero, valores):
+    celdas = []
+    for i, valor in enumerate(valores):
+        ref = f'{_columna(i)}{numero}'
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            celdas.append(f'<c r="{ref}"><v>{valor}</v></c>')
+        elif valor is not None and valor != '':
+            texto = escape(_ILEGALES_XML.sub('', str(valor)))
+            celdas.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>')
+    return f'<row r="{numero}">{"".join(celdas)}</row>'
+
+
+def _trozos_xlsx(nombre_hoja, filas):
+    salida = _Trozos()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _PARTES_XLSX.items():
+            libro.writestr(nombre, _XML + contenido)
+        libro.writestr('xl/workbook.xml', (
+            f'{_XML}<workbook xmlns="{_NS_HOJA}" xmlns:r="{_NS_DOCUMENTO}"><sheets>'
+            f'<sheet name={quoteattr(nombre_hoja[:31])} sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield salida.vaciar()
+        # Tamaño desconocido de antemano: zip64 para no fallar con exportaciones de más de 4 GB
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(f'{_XML}<worksheet xmlns="{_NS_HOJA}"><sheetData>'.encode())
+            for numero, fila in enumerate(filas, start=1):
+                hoja.write(_fila_xml(numero, fila).encode())
+                if numero % FILAS_POR_TROZO == 0:
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+            hoja.write(b'</sheetData></worksheet>')
+    yield salida.vaciar()
+
+
+def trozos_xlsx(tipo, **filtros):
+    """
+    Genera el XLSX de 'tipo' en trozos de bytes (para StreamingHttpResponse): el primero sale antes de leer
+    las filas y los siguientes cada FILAS_POR_TROZO filas. Lanza KeyError si el tipo no existe.
+    """
+    return _trozos_xlsx(tipo, EXPORTACIONES[tipo](**filtros))
+
+
+def escribir_xlsx(tipo, destino, **filtros):
+    """
+    Escribe el XLSX de 'tipo' en la ruta 'destino' y retorna las filas de datos escritas, sin el encabezado.
+    Lanza KeyError si el tipo no existe.
+    """
+    filas = EXPORTACIONES[tipo](**filtros)
+    escritas = -1
+
+    def contadas():
+        nonlocal escritas
+        for fila in filas:
+            escritas += 1
+            yield fila
+
+    with open(destino, 'wb') as archivo:
+        for trozo in _trozos_xlsx(tipo, contadas()):
+            archivo.write(trozo)
+    return escritas
@@ -3,6 +3,7 @@ mantenciones/forms.py
 Formularios para crear inspecciones con validación de kilometraje y filtrado de categorías.
 """
 
+import uuid
 from django import forms
 from .models import Inspeccion, ResultadoItem, RegistroDiario
 from django.core.exceptions import ObjectDoesNotExist
@@ -22,6 +23,10 @@ class InspeccionForm(forms.ModelForm):
         ('ST1', 'Servicio Allison ST1 (Transmisión)'),
     ]
 
+    # Se genera al abrir el formulario y viaja oculto: si el técnico reenvía (se cortó la conexión
+    # antes de la respuesta) la vista reconoce la clave y no vuelve a registrar la inspección
+    clave_idempotencia = forms.UUIDField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = Inspeccion
         fields = ['tipo_inspeccion', 'camion', 'remolque', 'km_registro', 'responsable', 'es_apto_operar', 'observaciones']        
@@ -101,4 +106,6 @@ class InspeccionForm(forms.ModelForm):
         # Remolque no es requerido y se auto-llena
         self.fields['tipo_inspeccion'].choices = self.OPCIONES_SERVICIO
         self.fields['remolque'].required = False
-        self.fields['remolque'].disabled = True
\ No newline at end of file
+        self.fields['remolque'].disabled = True
+        if not self.is_bound:
+            self.initial.setdefault('clave_idempotencia', uuid.uuid4())
\ No newline at end of file
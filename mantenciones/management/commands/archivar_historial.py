@@ -0,0 +1,38 @@
+"""
+mantenciones/management/commands/archivar_historial.py
+Mueve a ArchivoHistorico (core) las inspecciones, registros diarios e historial de estados más antiguos que la
+retención (settings.ARCHIVO_RETENCION_MESES), por meses completos. Ver mantenciones/archivo.py.
+
+Los indicadores (también 'refrescar_indicadores --completo') leen las filas archivadas: archivar no los cambia.
+
+Ejemplo (crontab, el día 1 de cada mes):
+    30 3 1 * * cd /app && python manage.py archivar_historial
+"""
+
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from mantenciones.archivo import TABLAS, archivar
+
+
+class Command(BaseCommand):
+    help = 'Archiva en frío el historial antiguo de inspecciones, registros diarios y estados de camión'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=settings.ARCHIVO_RETENCION_MESES,
+            help='Meses completos que se mantienen en las tablas vivas',
+        )
+        parser.add_argument('--tabla', choices=sorted(TABLAS), action='append', help='Solo esta tabla (repetible)')
+        parser.add_argument('--simular', action='store_true', help='Solo cuenta las filas que se archivarían')
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        meses = hoy.year * 12 + hoy.month - 1 - options['meses']
+        corte = timezone.make_aware(datetime(meses // 12, meses % 12 + 1, 1))
+
+        resultado = archivar(corte, tablas=options['tabla'], simular=options['simular'])
+        accion = 'archivables' if options['simular'] else 'archivadas'
+        for tabla, filas in resultado.items():
+            self.stdout.write(self.style.SUCCESS(f"🗄️ {tabla}: {filas} filas {accion} (anteriores a {corte:%Y-%m-%d})."))
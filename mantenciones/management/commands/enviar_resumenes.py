@@ -0,0 +1,25 @@
+"""
+mantenciones/management/commands/enviar_resumenes.py
+Envía los resúmenes de inspecciones en cola (destinatarios en modo RESUMEN).
+Pensado para correr desde cron cada pocos minutos; cada destinatario recibe a lo más un correo por su intervalo.
+
+Ejemplo (crontab):
+    */10 * * * * cd /app && python manage.py enviar_resumenes
+"""
+
+from django.core.management.base import BaseCommand
+from mantenciones.notificaciones import enviar_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Envía por correo los resúmenes de inspecciones pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help='Envía ahora aunque no se cumpla el intervalo')
+
+    def handle(self, *args, **options):
+        correos, inspecciones = enviar_resumenes(forzar=options['forzar'])
+        if not correos:
+            self.stdout.write(self.style.SUCCESS("✅ No hay resúmenes pendientes."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"📧 {correos} correos enviados con {inspecciones} inspecciones."))
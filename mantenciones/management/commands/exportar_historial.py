@@ -0,0 +1,57 @@
+"""
+mantenciones/management/commands/exportar_historial.py
+Exporta a CSV o XLSX el historial de mantenciones, inspecciones o documentación general, escribiendo fila
+a fila (memoria constante aunque sean varios años).
+
+Ejemplos:
+    python manage.py exportar_historial inspecciones --desde 2024-01-01 --contrato ENAP --salida insp.csv
+    python manage.py exportar_historial mantenciones --base CULLEN --formato xlsx --salida mant.xlsx
+"""
+
+import sys
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from mantenciones.exportaciones import EXPORTACIONES, escribir_xlsx, lineas_csv
+
+
+class Command(BaseCommand):
+    help = 'Exporta a CSV o XLSX mantenciones, inspecciones o documentos filtrados por fecha, base, contrato o unidad'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(EXPORTACIONES))
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--base', help='Base (ej: CULLEN)')
+        parser.add_argument('--contrato', help='ID o nombre del contrato')
+        parser.add_argument('--unidad', help='Patente del camión o remolque')
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv', help='Formato (por defecto csv)')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto la salida estándar; obligatorio en xlsx)')
+
+    def handle(self, *args, **options):
+        filtros = {
+            'desde': options['desde'],
+            'hasta': options['hasta'],
+            'base': options['base'].upper() if options['base'] else None,
+            'contrato': options['contrato'],
+            'unidad': options['unidad'],
+        }
+        if options['formato'] == 'xlsx':
+            if not options['salida']:
+                raise CommandError("El formato xlsx requiere --salida.")
+            escritas = escribir_xlsx(options['tipo'], options['salida'], **filtros)
+            self.stdout.write(self.style.SUCCESS(f"📤 {escritas} filas exportadas a {options['salida']}"))
+            return
+
+        lineas = lineas_csv(options['tipo'], **filtros)
+        if not options['salida']:
+            for linea in lineas:
+                sys.stdout.write(linea)
+            return
+
+        escritas = 0
+        with open(options['salida'], 'w', encoding='utf-8', newline='') as f:
+            for linea in lineas:
+                f.write(linea)
+                escritas += 1
+        # Sin contar el BOM ni el encabezado
+        self.stdout.write(self.style.SUCCESS(f"📤 {escritas - 2} filas exportadas a {options['salida']}"))
@@ -0,0 +1,46 @@
+"""
+mantenciones/management/commands/procesar_reportes.py
+Emite el PDF, el DocumentoMantencion y el correo de las inspecciones recibidas por la sincronización offline
+(reporte_pendiente). Pensado para correr desde cron cada pocos minutos; si una falla queda pendiente para la próxima.
+Cada inspección se toma antes de emitirla (reporte_tomado, ver emitir_reporte_pendiente): si una corrida se
+superpone con la anterior, se salta las que la otra ya está emitiendo.
+
+Ejemplo (crontab):
+    */5 * * * * cd /app && python manage.py procesar_reportes
+"""
+
+from django.core.management.base import BaseCommand
+from mantenciones.models import Inspeccion
+from mantenciones.servicios import emitir_reporte_pendiente
+
+
+class Command(BaseCommand):
+    help = 'Genera y notifica los reportes de inspecciones sincronizadas desde terreno'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=200, help='Máximo de inspecciones por corrida')
+
+    def handle(self, *args, **options):
+        pendientes = list(
+            Inspeccion.objects.filter(reporte_pendiente=True)
+            .order_by('pk').values_list('pk', flat=True)[:options['limite']]
+        )
+        if not pendientes:
+            self.stdout.write(self.style.SUCCESS("✅ No hay reportes pendientes."))
+            return
+
+        emitidos = errores = 0
+        for inspeccion_id in pendientes:
+            try:
+                if emitir_reporte_pendiente(inspeccion_id):
+                    emitidos += 1
+            except Exception as e:
+                errores += 1
+                self.stderr.write(self.style.ERROR(f"❌ Error en la inspección {inspeccion_id}: {e}"))
+
+        omitidos = len(pendientes) - emitidos - errores
+        resumen = f"{emitidos} reportes emitidos" + (f", {omitidos} tomados por otro proceso" if omitidos else "")
+        if errores:
+            self.stdout.write(self.style.WARNING(f"⚠️ {resumen}, {errores} con error."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"📄 {resumen}."))
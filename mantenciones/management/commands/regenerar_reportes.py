@@ -0,0 +1,190 @@
+"""
+mantenciones/management/commands/regenerar_reportes.py
+Vuelve a emitir los PDF de inspecciones ya registradas (ej: cambió la plantilla ENAP o el logo de un contrato).
+Los datos se leen en bloque desde el proceso principal y el render se reparte en un pool de procesos;
+cada worker mantiene su propio contexto de render (estilos y logos cargados una sola vez).
+El avance queda en un archivo JSON: si se corta, volver a correr el mismo comando continúa donde quedó.
+
+Ejemplo:
+    python manage.py regenerar_reportes --desde 2026-01-01 --hasta 2026-01-31 --contrato ENAP --procesos 4
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from django.urls import reverse
+from core.models import DocumentoMantencion
+from mantenciones.models import Inspeccion, ResultadoItem
+from mantenciones.render_pdf import inicializar_proceso_render
+from mantenciones.utils import (
+    obtener_datos_camion_autocompletado, datos_reporte_inspeccion, generar_reporte_inspeccion,
+    nombre_documento_reporte, prefetch_informe_tecnico, tipo_documento_reporte,
+)
+
+TAMANO_LOTE = 200
+
+
+def _renderizar(inspeccion, resultados_items, datos_autocompletado):
+    """Corre en el worker: renderiza y guarda el PDF. No toca la BD."""
+    nombre, _contenido = generar_reporte_inspeccion(inspeccion, resultados_items, datos_autocompletado)
+    return inspeccion.pk, nombre
+
+
+class Command(BaseCommand):
+    help = 'Re-genera en paralelo los PDF de inspecciones filtradas por fecha, base, contrato o camión'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha de ingreso inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha de ingreso final (AAAA-MM-DD)')
+        parser.add_argument('--base', help='Base actual del camión (ej: CULLEN)')
+        parser.add_argument('--contrato', help='ID o nombre del contrato del camión')
+        parser.add_argument('--camion', action='append', help='Patente (se puede repetir)')
+        parser.add_argument('--tipo', choices=[c for c, _ in Inspeccion.TIPO_CHOICES], help='Tipo de inspección')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1, help='Cantidad de procesos de render')
+        parser.add_argument(
+            '--progreso', default='regenerar_reportes.progreso.json',
+            help='Archivo donde se guarda el avance (para reanudar)',
+        )
+        parser.add_argument('--reiniciar', action='store_true', help='Ignora el avance guardado y parte de cero')
+
+    def handle(self, *args, **options):
+        qs = self._filtrar(options)
+        filtros = {k: str(options[k]) if options[k] is not None else None
+                   for k in ('desde', 'hasta', 'base', 'contrato', 'camion', 'tipo')}
+
+        hechas = self._leer_progreso(options['progreso'], filtros, options['reiniciar'])
+        pendientes = [pk for pk in qs.order_by('pk').values_list('pk', flat=True) if pk not in hechas]
+        if not pendientes:
+            self.stdout.write(self.style.SUCCESS("✅ No hay reportes pendientes para esos filtros."))
+            return
+
+        self.stdout.write(f"🖨️  {len(pendientes)} reportes por generar ({len(hechas)} ya hechos) con {options['procesos']} procesos")
+
+        datos_camion = {}
+        errores = 0
+        # 'spawn': los workers no heredan la conexión a la BD del proceso principal
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=options['procesos'], mp_context=contexto, initializer=inicializar_proceso_render,
+        ) as pool:
+            for inicio in range(0, len(pendientes), TAMANO_LOTE):
+                inspecciones = self._cargar_lote(pendientes[inicio:inicio + TAMANO_LOTE])
+
+                trabajos = {}
+                for insp in inspecciones:
+                    # El autocompletado depende solo del camión: una vez por camión en toda la corrida
+                    if insp.camion_id not in datos_camion:
+                        datos_camion[insp.camion_id] = obtener_datos_camion_autocompletado(insp.camion)
+                    datos = datos_reporte_inspeccion(insp, datos_camion[insp.camion_id])
+                    trabajo = pool.submit(_renderizar, insp, list(insp.resultados.all()), datos)
+                    trabajos[trabajo] = insp.pk
+
+                generadas, fallidas = set(), set()
+                for trabajo in as_completed(trabajos):
+                    try:
+                        pk, nombre = trabajo.result()
+                    except Exception as e:
+                        errores += 1
+                        fallidas.add(trabajos[trabajo])
+                        self.stderr.write(self.style.ERROR(f"❌ Error en la inspección {trabajos[trabajo]}: {e}"))
+                        continue
+                    if nombre:
+                        generadas.add(pk)
+
+                self._registrar_documentos([i for i in inspecciones if i.pk in generadas])
+                # Las que no tienen reporte (tipo sin PDF) también cuentan como procesadas
+                hechas.update(i.pk for i in inspecciones if i.pk not in fallidas)
+                self._guardar_progreso(options['progreso'], filtros, hechas)
+                self.stdout.write(f"   📄 {min(inicio + TAMANO_LOTE, len(pendientes))}/{len(pendientes)}")
+
+        if errores:
+            self.stdout.write(self.style.WARNING(f"⚠️ Terminado con {errores} errores (no quedan marcados en el avance)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ Reportes re-generados."))
+
+    def _filtrar(self, options):
+        qs = Inspeccion.objects.all()
+        if options['desde']:
+            qs = qs.filter(fecha_ingreso__date__gte=options['desde'])
+        if options['hasta']:
+            qs = qs.filter(fecha_ingreso__date__lte=options['hasta'])
+        if options['base']:
+            qs = qs.filter(camion__estado_actual__base_actual=options['base'].upper())
+        if options['contrato']:
+            contrato = options['contrato']
+            if contrato.isdigit():
+                qs = qs.filter(camion__contrato_id=int(contrato))
+            else:
+                qs = qs.filter(camion__contrato__nombre__iexact=contrato)
+        if options['camion']:
+            qs = qs.filter(camion__patente__in=[p.upper() for p in options['camion']])
+        if options['tipo']:
+            qs = qs.filter(tipo_inspeccion=options['tipo'])
+        return qs
+
+    def _cargar_lote(self, ids):
+        """Inspecciones con todo lo que usa el render en un número fijo de consultas."""
+        inspecciones = list(
+            Inspeccion.objects.filter(pk__in=ids)
+            .select_related('camion__contrato', 'camion__modelo', 'camion__estado_actual__conductor')
+            .prefetch_related(Prefetch(
+                'resultados',
+                queryset=ResultadoItem.objects.select_related('item__categoria').order_by('pk'),
+            ))
+            .order_by('pk')
+        )
+        prefetch_informe_tecnico([i for i in inspecciones if i.tipo_inspeccion != 'DIARIO'])
+        return inspecciones
+
+    def _registrar_documentos(self, inspecciones):
+        """Apunta el DocumentoMantencion de cada mantención a la descarga del reporte (en bloque)."""
+        por_mantencion = {i.mantencion_id: i for i in inspecciones if i.mantencion_id}
+        if not por_mantencion:
+            return
+
+        existentes = {}
+        for doc in DocumentoMantencion.objects.filter(
+            mantencion_id__in=list(por_mantencion),
+            tipo_documento__in=['CHECKLIST_ENAP', 'INFORME_TECNICO'],
+        ).order_by('pk'):
+            existentes.setdefault(doc.mantencion_id, doc)
+
+        por_actualizar, por_crear = [], []
+        for mantencion_id, insp in por_mantencion.items():
+            ruta = reverse('mantenciones:descargar_reporte', args=[insp.pk])
+            doc = existentes.get(mantencion_id)
+            if doc is None:
+                por_crear.append(DocumentoMantencion(
+                    mantencion_id=mantencion_id,
+                    nombre_archivo=nombre_documento_reporte(insp),
+                    ruta_archivo=ruta,
+                    tipo_documento=tipo_documento_reporte(insp),
+                ))
+            elif doc.ruta_archivo != ruta:
+                doc.ruta_archivo = ruta
+                por_actualizar.append(doc)
+
+        DocumentoMantencion.objects.bulk_update(por_actualizar, ['ruta_archivo'])
+        DocumentoMantencion.objects.bulk_create(por_crear)
+
+    def _leer_progreso(self, ruta, filtros, reiniciar):
+        if reiniciar or not os.path.exists(ruta):
+            return set()
+        with open(ruta, 'r', encoding='utf-8') as f:
+            progreso = json.load(f)
+        if progreso.get('filtros') != filtros:
+            raise CommandError(
+                f"El avance guardado en {ruta} es de otros filtros. Usa --reiniciar o indica otro --progreso."
+            )
+        return set(progreso.get('hechas', []))
+
+    def _guardar_progreso(self, ruta, filtros, hechas):
+        # Escritura atómica: un corte a mitad no deja el archivo corrupto
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'filtros': filtros, 'hechas': sorted(hechas)}, f)
+        os.replace(temporal, ruta)
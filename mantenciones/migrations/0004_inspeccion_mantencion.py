@@ -0,0 +1,58 @@
+# Vínculo inspección -> mantención generada (para ubicar su DocumentoMantencion al re-emitir reportes).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_estadoremolque_base_actual"),
+        ("mantenciones", "0003_remove_categoriachecklist_aplica_a_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspeccion",
+            name="mantencion",
+            field=models.ForeignKey(
+                blank=True,
+                db_column="id_mantencion",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="inspecciones",
+                to="core.mantencion",
+            ),
+        ),
+        # Inspecciones existentes: crear_inspeccion crea la mantención en la misma transacción con
+        # fecha = día UTC del ingreso y observaciones "Servicio <tipo> realizado por <responsable>.".
+        # Si hay varias el mismo día se emparejan en orden de creación.
+        migrations.RunSQL(
+            sql="""
+                WITH ins AS (
+                    SELECT id_inspeccion, id_camion,
+                           (fecha_ingreso AT TIME ZONE 'UTC')::date AS dia,
+                           'Servicio ' || tipo_inspeccion || ' realizado por ' || responsable || '.' AS texto,
+                           row_number() OVER (
+                               PARTITION BY id_camion, (fecha_ingreso AT TIME ZONE 'UTC')::date,
+                                            tipo_inspeccion, responsable
+                               ORDER BY id_inspeccion
+                           ) AS n
+                    FROM mantencion_inspeccion
+                ), man AS (
+                    SELECT id_mantencion, id_camion, fecha_mantencion, observaciones,
+                           row_number() OVER (
+                               PARTITION BY id_camion, fecha_mantencion, observaciones
+                               ORDER BY id_mantencion
+                           ) AS n
+                    FROM mantenciones
+                    WHERE observaciones LIKE 'Servicio % realizado por %.'
+                )
+                UPDATE mantencion_inspeccion i SET id_mantencion = man.id_mantencion
+                FROM ins
+                JOIN man ON man.id_camion = ins.id_camion AND man.fecha_mantencion = ins.dia
+                        AND man.observaciones = ins.texto AND man.n = ins.n
+                WHERE i.id_inspeccion = ins.id_inspeccion;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
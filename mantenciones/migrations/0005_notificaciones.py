@@ -0,0 +1,100 @@
+# Destinatarios de reportes por base/contrato y cola de resúmenes.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_estado_contrato"),
+        ("mantenciones", "0004_inspeccion_mantencion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DestinatarioNotificacion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("nombre", models.CharField(blank=True, max_length=100)),
+                ("correo", models.EmailField(max_length=254)),
+                (
+                    "base",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("SOMBRERO", "Sombrero"),
+                            ("GREGORIO", "Gregorio"),
+                            ("CULLEN", "Cullen"),
+                            ("POSESION", "Posesión"),
+                            ("PUNTA_ARENAS", "Punta Arenas"),
+                        ],
+                        help_text="Vacío = todas las bases",
+                        max_length=20,
+                        null=True,
+                    ),
+                ),
+                (
+                    "modo",
+                    models.CharField(
+                        choices=[
+                            ("INMEDIATO", "Inmediato (un correo por inspección)"),
+                            ("RESUMEN", "Resumen periódico"),
+                        ],
+                        default="RESUMEN",
+                        max_length=20,
+                    ),
+                ),
+                ("intervalo_minutos", models.PositiveIntegerField(default=60, help_text="Cada cuánto se envía el resumen")),
+                ("adjuntar_zip", models.BooleanField(default=False, help_text="Enviar los PDF del resumen comprimidos en un .zip")),
+                ("activo", models.BooleanField(default=True)),
+                ("ultimo_resumen", models.DateTimeField(blank=True, editable=False, null=True)),
+                (
+                    "contrato",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Vacío = todos los contratos",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="core.contrato",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Destinatario de Notificaciones",
+                "verbose_name_plural": "Destinatarios de Notificaciones",
+            },
+        ),
+        migrations.CreateModel(
+            name="NotificacionPendiente",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("creado", models.DateTimeField(auto_now_add=True)),
+                ("enviado", models.DateTimeField(blank=True, null=True)),
+                (
+                    "destinatario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pendientes",
+                        to="mantenciones.destinatarionotificacion",
+                    ),
+                ),
+                (
+                    "inspeccion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notificaciones",
+                        to="mantenciones.inspeccion",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("enviado__isnull", True)),
+                        fields=["destinatario"],
+                        name="notif_pendiente_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Clave de idempotencia del formulario de inspección (evita duplicados por reenvío).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mantenciones", "0005_notificaciones"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspeccion",
+            name="clave_idempotencia",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Cola de reportes (PDF + correo) de las inspecciones recibidas por la sincronización offline.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mantenciones", "0006_inspeccion_clave_idempotencia"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspeccion",
+            name="reporte_pendiente",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="inspeccion",
+            index=models.Index(
+                condition=models.Q(("reporte_pendiente", True)),
+                fields=["id_inspeccion"],
+                name="insp_reporte_pendiente_idx",
+            ),
+        ),
+    ]
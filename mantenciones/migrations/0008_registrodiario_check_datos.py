@@ -0,0 +1,80 @@
+# check_datos pasa de un string JSON (json.dumps de la lista de resultados) a un mapa {item_id: estado}
+# consultable con @> sobre un índice GIN.
+# Un string que no es JSON válido no detiene la migración: ese registro queda con el checklist vacío, el texto
+# original se agrega a 'novedades' y los ids se informan al migrar.
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# Cast que retorna NULL en vez de abortar (pg_input_is_valid recién existe desde PostgreSQL 16).
+# pg_temp: vive solo en la conexión que migra.
+FUNCION_JSONB_O_NULL = """
+    CREATE OR REPLACE FUNCTION pg_temp.zmc_jsonb_o_null(texto text) RETURNS jsonb LANGUAGE plpgsql AS $$
+    BEGIN
+        RETURN texto::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END $$;
+"""
+
+# 1. Filas antiguas: '"[{\"item_id\": 12, ...}]"' -> [{"item_id": 12, ...}] (solo si el string es JSON válido)
+DESEMPAQUETAR_STRING = """
+    UPDATE mantenciones_registrodiario
+    SET check_datos = pg_temp.zmc_jsonb_o_null(check_datos #>> '{}')
+    WHERE jsonb_typeof(check_datos) = 'string'
+      AND pg_temp.zmc_jsonb_o_null(check_datos #>> '{}') IS NOT NULL;
+"""
+
+# 2. Lo que no quedó como lista ni mapa no se puede leer: checklist vacío y el texto original a novedades
+APARTAR_ILEGIBLES = """
+    UPDATE mantenciones_registrodiario
+    SET novedades = concat_ws(E'\\n', NULLIF(novedades, ''), 'Checklist original ilegible: ' || (check_datos #>> '{}')),
+        check_datos = '{}'::jsonb
+    WHERE jsonb_typeof(check_datos) NOT IN ('array', 'object')
+    RETURNING id;
+"""
+
+# 3. [{"item_id": 12, "estado": "B", ...}] -> {"12": "B"}
+LISTA_A_MAPA = """
+    UPDATE mantenciones_registrodiario r
+    SET check_datos = COALESCE((
+        SELECT jsonb_object_agg(e->>'item_id', e->>'estado')
+        FROM jsonb_array_elements(r.check_datos) AS e
+        WHERE jsonb_typeof(e) = 'object' AND e ? 'item_id' AND e ? 'estado'
+    ), '{}'::jsonb)
+    WHERE jsonb_typeof(r.check_datos) = 'array';
+"""
+
+
+def normalizar_check_datos(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FUNCION_JSONB_O_NULL)
+        cursor.execute(DESEMPAQUETAR_STRING)
+        cursor.execute(APARTAR_ILEGIBLES)
+        ilegibles = sorted(fila[0] for fila in cursor.fetchall())
+        cursor.execute(LISTA_A_MAPA)
+    if ilegibles:
+        print(
+            f"\n  ⚠️ {len(ilegibles)} registros diarios tenían un checklist ilegible: quedó vacío y el texto "
+            f"original pasó a novedades (ids: {', '.join(map(str, ilegibles))})"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mantenciones", "0007_inspeccion_reporte_pendiente"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_check_datos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="registrodiario",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["check_datos"], name="registro_check_datos_gin", opclasses=["jsonb_path_ops"]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="registrodiario",
+            index=models.Index(fields=["fecha"], name="registro_diario_fecha_idx"),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Base de la inspección (para indicadores por base) e índice por fecha de ingreso.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mantenciones", "0008_registrodiario_check_datos"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspeccion",
+            name="base",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("SOMBRERO", "Sombrero"),
+                    ("GREGORIO", "Gregorio"),
+                    ("CULLEN", "Cullen"),
+                    ("POSESION", "Posesión"),
+                    ("PUNTA_ARENAS", "Punta Arenas"),
+                ],
+                editable=False,
+                max_length=20,
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="inspeccion",
+            name="fecha_ingreso",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        # Inspecciones existentes: no hay historial de bases, se usa la base actual del camión
+        migrations.RunSQL(
+            sql="""
+                UPDATE mantencion_inspeccion i SET base = e.base_actual
+                FROM estado_camion e
+                WHERE e.id_camion = i.id_camion AND i.base IS NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Toma del reporte pendiente: el PDF y el correo se emiten fuera de la transacción que marca la inspección.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mantenciones", "0009_inspeccion_base"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inspeccion",
+            name="reporte_tomado",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
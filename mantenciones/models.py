@@ -4,9 +4,10 @@ Modelo de datos para inspecciones y checklists de mantenimiento.
 Define categorías de checklist, items, resultados de inspecciones y registro de aceites.
 """
 
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.conf import settings
-from core.models import Camion, Remolque
+from core.models import Camion, Remolque, BASE_CHOICES
 from django.contrib.auth.models import User
 
 class Inspeccion(models.Model):
@@ -31,9 +32,12 @@ class Inspeccion(models.Model):
     
     # Datos Operativos
     km_registro = models.PositiveIntegerField() # Equivale a kilometraje_unidad
-    fecha_ingreso = models.DateTimeField(auto_now_add=True) # Se auto-rellena al crear
+    fecha_ingreso = models.DateTimeField(auto_now_add=True, db_index=True) # Se auto-rellena al crear
     fecha_salida = models.DateTimeField(null=True, blank=True) #
     
+    # Base donde estaba el camión al inspeccionar (la de estado_actual cambia con los traslados)
+    base = models.CharField(max_length=20, choices=BASE_CHOICES, null=True, blank=True, editable=False)
+
     # Responsable y Observaciones
     responsable = models.CharField(max_length=100, default="Tomás Rocamora")
     observaciones = models.TextField(blank=True, null=True)
@@ -44,9 +48,27 @@ class Inspeccion(models.Model):
 
     ajuste_db = models.BooleanField(default=True)
 
+    # Mantención que generó la inspección (ahí se registra su PDF como DocumentoMantencion)
+    mantencion = models.ForeignKey(
+        'core.Mantencion', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='inspecciones', db_column='id_mantencion',
+    )
+
+    # UUID que genera el formulario al abrirse: un reenvío del mismo formulario no crea otra inspección
+    clave_idempotencia = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+
+    # Inspecciones sincronizadas desde terreno: el PDF y el correo los emite después 'procesar_reportes'
+    reporte_pendiente = models.BooleanField(default=False, editable=False)
+    # Cuándo un proceso tomó el reporte para emitirlo (ver servicios.emitir_reporte_pendiente)
+    reporte_tomado = models.DateTimeField(null=True, blank=True, editable=False)
+
     class Meta:
         db_table = 'mantencion_inspeccion'
         verbose_name_plural = "Inspecciones"
+        indexes = [
+            # Cola de procesar_reportes: solo las que faltan
+            models.Index(fields=['id_inspeccion'], condition=models.Q(reporte_pendiente=True), name='insp_reporte_pendiente_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tipo_inspeccion} - {self.camion.patente} ({self.fecha_ingreso.strftime('%d/%m/%Y')})"
@@ -170,6 +192,23 @@ class RegistroLubricantes(models.Model):
             
         super().save(*args, **kwargs)
 
+class RegistroDiarioQuerySet(models.QuerySet):
+    """Consultas sobre el checklist guardado en check_datos ({item_id: estado})."""
+
+    def con_estado(self, item, estado='M'):
+        """
+        Registros donde el item quedó en 'estado' (B/R/M).
+        Es un @> sobre check_datos, que resuelve el índice GIN (jsonb_path_ops).
+        Ej: RegistroDiario.objects.filter(fecha__gte=hace_7_dias).con_estado(item_frenos, 'M')
+        """
+        item_id = getattr(item, 'pk', item)
+        return self.filter(check_datos__contains={str(item_id): estado})
+
+    def camiones_con_estado(self, item, estado='M'):
+        """IDs de los camiones que reportaron el item en ese estado."""
+        # Sin el ordering por fecha del Meta, que se colaría en el DISTINCT
+        return self.con_estado(item, estado).order_by().values_list('vehiculo_id', flat=True).distinct()
+
 class RegistroDiario(models.Model):
     """
     Resumen diario de inspecciones de un vehículo.
@@ -192,16 +231,23 @@ class RegistroDiario(models.Model):
 
     # Almacenamiento flexible del Checklist
     # Guardamos las respuestas como un JSON para no crear 50 columnas de Sí/No
-    # Ej: {"luces": true, "frenos": false, "limpieza": true}
+    # id del ItemChecklist -> estado. Ej: {"12": "B", "15": "M"} (ver RegistroDiarioQuerySet.con_estado)
     check_datos = models.JSONField(default=dict, help_text="Resultados del checklist diario")
 
     # Observaciones críticas
     novedades = models.TextField(blank=True, null=True, verbose_name="Novedades o fallas detectadas")
+
+    objects = RegistroDiarioQuerySet.as_manager()
     
     class Meta:
         ordering = ['-fecha']
         verbose_name = "Registro Diario"
         verbose_name_plural = "Registros Diarios"
+        indexes = [
+            # jsonb_path_ops: índice más chico, solo para @> (que es lo único que se consulta)
+            GinIndex(fields=['check_datos'], opclasses=['jsonb_path_ops'], name='registro_check_datos_gin'),
+            models.Index(fields=['fecha'], name='registro_diario_fecha_idx'),
+        ]
 
     def __str__(self):
         estado = "APTO" if self.es_apto else "NO APTO"
@@ -285,3 +331,45 @@ class InsumoUtilizado(models.Model):
     def __str__(self):
         return f"{self.cantidad_usada} {self.repuesto.unidad_medida} de {self.repuesto.nombre}"
     
+
+
+# --- NOTIFICACIONES DE REPORTES ---
+class DestinatarioNotificacion(models.Model):
+    """
+    Quién recibe los reportes de inspección y cómo.
+    'base' y 'contrato' vacíos significan "todas"; el modo RESUMEN junta los reportes del intervalo en un solo correo.
+    """
+    MODO_CHOICES = [
+        ('INMEDIATO', 'Inmediato (un correo por inspección)'),
+        ('RESUMEN', 'Resumen periódico'),
+    ]
+
+    nombre = models.CharField(max_length=100, blank=True)
+    correo = models.EmailField()
+    base = models.CharField(max_length=20, choices=BASE_CHOICES, null=True, blank=True, help_text="Vacío = todas las bases")
+    contrato = models.ForeignKey('core.Contrato', on_delete=models.CASCADE, null=True, blank=True, help_text="Vacío = todos los contratos")
+    modo = models.CharField(max_length=20, choices=MODO_CHOICES, default='RESUMEN')
+    intervalo_minutos = models.PositiveIntegerField(default=60, help_text="Cada cuánto se envía el resumen")
+    adjuntar_zip = models.BooleanField(default=False, help_text="Enviar los PDF del resumen comprimidos en un .zip")
+    activo = models.BooleanField(default=True)
+    ultimo_resumen = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = "Destinatario de Notificaciones"
+        verbose_name_plural = "Destinatarios de Notificaciones"
+
+    def __str__(self):
+        return f"{self.nombre or self.correo} ({self.get_modo_display()})"
+
+class NotificacionPendiente(models.Model):
+    """Reporte en cola para el próximo resumen de un destinatario."""
+    destinatario = models.ForeignKey(DestinatarioNotificacion, on_delete=models.CASCADE, related_name='pendientes')
+    inspeccion = models.ForeignKey(Inspeccion, on_delete=models.CASCADE, related_name='notificaciones')
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # La cola que lee enviar_resumenes: solo lo no enviado
+            models.Index(fields=['destinatario'], condition=models.Q(enviado__isnull=True), name='notif_pendiente_idx'),
+        ]
@@ -0,0 +1,232 @@
+"""
+mantenciones/notificaciones.py
+Envío de los reportes de inspección por correo.
+Cada DestinatarioNotificacion elige base/contrato y modo: INMEDIATO (un correo por inspección, como antes)
+o RESUMEN (las inspecciones se encolan y 'enviar_resumenes' las manda juntas cada N minutos).
+Todos los correos de una pasada salen por una sola conexión SMTP.
+Si no hay ningún destinatario activo configurado se usa NOTIFICACIONES_DESTINATARIOS_POR_DEFECTO en modo
+inmediato; si los hay pero ninguno cubre la base/contrato de la inspección, no se notifica.
+"""
+
+import zipfile
+from collections import defaultdict
+from datetime import timedelta
+from io import BytesIO
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.models import BASE_CHOICES
+from .models import DestinatarioNotificacion, NotificacionPendiente, Inspeccion
+from .utils import ruta_reporte, nombre_descarga_reporte, generar_reporte_inspeccion
+
+NOMBRES_BASE = dict(BASE_CHOICES)
+
+
+def base_inspeccion(inspeccion):
+    """Base donde se hizo la inspección (o la actual del camión en inspecciones antiguas)."""
+    if inspeccion.base:
+        return inspeccion.base
+    estado = getattr(inspeccion.camion, 'estado_actual', None)
+    return estado.base_actual if estado else None
+
+
+def destinatarios_para(inspeccion):
+    """Destinatarios activos que cubren la base y el contrato de la inspección."""
+    base = base_inspeccion(inspeccion)
+    contrato_id = inspeccion.camion.contrato_id
+    filtro_base = Q(base__isnull=True) | Q(base='')
+    if base:
+        filtro_base |= Q(base=base)
+    filtro_contrato = Q(contrato__isnull=True)
+    if contrato_id:
+        filtro_contrato |= Q(contrato_id=contrato_id)
+    return DestinatarioNotificacion.objects.filter(filtro_base, filtro_contrato, activo=True)
+
+
+def cuerpo_inspeccion(inspeccion, datos_autocompletado):
+    """Texto del correo inmediato de una inspección."""
+    return (
+        f"Se ha registrado una nueva inspección en el sistema.\n\n"
+        f"--- DETALLES DE LA UNIDAD ---\n"
+        f" Unidad: {inspeccion.camion.patente}\n"
+        f" Responsable: {inspeccion.responsable}\n"
+        f" Kilometraje: {inspeccion.km_registro:,} KM\n"
+        f" Fecha/Hora: {datos_autocompletado['fecha_inspeccion']}\n"
+        f" Contrato: {datos_autocompletado.get('contrato', 'GENERAL')}\n\n"
+        f"--- ESTADO DE OPERACIÓN ---\n"
+        f" ¿Apto para trabajar?: {'SÍ' if inspeccion.es_apto_operar else 'NO'}\n"
+        f" ¿Renovó Aceite?: {'SÍ' if inspeccion.renovó_aceite else 'NO'}\n"
+        f" Observaciones: {inspeccion.observaciones if inspeccion.observaciones else 'Sin observaciones.'}\n\n"
+        f"Se adjunta el informe técnico detallado en formato PDF.\n\n"
+        f"Atentamente,\n"
+        f"Sistema de Gestión de Flota ZMC"
+    )
+
+
+def notificar_inspeccion(inspeccion, contenido_pdf, datos_autocompletado):
+    """
+    Llamar después de generar el PDF de una inspección nueva.
+    Envía de inmediato a los destinatarios INMEDIATO y encola la inspección para los de RESUMEN.
+    """
+    destinatarios = list(destinatarios_para(inspeccion))
+    inmediatos = [d.correo for d in destinatarios if d.modo == 'INMEDIATO']
+    resumen = [d for d in destinatarios if d.modo == 'RESUMEN']
+
+    if not destinatarios and not DestinatarioNotificacion.objects.filter(activo=True).exists():
+        inmediatos = list(getattr(settings, 'NOTIFICACIONES_DESTINATARIOS_POR_DEFECTO', []))
+
+    if resumen:
+        # Un reintento del reporte no vuelve a encolar a quien ya tiene la inspección en su resumen
+        encolados = set(
+            NotificacionPendiente.objects.filter(inspeccion=inspeccion).values_list('destinatario_id', flat=True)
+        )
+        NotificacionPendiente.objects.bulk_create(
+            [NotificacionPendiente(destinatario=d, inspeccion=inspeccion) for d in resumen if d.pk not in encolados]
+        )
+
+    if inmediatos and contenido_pdf:
+        email = EmailMessage(
+            subject=f"📝 NUEVO CHECKLIST: {inspeccion.camion.patente} - {inspeccion.tipo_inspeccion}",
+            body=cuerpo_inspeccion(inspeccion, datos_autocompletado),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=sorted(set(inmediatos)),
+        )
+        email.attach(nombre_descarga_reporte(inspeccion), contenido_pdf, 'application/pdf')
+        email.send()
+
+
+def _leer_pdf(inspeccion):
+    """Bytes del PDF desde el storage; si no está se vuelve a generar."""
+    nombre = ruta_reporte(inspeccion)
+    if default_storage.exists(nombre):
+        with default_storage.open(nombre, 'rb') as f:
+            return f.read()
+    _nombre, contenido = generar_reporte_inspeccion(inspeccion)
+    return contenido
+
+
+def _cuerpo_resumen(inspecciones):
+    """Listado de las inspecciones del resumen agrupado por base."""
+    por_base = defaultdict(list)
+    for insp in inspecciones:
+        por_base[base_inspeccion(insp)].append(insp)
+
+    lineas = [f"Resumen de {len(inspecciones)} inspecciones registradas en el sistema.\n"]
+    for base in sorted(por_base, key=lambda b: b or ''):
+        lineas.append(f"--- {NOMBRES_BASE.get(base, 'SIN BASE').upper()} ---")
+        for insp in por_base[base]:
+            apto = 'APTO' if insp.es_apto_operar else 'NO APTO'
+            lineas.append(
+                f" {timezone.localtime(insp.fecha_ingreso).strftime('%d/%m %H:%M')}  {insp.camion.patente}  "
+                f"{insp.tipo_inspeccion}  {insp.km_registro:,} KM  {apto}  ({insp.responsable})"
+            )
+            if insp.observaciones:
+                lineas.append(f"     Obs: {insp.observaciones}")
+        lineas.append("")
+    lineas.append("Se adjuntan los reportes en formato PDF.\n\nAtentamente,\nSistema de Gestión de Flota ZMC")
+    return "\n".join(lineas)
+
+
+def _mensaje_resumen(correos, inspecciones, adjuntar_zip, pdfs):
+    bases = sorted({NOMBRES_BASE.get(base_inspeccion(i), 'Sin base') for i in inspecciones})
+    email = EmailMessage(
+        subject=f"📋 RESUMEN DE CHECKLISTS: {len(inspecciones)} inspecciones - {', '.join(bases)}",
+        body=_cuerpo_resumen(inspecciones),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=correos,
+    )
+    adjuntos, usados = [], set()
+    for insp in inspecciones:
+        if not pdfs.get(insp.pk):
+            continue
+        nombre = nombre_descarga_reporte(insp)
+        if nombre in usados:
+            # Mismo camión y día: el zip no admite nombres repetidos
+            nombre = nombre.replace('.pdf', f'_{insp.pk}.pdf')
+        usados.add(nombre)
+        adjuntos.append((nombre, pdfs[insp.pk]))
+    if adjuntar_zip and adjuntos:
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for nombre, contenido in adjuntos:
+                zf.writestr(nombre, contenido)
+        email.attach(f"Reportes_{timezone.localdate().strftime('%d-%m-%Y')}.zip", buffer.getvalue(), 'application/zip')
+    else:
+        for nombre, contenido in adjuntos:
+            email.attach(nombre, contenido, 'application/pdf')
+    return email
+
+
+def enviar_resumenes(ahora=None, forzar=False):
+    """
+    Envía los resúmenes de los destinatarios cuyo intervalo ya se cumplió (todos si 'forzar').
+    Destinatarios con exactamente las mismas inspecciones pendientes reciben un solo correo.
+    Las filas se toman primero (SELECT ... FOR UPDATE SKIP LOCKED, quedan con 'enviado') en una transacción
+    corta; los PDF y el SMTP van después, sin bloqueos abiertos. Dos corridas simultáneas no repiten correos,
+    y si un envío falla sus filas vuelven a la cola para la próxima corrida.
+    Retorna (correos_enviados, inspecciones_notificadas).
+    """
+    ahora = ahora or timezone.now()
+    with transaction.atomic():
+        pendientes = list(
+            NotificacionPendiente.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                enviado__isnull=True, destinatario__activo=True, destinatario__modo='RESUMEN',
+            ).select_related('destinatario').order_by('pk')
+        )
+
+        por_destinatario = defaultdict(list)
+        destinatarios = {}
+        for p in pendientes:
+            d = p.destinatario
+            if not forzar and d.ultimo_resumen and d.ultimo_resumen + timedelta(minutes=d.intervalo_minutos) > ahora:
+                continue
+            destinatarios[d.pk] = d
+            por_destinatario[d.pk].append(p)
+        if not por_destinatario:
+            return 0, 0
+
+        NotificacionPendiente.objects.filter(
+            pk__in=[p.pk for lista in por_destinatario.values() for p in lista]
+        ).update(enviado=ahora)
+        DestinatarioNotificacion.objects.filter(pk__in=list(destinatarios)).update(ultimo_resumen=ahora)
+
+    ids_inspeccion = {p.inspeccion_id for lista in por_destinatario.values() for p in lista}
+    inspecciones = Inspeccion.objects.select_related(
+        'camion__contrato', 'camion__estado_actual'
+    ).in_bulk(ids_inspeccion)
+
+    # Un mensaje por combinación (inspecciones, zip) con todos los destinatarios que la comparten
+    grupos = defaultdict(list)
+    for d_id, lista in por_destinatario.items():
+        clave = (tuple(sorted({p.inspeccion_id for p in lista})), destinatarios[d_id].adjuntar_zip)
+        grupos[clave].append(d_id)
+
+    grupos = list(grupos.items())
+    enviados = hechos = 0
+    try:
+        pdfs = {pk: _leer_pdf(insp) for pk, insp in inspecciones.items()}
+        with get_connection() as conexion:
+            for (ids, adjuntar_zip), d_ids in grupos:
+                lista = sorted((inspecciones[pk] for pk in ids if pk in inspecciones), key=lambda i: i.fecha_ingreso)
+                if lista:
+                    correos = sorted({destinatarios[d_id].correo for d_id in d_ids})
+                    enviados += conexion.send_messages([_mensaje_resumen(correos, lista, adjuntar_zip, pdfs)]) or 0
+                hechos += 1
+    except Exception:
+        # Lo que no alcanzó a salir vuelve a la cola (los correos ya enviados no se repiten)
+        pendientes = [d_id for _clave, d_ids in grupos[hechos:] for d_id in d_ids]
+        _devolver_a_la_cola([por_destinatario[d_id] for d_id in pendientes], [destinatarios[d_id] for d_id in pendientes])
+        raise
+
+    return enviados, len(inspecciones)
+
+
+def _devolver_a_la_cola(listas, destinatarios):
+    """Libera filas tomadas por enviar_resumenes y repone el ultimo_resumen anterior de sus destinatarios."""
+    with transaction.atomic():
+        NotificacionPendiente.objects.filter(pk__in=[p.pk for lista in listas for p in lista]).update(enviado=None)
+        # Las instancias conservan el valor leído antes de tomar las filas
+        DestinatarioNotificacion.objects.bulk_update(destinatarios, ['ultimo_resumen'])
@@ -0,0 +1,161 @@
+"""
+mantenciones/render_pdf.py
+Contexto de render compartido por los reportes PDF (diario y técnico).
+Estilos de párrafo, estilos de tabla y logos/firma se preparan una sola vez por proceso.
+Las imágenes quedan decodificadas en memoria con clave ruta + mtime, así que si alguien reemplaza
+un logo en media/logos/ el siguiente reporte usa el archivo nuevo sin reiniciar el servidor.
+Las fuentes son las estándar de PDF (Helvetica), que ReportLab no necesita registrar ni cargar.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Image, Table, TableStyle
+
+# Comandos comunes de las tablas de datos (carátula)
+COMANDOS_TABLA_BASE = [
+    ('GRID', (0, 0), (-1, -1), 0.7, colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+]
+
+
+class ImagenPrecargada(Image):
+    """Image de platypus que dibuja un ImageReader ya decodificado (no vuelve a leer el archivo)."""
+
+    def __init__(self, lector, ruta, width, height, hAlign='CENTER'):
+        super().__init__(ruta, width=width, height=height, hAlign=hAlign)
+        self._img = lector
+
+
+class ContextoRender:
+    """
+    Recursos de ReportLab reutilizables entre reportes.
+    No guarda nada propio de un reporte: los flowables se crean nuevos en cada llamada.
+    """
+
+    def __init__(self):
+        hoja = getSampleStyleSheet()
+        self.estilos = {
+            'titulo': ParagraphStyle('Title', fontSize=14, alignment=TA_CENTER, fontName='Helvetica-Bold', spaceAfter=10),
+            'etiqueta': ParagraphStyle('Label', fontSize=11, fontName='Helvetica-Bold', spaceBefore=8, spaceAfter=4),
+            'patente': ParagraphStyle(
+                'PatenteSimple', parent=hoja['Normal'], fontSize=48, leading=54,
+                alignment=TA_CENTER, fontName='Helvetica-Bold',
+            ),
+            # Texto largo dentro de celdas: el Paragraph fuerza los saltos de línea
+            'celda': ParagraphStyle('CellBody', parent=hoja['Normal'], fontSize=9, leading=10, alignment=TA_LEFT),
+        }
+        self.tablas = {
+            'base': TableStyle(COMANDOS_TABLA_BASE),
+            'logos': TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+                ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+            ]),
+            'checklist': TableStyle([
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('TOPPADDING', (0, 0), (-1, -1), 4),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ]),
+            'firmas': TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),  # La firma "descansa" sobre la línea
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 1), (1, 1), 0),  # Pegamos la imagen a la línea
+            ]),
+        }
+        self._imagenes = {}
+        self._lock = threading.Lock()
+
+    def tabla_base(self, *comandos):
+        """Estilo base de tabla más comandos propios de una tabla puntual."""
+        if not comandos:
+            return self.tablas['base']
+        return TableStyle(list(comandos), parent=self.tablas['base'])
+
+    def imagen(self, ruta, width, height, hAlign='CENTER'):
+        """Flowable con la imagen de 'ruta' (decodificada una sola vez), o None si el archivo no existe."""
+        lector = self._lector(ruta)
+        if lector is None:
+            return None
+        return ImagenPrecargada(lector, ruta, width, height, hAlign)
+
+    def imagen_logos(self, nombre, width, height, hAlign='CENTER'):
+        """Imagen de media/logos/ (logo-zmc.png, firma-zmc.png)."""
+        return self.imagen(os.path.join(settings.MEDIA_ROOT, 'logos', nombre), width, height, hAlign)
+
+    def encabezado_logos(self, contrato=None):
+        """Tabla de encabezado con el logo de ZMC a la izquierda y el del cliente (contrato) a la derecha."""
+        img_zmc = self.imagen_logos('logo-zmc.png', 1.2*inch, 0.6*inch, hAlign='LEFT')
+        img_contrato = None
+        if contrato and contrato.logo_cliente:
+            img_contrato = self.imagen(contrato.logo_cliente.path, 1.2*inch, 0.6*inch, hAlign='RIGHT')
+
+        t_logos = Table([[img_zmc or '', '', img_contrato or '']], colWidths=[2.5*inch, 2.5*inch, 2.5*inch])
+        t_logos.setStyle(self.tablas['logos'])
+        return t_logos
+
+    def tabla_firmas(self, responsable, cargo_responsable='Responsable Inspección'):
+        """
+        Tabla de firmas:
+        Fila 1: la firma digital del representante ZMC a la derecha (aprox 1.5 x 0.7 pulgadas)
+        Fila 2: las líneas de puntos
+        Fila 3: los nombres
+        Fila 4: los cargos
+        """
+        img_firma = self.imagen_logos('firma-zmc.png', 1.5*inch, 0.7*inch) or ''
+        firma_data = [
+            ['', img_firma],
+            ['_______________________', '_______________________'],
+            [f'Firma: {responsable}', 'Firma: Representante ZMC'],
+            [cargo_responsable, 'Control de Flota'],
+        ]
+        t_firma = Table(firma_data, colWidths=[3.75*inch, 3.75*inch])
+        t_firma.setStyle(self.tablas['firmas'])
+        return t_firma
+
+    def _lector(self, ruta):
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except OSError:
+            return None
+
+        clave = (ruta, mtime)
+        lector = self._imagenes.get(clave)
+        if lector is None:
+            lector = ImageReader(ruta)
+            lector.getRGBData()  # Decodifica ahora; ReportLab reutiliza estos bytes en cada drawImage
+            with self._lock:
+                # Si el archivo cambió, la versión anterior ya no sirve
+                for anterior in [c for c in self._imagenes if c[0] == ruta]:
+                    del self._imagenes[anterior]
+                self._imagenes[clave] = lector
+        return lector
+
+
+@lru_cache(maxsize=None)
+def contexto_render():
+    """Contexto único del proceso (se crea en el primer reporte)."""
+    return ContextoRender()
+
+
+def inicializar_proceso_render():
+    """
+    Initializer para pools de procesos (ej: regenerar_reportes): configura Django en el worker
+    y deja el contexto de render cargado antes del primer reporte.
+    """
+    import django
+    django.setup()
+    contexto_render()
@@ -0,0 +1,213 @@
+"""
+mantenciones/servicios.py
+Registro de una inspección nueva: la transacción (inspección, resultados, registro diario, mantención, km)
+y luego el PDF, su DocumentoMantencion y la notificación por correo.
+La clave de idempotencia hace que reenviar la misma inspección devuelva la ya registrada sin repetir nada.
+El formulario hace ambos pasos seguidos (registrar_inspeccion); la sincronización offline solo guarda
+(guardar_inspeccion) y deja el reporte en cola para 'procesar_reportes' (emitir_reporte_pendiente).
+En ambos casos la inspección se guarda con reporte_pendiente=True, que se apaga recién cuando el PDF, el
+DocumentoMantencion y la notificación salieron bien: si algo falla, 'procesar_reportes' lo reintenta.
+"""
+
+import logging
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from core.models import DocumentoMantencion, Mantencion
+from .models import Inspeccion, ItemChecklist, ResultadoItem, RegistroDiario
+from .notificaciones import notificar_inspeccion
+from .utils import (
+    datos_reporte_inspeccion, generar_reporte_inspeccion, nombre_documento_reporte, tipo_documento_reporte,
+)
+
+logger = logging.getLogger(__name__)
+
+# Una toma más antigua es de un proceso que murió a mitad de la emisión: otro la puede retomar
+TOMA_REPORTE_VENCE = timedelta(minutes=15)
+
+
+def inspeccion_por_clave(clave):
+    """Inspección ya registrada con esa clave de idempotencia, o None."""
+    if not clave:
+        return None
+    return Inspeccion.objects.filter(clave_idempotencia=clave).first()
+
+
+def guardar_inspeccion(inspeccion, resultados_data):
+    """
+    Guarda la inspección (instancia sin guardar, ej: form.save(commit=False)) con sus resultados
+    [{item_id, estado, observacion}], el registro diario, la mantención y el km del camión.
+    Retorna (inspeccion, creada). Si ya existía una con la misma clave_idempotencia se retorna esa
+    con creada=False sin guardar nada.
+    """
+    clave = inspeccion.clave_idempotencia
+    existente = inspeccion_por_clave(clave)
+    if existente:
+        return existente, False
+
+    try:
+        # 1. BLOQUE DE BASE DE DATOS (Transacción Atómica)
+        with transaction.atomic():
+            # Guardamos la Inspección
+            inspeccion.fecha_ingreso = timezone.localtime(timezone.now())
+            estado = getattr(inspeccion.camion, 'estado_actual', None)
+            inspeccion.base = estado.base_actual if estado else None
+            inspeccion.save()
+
+            check_datos = {}
+            for data in resultados_data:
+                try:
+                    item = ItemChecklist.objects.get(id=data['item_id'])
+                    ResultadoItem.objects.create(
+                        inspeccion=inspeccion,
+                        item=item,
+                        estado=data['estado'],
+                        observacion=data.get('observacion', '')
+                    )
+                    check_datos[str(item.id)] = data['estado']
+                except ItemChecklist.DoesNotExist:
+                    continue
+
+            # Guardar en RegistroDiario
+            RegistroDiario.objects.create(
+                vehiculo=inspeccion.camion,
+                revisado_por=inspeccion.responsable,
+                km_actual=inspeccion.km_registro,
+                es_apto=inspeccion.es_apto_operar,
+                check_datos=check_datos,
+                novedades=inspeccion.observaciones
+            )
+
+            # --- NUEVA LÓGICA DE MANTENCIÓN Y PRÓXIMA META (KAUFMANN/FTL) ---
+            intervalo_base = 20000 
+
+            if inspeccion.camion.modelo:
+                if inspeccion.camion.modelo.marca == 'Mercedes-Benz':
+                    intervalo_base = 40000  
+                else:
+                    intervalo_base = 30000  
+
+            # Ajuste por Tipo de Operación
+            if inspeccion.camion.tipo_operacion == 'SEVERO':
+                intervalo_base = intervalo_base * 0.25  
+            elif inspeccion.camion.tipo_operacion == 'MIXTO':
+                intervalo_base = intervalo_base * 0.5   
+
+            # Cálculo de la meta según el tipo de reporte
+            if inspeccion.tipo_inspeccion == 'DIARIO':
+                if inspeccion.renovó_aceite:
+                    nueva_meta = inspeccion.km_registro + intervalo_base
+                else:
+                    # Si es diario sin cambio de aceite, busca la meta anterior
+                    ultima_m = Mantencion.objects.filter(camion=inspeccion.camion).last()
+                    nueva_meta = ultima_m.km_proxima_mantencion if ultima_m else inspeccion.km_registro
+            else:
+                # Si es una preventiva (SM1, SM2, etc.), se setea la nueva meta obligatoriamente
+                nueva_meta = inspeccion.km_registro + intervalo_base
+
+            # Guardar la mantención técnica en el historial
+            nueva_mantencion = Mantencion.objects.create(
+                camion=inspeccion.camion,
+                taller='ZMC',
+                fecha_mantencion=timezone.now().date(),
+                km_mantencion=inspeccion.km_registro,
+                km_proxima_mantencion=nueva_meta,
+                observaciones=f"Servicio {inspeccion.tipo_inspeccion} realizado por {inspeccion.responsable}."
+            )
+
+            inspeccion.mantencion = nueva_mantencion
+            inspeccion.save(update_fields=['mantencion'])
+
+            # Actualizar KM actual del camión (el cambio queda en HistorialEstadoCamion)
+            if hasattr(inspeccion.camion, 'estado_actual'):
+                estado = inspeccion.camion.estado_actual
+                estado.kilometraje = inspeccion.km_registro
+                estado.motivo = f"Inspección {inspeccion.tipo_inspeccion} #{inspeccion.pk}"
+                estado.save()
+    except IntegrityError:
+        # Dos envíos simultáneos con la misma clave: el primero en confirmar gana
+        existente = inspeccion_por_clave(clave)
+        if existente:
+            return existente, False
+        raise
+
+    return inspeccion, True
+
+
+def emitir_reporte(inspeccion):
+    """
+    Genera el PDF de una inspección ya guardada, lo registra como DocumentoMantencion
+    y notifica a los destinatarios. Los errores (también los del correo) se propagan.
+    Se puede repetir: el PDF se reemplaza, el documento y la cola del resumen no se duplican.
+    """
+    datos_autocompletado = datos_reporte_inspeccion(inspeccion)
+    nueva_mantencion = inspeccion.mantencion
+
+    # El PDF se renderiza en memoria y se guarda en el storage; los bytes se reutilizan para el correo
+    resultados_items = ResultadoItem.objects.filter(inspeccion=inspeccion).select_related('item__categoria')
+    ruta_pdf, contenido_pdf = generar_reporte_inspeccion(inspeccion, resultados_items, datos_autocompletado)
+
+    # Registrar el PDF generado en la base de datos (se descarga por la vista protegida).
+    # get_or_create: un reintento después de una falla posterior no duplica el documento
+    if ruta_pdf and nueva_mantencion:
+        DocumentoMantencion.objects.get_or_create(
+            mantencion=nueva_mantencion,
+            ruta_archivo=reverse('mantenciones:descargar_reporte', args=[inspeccion.pk]),
+            defaults={
+                'nombre_archivo': nombre_documento_reporte(inspeccion),
+                'tipo_documento': tipo_documento_reporte(inspeccion),
+            },
+        )
+
+    # Inmediato o en cola para el resumen según los destinatarios de la base/contrato
+    notificar_inspeccion(inspeccion, contenido_pdf, datos_autocompletado)
+
+
+def registrar_inspeccion(inspeccion, resultados_data):
+    """
+    Guarda la inspección y emite su reporte (flujo del formulario).
+    Retorna (inspeccion, creada); un reenvío con la misma clave no repite nada.
+    Si el reporte falla la inspección queda guardada con reporte_pendiente=True para 'procesar_reportes'.
+    """
+    inspeccion.reporte_pendiente = True
+    inspeccion, creada = guardar_inspeccion(inspeccion, resultados_data)
+    if creada:
+        try:
+            if emitir_reporte_pendiente(inspeccion.pk):
+                inspeccion.reporte_pendiente = False
+        except Exception:
+            logger.exception("Error al emitir el reporte de la inspección %s (queda pendiente)", inspeccion.pk)
+    return inspeccion, creada
+
+
+def emitir_reporte_pendiente(inspeccion_id):
+    """
+    Emite el reporte de la inspección si sigue pendiente y nadie más lo está emitiendo.
+    1. Toma: un UPDATE corto marca reporte_tomado (dos procesos no pueden tomar la misma fila) y confirma.
+    2. PDF, storage y correo corren fuera de toda transacción y sin bloqueos.
+    3. Solo si todo salió bien se apaga reporte_pendiente; si algo falla se suelta la toma, el error se propaga
+       y la próxima corrida de 'procesar_reportes' lo reintenta.
+    Retorna la inspección emitida, o None si estaba tomada o ya emitida.
+    """
+    toma = timezone.now()
+    tomada = Inspeccion.objects.filter(
+        Q(reporte_tomado__isnull=True) | Q(reporte_tomado__lt=toma - TOMA_REPORTE_VENCE),
+        pk=inspeccion_id, reporte_pendiente=True,
+    ).update(reporte_tomado=toma)
+    if not tomada:
+        return None
+
+    propia = Inspeccion.objects.filter(pk=inspeccion_id, reporte_tomado=toma)
+    try:
+        inspeccion = Inspeccion.objects.select_related(
+            'camion__contrato', 'camion__modelo', 'camion__estado_actual__conductor', 'mantencion',
+        ).get(pk=inspeccion_id)
+        emitir_reporte(inspeccion)
+    except Exception:
+        propia.update(reporte_tomado=None)
+        raise
+    propia.update(reporte_pendiente=False, reporte_tomado=None)
+    inspeccion.reporte_pendiente, inspeccion.reporte_tomado = False, None
+    return inspeccion
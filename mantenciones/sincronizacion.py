@@ -0,0 +1,188 @@
+"""
+mantenciones/sincronizacion.py
+Sincronización offline para las bases con conexión intermitente.
+- paquete_offline(): todo lo que el formulario necesita sin red (flota, catálogo de checklist por modelo/nivel,
+  autocompletado y sugerencia de cada camión) con una versión que cambia solo si cambian los datos.
+- aplicar_lote(): recibe las inspecciones encoladas en el celular y las guarda en una sola transacción,
+  cada una con su savepoint y su clave de idempotencia (reintentar el mismo lote no duplica nada).
+  El PDF y el correo quedan en cola (reporte_pendiente) para el comando 'procesar_reportes'.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from core.models import Camion, DocumentacionGeneral
+from .forms import InspeccionForm
+from .models import CategoriaChecklist, ItemChecklist, Inspeccion, CronogramaPlan
+from .servicios import guardar_inspeccion, inspeccion_por_clave
+from .utils import obtener_datos_camion_autocompletado, sugerencia_mantenimiento
+
+FORMATO_PAQUETE = 1
+MAX_INSPECCIONES_LOTE = 200
+
+# Dependen de la hora de la consulta: el celular las completa al momento de inspeccionar
+CLAVES_SEGUN_HORA = ('fecha_inspeccion', 'fecha_control')
+
+
+def _catalogo():
+    """Categorías, items y qué items corresponden a cada modelo/nivel de servicio."""
+    categorias = list(CategoriaChecklist.objects.order_by('orden', 'pk').values('id', 'nombre', 'orden'))
+    items = list(ItemChecklist.objects.order_by('categoria_id', 'pk').values(
+        'id', 'categoria_id', 'nombre', 'es_critico', 'tipo_respuesta', 'es_opcional',
+        'referencia_tecnica', 'codigo_sap', 'nivel_servicio', 'modelo_id',
+    ))
+
+    # {modelo_id | 'general': {nivel: [item_id, ...]}}
+    niveles = defaultdict(lambda: defaultdict(list))
+    for item in items:
+        niveles[str(item['modelo_id'] or 'general')][item['nivel_servicio']].append(item['id'])
+
+    return {
+        'categorias': categorias,
+        'items': items,
+        'niveles': {modelo: dict(por_nivel) for modelo, por_nivel in niveles.items()},
+    }
+
+
+def _flota():
+    """Lista de camiones activos y su autocompletado, en un número fijo de consultas."""
+    camiones = list(
+        Camion.objects.filter(activo=True)
+        .select_related('modelo', 'estado_actual__conductor', 'asignacion_actual__remolque')
+        .order_by('patente')
+    )
+
+    docs_camion, docs_remolque = defaultdict(list), defaultdict(list)
+    for doc in DocumentacionGeneral.objects.filter(tipo_entidad__in=['CAMION', 'REMOLQUE']).order_by('pk'):
+        if doc.tipo_entidad == 'CAMION' and doc.camion_id:
+            docs_camion[doc.camion_id].append(doc)
+        elif doc.tipo_entidad == 'REMOLQUE' and doc.remolque_id:
+            docs_remolque[doc.remolque_id].append(doc)
+
+    preventivas = dict(
+        Inspeccion.objects.exclude(tipo_inspeccion='DIARIO')
+        .values('camion_id').annotate(n=Count('pk')).values_list('camion_id', 'n')
+    )
+    planes = defaultdict(list)
+    for plan in CronogramaPlan.objects.order_by('modelo_id', 'posicion_ciclo'):
+        planes[plan.modelo_id].append(plan)
+
+    flota, autocompletado = [], {}
+    for camion in camiones:
+        estado = getattr(camion, 'estado_actual', None)
+        asignacion = camion.asignacion_actual
+        flota.append({
+            'id': camion.pk,
+            'patente': camion.patente,
+            'modelo_id': camion.modelo_id,
+            'base': estado.base_actual if estado else None,
+            'km': estado.kilometraje if estado else 0,
+            'remolque_id': asignacion.remolque_id if asignacion else None,
+        })
+
+        datos = obtener_datos_camion_autocompletado(
+            camion,
+            docs_camion=docs_camion.get(camion.pk, []),
+            docs_remolque=docs_remolque.get(asignacion.remolque_id, []) if asignacion else None,
+        )
+        for clave in CLAVES_SEGUN_HORA:
+            datos.pop(clave, None)
+        autocompletado[str(camion.pk)] = {
+            'datos': datos,
+            'sugerencia_mantenimiento': sugerencia_mantenimiento(
+                camion, preventivas.get(camion.pk, 0), planes.get(camion.modelo_id, [])
+            ),
+        }
+    return flota, autocompletado
+
+
+def paquete_offline():
+    """
+    Paquete completo para trabajar sin conexión.
+    'version' es un hash del contenido: el celular la manda de vuelta y si no cambió no se reenvía nada.
+    """
+    flota, autocompletado = _flota()
+    contenido = {
+        'flota': flota,
+        'catalogo': _catalogo(),
+        'autocompletado': autocompletado,
+    }
+    serializado = json.dumps(contenido, sort_keys=True, cls=DjangoJSONEncoder)
+    return {
+        'formato': FORMATO_PAQUETE,
+        'version': hashlib.sha1(serializado.encode('utf-8')).hexdigest()[:16],
+        'generado': timezone.now().isoformat(),
+        **contenido,
+    }
+
+
+def _aplicar_inspeccion(datos):
+    """Guarda una inspección del lote. Retorna el dict de resultado para el celular."""
+    clave = datos.get('clave_idempotencia')
+    resultado = {'clave_idempotencia': clave}
+
+    form = InspeccionForm({
+        'tipo_inspeccion': datos.get('tipo_inspeccion'),
+        'camion': datos.get('camion'),
+        'km_registro': datos.get('km_registro'),
+        'responsable': datos.get('responsable'),
+        'es_apto_operar': bool(datos.get('es_apto_operar', True)),
+        'observaciones': datos.get('observaciones', ''),
+        'clave_idempotencia': clave,
+    })
+    if not form.is_valid():
+        return {**resultado, 'estado': 'ERROR', 'errores': form.errors.get_json_data()}
+    if not form.cleaned_data.get('clave_idempotencia'):
+        return {**resultado, 'estado': 'ERROR', 'errores': {'clave_idempotencia': [{'message': 'Falta la clave.'}]}}
+
+    inspeccion = form.save(commit=False)
+    inspeccion.clave_idempotencia = form.cleaned_data['clave_idempotencia']
+    inspeccion.renovó_aceite = bool(datos.get('renovo_aceite', False))
+    inspeccion.reporte_pendiente = True
+    inspeccion, creada = guardar_inspeccion(inspeccion, datos.get('resultados') or [])
+    return {**resultado, 'estado': 'CREADA' if creada else 'DUPLICADA', 'inspeccion_id': inspeccion.pk}
+
+
+def aplicar_lote(inspecciones):
+    """
+    Aplica un lote de inspecciones encoladas offline (en el orden recibido, así los km del mismo camión
+    se validan contra la inspección anterior del lote). Un error en una no deshace las demás.
+    Retorna la lista de resultados por inspección: CREADA, DUPLICADA o ERROR.
+    """
+    resultados = []
+    with transaction.atomic():
+        for datos in inspecciones:
+            if not isinstance(datos, dict):
+                resultados.append({
+                    'clave_idempotencia': None, 'estado': 'ERROR', 'errores': {'__all__': [{'message': 'Formato inválido.'}]},
+                })
+                continue
+            # Ya recibida en un envío anterior (el celular no alcanzó a ver la respuesta)
+            existente = inspeccion_por_clave(_clave_valida(datos.get('clave_idempotencia')))
+            if existente:
+                resultados.append({
+                    'clave_idempotencia': datos.get('clave_idempotencia'), 'estado': 'DUPLICADA', 'inspeccion_id': existente.pk,
+                })
+                continue
+            try:
+                with transaction.atomic():
+                    resultados.append(_aplicar_inspeccion(datos))
+            except Exception as e:
+                resultados.append({
+                    'clave_idempotencia': datos.get('clave_idempotencia'), 'estado': 'ERROR',
+                    'errores': {'__all__': [{'message': str(e)}]},
+                })
+    return resultados
+
+
+def _clave_valida(clave):
+    """UUID de la clave o None (una clave mal formada se reporta al validar el formulario)."""
+    try:
+        return InspeccionForm.base_fields['clave_idempotencia'].to_python(clave)
+    except ValidationError:
+        return None
@@ -312,10 +312,16 @@ async function cargarCategorias() {
 
     try {
         // --- CAMBIO: Agregamos el camion_id como parámetro GET ---
-        const response = await fetch(`/mantenciones/api/categorias/${tSel.value}/?camion_id=${cSel.value}`);
-        const data = await response.json();
+        let data;
+        try {
+            const response = await fetch(`/mantenciones/api/categorias/${tSel.value}/?camion_id=${cSel.value}`);
+            data = await response.json();
+        } catch (e) {
+            // Sin señal: checklist desde el paquete offline (sincronizacion.js)
+            data = typeof categoriasOffline === 'function' ? categoriasOffline(tSel.value, cSel.value) : null;
+        }
         
-        if (data.success) {
+        if (data && data.success) {
             renderizarCategorias(data.categorias);
             mostrarPaso('#step-4');
         }
@@ -338,10 +344,16 @@ async function cargarDatosAutocompletados() {
     const hint = document.getElementById('km-referencia-hint');
     
     try {
-        const response = await fetch(`/mantenciones/api/datos-autocompletado/${id}/`);
-        const data = await response.json();
+        let data;
+        try {
+            const response = await fetch(`/mantenciones/api/datos-autocompletado/${id}/`);
+            data = await response.json();
+        } catch (e) {
+            // Sin señal: datos desde el paquete offline (sincronizacion.js)
+            data = typeof autocompletadoOffline === 'function' ? autocompletadoOffline(id) : null;
+        }
         
-        if (data.success) {
+        if (data && data.success) {
             const d = data.datos;
             document.getElementById('lugar-inspeccion').value = d.lugar_inspeccion;
             document.getElementById('conductor-nombre').value = d.conductor_nombre_corto || d.conductor_nombre;
@@ -0,0 +1,182 @@
+/**
+ * SINCRONIZACIÓN OFFLINE (bases con señal intermitente)
+ * - Guarda en el celular el paquete offline (flota, checklist y autocompletado) y lo actualiza solo si cambió.
+ * - Sin señal, el formulario queda en una cola local y se envía en un solo lote comprimido al volver la conexión.
+ * inspeccion.js usa categoriasOffline() / autocompletadoOffline() cuando la API no responde.
+ */
+
+const URL_PAQUETE_OFFLINE = '/mantenciones/api/sync/paquete/';
+const URL_LOTE_INSPECCIONES = '/mantenciones/api/sync/inspecciones/';
+const CLAVE_PAQUETE = 'zmc_paquete_offline';
+const CLAVE_COLA = 'zmc_cola_inspecciones';
+const CLAVE_RECHAZADAS = 'zmc_inspecciones_rechazadas';
+const MAX_LOTE = 200;
+
+function leerLocal(clave, porDefecto) {
+    try {
+        const valor = localStorage.getItem(clave);
+        return valor ? JSON.parse(valor) : porDefecto;
+    } catch (e) {
+        return porDefecto;
+    }
+}
+
+function guardarLocal(clave, valor) {
+    localStorage.setItem(clave, JSON.stringify(valor));
+}
+
+function tokenCsrf() {
+    const input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    if (input) return input.value;
+    const cookie = document.cookie.split('; ').find(c => c.startsWith('csrftoken='));
+    return cookie ? decodeURIComponent(cookie.split('=')[1]) : '';
+}
+
+async function actualizarPaqueteOffline() {
+    const actual = leerLocal(CLAVE_PAQUETE, null);
+    const headers = actual ? { 'If-None-Match': `"${actual.version}"` } : {};
+    try {
+        const response = await fetch(URL_PAQUETE_OFFLINE, { headers, credentials: 'same-origin' });
+        if (response.status === 304 || !response.ok) return actual;
+        const data = await response.json();
+        if (data.success) guardarLocal(CLAVE_PAQUETE, data.paquete);
+        return data.paquete;
+    } catch (e) {
+        return actual;
+    }
+}
+
+/**
+ * Misma respuesta que /api/categorias/<tipo>/ armada desde el paquete.
+ * SMn incluye las tareas de SM1..SMn del modelo del camión.
+ */
+function categoriasOffline(tipo, camionId) {
+    const paquete = leerLocal(CLAVE_PAQUETE, null);
+    if (!paquete) return null;
+
+    let filtro;
+    if (tipo === 'DIARIO') {
+        filtro = item => item.nivel_servicio === 'DIARIO';
+    } else {
+        let niveles = [tipo];
+        if (tipo.includes('SM')) {
+            const num = parseInt(tipo.replace('SM', ''));
+            niveles = Array.from({ length: num }, (_, i) => `SM${i + 1}`);
+        }
+        const camion = paquete.flota.find(c => String(c.id) === String(camionId));
+        const modeloId = camion ? camion.modelo_id : undefined;
+        filtro = item => niveles.includes(item.nivel_servicio) && (modeloId === undefined || item.modelo_id === modeloId);
+    }
+
+    const categorias = [];
+    paquete.catalogo.categorias.forEach(cat => {
+        const items = paquete.catalogo.items
+            .filter(item => item.categoria_id === cat.id && filtro(item))
+            .map(({ id, nombre, es_critico, tipo_respuesta, es_opcional, referencia_tecnica, codigo_sap }) =>
+                ({ id, nombre, es_critico, tipo_respuesta, es_opcional, referencia_tecnica, codigo_sap }));
+        if (items.length) categorias.push({ id: cat.id, nombre: cat.nombre, items });
+    });
+    return { success: true, categorias, offline: true };
+}
+
+/** Misma respuesta que /api/datos-autocompletado/<id>/ armada desde el paquete. */
+function autocompletadoOffline(camionId) {
+    const paquete = leerLocal(CLAVE_PAQUETE, null);
+    const entrada = paquete && paquete.autocompletado[String(camionId)];
+    if (!entrada) return null;
+
+    const ahora = new Date();
+    const fecha = ahora.toLocaleDateString('es-CL', { day: '2-digit', month: '2-digit', year: 'numeric' });
+    const hora = ahora.toLocaleTimeString('es-CL', { hour: '2-digit', minute: '2-digit', hour12: false });
+    return {
+        success: true,
+        datos: { ...entrada.datos, fecha_inspeccion: `${fecha} ${hora}`, fecha_control: fecha },
+        sugerencia_mantenimiento: entrada.sugerencia_mantenimiento,
+        offline: true,
+    };
+}
+
+function encolarInspeccion(form) {
+    const fd = new FormData(form);
+    const cola = leerLocal(CLAVE_COLA, []);
+    cola.push({
+        clave_idempotencia: fd.get('clave_idempotencia'),
+        tipo_inspeccion: fd.get('tipo_inspeccion'),
+        camion: fd.get('camion'),
+        km_registro: parseInt(fd.get('km_registro')) || 0,
+        responsable: fd.get('responsable'),
+        es_apto_operar: fd.get('es_apto_operar') === 'on',
+        observaciones: fd.get('observaciones') || '',
+        resultados: JSON.parse(fd.get('resultados_checklist') || '[]'),
+        registrada_en: new Date().toISOString(),
+    });
+    guardarLocal(CLAVE_COLA, cola);
+}
+
+async function comprimir(texto) {
+    if (!window.CompressionStream) return null;
+    const stream = new Blob([texto]).stream().pipeThrough(new CompressionStream('gzip'));
+    return await new Response(stream).blob();
+}
+
+/**
+ * Envía la cola en lotes. Las CREADA y DUPLICADA salen de la cola;
+ * las rechazadas (ej: km menor al actual) se apartan para revisarlas y no se reintentan.
+ */
+async function sincronizarCola() {
+    let cola = leerLocal(CLAVE_COLA, []);
+    while (cola.length && navigator.onLine) {
+        const lote = cola.slice(0, MAX_LOTE);
+        const texto = JSON.stringify({ inspecciones: lote });
+        const headers = { 'Content-Type': 'application/json', 'X-CSRFToken': tokenCsrf() };
+        let cuerpo = await comprimir(texto);
+        if (cuerpo) headers['Content-Encoding'] = 'gzip';
+        else cuerpo = texto;
+
+        let data;
+        try {
+            const response = await fetch(URL_LOTE_INSPECCIONES, { method: 'POST', headers, body: cuerpo, credentials: 'same-origin' });
+            if (!response.ok) return;
+            data = await response.json();
+        } catch (e) {
+            return; // Se cortó de nuevo: queda todo en la cola
+        }
+
+        const resultados = new Map(data.resultados.map((r, i) => [lote[i].clave_idempotencia, r]));
+        const rechazadas = leerLocal(CLAVE_RECHAZADAS, []);
+        lote.forEach(insp => {
+            const r = resultados.get(insp.clave_idempotencia);
+            if (r && r.estado === 'ERROR') rechazadas.push({ ...insp, errores: r.errores });
+        });
+        guardarLocal(CLAVE_RECHAZADAS, rechazadas);
+
+        // La cola pudo crecer mientras se enviaba: se quita solo lo enviado
+        const enviadas = new Set(lote.map(i => i.clave_idempotencia));
+        cola = leerLocal(CLAVE_COLA, []).filter(i => !enviadas.has(i.clave_idempotencia));
+        guardarLocal(CLAVE_COLA, cola);
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('inspeccion-form');
+    if (form) {
+        form.addEventListener('submit', function(e) {
+            if (navigator.onLine) return;
+            e.preventDefault();
+            encolarInspeccion(form);
+
+            alert('📴 Sin conexión: la inspección quedó guardada en el celular y se enviará al volver la señal.');
+
+            // Sin recargar (la página no cargaría sin señal): formulario limpio y nueva clave
+            form.reset();
+            const clave = form.querySelector('input[name="clave_idempotencia"]');
+            if (clave && window.crypto && crypto.randomUUID) clave.value = crypto.randomUUID();
+            window.scrollTo({ top: 0, behavior: 'smooth' });
+        });
+    }
+
+    window.addEventListener('online', function() {
+        sincronizarCola().then(actualizarPaqueteOffline);
+    });
+    if (navigator.onLine) sincronizarCola().then(actualizarPaqueteOffline);
+});
@@ -1,3 +1,706 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from contextlib import redirect_stdout
+from unittest import mock
+from xml.etree import ElementTree
+from django.apps import apps
+from django.contrib.auth.models import Permission, User
+from django.core.files.storage import default_storage
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.models import ArchivoHistorico, Camion, DocumentoMantencion, EstadoCamion, Mantencion, ModeloVehiculo
+from PIL import Image as ImagenPIL
+from reportlab.lib.utils import ImageReader as ImageReaderReal
+from . import exportaciones
+from .archivo import archivar, inspeccion_archivada
+from .management.commands import regenerar_reportes
+from .models import (
+    CategoriaChecklist, Componente, DestinatarioNotificacion, InsumoUtilizado, Inspeccion, ItemChecklist, KitComponente,
+    NotificacionPendiente, RegistroDiario, RegistroLubricantes, Repuesto, ResultadoItem,
+)
+from .notificaciones import enviar_resumenes
+from .render_pdf import ContextoRender, contexto_render
+from .servicios import emitir_reporte_pendiente, guardar_inspeccion, registrar_inspeccion
+from .sincronizacion import aplicar_lote
+from .utils import (
+    datos_reporte_inspeccion, generar_pdf_mantencion_tecnica, generar_reporte_inspeccion, nombre_documento_reporte,
+    prefetch_informe_tecnico, ruta_reporte,
+)
 
-# Create your tests here.
+
+class InspeccionBaseTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Los reportes PDF se guardan en el storage
+        cls.media = tempfile.mkdtemp()
+        cls.ajustes = override_settings(MEDIA_ROOT=cls.media)
+        cls.ajustes.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.ajustes.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.camion = Camion.objects.create(
+            patente='ABCD12', tipo_camion='TRACTO', rol_operativo='TITULAR', capacidad_m3=30,
+            taller_mantencion='ZMC', fecha_creacion=timezone.now(),
+        )
+        EstadoCamion.objects.create(camion=cls.camion, kilometraje=1000, estado_operativo='OPERATIVO', base_actual='CULLEN')
+        categoria = CategoriaChecklist.objects.create(nombre='KIT DE SEGURIDAD', orden=1)
+        cls.items = [ItemChecklist.objects.create(categoria=categoria, nombre=f'ITEM {i}') for i in range(2)]
+
+    def _resultados(self):
+        return [{'item_id': item.pk, 'estado': 'B', 'observacion': ''} for item in self.items]
+
+    def _inspeccion(self, clave=None):
+        return Inspeccion(
+            camion=self.camion, km_registro=1500, tipo_inspeccion='DIARIO', responsable='Inspector',
+            clave_idempotencia=clave or uuid.uuid4(),
+        )
+
+
+class IdempotenciaTests(InspeccionBaseTests):
+    """Un reenvío con la misma clave_idempotencia retorna la inspección ya registrada sin repetir nada."""
+
+    def test_reenvio_retorna_la_inspeccion_existente(self):
+        clave = uuid.uuid4()
+        primera, creada = guardar_inspeccion(self._inspeccion(clave), self._resultados())
+        self.assertTrue(creada)
+
+        segunda, creada = guardar_inspeccion(self._inspeccion(clave), self._resultados())
+
+        self.assertFalse(creada)
+        self.assertEqual(segunda.pk, primera.pk)
+        self.assertEqual(Inspeccion.objects.count(), 1)
+        self.assertEqual(ResultadoItem.objects.count(), len(self.items))
+        self.assertEqual(Mantencion.objects.count(), 1)
+        self.assertEqual(RegistroDiario.objects.count(), 1)
+
+    def test_reenvio_del_formulario_no_vuelve_a_guardar(self):
+        clave = uuid.uuid4()
+        existente, _creada = guardar_inspeccion(self._inspeccion(clave), self._resultados())
+        self.client.force_login(User.objects.create_user('inspector', password='clave'))
+
+        respuesta = self.client.post(reverse('mantenciones:crear_inspeccion'), {'clave_idempotencia': str(clave)})
+
+        self.assertRedirects(respuesta, '/mantenciones/nueva/', fetch_redirect_response=False)
+        self.assertEqual(list(Inspeccion.objects.values_list('pk', flat=True)), [existente.pk])
+
+
+class ReportePendienteTests(InspeccionBaseTests):
+    """La inspección queda con reporte_pendiente hasta que el reporte se emite completo."""
+
+    def test_reporte_fallido_queda_pendiente_y_se_emite_una_vez(self):
+        with mock.patch('mantenciones.servicios.generar_reporte_inspeccion', side_effect=RuntimeError('sin disco')), \
+                self.assertLogs('mantenciones.servicios', 'ERROR') as registro:
+            inspeccion, creada = registrar_inspeccion(self._inspeccion(), self._resultados())
+
+        self.assertTrue(creada)
+        self.assertIn('queda pendiente', registro.output[0])
+        inspeccion.refresh_from_db()
+        self.assertTrue(inspeccion.reporte_pendiente)
+        self.assertFalse(DocumentoMantencion.objects.exists())
+
+        self.assertIsNotNone(emitir_reporte_pendiente(inspeccion.pk))
+        inspeccion.refresh_from_db()
+        self.assertFalse(inspeccion.reporte_pendiente)
+        self.assertEqual(DocumentoMantencion.objects.filter(mantencion=inspeccion.mantencion).count(), 1)
+
+        # Ya emitida: otra corrida de 'procesar_reportes' no la repite
+        self.assertIsNone(emitir_reporte_pendiente(inspeccion.pk))
+        self.assertEqual(DocumentoMantencion.objects.count(), 1)
+
+    def test_reporte_exitoso_no_queda_pendiente(self):
+        inspeccion, _creada = registrar_inspeccion(self._inspeccion(), self._resultados())
+
+        inspeccion.refresh_from_db()
+        self.assertFalse(inspeccion.reporte_pendiente)
+        self.assertEqual(DocumentoMantencion.objects.get().nombre_archivo, f"Checklist_ABCD12_{timezone.localdate():%Y%m%d}.pdf")
+
+
+    def test_falla_del_correo_queda_pendiente_y_el_reintento_no_duplica(self):
+        DestinatarioNotificacion.objects.create(correo='taller@zmc.cl', modo='INMEDIATO')
+        DestinatarioNotificacion.objects.create(correo='jefe@zmc.cl', modo='RESUMEN')
+        with mock.patch('mantenciones.notificaciones.EmailMessage.send', side_effect=OSError('smtp caído')), \
+                self.assertLogs('mantenciones.servicios', 'ERROR'):
+            inspeccion, _creada = registrar_inspeccion(self._inspeccion(), self._resultados())
+
+        inspeccion.refresh_from_db()
+        self.assertTrue(inspeccion.reporte_pendiente)
+        self.assertIsNone(inspeccion.reporte_tomado)
+
+        self.assertIsNotNone(emitir_reporte_pendiente(inspeccion.pk))
+
+        inspeccion.refresh_from_db()
+        self.assertFalse(inspeccion.reporte_pendiente)
+        self.assertEqual([m.to for m in mail.outbox], [['taller@zmc.cl']])
+        self.assertEqual(NotificacionPendiente.objects.filter(inspeccion=inspeccion).count(), 1)
+        self.assertEqual(DocumentoMantencion.objects.filter(mantencion=inspeccion.mantencion).count(), 1)
+
+    def test_toma_vigente_de_otro_proceso_se_respeta(self):
+        inspeccion, _creada = guardar_inspeccion(self._inspeccion(), self._resultados())
+        Inspeccion.objects.filter(pk=inspeccion.pk).update(reporte_pendiente=True, reporte_tomado=timezone.now())
+
+        self.assertIsNone(emitir_reporte_pendiente(inspeccion.pk))
+
+        # Un proceso que murió a mitad de la emisión no la deja tomada para siempre
+        Inspeccion.objects.filter(pk=inspeccion.pk).update(reporte_tomado=timezone.now() - timedelta(hours=1))
+        self.assertIsNotNone(emitir_reporte_pendiente(inspeccion.pk))
+        self.assertFalse(Inspeccion.objects.get(pk=inspeccion.pk).reporte_pendiente)
+
+    def test_la_toma_se_marca_antes_de_emitir(self):
+        inspeccion, _creada = guardar_inspeccion(self._inspeccion(), self._resultados())
+        Inspeccion.objects.filter(pk=inspeccion.pk).update(reporte_pendiente=True)
+        tomas = []
+
+        def notificar(insp, *args):
+            tomas.append(Inspeccion.objects.values_list('reporte_tomado', flat=True).get(pk=insp.pk))
+
+        with mock.patch('mantenciones.servicios.notificar_inspeccion', side_effect=notificar):
+            emitir_reporte_pendiente(inspeccion.pk)
+
+        self.assertIsNotNone(tomas[0])
+        self.assertIsNone(Inspeccion.objects.get(pk=inspeccion.pk).reporte_tomado)
+
+
+class SincronizacionTests(InspeccionBaseTests):
+    """Lotes offline: cada inspección en su savepoint, reintentos idempotentes y reportes en cola."""
+
+    def _datos(self, **extra):
+        return {
+            'clave_idempotencia': str(uuid.uuid4()), 'tipo_inspeccion': 'DIARIO', 'camion': self.camion.pk,
+            'km_registro': 1500, 'responsable': 'Inspector', 'resultados': self._resultados(), **extra,
+        }
+
+    def test_lote_reenviado_retorna_la_inspeccion_existente(self):
+        datos = self._datos()
+        [primero] = aplicar_lote([datos])
+        self.assertEqual(primero['estado'], 'CREADA')
+
+        [segundo] = aplicar_lote([datos])
+
+        self.assertEqual(segundo['estado'], 'DUPLICADA')
+        self.assertEqual(segundo['inspeccion_id'], primero['inspeccion_id'])
+        self.assertEqual(Inspeccion.objects.count(), 1)
+
+    def test_error_en_una_inspeccion_no_deshace_las_demas(self):
+        lote = [self._datos(), self._datos(camion=999999), 'sin formato', self._datos(clave_idempotencia='')]
+        lote.append(self._datos())
+
+        estados = [r['estado'] for r in aplicar_lote(lote)]
+
+        self.assertEqual(estados, ['CREADA', 'ERROR', 'ERROR', 'ERROR', 'CREADA'])
+        self.assertEqual(Inspeccion.objects.count(), 2)
+        # El PDF y el correo quedan para 'procesar_reportes'
+        self.assertEqual(Inspeccion.objects.filter(reporte_pendiente=True).count(), 2)
+        self.assertFalse(DocumentoMantencion.objects.exists())
+
+    def test_excepcion_a_mitad_del_guardado_solo_deshace_esa_inspeccion(self):
+        lote = [self._datos(), self._datos(), self._datos()]
+        guardar = guardar_inspeccion
+
+        def guardar_y_fallar(inspeccion, resultados):
+            guardada = guardar(inspeccion, resultados)
+            if str(inspeccion.clave_idempotencia) == lote[1]['clave_idempotencia']:
+                raise RuntimeError('corte de luz')
+            return guardada
+
+        with mock.patch('mantenciones.sincronizacion.guardar_inspeccion', side_effect=guardar_y_fallar):
+            resultados = aplicar_lote(lote)
+
+        self.assertEqual([r['estado'] for r in resultados], ['CREADA', 'ERROR', 'CREADA'])
+        self.assertEqual(resultados[1]['errores']['__all__'][0]['message'], 'corte de luz')
+        self.assertEqual(Inspeccion.objects.count(), 2)
+        self.assertEqual(ResultadoItem.objects.count(), 2 * len(self.items))
+        self.assertEqual(Mantencion.objects.count(), 2)
+
+    def test_api_acepta_lotes_comprimidos(self):
+        self.client.force_login(User.objects.create_user('inspector', password='clave'))
+        cuerpo = gzip.compress(json.dumps({'inspecciones': [self._datos()]}).encode())
+
+        respuesta = self.client.post(
+            reverse('mantenciones:api_sync_inspecciones'), data=cuerpo, content_type='application/json',
+            headers={'Content-Encoding': 'gzip'},
+        )
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resultados'][0]['estado'], 'CREADA')
+
+    def test_paquete_sin_cambios_responde_304(self):
+        self.client.force_login(User.objects.create_user('inspector', password='clave'))
+        url = reverse('mantenciones:api_sync_paquete')
+        version = self.client.get(url).json()['paquete']['version']
+
+        self.assertEqual(self.client.get(url, {'version': version}).status_code, 304)
+
+class ReporteStorageTests(InspeccionBaseTests):
+    """El PDF se reemplaza en el storage con un solo rename y se descarga en bloques (con Range)."""
+
+    def setUp(self):
+        self.inspeccion, _creada = registrar_inspeccion(self._inspeccion(), self._resultados())
+        self.nombre = ruta_reporte(self.inspeccion)
+
+    def _archivos(self):
+        """Archivos de la carpeta de reportes que son de esta inspección (incluye temporales)."""
+        propio = os.path.basename(self.nombre)
+        return [a for a in default_storage.listdir(os.path.dirname(self.nombre))[1] if a.startswith(propio)]
+
+    def test_regenerar_reemplaza_el_mismo_archivo(self):
+        with default_storage.open(self.nombre, 'wb') as f:
+            f.write(b'version anterior')
+
+        nombre, contenido = generar_reporte_inspeccion(self.inspeccion)
+
+        self.assertEqual(nombre, self.nombre)
+        self.assertEqual(self._archivos(), [os.path.basename(self.nombre)])
+        with default_storage.open(nombre, 'rb') as f:
+            self.assertEqual(f.read(), contenido)
+
+    def test_falla_al_reemplazar_no_deja_temporales(self):
+        with default_storage.open(self.nombre, 'rb') as f:
+            anterior = f.read()
+
+        with mock.patch('mantenciones.utils.os.replace', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                generar_reporte_inspeccion(self.inspeccion)
+
+        self.assertEqual(self._archivos(), [os.path.basename(self.nombre)])
+        with default_storage.open(self.nombre, 'rb') as f:
+            self.assertEqual(f.read(), anterior)
+
+    def test_descarga_en_bloques_y_por_rango(self):
+        usuario = User.objects.create_user('supervisor', password='clave')
+        usuario.user_permissions.add(Permission.objects.get(codename='view_inspeccion'))
+        self.client.force_login(usuario)
+        url = reverse('mantenciones:descargar_reporte', args=[self.inspeccion.pk])
+        default_storage.delete(self.nombre)
+
+        # Si falta en el storage se vuelve a generar
+        respuesta = self.client.get(url)
+        self.assertTrue(respuesta.streaming)
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+        self.assertTrue(default_storage.exists(self.nombre))
+
+        parcial = self.client.get(url, headers={'Range': 'bytes=0-3'})
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b''.join(parcial.streaming_content), b'%PDF')
+
+    def test_descarga_sin_permiso(self):
+        self.client.force_login(User.objects.create_user('invitado', password='clave'))
+
+        respuesta = self.client.get(reverse('mantenciones:descargar_reporte', args=[self.inspeccion.pk]))
+
+        self.assertEqual(respuesta.status_code, 403)
+
+
+class PoolEnProceso:
+    """Reemplazo de ProcessPoolExecutor que corre cada trabajo en el proceso de la prueba (ve la BD de pruebas)."""
+
+    def __init__(self, max_workers=None, mp_context=None, initializer=None):
+        if initializer:
+            initializer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+
+@mock.patch('mantenciones.management.commands.regenerar_reportes.ProcessPoolExecutor', PoolEnProceso)
+class RegenerarReportesTests(InspeccionBaseTests):
+    """'regenerar_reportes' registra el DocumentoMantencion de cada reporte y guarda su avance para reanudar."""
+
+    def setUp(self):
+        self.inspecciones = [guardar_inspeccion(self._inspeccion(), self._resultados())[0] for _ in range(3)]
+        self.progreso = os.path.join(self.media, f'progreso_{uuid.uuid4()}.json')
+
+    def _regenerar(self, *args):
+        salida = StringIO()
+        call_command('regenerar_reportes', '--progreso', self.progreso, '--procesos', '1', *args, stdout=salida, stderr=salida)
+        return salida.getvalue()
+
+    def test_registra_los_documentos_y_no_repite_lo_hecho(self):
+        self._regenerar('--camion', 'abcd12')
+
+        for inspeccion in self.inspecciones:
+            documento = DocumentoMantencion.objects.get(mantencion=inspeccion.mantencion)
+            self.assertEqual(documento.nombre_archivo, nombre_documento_reporte(inspeccion))
+            self.assertEqual(documento.tipo_documento, 'CHECKLIST_ENAP')
+            self.assertEqual(documento.ruta_archivo, reverse('mantenciones:descargar_reporte', args=[inspeccion.pk]))
+            self.assertTrue(default_storage.exists(ruta_reporte(inspeccion)))
+
+        self.assertIn('No hay reportes pendientes', self._regenerar('--camion', 'abcd12'))
+        self.assertEqual(DocumentoMantencion.objects.count(), 3)
+
+    def test_reporte_fallido_queda_para_la_siguiente_corrida(self):
+        fallida = self.inspecciones[1]
+        original = regenerar_reportes._renderizar
+
+        def renderizar_o_fallar(inspeccion, *args):
+            if inspeccion.pk == fallida.pk:
+                raise RuntimeError('plantilla rota')
+            return original(inspeccion, *args)
+
+        with mock.patch.object(regenerar_reportes, '_renderizar', renderizar_o_fallar):
+            self.assertIn('1 errores', self._regenerar())
+        self.assertFalse(DocumentoMantencion.objects.filter(mantencion=fallida.mantencion).exists())
+
+        self._regenerar()
+
+        self.assertEqual(DocumentoMantencion.objects.count(), 3)
+
+    def test_avance_de_otros_filtros_se_rechaza(self):
+        self._regenerar('--tipo', 'DIARIO')
+
+        with self.assertRaises(CommandError):
+            self._regenerar('--tipo', 'MANTENCION')
+        self.assertIn('No hay reportes pendientes', self._regenerar('--tipo', 'MANTENCION', '--reiniciar'))
+
+    def test_nombre_del_documento_usa_la_fecha_local(self):
+        inspeccion = self.inspecciones[0]
+        # 01:30 UTC del 1 de marzo todavía es 28 de febrero en Chile
+        inspeccion.fecha_ingreso = datetime(2026, 3, 1, 1, 30, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(nombre_documento_reporte(inspeccion), 'Checklist_ABCD12_20260228.pdf')
+
+
+class InformeTecnicoTests(InspeccionBaseTests):
+    """Informe de mantención técnica: texto libre con marcas de ReportLab y render sin consultas."""
+
+    TEXTO = 'Fuga <b> & filtro <sin cerrar'
+
+    def setUp(self):
+        modelo = ModeloVehiculo.objects.create(nombre='Actros', marca='Mercedes-Benz')
+        Camion.objects.filter(pk=self.camion.pk).update(modelo=modelo)
+        componente = Componente.objects.create(nombre='Motor OM501', categoria='MOTOR', modelo=modelo)
+        repuesto = Repuesto.objects.create(nombre='Filtro <aceite> & combustible', codigo_zmc='FIL-1')
+        KitComponente.objects.create(componente=componente, repuesto=repuesto, cantidad_necesaria=2, plan_asociado='SM1')
+        categoria = CategoriaChecklist.objects.create(nombre='MOTOR & <TREN>', orden=2)
+        item = ItemChecklist.objects.create(
+            categoria=categoria, nombre='Cambio de <filtro>', nivel_servicio='SM1', referencia_tecnica='WIS <1>',
+        )
+
+        self.inspeccion = Inspeccion.objects.create(
+            camion_id=self.camion.pk, km_registro=1500, tipo_inspeccion='MANTENCION', responsable='Mecánico',
+            observaciones=self.TEXTO, clave_idempotencia=uuid.uuid4(),
+        )
+        ResultadoItem.objects.create(inspeccion=self.inspeccion, item=item, estado='B', observacion=self.TEXTO)
+        RegistroLubricantes.objects.create(inspeccion=self.inspeccion, tipo_lubricante='ACEITE <MOTOR>', renovado=True, proximo_cambio_km=31500)
+        InsumoUtilizado.objects.create(inspeccion=self.inspeccion, repuesto=repuesto, cantidad_usada=2, observacion=self.TEXTO)
+
+    def test_render_con_texto_libre_sin_consultas(self):
+        inspeccion = Inspeccion.objects.select_related('camion__contrato', 'camion__modelo').get(pk=self.inspeccion.pk)
+        resultados = list(inspeccion.resultados.select_related('item__categoria'))
+        datos = datos_reporte_inspeccion(inspeccion)
+        prefetch_informe_tecnico([inspeccion])
+
+        with self.assertNumQueries(0):
+            contenido = generar_pdf_mantencion_tecnica(inspeccion, resultados, datos)
+
+        self.assertTrue(contenido.startswith(b'%PDF'))
+
+    def test_reporte_tecnico_queda_en_el_storage(self):
+        nombre, contenido = generar_reporte_inspeccion(self.inspeccion)
+
+        self.assertEqual(nombre, f'reportes/mantencion/reporte_{self.inspeccion.pk}_ABCD12.pdf')
+        with default_storage.open(nombre, 'rb') as f:
+            self.assertEqual(f.read(), contenido)
+
+
+class ResumenesTests(InspeccionBaseTests):
+    """Resúmenes por correo: una sola conexión, filas tomadas antes de enviar y devueltas a la cola si falla."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.inmediato = DestinatarioNotificacion.objects.create(correo='taller@zmc.cl', modo='INMEDIATO')
+        cls.resumen = DestinatarioNotificacion.objects.create(correo='jefe@zmc.cl', modo='RESUMEN', intervalo_minutos=60)
+        cls.otro_resumen = DestinatarioNotificacion.objects.create(correo='cullen@zmc.cl', modo='RESUMEN', base='CULLEN')
+
+    def setUp(self):
+        self.inspecciones = [registrar_inspeccion(self._inspeccion(), self._resultados())[0] for _ in range(2)]
+
+    def test_inmediato_sale_al_registrar_y_resumen_queda_en_cola(self):
+        self.assertEqual([m.to for m in mail.outbox], [['taller@zmc.cl'], ['taller@zmc.cl']])
+        self.assertEqual(NotificacionPendiente.objects.filter(enviado__isnull=True).count(), 4)
+
+    def test_un_correo_por_grupo_de_destinatarios(self):
+        mail.outbox.clear()
+
+        self.assertEqual(enviar_resumenes(), (1, 2))
+
+        [correo] = mail.outbox
+        self.assertEqual(correo.to, ['cullen@zmc.cl', 'jefe@zmc.cl'])
+        self.assertEqual(len(correo.attachments), 2)
+        self.assertFalse(NotificacionPendiente.objects.filter(enviado__isnull=True).exists())
+        # Dentro del intervalo no se vuelve a enviar, aunque llegue otra inspección
+        registrar_inspeccion(self._inspeccion(), self._resultados())
+        self.assertEqual(enviar_resumenes(), (0, 0))
+        self.assertEqual(enviar_resumenes(forzar=True), (1, 1))
+
+    def test_toma_las_filas_sin_esperar_bloqueos(self):
+        with CaptureQueriesContext(connection) as consultas:
+            enviar_resumenes()
+
+        self.assertTrue(any('SKIP LOCKED' in c['sql'] for c in consultas.captured_queries))
+
+    def test_falla_smtp_devuelve_las_filas_a_la_cola(self):
+        with mock.patch('mantenciones.notificaciones.get_connection') as conexion:
+            conexion.return_value.__enter__.return_value.send_messages.side_effect = OSError('smtp caído')
+            with self.assertRaises(OSError):
+                enviar_resumenes()
+
+        self.assertEqual(NotificacionPendiente.objects.filter(enviado__isnull=True).count(), 4)
+        self.assertIsNone(DestinatarioNotificacion.objects.get(pk=self.resumen.pk).ultimo_resumen)
+        mail.outbox.clear()
+        self.assertEqual(enviar_resumenes(), (1, 2))
+
+
+class CheckDatosTests(InspeccionBaseTests):
+    """check_datos como mapa {item_id: estado}: consultas con @> y la conversión de los registros antiguos."""
+
+    def _registro(self, check_datos, novedades=None):
+        return RegistroDiario.objects.create(
+            vehiculo=self.camion, revisado_por='Inspector', km_actual=1500, check_datos=check_datos, novedades=novedades,
+        )
+
+    def test_con_estado_filtra_por_item(self):
+        malo = self._registro({str(self.items[0].pk): 'M', str(self.items[1].pk): 'B'})
+        self._registro({str(self.items[0].pk): 'B'})
+
+        self.assertEqual(list(RegistroDiario.objects.con_estado(self.items[0])), [malo])
+        self.assertEqual(list(RegistroDiario.objects.camiones_con_estado(self.items[0].pk)), [self.camion.pk])
+
+    def test_migracion_convierte_y_aparta_los_ilegibles(self):
+        migracion = importlib.import_module('mantenciones.migrations.0008_registrodiario_check_datos')
+        lista = self._registro('[{"item_id": 12, "estado": "B"}, {"item_id": 15, "estado": "M"}, "basura"]')
+        mapa = self._registro('{"7": "R"}')
+        ilegible = self._registro('[{"item_id": 12, "estado": ', novedades='Frenos')
+        ya_convertido = self._registro({'3': 'B'})
+
+        salida = StringIO()
+        with redirect_stdout(salida), connection.schema_editor() as editor:
+            migracion.normalizar_check_datos(apps, editor)
+
+        for registro in (lista, mapa, ilegible, ya_convertido):
+            registro.refresh_from_db()
+        self.assertEqual(lista.check_datos, {'12': 'B', '15': 'M'})
+        self.assertEqual(mapa.check_datos, {'7': 'R'})
+        self.assertEqual(ya_convertido.check_datos, {'3': 'B'})
+        self.assertEqual(ilegible.check_datos, {})
+        self.assertEqual(ilegible.novedades, 'Frenos\nChecklist original ilegible: [{"item_id": 12, "estado": ')
+        self.assertIn(f'(ids: {ilegible.pk})', salida.getvalue())
+
+
+class ExportacionXlsxTests(InspeccionBaseTests):
+    """XLSX del historial escrito en streaming (sin temporal) y permiso de la descarga web."""
+
+    NS = {'h': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(3):
+            Mantencion.objects.create(
+                taller='ZMC', tipo_mantencion='TALLER', fecha_mantencion=datetime(2026, 1, i + 1).date(),
+                camion=cls.camion, km_mantencion=1000 * i, observaciones=f'Frenos <{i}> & luces\x01',
+            )
+
+    def _login(self, *permisos):
+        usuario = User.objects.create_user('supervisor', password='clave')
+        usuario.user_permissions.add(*Permission.objects.filter(codename__in=permisos))
+        self.client.force_login(usuario)
+
+    def _celdas(self, contenido):
+        with zipfile.ZipFile(BytesIO(contenido)) as libro:
+            self.assertIn('xl/workbook.xml', libro.namelist())
+            hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+        return [
+            [''.join(c.itertext()) for c in fila.findall('h:c', self.NS)]
+            for fila in hoja.find('h:sheetData', self.NS)
+        ]
+
+    def test_descarga_en_trozos(self):
+        self._login('view_mantencion')
+
+        with mock.patch.object(exportaciones, 'FILAS_POR_TROZO', 1):
+            response = self.client.get(reverse('mantenciones:exportar_historial', args=['mantenciones']), {'formato': 'xlsx'})
+            self.assertTrue(response.streaming)
+            trozos = list(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('mantenciones_', response['Content-Disposition'])
+        self.assertGreater(len(trozos), 2)
+        filas = self._celdas(b''.join(trozos))
+        self.assertEqual(filas[0][:3], ['ID', 'Tipo', 'Fecha'])
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[1][2], '2026-01-01')
+        # Los caracteres de control se quitan y los especiales de XML se escapan
+        self.assertIn('Frenos <0> & luces', filas[1])
+
+    def test_numeros_quedan_como_numeros(self):
+        contenido = b''.join(exportaciones.trozos_xlsx('mantenciones'))
+
+        with zipfile.ZipFile(BytesIO(contenido)) as libro:
+            hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+        celda = hoja.find("h:sheetData/h:row[@r='3']/h:c[@r='I3']", self.NS)
+        self.assertIsNone(celda.get('t'))
+        self.assertEqual(celda.find('h:v', self.NS).text, '1000')
+
+    def test_sin_permiso_del_modelo_es_403(self):
+        self._login('view_inspeccion')
+
+        response = self.client.get(reverse('mantenciones:exportar_historial', args=['mantenciones']), {'formato': 'xlsx'})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_comando_escribe_el_archivo_y_cuenta_las_filas(self):
+        salida = os.path.join(self.media, 'mantenciones.xlsx')
+        out = StringIO()
+
+        call_command('exportar_historial', 'mantenciones', '--formato', 'xlsx', '--salida', salida, stdout=out)
+
+        self.assertIn('3 filas exportadas', out.getvalue())
+        with open(salida, 'rb') as archivo:
+            self.assertEqual(len(self._celdas(archivo.read())), 4)
+
+
+class ArchivoTests(InspeccionBaseTests):
+    """archivar() mueve las filas a ArchivoHistorico sin perder datos; el admin las sigue mostrando."""
+
+    ANTES = datetime(2025, 6, 10, 9, tzinfo=dt_timezone.utc)
+
+    def _antigua(self):
+        inspeccion = self._inspeccion()
+        inspeccion.responsable = 'Inspector <turno>'
+        inspeccion.reporte_tomado = self.ANTES + timedelta(minutes=5)
+        inspeccion.save()
+        for item, estado in zip(self.items, 'BM'):
+            ResultadoItem.objects.create(inspeccion=inspeccion, item=item, estado=estado, observacion='Revisar <luz>')
+        RegistroLubricantes.objects.create(inspeccion=inspeccion, tipo_lubricante='ACEITE MOTOR', renovado=True, proximo_cambio_km=31500)
+        Inspeccion.objects.filter(pk=inspeccion.pk).update(fecha_ingreso=self.ANTES)
+        return Inspeccion.objects.get(pk=inspeccion.pk)
+
+    def test_inspeccion_vuelve_igual_desde_el_archivo(self):
+        original = self._antigua()
+        resultados = list(original.resultados.order_by('pk').values_list('item_id', 'estado', 'observacion'))
+
+        self.assertEqual(archivar(timezone.now(), tablas=['INSPECCION']), {'INSPECCION': 1})
+
+        self.assertFalse(Inspeccion.objects.filter(pk=original.pk).exists())
+        [fila] = ArchivoHistorico.objects.get(tabla='INSPECCION').leer()
+        copia = ArchivoHistorico.a_instancia(Inspeccion, fila)
+        for campo in Inspeccion._meta.concrete_fields:
+            self.assertEqual(getattr(copia, campo.attname), getattr(original, campo.attname), campo.attname)
+        self.assertEqual(copia.reporte_tomado, self.ANTES + timedelta(minutes=5))
+
+        archivada = inspeccion_archivada(original.pk)
+        self.assertTrue(archivada.archivada)
+        self.assertEqual(archivada.reporte_tomado, original.reporte_tomado)
+        with self.assertNumQueries(0):
+            self.assertEqual([(r.item_id, r.estado, r.observacion) for r in archivada.resultados.all()], resultados)
+            self.assertEqual([l.proximo_cambio_km for l in archivada.lubricantes.all()], [31500])
+
+    def test_registro_diario_vuelve_igual_desde_el_archivo(self):
+        registro = RegistroDiario.objects.create(
+            vehiculo=self.camion, revisado_por='Inspector', km_actual=1500,
+            check_datos={str(self.items[0].pk): 'M'}, novedades='Luz quemada',
+        )
+        RegistroDiario.objects.filter(pk=registro.pk).update(fecha=self.ANTES)
+        registro.refresh_from_db()
+
+        archivar(timezone.now(), tablas=['REGISTRO_DIARIO'])
+
+        [fila] = ArchivoHistorico.objects.get(tabla='REGISTRO_DIARIO').leer()
+        copia = ArchivoHistorico.a_instancia(RegistroDiario, fila)
+        for campo in RegistroDiario._meta.concrete_fields:
+            self.assertEqual(getattr(copia, campo.attname), getattr(registro, campo.attname), campo.attname)
+
+    def test_admin_redirige_a_la_fila_archivada(self):
+        original = self._antigua()
+        archivar(timezone.now(), tablas=['INSPECCION'])
+        archivo = ArchivoHistorico.objects.get(tabla='INSPECCION')
+        self.client.force_login(User.objects.create_superuser('admin', password='clave'))
+
+        respuesta = self.client.get(reverse('admin:mantenciones_inspeccion_change', args=[original.pk]))
+
+        url = reverse('admin:core_archivohistorico_change', args=[archivo.pk])
+        self.assertRedirects(respuesta, f'{url}#fila-{original.pk}', fetch_redirect_response=False)
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, f'id="fila-{original.pk}"')
+        # Texto escapado; de las relaciones solo la cantidad de filas
+        self.assertContains(respuesta, 'Inspector &lt;turno&gt;')
+        self.assertNotContains(respuesta, 'Revisar')
+
+    def test_admin_sin_archivo_mantiene_el_aviso_de_inexistente(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='clave'))
+
+        respuesta = self.client.get(reverse('admin:mantenciones_inspeccion_change', args=[999999]))
+
+        self.assertRedirects(respuesta, reverse('admin:index'), fetch_redirect_response=False)
+
+
+class ContextoRenderTests(SimpleTestCase):
+    """Estilos y logos de ReportLab se preparan una vez por proceso; un logo reemplazado se vuelve a leer."""
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta, ignore_errors=True)
+        self.ruta = os.path.join(self.carpeta, 'logo.png')
+        ImagenPIL.new('RGB', (4, 2), 'red').save(self.ruta)
+
+    def test_contexto_unico_por_proceso(self):
+        self.assertIs(contexto_render(), contexto_render())
+
+    def test_imagen_se_decodifica_una_sola_vez(self):
+        ctx = ContextoRender()
+        with mock.patch('mantenciones.render_pdf.ImageReader', wraps=ImageReaderReal) as lector:
+            primera = ctx.imagen(self.ruta, 10, 5)
+            segunda = ctx.imagen(self.ruta, 10, 5)
+
+        self.assertEqual(lector.call_count, 1)
+        self.assertIsNot(primera, segunda)
+        self.assertIs(primera._img, segunda._img)
+
+    def test_logo_reemplazado_se_vuelve_a_leer(self):
+        ctx = ContextoRender()
+        anterior = ctx.imagen(self.ruta, 10, 5)._img
+        ImagenPIL.new('RGB', (8, 8), 'blue').save(self.ruta)
+        os.utime(self.ruta, ns=(0, os.stat(self.ruta).st_mtime_ns + 1))
+
+        nuevo = ctx.imagen(self.ruta, 10, 5)._img
+
+        self.assertIsNot(nuevo, anterior)
+        self.assertEqual(nuevo.getSize(), (8, 8))
+        self.assertEqual(len(ctx._imagenes), 1)
+
+    def test_imagen_inexistente(self):
+        self.assertIsNone(ContextoRender().imagen(os.path.join(self.carpeta, 'firma.png'), 10, 5))
@@ -1,6 +1,6 @@
 """
 mantenciones/urls.py
-Rutas URL para crear inspecciones y APIs de autocompletado de datos.
+Rutas URL para crear inspecciones, descargar sus reportes, APIs de autocompletado, sincronización offline y exportación CSV.
 """
 
 from django.urls import path
@@ -10,7 +10,11 @@ app_name = 'mantenciones'
 
 urlpatterns = [
     path('nueva/', views.crear_inspeccion, name='crear_inspeccion'),
+    path('inspeccion/<int:inspeccion_id>/reporte/', views.descargar_reporte, name='descargar_reporte'),
     path('api/datos-autocompletado/<int:camion_id>/', views.api_datos_autocompletado, name='api_datos_autocompletado'),
     path('api/categorias/<str:tipo_inspeccion>/', views.api_categorias_por_tipo, name='api_categorias_por_tipo'),
     path('api/remolque-asignado/<int:camion_id>/', views.api_remolque_asignado, name='api_remolque_asignado'),
+    path('api/sync/paquete/', views.api_sync_paquete, name='api_sync_paquete'),
+    path('api/sync/inspecciones/', views.api_sync_inspecciones, name='api_sync_inspecciones'),
+    path('exportar/<str:tipo>/', views.exportar_historial, name='exportar_historial'),
 ]
\ No newline at end of file
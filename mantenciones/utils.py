@@ -8,18 +8,22 @@ Autocompletación de datos del camión, remolque, documentos y generación de re
 """
 
 from datetime import datetime
+from io import BytesIO
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.utils import timezone
+from django.db.models import Prefetch, prefetch_related_objects
+from xml.sax.saxutils import escape
 from core.models import Conductor, DocumentacionGeneral
+from .models import InsumoUtilizado, KitComponente
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
+from .render_pdf import contexto_render
 import os
 
-def obtener_datos_camion_autocompletado(camion):
+def obtener_datos_camion_autocompletado(camion, docs_camion=None, docs_remolque=None):
     """
     Recopila todos los datos del camión para auto-llenar formularios de inspección:
     - Información del camión: patente, marca, modelo, año
@@ -27,7 +31,8 @@ def obtener_datos_camion_autocompletado(camion):
     - Vencimientos: RT, PC, SOAP, TC8
     - Remolque asignado (si existe) con sus vencimientos
     
-    Retorna dict con todas las claves necesarias para templates
+    Retorna dict con todas las claves necesarias para templates.
+    'docs_camion' / 'docs_remolque' permiten pasar la DocumentacionGeneral ya cargada (ej: paquete offline de toda la flota).
     """
     """
     Retorna un diccionario con todos los datos que se auto-llenan 
@@ -73,7 +78,8 @@ def obtener_datos_camion_autocompletado(camion):
     }
 
     # 3. Buscar documentos del camión (Vencimientos)
-    docs_camion = DocumentacionGeneral.objects.filter(camion=camion, tipo_entidad='CAMION')
+    if docs_camion is None:
+        docs_camion = DocumentacionGeneral.objects.filter(camion=camion, tipo_entidad='CAMION')
     for doc in docs_camion:
         key = f"camion_vto_{doc.categoria.lower().replace('REVISION_TECNICA', 'rt').replace('PERMISO_CIRCULACION', 'pc')}"
         # Mapeo manual para asegurar que coincida con tus llaves
@@ -86,9 +92,8 @@ def obtener_datos_camion_autocompletado(camion):
         if doc.categoria in mapa_docs:
             datos[mapa_docs[doc.categoria]] = doc.fecha_vencimiento.strftime('%d/%m/%Y') if doc.fecha_vencimiento else 'N/A'
 
-    # 4. Lógica de Remolque Asignado
-    from core.models import AsignacionTractoRemolque
-    asignacion = AsignacionTractoRemolque.objects.filter(camion=camion, activo=True).first()
+    # 4. Lógica de Remolque Asignado (puntero a la asignación activa)
+    asignacion = camion.asignacion_actual
     
     if asignacion:
         rem = asignacion.remolque
@@ -103,7 +108,9 @@ def obtener_datos_camion_autocompletado(camion):
         })
 
         # Documentos del Remolque
-        docs_rem = DocumentacionGeneral.objects.filter(remolque=rem, tipo_entidad='REMOLQUE')
+        docs_rem = docs_remolque
+        if docs_rem is None:
+            docs_rem = DocumentacionGeneral.objects.filter(remolque=rem, tipo_entidad='REMOLQUE')
         mapa_rem = {
             'REVISION_TECNICA': 'remolque_vto_rt',
             'PERMISO_CIRCULACION': 'remolque_vto_pc',
@@ -117,17 +124,232 @@ def obtener_datos_camion_autocompletado(camion):
 
     return datos
 
+def sugerencia_mantenimiento(camion, conteo_preventivas, planes):
+    """
+    Paquetes sugeridos para la próxima preventiva según la posición del camión en el ciclo del CronogramaPlan.
+    'planes' son los CronogramaPlan del modelo del camión ordenados por posicion_ciclo.
+    """
+    sugerencia = "DIARIO"
+    paquetes_sugeridos = []
+
+    if camion.modelo_id and planes:
+        # Calculamos la posición en el ciclo (ej: 1 al 8 o 1 al 16)
+        posicion = (conteo_preventivas % len(planes)) + 1
+        plan = next((p for p in planes if p.posicion_ciclo == posicion), None)
+
+        if plan:
+            paquetes_sugeridos = plan.paquetes_json # Ej: ["SM2", "MB1"]
+            sugerencia = f"Sugerido: {', '.join(paquetes_sugeridos)}"
+
+    return {'texto': sugerencia, 'paquetes': paquetes_sugeridos}
+
+def prefetch_informe_tecnico(inspecciones):
+    """
+    Carga en bloque lo que usa el informe técnico (lubricantes, insumos y kits del modelo),
+    para que el render no haga consultas (ej: dentro de un worker de regenerar_reportes).
+    Las inspecciones que ya lo tienen cargado no se vuelven a consultar.
+    """
+    prefetch_related_objects(
+        list(inspecciones),
+        'lubricantes',
+        Prefetch('insumos_usados', queryset=InsumoUtilizado.objects.select_related('repuesto').order_by('pk')),
+        Prefetch('camion__modelo__componentes__kits', queryset=KitComponente.objects.select_related('repuesto')),
+    )
+
 def generar_pdf_mantencion_tecnica(inspeccion, resultados_items, datos_autocompletado):
     """
-    Genera un PDF de reporte de mantención técnica con detalles de la inspección.
-    (Placeholder para implementación futura)
+    Genera el PDF del informe de mantención técnica (SM1, SM2, SC1, MB1, ST1...):
+    - Datos del camión y del servicio
+    - Tareas agrupadas por categoría con referencia técnica (WIS) y código SAP
+    - Lubricantes renovados y próximo cambio
+    - Insumos utilizados contra la cantidad del kit del plan
+    Usa lo que dejó cargado prefetch_informe_tecnico y retorna los bytes del PDF.
     """
-    return 0
+    ctx = contexto_render()
+    cell_body_style = ctx.estilos['celda']
+    header_label = ctx.estilos['etiqueta']
+    camion = inspeccion.camion
+    resultados_items = list(resultados_items)
+
+    # Planes realizados según las tareas registradas (la herencia SM2 -> SM1 ya viene en los ítems)
+    niveles = sorted({res.item.nivel_servicio for res in resultados_items if res.item.nivel_servicio != 'DIARIO'})
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            rightMargin=30, leftMargin=30,
+                            topMargin=30, bottomMargin=30)
+    story = [ctx.encabezado_logos(camion.contrato), Spacer(1, 10)]
+
+    story.append(Paragraph(f"INFORME DE MANTENCIÓN TÉCNICA {' / '.join(niveles)}".strip(), ctx.estilos['titulo']))
+    story.append(Paragraph(escape(datos_autocompletado.get('camion_patente', camion.patente)), ctx.estilos['patente']))
+    story.append(Spacer(1, 10))
+
+    story.append(Paragraph("INFORMACIÓN", header_label))
+    c_w = 7.5*inch / 4
+    info_data = [
+        ['Fecha Servicio:', datos_autocompletado['fecha_inspeccion'], 'Lugar:', datos_autocompletado['lugar_inspeccion']],
+        ['Marca / Modelo:', Paragraph(escape(f"{datos_autocompletado['camion_marca']} {datos_autocompletado['camion_modelo']}"), cell_body_style),
+         'Odómetro:', f"{inspeccion.km_registro:,}"],
+        ['Responsable:', inspeccion.responsable, 'Contrato:', camion.contrato.nombre if camion.contrato else 'GENERAL'],
+        ['¿Apto para Operar?:', datos_autocompletado['apto_trabajar'], '¿Renovó Aceite?:', 'SÍ' if inspeccion.renovó_aceite else 'NO'],
+    ]
+    t_info = Table(info_data, colWidths=[c_w]*4)
+    t_info.setStyle(ctx.tabla_base(('FONTSIZE', (0,0), (-1,-1), 9)))
+    story.append(t_info)
+
+    # --- TAREAS POR CATEGORÍA ---
+    mapeo_nombres = {'B': 'BUENO', 'R': 'REGULAR', 'M': 'MALO', 'S': 'SÍ', 'N': 'NO', 'X': 'N/A'}
+    items_por_categoria = {}
+    for res in resultados_items:
+        items_por_categoria.setdefault(res.item.categoria.nombre, []).append(res)
+
+    for categoria, resultados in items_por_categoria.items():
+        story.append(Paragraph(escape(categoria.upper()), header_label))
+        data = [['N°', 'Tarea', 'Ref. Técnica', 'Cód. SAP', 'Estado', 'Observación']]
+        for idx, res in enumerate(resultados, 1):
+            data.append([
+                str(idx),
+                Paragraph(escape(res.item.nombre), cell_body_style),
+                Paragraph(escape(res.item.referencia_tecnica or '-'), cell_body_style),
+                res.item.codigo_sap or '-',
+                mapeo_nombres.get(res.estado, '-'),
+                Paragraph(escape(res.observacion or ''), cell_body_style),
+            ])
+        # repeatRows: si la categoría salta de página se repite el encabezado
+        t_tareas = Table(data, colWidths=[0.4*inch, 2.6*inch, 1.1*inch, 0.9*inch, 0.8*inch, 1.7*inch], repeatRows=1)
+        t_tareas.setStyle(ctx.tablas['checklist'])
+        story.append(t_tareas)
+
+    # --- LUBRICANTES ---
+    story.append(Paragraph("LUBRICANTES", header_label))
+    lubricantes = list(inspeccion.lubricantes.all())
+    if lubricantes:
+        data = [['Lubricante', 'Renovado', 'Próximo cambio (km)']]
+        for lub in lubricantes:
+            data.append([
+                Paragraph(escape(lub.tipo_lubricante), cell_body_style),
+                'SÍ' if lub.renovado else 'NO',
+                f"{lub.proximo_cambio_km:,}" if lub.proximo_cambio_km else '-',
+            ])
+        t_lub = Table(data, colWidths=[3.9*inch, 1.4*inch, 2.2*inch], repeatRows=1)
+        t_lub.setStyle(ctx.tablas['checklist'])
+        story.append(t_lub)
+    else:
+        story.append(Paragraph("Sin lubricantes registrados.", cell_body_style))
+
+    # --- INSUMOS UTILIZADOS VS KIT DEL PLAN ---
+    story.append(Paragraph("INSUMOS", header_label))
+    kit = {}
+    if camion.modelo:
+        for componente in camion.modelo.componentes.all():
+            for k in componente.kits.all():
+                if k.plan_asociado in niveles:
+                    fila = kit.setdefault(k.repuesto_id, {'repuesto': k.repuesto, 'cantidad': 0})
+                    fila['cantidad'] += k.cantidad_necesaria
+
+    usados = {}
+    for insumo in inspeccion.insumos_usados.all():
+        fila = usados.setdefault(insumo.repuesto_id, {'repuesto': insumo.repuesto, 'cantidad': 0, 'obs': []})
+        fila['cantidad'] += insumo.cantidad_usada
+        if insumo.observacion:
+            fila['obs'].append(insumo.observacion)
+
+    if kit or usados:
+        data = [['Repuesto', 'Código ZMC', 'Unidad', 'Cant. Kit', 'Cant. Usada', 'Observación']]
+        for repuesto_id in list(kit) + [r for r in usados if r not in kit]:
+            fila_kit, fila_uso = kit.get(repuesto_id), usados.get(repuesto_id)
+            repuesto = (fila_kit or fila_uso)['repuesto']
+            data.append([
+                Paragraph(escape(repuesto.nombre), cell_body_style),
+                repuesto.codigo_zmc or 'S/C',
+                repuesto.unidad_medida,
+                f"{fila_kit['cantidad']:g}" if fila_kit else '-',
+                f"{fila_uso['cantidad']:g}" if fila_uso else '0',
+                Paragraph(escape('; '.join(fila_uso['obs'])) if fila_uso else '', cell_body_style),
+            ])
+        t_ins = Table(data, colWidths=[2.3*inch, 1.0*inch, 0.8*inch, 0.8*inch, 0.9*inch, 1.7*inch], repeatRows=1)
+        t_ins.setStyle(ctx.tablas['checklist'])
+        story.append(t_ins)
+    else:
+        story.append(Paragraph("Sin insumos registrados.", cell_body_style))
+
+    if inspeccion.observaciones:
+        story.append(Paragraph("OBSERVACIONES", header_label))
+        story.append(Paragraph(escape(inspeccion.observaciones), cell_body_style))
+
+    story.append(Spacer(1, 20))
+    story.append(ctx.tabla_firmas(inspeccion.responsable, 'Responsable Mantención'))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+def ruta_reporte(inspeccion):
+    """Nombre del PDF de la inspección dentro del storage (siempre el mismo para la misma inspección)."""
+    return f"reportes/{inspeccion.tipo_inspeccion.lower()}/reporte_{inspeccion.pk}_{inspeccion.camion.patente}.pdf"
+
+def _prefijo_reporte(inspeccion):
+    return 'Checklist' if inspeccion.tipo_inspeccion == 'DIARIO' else 'Informe_Tecnico'
+
+def nombre_descarga_reporte(inspeccion):
+    """Nombre amigable del PDF para adjuntos y descargas."""
+    return f"{_prefijo_reporte(inspeccion)}_{inspeccion.camion.patente}_{timezone.localtime(inspeccion.fecha_ingreso).strftime('%d-%m-%Y')}.pdf"
+
+def nombre_documento_reporte(inspeccion):
+    """nombre_archivo del DocumentoMantencion que registra el PDF de la inspección."""
+    return f"{_prefijo_reporte(inspeccion)}_{inspeccion.camion.patente}_{timezone.localtime(inspeccion.fecha_ingreso).strftime('%Y%m%d')}.pdf"
+
+def tipo_documento_reporte(inspeccion):
+    """tipo_documento del DocumentoMantencion que registra el PDF de la inspección."""
+    return 'CHECKLIST_ENAP' if inspeccion.tipo_inspeccion == 'DIARIO' else 'INFORME_TECNICO'
+
+def datos_reporte_inspeccion(inspeccion, datos_camion=None):
+    """
+    Datos de autocompletado más los propios de la inspección que usan los reportes.
+    'datos_camion' permite reutilizar el autocompletado ya calculado para el camión (reportes en lote).
+    """
+    if datos_camion is not None:
+        datos = dict(datos_camion)
+    else:
+        datos = obtener_datos_camion_autocompletado(inspeccion.camion)
+    datos['apto_trabajar'] = 'SI' if inspeccion.es_apto_operar else 'NO'
+    datos['fecha_inspeccion'] = timezone.localtime(inspeccion.fecha_ingreso).strftime('%d/%m/%Y %H:%M')
+    return datos
+
+def generar_reporte_inspeccion(inspeccion, resultados_items=None, datos_autocompletado=None):
+    """
+    Renderiza el PDF de la inspección en memoria y lo guarda en el storage (reemplazando el anterior).
+    Retorna (nombre_en_storage, bytes_pdf) o (None, None) si el tipo de inspección aún no tiene reporte.
+    """
+    if resultados_items is None:
+        resultados_items = inspeccion.resultados.select_related('item__categoria')
+    if datos_autocompletado is None:
+        datos_autocompletado = datos_reporte_inspeccion(inspeccion)
+
+    if inspeccion.tipo_inspeccion == 'DIARIO':
+        contenido = generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado)
+    else:
+        prefetch_informe_tecnico([inspeccion])
+        contenido = generar_pdf_mantencion_tecnica(inspeccion, resultados_items, datos_autocompletado)
+    if not contenido:
+        return None, None
+
+    nombre = guardar_reemplazando(ruta_reporte(inspeccion), contenido)
+    return nombre, contenido
+
+def guardar_reemplazando(nombre, contenido):
+    """
+    Guarda 'contenido' en 'nombre' del storage reemplazando el archivo anterior de una vez: se escribe con un
+    nombre temporal en la misma carpeta y se renombra encima (os.replace es atómico). Una descarga en ese
+    momento lee el PDF anterior o el nuevo completo, y dos renders simultáneos no dejan 'reporte_..._abc123.pdf'.
+    """
+    temporal = default_storage.save(f"{nombre}.tmp", ContentFile(contenido))
+    try:
+        os.replace(default_storage.path(temporal), default_storage.path(nombre))
+    except BaseException:
+        default_storage.delete(temporal)
+        raise
+    return nombre
 
-import os
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import Image, Table, TableStyle, Paragraph, Spacer, PageBreak, SimpleDocTemplate
-# ... tus otros imports de reportlab ...
 def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
     """
     Genera un PDF de checklist diario con:
@@ -135,85 +357,35 @@ def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
     - Resultados del checklist (Bien/Regular/Malo)
     - Observaciones y novedades
     - Logos de ZMC y cliente
+    Se renderiza en memoria y retorna los bytes del PDF (ver generar_reporte_inspeccion).
     """
-    # Crear directorio
-    tipo_insp = inspeccion.get_tipo_inspeccion_display().lower()
-    directorio = f'media/reportes_diarios/{tipo_insp}/'
-    os.makedirs(directorio, exist_ok=True)
-    
-    fecha_str = timezone.now().strftime('%Y%m%d_%H%M%S')
-    patente = inspeccion.camion.patente
-    nombre_pdf = f'reporte_{fecha_str}_{patente}.pdf'
-    ruta_pdf = os.path.join(directorio, nombre_pdf)
-    
+    buffer = BytesIO()
+
     # Márgenes originales
-    doc = SimpleDocTemplate(ruta_pdf, pagesize=letter,
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
                             rightMargin=30, leftMargin=30, 
                             topMargin=30, bottomMargin=30)
     story = []
     
-    # --- LÓGICA DE LOGOS DINÁMICOS ---
-    path_logo_zmc = os.path.join(settings.MEDIA_ROOT, 'logos', 'logo-zmc.png')
-    img_zmc = None
-    if os.path.exists(path_logo_zmc):
-        img_zmc = Image(path_logo_zmc, width=1.2*inch, height=0.6*inch)
-        img_zmc.hAlign = 'LEFT'
-
-    img_contrato = None
+    # Estilos, tablas base y logos compartidos por todos los reportes del proceso
+    ctx = contexto_render()
+    title_style = ctx.estilos['titulo']
+    header_label = ctx.estilos['etiqueta']
+    patente_text_style = ctx.estilos['patente']
+    cell_body_style = ctx.estilos['celda']
+
+    # --- LOGOS DE ZMC Y CLIENTE ---
     camion = inspeccion.camion
-    if camion.contrato and camion.contrato.logo_cliente:
-        path_logo_contrato = camion.contrato.logo_cliente.path
-        if os.path.exists(path_logo_contrato):
-            img_contrato = Image(path_logo_contrato, width=1.2*inch, height=0.6*inch)
-            img_contrato.hAlign = 'RIGHT'
-
-    header_logo_data = [[img_zmc if img_zmc else '', '', img_contrato if img_contrato else '']]
-    """Tabla de encabezado con logos de ZMC y cliente"""
-    t_logos = Table(header_logo_data, colWidths=[2.5*inch, 2.5*inch, 2.5*inch])
-    t_logos.setStyle(TableStyle([
-        ['VALIGN', (0,0), (-1,-1), 'MIDDLE'],
-        ['ALIGN', (0,0), (0,0), 'LEFT'],
-        ['ALIGN', (2,0), (2,0), 'RIGHT'],
-    ]))
-    story.append(t_logos)
+    story.append(ctx.encabezado_logos(camion.contrato))
     story.append(Spacer(1, 10))
 
-    # Estilos originales
-    title_style = ParagraphStyle('Title', fontSize=14, alignment=TA_CENTER, fontName='Helvetica-Bold', spaceAfter=10)
-    header_label = ParagraphStyle('Label', fontSize=11, fontName='Helvetica-Bold', spaceBefore=8, spaceAfter=4)
-    styles = getSampleStyleSheet()
-    
-    base_style = [
-        ['GRID', (0,0), (-1,-1), 0.7, colors.black],
-        ['FONTSIZE', (0,0), (-1,-1), 11], 
-        ['VALIGN', (0,0), (-1,-1), 'MIDDLE'],
-        ['LEFTPADDING', (0,0), (-1,-1), 10],
-        ['TOPPADDING', (0,0), (-1,-1), 6],
-        ['BOTTOMPADDING', (0,0), (-1,-1), 6],
-    ]
-    patente_text_style = ParagraphStyle(
-        'PatenteSimple',
-        parent=styles['Normal'],
-        fontSize=48,
-        leading=54,
-        alignment=1,
-        fontName='Helvetica-Bold',
-    )
-    cell_body_style = ParagraphStyle(
-        'CellBody',
-        parent=styles['Normal'],
-        fontSize=9,
-        leading=10, # Espacio entre líneas
-        alignment=TA_LEFT,
-    )
-
     # --- PÁGINA 1: CARÁTULA ---
     """Primera página del reporte con información general del vehículo y contrato"""
     nombre_contrato = camion.contrato.nombre.upper() if camion.contrato else "GENERAL"
-    story.append(Paragraph(f"ZMC TRANSPORTES - {nombre_contrato}", title_style))
+    story.append(Paragraph(escape(f"ZMC TRANSPORTES - {nombre_contrato}"), title_style))
     
     patente_camion = datos_autocompletado.get('camion_patente', 'S/P')
-    story.append(Paragraph(patente_camion, patente_text_style))
+    story.append(Paragraph(escape(patente_camion), patente_text_style))
     story.append(Spacer(1, 20))
 
     story.append(Paragraph("INFORMACIÓN", header_label))
@@ -224,7 +396,7 @@ def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
          'Contrato:', datos_autocompletado['contrato']],
     ]
     t1 = Table(info_data, colWidths=[1.3*inch, 2.45*inch, 1.3*inch, 2.45*inch])
-    t1.setStyle(TableStyle(base_style + [('FONTSIZE', (0,0), (-1,-1), 9)]))
+    t1.setStyle(ctx.tabla_base(('FONTSIZE', (0,0), (-1,-1), 9)))
     story.append(t1)
 
     story.append(Paragraph("CONDUCTOR", header_label))
@@ -235,23 +407,23 @@ def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
         ['¿Apto para Trabajar?:', datos_autocompletado['apto_trabajar'], 'Observaciones:', ''],
     ]
     t2 = Table(cond_data, colWidths=[1.8*inch, 1.95*inch, 1.3*inch, 2.45*inch])
-    t2.setStyle(TableStyle(base_style + [('SPAN', (1, 0), (3, 0))]))
+    t2.setStyle(ctx.tabla_base(('SPAN', (1, 0), (3, 0))))
     story.append(t2)
 
     story.append(Paragraph("CAMIÓN", header_label))
     c_w = 7.5*inch / 6
-    modelo_camion_p = Paragraph(datos_autocompletado['camion_modelo'], cell_body_style)
+    modelo_camion_p = Paragraph(escape(str(datos_autocompletado['camion_modelo'])), cell_body_style)
     camion_data = [
         ['Marca:', datos_autocompletado['camion_marca'], 'Modelo:', modelo_camion_p, 'Año:', datos_autocompletado['camion_anio']],
         ['Patente:', datos_autocompletado['camion_patente'], 'Odómetro:', f"{inspeccion.km_registro:,}", 'Vto. RT:', datos_autocompletado['camion_vto_rt']],
         ['Vto. PC:', datos_autocompletado['camion_vto_pc'], 'Vto. SOAP:', datos_autocompletado['camion_vto_soap'], 'Vto. TC8:', datos_autocompletado['camion_vto_tc8']],
     ]
     t3 = Table(camion_data, colWidths=[c_w]*6)
-    t3.setStyle(TableStyle(base_style + [
+    t3.setStyle(ctx.tabla_base(
         ('FONTSIZE', (0,0), (-1,-1), 9),
         ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), # Alineación vertical al centro
         ('LEFTPADDING', (3, 0), (3, 0), 2),    # Ajuste de margen interno para el modelo
-    ]))
+    ))
     story.append(t3)
 
     story.append(Paragraph("ESTANQUE / REMOLQUE", header_label))
@@ -261,7 +433,7 @@ def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
         ['Vto. PC:', datos_autocompletado.get('remolque_vto_pc', 'N/A'), 'Vto. TC8:', datos_autocompletado.get('remolque_vto_tc8', 'N/A'), 'F. Hermeticidad:', datos_autocompletado.get('remolque_vto_herm', 'N/A')],
     ]
     t4 = Table(est_data, colWidths=[c_w]*6)
-    t4.setStyle(TableStyle(base_style + [('FONTSIZE', (0,0), (-1,-1), 9)]))
+    t4.setStyle(ctx.tabla_base(('FONTSIZE', (0,0), (-1,-1), 9)))
     story.append(t4)
 
     story.append(PageBreak())
@@ -282,7 +454,7 @@ def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
     }
     
     for categoria, resultados in items_por_categoria.items():
-        story.append(Paragraph(categoria.upper(), header_label))
+        story.append(Paragraph(escape(categoria.upper()), header_label))
         data = [['N°', 'Descripción', 'Estado', 'Observación']]
         
         for idx, res in enumerate(resultados, 1):
@@ -290,68 +462,26 @@ def generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado):
             observacion_texto = res.observacion or ''
             estado_visual = mapeo_nombres.get(valor_db, "-")
 
-            # --- LA SOLUCIÓN AL TEXTO LARGO ---
-            # Creamos un estilo específico para el texto dentro de la tabla
-            estilo_celda = ParagraphStyle(
-                'CeldaTexto',
-                parent=styles['Normal'],
-                fontSize=9,      # Un poco más pequeño para que quepa mejor
-                leading=10,      # Espacio entre líneas (el "enter")
-                alignment=TA_LEFT # Alineado a la izquierda
-            )
-
             # Envolvemos el nombre del ítem y la observación en un Paragraph
             # Esto obliga a ReportLab a calcular los saltos de línea
-            nombre_item_p = Paragraph(res.item.nombre, estilo_celda)
-            observacion_p = Paragraph(observacion_texto, estilo_celda)
+            # escape(): ReportLab interpreta el texto como marcado ('<', '>' y '&' rompen el PDF)
+            nombre_item_p = Paragraph(escape(res.item.nombre), cell_body_style)
+            observacion_p = Paragraph(escape(observacion_texto), cell_body_style)
 
             # Agregamos los objetos Paragraph en lugar de texto plano
             data.append([str(idx), nombre_item_p, estado_visual, observacion_p])
         
         # Al definir la tabla, ReportLab ajustará el alto de la fila automáticamente
         t_check = Table(data, colWidths=[0.5*inch, 3.4*inch, 1.2*inch, 2.4*inch])
-        t_check.setStyle(TableStyle([
-            ['GRID', (0,0), (-1,-1), 0.5, colors.black],
-            ['VALIGN', (0,0), (-1,-1), 'MIDDLE'], # Centra el contenido verticalmente
-            ['TOPPADDING', (0,0), (-1,-1), 4],
-            ['BOTTOMPADDING', (0,0), (-1,-1), 4],
-            ['BACKGROUND', (0,0), (-1,0), colors.lightgrey],
-        ]))
+        t_check.setStyle(ctx.tablas['checklist'])
         story.append(t_check)
         story.append(Spacer(1, 10))
 
     # Firmas
     # --- SECCIÓN DE FIRMAS CON IMAGEN ---
     story.append(Spacer(1, 20))
-    
-    # Intentar cargar la firma del representante desde media/logos/
-    path_firma_zmc = os.path.join(settings.MEDIA_ROOT, 'logos', 'firma-zmc.png')
-    img_firma = ''
-    if os.path.exists(path_firma_zmc):
-        # Ajustamos el tamaño para que quepa bien sobre la línea (aprox 1.5 x 0.7 pulgadas)
-        img_firma = Image(path_firma_zmc, width=1.5*inch, height=0.7*inch)
-
-    # Tabla de firmas: 
-    # Fila 1: Las imágenes (o espacio vacío)
-    # Fila 2: Las líneas de puntos
-    # Fila 3: Los nombres
-    # Fila 4: Los cargos
-    firma_data = [
-        ['', img_firma], # Aquí va la firma digital a la derecha
-        ['_______________________', '_______________________'],
-        [f'Firma: {inspeccion.responsable}', 'Firma: Representante ZMC'],
-        ['Responsable Inspección', 'Control de Flota']
-    ]
-    
-    t_firma = Table(firma_data, colWidths=[3.75*inch, 3.75*inch])
-    t_firma.setStyle(TableStyle([
-        ['ALIGN', (0, 0), (-1, -1), 'CENTER'],
-        ['VALIGN', (0, 0), (-1, -1), 'BOTTOM'], # La firma "descansa" sobre la línea
-        ['FONTSIZE', (0, 0), (-1, -1), 10],
-        ['BOTTOMPADDING', (0, 1), (1, 1), 0], # Pegamos la imagen a la línea
-    ]))
-    story.append(t_firma)
+    story.append(ctx.tabla_firmas(inspeccion.responsable))
 
     # Generar el documento
     doc.build(story)
-    return ruta_pdf
\ No newline at end of file
+    return buffer.getvalue()
\ No newline at end of file
@@ -4,26 +4,55 @@ Vistas para crear inspecciones de mantenimiento con generación de PDF y envío
 Implementa APIs para autocompletado de datos, categorías y validación de remolques asignados.
 """
 
+import gzip
 import json
+import uuid
+from datetime import date
+from io import BytesIO
 from django.shortcuts import render, redirect, get_object_or_404
-from django.utils import timezone
-from django.db import transaction
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header, parse_etags
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from mantenciones.forms import InspeccionForm
-from .utils import obtener_datos_camion_autocompletado, generar_pdf_enap_diario, generar_pdf_mantencion_tecnica
+from .utils import (
+    obtener_datos_camion_autocompletado, generar_reporte_inspeccion, ruta_reporte, nombre_descarga_reporte,
+    sugerencia_mantenimiento,
+)
 from .models import (
-    CategoriaChecklist, ItemChecklist, Inspeccion, 
-    ResultadoItem, RegistroLubricantes, RegistroDiario, CronogramaPlan
+    CategoriaChecklist, ItemChecklist, Inspeccion, RegistroLubricantes, CronogramaPlan
 )
-from core.models import DocumentoMantencion, EstadoCamion, Mantencion, Camion, Remolque, AsignacionTractoRemolque
+from core.models import EstadoCamion, Camion, Remolque, AsignacionTractoRemolque
 from mantenciones import models
-from django.db.models import Q
-from django.core.mail import EmailMessage
+from django.db.models import Q, prefetch_related_objects
+from django.core.files.storage import default_storage
 from django.conf import settings
-import os
+from django.core.exceptions import PermissionDenied
+from core.descargas import respuesta_archivo
+from core.replica import solo_lectura
+from core.cache import CAMION, CATALOGO_CHECKLIST, MODELO, REMOLQUE, en_cache
+from .servicios import inspeccion_por_clave, registrar_inspeccion
+from .sincronizacion import paquete_offline, aplicar_lote, MAX_INSPECCIONES_LOTE
+from .exportaciones import EXPORTACIONES, PERMISOS_EXPORTACION, lineas_csv, trozos_xlsx
+from .archivo import inspeccion_archivada
+
+# Límite del cuerpo descomprimido de un lote de sincronización
+MAX_BYTES_LOTE = 20 * 1024 * 1024
+
+def _clave_idempotencia(datos):
+    """UUID enviado por el formulario, o None si falta o no es válido."""
+    try:
+        return uuid.UUID(datos.get('clave_idempotencia', ''))
+    except (TypeError, ValueError):
+        return None
+
+def _mensaje_inspeccion(inspeccion):
+    if inspeccion.reporte_pendiente:
+        return "✅ Inspección guardada. El reporte PDF y el correo se enviarán en unos minutos."
+    return "✅ Inspección enviada y reporte enviado por correo."
 
 @login_required
 def crear_inspeccion(request):
@@ -33,160 +62,36 @@ def crear_inspeccion(request):
     Flujo:
     1. Guarda inspección y resultados en BD (transacción atómica)
     2. Genera PDF del reporte (diario o técnico)
-    3. Envía correo con el PDF adjunto
+    3. Envía el correo o lo encola para el resumen (ver notificaciones.py)
     4. Redirige a la página de creación
     """
     
     """Vista para crear una nueva inspección con checklist dinámico"""
     
     if request.method == 'POST':
+        # Reenvío de un formulario ya registrado (se cortó la conexión antes de recibir la respuesta):
+        # se responde igual que la primera vez sin volver a guardar, generar el PDF ni enviar el correo
+        existente = inspeccion_por_clave(_clave_idempotencia(request.POST))
+        if existente:
+            messages.success(request, _mensaje_inspeccion(existente))
+            return redirect('/mantenciones/nueva/')
+
         form = InspeccionForm(request.POST)
         
         if form.is_valid():
-            ruta_pdf = None  
             try:
-                # 1. BLOQUE DE BASE DE DATOS (Transacción Atómica)
-                with transaction.atomic():
-                    # Guardamos la Inspección
-                    inspeccion = form.save(commit=False)
-                    inspeccion.fecha_ingreso = timezone.localtime(timezone.now())
-                    inspeccion.save()
-                    
-                    # Procesar resultados del checklist
-                    resultados_raw = request.POST.get('resultados_checklist', '[]')
-                    resultados_data = json.loads(resultados_raw)
-                    
-                    for data in resultados_data:
-                        try:
-                            item = ItemChecklist.objects.get(id=data['item_id'])
-                            ResultadoItem.objects.create(
-                                inspeccion=inspeccion,
-                                item=item,
-                                estado=data['estado'],
-                                observacion=data.get('observacion', '')
-                            )
-                        except ItemChecklist.DoesNotExist:
-                            continue
-                    
-                    # Datos autocompletado (solo para lógica interna aquí)
-                    datos_autocompletado = obtener_datos_camion_autocompletado(inspeccion.camion)
-                    datos_autocompletado['apto_trabajar'] = 'SI' if inspeccion.es_apto_operar else 'NO'
-                    fecha_chile = timezone.localtime(inspeccion.fecha_ingreso)
-                    datos_autocompletado['fecha_inspeccion'] = fecha_chile.strftime('%d/%m/%Y %H:%M')
-
-                    # Guardar en RegistroDiario
-                    RegistroDiario.objects.create(
-                        vehiculo=inspeccion.camion,
-                        revisado_por=inspeccion.responsable,
-                        km_actual=inspeccion.km_registro,
-                        es_apto=inspeccion.es_apto_operar,
-                        check_datos=json.dumps(resultados_data),
-                        novedades=inspeccion.observaciones
-                    )
-                    
-                    # --- NUEVA LÓGICA DE MANTENCIÓN Y PRÓXIMA META (KAUFMANN/FTL) ---
-                    intervalo_base = 20000 
-
-                    if inspeccion.camion.modelo:
-                        if inspeccion.camion.modelo.marca == 'Mercedes-Benz':
-                            intervalo_base = 40000  
-                        else:
-                            intervalo_base = 30000  
-
-                    # Ajuste por Tipo de Operación
-                    if inspeccion.camion.tipo_operacion == 'SEVERO':
-                        intervalo_base = intervalo_base * 0.25  
-                    elif inspeccion.camion.tipo_operacion == 'MIXTO':
-                        intervalo_base = intervalo_base * 0.5   
-
-                    # Cálculo de la meta según el tipo de reporte
-                    if inspeccion.tipo_inspeccion == 'DIARIO':
-                        if inspeccion.renovó_aceite:
-                            nueva_meta = inspeccion.km_registro + intervalo_base
-                        else:
-                            # Si es diario sin cambio de aceite, busca la meta anterior
-                            ultima_m = Mantencion.objects.filter(camion=inspeccion.camion).last()
-                            nueva_meta = ultima_m.km_proxima_mantencion if ultima_m else inspeccion.km_registro
-                    else:
-                        # Si es una preventiva (SM1, SM2, etc.), se setea la nueva meta obligatoriamente
-                        nueva_meta = inspeccion.km_registro + intervalo_base
-
-                    # Guardar la mantención técnica en el historial
-                    nueva_mantencion = Mantencion.objects.create(
-                        camion=inspeccion.camion,
-                        taller='ZMC',
-                        fecha_mantencion=timezone.now().date(),
-                        km_mantencion=inspeccion.km_registro,
-                        km_proxima_mantencion=nueva_meta,
-                        observaciones=f"Servicio {inspeccion.tipo_inspeccion} realizado por {inspeccion.responsable}."
-                    )
-
-                    # Actualizar KM actual del camión
-                    if hasattr(inspeccion.camion, 'estado_actual'):
-                        inspeccion.camion.estado_actual.kilometraje = inspeccion.km_registro
-                        inspeccion.camion.estado_actual.save()
-
-                # --- 2. BLOQUE DE GENERACIÓN (FUERA DE LA TRANSACCIÓN) ---
-                # Ahora que la transacción cerró, los resultados_items EXISTEN en la DB.
-                resultados_items = ResultadoItem.objects.filter(inspeccion=inspeccion).select_related('item')
-
-                if inspeccion.tipo_inspeccion == 'DIARIO':
-                    ruta_pdf = generar_pdf_enap_diario(inspeccion, resultados_items, datos_autocompletado)                     
-                else:
-                    ruta_pdf = generar_pdf_mantencion_tecnica(inspeccion, resultados_items, datos_autocompletado)
-
-                # Registrar el PDF generado en la base de datos
-                if ruta_pdf:
-                    DocumentoMantencion.objects.create(
-                        mantencion=nueva_mantencion,
-                        nombre_archivo=f"Checklist_{inspeccion.camion.patente}_{inspeccion.fecha_ingreso.strftime('%Y%m%d')}.pdf",
-                        ruta_archivo=ruta_pdf,
-                        tipo_documento='CHECKLIST_ENAP'
-                    )
-
-                # --- BLOQUE DE CORREO (FUERA DE LA TRANSACCIÓN) ---
-                if ruta_pdf and os.path.exists(ruta_pdf):
-                    try:
-                        destinatarios = ['iancuevas7321@gmail.com', 'gestion.flota.zmc@gmail.com','bsantanav@gmail.com']
-                        sujeto = f"📝 NUEVO CHECKLIST: {inspeccion.camion.patente} - {inspeccion.tipo_inspeccion}"
-                        
-                        # Cuerpo del mensaje con formato profesional
-                        cuerpo = (
-                            f"Se ha registrado una nueva inspección en el sistema.\n\n"
-                            f"--- DETALLES DE LA UNIDAD ---\n"
-                            f" Unidad: {inspeccion.camion.patente}\n"
-                            f" Responsable: {inspeccion.responsable}\n"
-                            f" Kilometraje: {inspeccion.km_registro:,} KM\n"
-                            f" Fecha/Hora: {datos_autocompletado['fecha_inspeccion']}\n"
-                            f" Contrato: {datos_autocompletado.get('contrato', 'GENERAL')}\n\n"
-                            f"--- ESTADO DE OPERACIÓN ---\n"
-                            f" ¿Apto para trabajar?: {'SÍ' if inspeccion.es_apto_operar else 'NO'}\n"
-                            f" ¿Renovó Aceite?: {'SÍ' if inspeccion.renovó_aceite else 'NO'}\n"
-                            f" Observaciones: {inspeccion.observaciones if inspeccion.observaciones else 'Sin observaciones.'}\n\n"
-                            f"Se adjunta el informe técnico detallado en formato PDF.\n\n"
-                            f"Atentamente,\n"
-                            f"Sistema de Gestión de Flota ZMC"
-                        )
-
-                        email = EmailMessage(
-                            subject=sujeto,
-                            body=cuerpo,
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            to=destinatarios,
-                        )
-
-                        # Adjuntamos el archivo con un nombre más limpio
-                        with open(ruta_pdf, 'rb') as f:
-                            email.attach(f"Checklist_{inspeccion.camion.patente}_{inspeccion.fecha_ingreso.strftime('%d-%m-%Y')}.pdf", f.read(), 'application/pdf')
-
-                        email.send()
-                        print(f"DEBUG: Correo enviado con éxito para {inspeccion.camion.patente}")
-
-                    except Exception as e_mail:
-                        print(f"ERROR al enviar correo: {e_mail}")
+                inspeccion = form.save(commit=False)
+                inspeccion.clave_idempotencia = form.cleaned_data.get('clave_idempotencia')
+
+                # Procesar resultados del checklist
+                resultados_raw = request.POST.get('resultados_checklist', '[]')
+                resultados_data = json.loads(resultados_raw)
+
+                # 1-3. Transacción, PDF y correo (ver servicios.py)
+                inspeccion, _creada = registrar_inspeccion(inspeccion, resultados_data)
 
                 # --- 4. REDIRECT (EVITA DUPLICADOS AL REFRESCAR) ---
-                messages.success(request, f"✅ Inspección enviada y reporte enviado por correo.")
+                messages.success(request, _mensaje_inspeccion(inspeccion))
                 return redirect('/mantenciones/nueva/')
 
             except Exception as e:
@@ -199,6 +104,36 @@ def crear_inspeccion(request):
     categorias = CategoriaChecklist.objects.all().order_by('orden')
     return render(request, 'mantenciones/crear_inspeccion.html', {'form': form, 'categorias': categorias})
 
+@login_required
+@require_http_methods(["GET"])
+@solo_lectura
+def descargar_reporte(request, inspeccion_id):
+    """
+    Descarga el PDF de una inspección.
+    Si el archivo no está en el storage (borrado, otro servidor, etc.) se vuelve a generar.
+    Las inspecciones archivadas (ver mantenciones/archivo.py) se leen desde ArchivoHistorico.
+    Pide el mismo permiso que los reportes servidos desde MEDIA (core.views.media_protegida).
+    """
+    if not request.user.has_perm('mantenciones.view_inspeccion'):
+        raise PermissionDenied
+    inspeccion = Inspeccion.objects.select_related('camion__contrato').filter(pk=inspeccion_id).first()
+    if inspeccion is None:
+        inspeccion = inspeccion_archivada(inspeccion_id)
+        if inspeccion is None:
+            raise Http404("No existe la inspección.")
+
+    nombre = ruta_reporte(inspeccion)
+    if not default_storage.exists(nombre):
+        resultados = None
+        if getattr(inspeccion, 'archivada', False):
+            resultados = list(inspeccion.resultados.all())
+            prefetch_related_objects(resultados, 'item__categoria')
+        nombre, _contenido = generar_reporte_inspeccion(inspeccion, resultados_items=resultados)
+        if not nombre:
+            raise Http404("Este tipo de inspección no tiene reporte PDF.")
+
+    return respuesta_archivo(request, nombre, nombre_descarga=nombre_descarga_reporte(inspeccion))
+
 @require_http_methods(["GET"])
 def api_datos_autocompletado(request, camion_id):
     """
@@ -212,42 +147,75 @@ def api_datos_autocompletado(request, camion_id):
     API que retorna los datos que se auto-completan al seleccionar un camión
     """
     try:
-        camion = get_object_or_404(Camion, id_camion=camion_id)
-        datos = obtener_datos_camion_autocompletado(camion)
-        
-        # --- NUEVA LÓGICA DE SUGERENCIA ---
-        sugerencia = "DIARIO"
-        paquetes_sugeridos = []
-        
-        # Buscamos cuántas mantenciones preventivas tiene este camión
-        conteo_preventivas = Inspeccion.objects.filter(
-            camion=camion
-        ).exclude(tipo_inspeccion='DIARIO').count()
-        
-        if camion.modelo:
-            # Calculamos la posición en el ciclo (ej: 1 al 8 o 1 al 16)
-            posicion = (conteo_preventivas % CronogramaPlan.objects.filter(modelo=camion.modelo).count()) + 1
-            
-            plan = CronogramaPlan.objects.filter(
-                modelo=camion.modelo, 
-                posicion_ciclo=posicion
-            ).first()
-            
-            if plan:
-                paquetes_sugeridos = plan.paquetes_json # Ej: ["SM2", "MB1"]
-                sugerencia = f"Sugerido: {', '.join(paquetes_sugeridos)}"
+        camion = get_object_or_404(Camion.objects.select_related('asignacion_actual'), id_camion=camion_id)
 
-        return JsonResponse({
-            'success': True,
-            'datos': datos,
-            'sugerencia_mantenimiento': {
-                'texto': sugerencia,
-                'paquetes': paquetes_sugeridos
+        def calcular():
+            datos = obtener_datos_camion_autocompletado(camion)
+
+            # --- NUEVA LÓGICA DE SUGERENCIA ---
+            # Buscamos cuántas mantenciones preventivas tiene este camión
+            conteo_preventivas = Inspeccion.objects.filter(
+                camion=camion
+            ).exclude(tipo_inspeccion='DIARIO').count()
+            planes = list(CronogramaPlan.objects.filter(modelo=camion.modelo)) if camion.modelo_id else []
+            return {
+                'datos': datos,
+                'sugerencia_mantenimiento': sugerencia_mantenimiento(camion, conteo_preventivas, planes),
             }
-        })
+
+        # Incluye los documentos del remolque enganchado y los planes del modelo
+        dependencias = [(CAMION, camion.pk)]
+        if camion.asignacion_actual_id:
+            dependencias.append((REMOLQUE, camion.asignacion_actual.remolque_id))
+        if camion.modelo_id:
+            dependencias.append((MODELO, camion.modelo_id))
+        respuesta = en_cache('autocompletado', dependencias, calcular)
+
+        # La fecha y hora del formulario son las de ahora, no las del cálculo cacheado
+        datos = dict(respuesta['datos'])
+        datos['fecha_inspeccion'] = timezone.localtime(timezone.now()).strftime('%d/%m/%Y %H:%M')
+        datos['fecha_control'] = timezone.now().strftime('%d/%m/%Y')
+        return JsonResponse({'success': True, **respuesta, 'datos': datos})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
+def _categorias_con_items(tipo_inspeccion, por_modelo, modelo_id):
+    """Categorías del checklist con sus ítems para el tipo de inspección (se cachea con el catálogo)."""
+    # Filtro base por categoría
+    # Si es una mantención preventiva, el 'tipo_inspeccion' vendrá como "SM2", "SM1", etc.
+
+    if tipo_inspeccion == 'DIARIO':
+        q_items = Q(nivel_servicio='DIARIO')
+    else:
+        # Lógica de Herencia: Si es SM2, traemos tareas de SM1 y SM2
+        # Determinamos los niveles a cargar (esto depende de cómo nombres tus niveles)
+        niveles_a_cargar = [tipo_inspeccion]
+        if "SM" in tipo_inspeccion:
+            num = int(tipo_inspeccion.replace("SM", ""))
+            niveles_a_cargar = [f"SM{i}" for i in range(1, num + 1)]
+
+        q_items = Q(nivel_servicio__in=niveles_a_cargar)
+        if por_modelo:
+            q_items &= Q(modelo_id=modelo_id)
+
+    categorias = CategoriaChecklist.objects.all().order_by('orden')
+
+    categorias_con_items = []
+    for cat in categorias:
+        # Filtramos ítems dinámicamente según modelo y nivel
+        items = ItemChecklist.objects.filter(
+            q_items, 
+            categoria=cat
+        ).values('id', 'nombre', 'es_critico', 'tipo_respuesta', 'es_opcional', 'referencia_tecnica', 'codigo_sap')
+
+        if items.exists():
+            categorias_con_items.append({
+                'id': cat.id,
+                'nombre': cat.nombre,
+                'items': list(items)
+            })
+    return categorias_con_items
+
 @require_http_methods(["GET"])
 def api_categorias_por_tipo(request, tipo_inspeccion):
     """
@@ -264,40 +232,14 @@ def api_categorias_por_tipo(request, tipo_inspeccion):
     camion_id = request.GET.get('camion_id') # Enviamos el ID por parámetro
     
     try:
-        # Filtro base por categoría
-        # Si es una mantención preventiva, el 'tipo_inspeccion' vendrá como "SM2", "SM1", etc.
-        
-        if tipo_inspeccion == 'DIARIO':
-            q_items = Q(nivel_servicio='DIARIO')
-        else:
-            # Lógica de Herencia: Si es SM2, traemos tareas de SM1 y SM2
-            # Determinamos los niveles a cargar (esto depende de cómo nombres tus niveles)
-            niveles_a_cargar = [tipo_inspeccion]
-            if "SM" in tipo_inspeccion:
-                num = int(tipo_inspeccion.replace("SM", ""))
-                niveles_a_cargar = [f"SM{i}" for i in range(1, num + 1)]
-            
-            q_items = Q(nivel_servicio__in=niveles_a_cargar)
-            if camion_id:
-                camion = Camion.objects.get(id_camion=camion_id)
-                q_items &= Q(modelo=camion.modelo)
-
-        categorias = CategoriaChecklist.objects.all().order_by('orden')
-        
-        categorias_con_items = []
-        for cat in categorias:
-            # Filtramos ítems dinámicamente según modelo y nivel
-            items = ItemChecklist.objects.filter(
-                q_items, 
-                categoria=cat
-            ).values('id', 'nombre', 'es_critico', 'tipo_respuesta', 'es_opcional', 'referencia_tecnica', 'codigo_sap')
-            
-            if items.exists():
-                categorias_con_items.append({
-                    'id': cat.id,
-                    'nombre': cat.nombre,
-                    'items': list(items)
-                })
+        # En las mantenciones se filtra por el modelo del camión (sin modelo: ítems sin modelo)
+        por_modelo = tipo_inspeccion != 'DIARIO' and bool(camion_id)
+        modelo_id = Camion.objects.values_list('modelo_id', flat=True).get(id_camion=camion_id) if por_modelo else None
+        categorias_con_items = en_cache(
+            'categorias_checklist', [CATALOGO_CHECKLIST],
+            lambda: _categorias_con_items(tipo_inspeccion, por_modelo, modelo_id),
+            extra=[tipo_inspeccion, modelo_id if por_modelo else '*'],
+        )
         
         return JsonResponse({'success': True, 'categorias': categorias_con_items})
     except Exception as e:
@@ -316,11 +258,11 @@ def api_remolque_asignado(request, camion_id):
     API que verifica si un camión tiene remolque asignado
     """
     try:
-        camion = get_object_or_404(Camion, id_camion=camion_id)
-        asignacion = AsignacionTractoRemolque.objects.filter(
-            camion=camion,
-            activo=True
-        ).first()
+        camion = get_object_or_404(
+            Camion.objects.select_related('asignacion_actual__remolque'),
+            id_camion=camion_id
+        )
+        asignacion = camion.asignacion_actual
         
         if asignacion:
             return JsonResponse({
@@ -340,3 +282,93 @@ def api_remolque_asignado(request, camion_id):
             'error': str(e)
         }, status=400)
     
+
+@login_required
+@gzip_page
+@require_http_methods(["GET"])
+def api_sync_paquete(request):
+    """
+    Paquete offline para el celular (flota, catálogo de checklist y autocompletado).
+    Si el celular ya tiene la versión vigente (If-None-Match o ?version=) responde 304 sin cuerpo.
+    """
+    paquete = paquete_offline()
+    etag = f'"{paquete["version"]}"'
+    # gzip_page marca el ETag como débil (W/"...") al comprimir
+    conocidas = [e.removeprefix('W/') for e in parse_etags(request.headers.get('If-None-Match', ''))]
+    if etag in conocidas or request.GET.get('version') == paquete['version']:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({'success': True, 'paquete': paquete})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def api_sync_inspecciones(request):
+    """
+    Recibe un lote de inspecciones encoladas offline: {"inspecciones": [...]}, opcionalmente con
+    Content-Encoding: gzip. Retorna el resultado de cada una (CREADA, DUPLICADA o ERROR);
+    el celular borra de su cola las CREADA y DUPLICADA.
+    """
+    cuerpo = request.body
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        try:
+            with gzip.GzipFile(fileobj=BytesIO(cuerpo)) as archivo:
+                cuerpo = archivo.read(MAX_BYTES_LOTE + 1)
+        except (OSError, EOFError):
+            return JsonResponse({'success': False, 'error': 'Cuerpo gzip inválido.'}, status=400)
+        if len(cuerpo) > MAX_BYTES_LOTE:
+            return JsonResponse({'success': False, 'error': 'Lote demasiado grande.'}, status=413)
+
+    try:
+        inspecciones = json.loads(cuerpo).get('inspecciones', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+    if not isinstance(inspecciones, list):
+        return JsonResponse({'success': False, 'error': "'inspecciones' debe ser una lista."}, status=400)
+    if len(inspecciones) > MAX_INSPECCIONES_LOTE:
+        return JsonResponse(
+            {'success': False, 'error': f'Máximo {MAX_INSPECCIONES_LOTE} inspecciones por lote.'}, status=413
+        )
+
+    return JsonResponse({'success': True, 'resultados': aplicar_lote(inspecciones)})
+
+
+@login_required
+@require_http_methods(["GET"])
+@solo_lectura
+def exportar_historial(request, tipo):
+    """
+    Descarga en CSV o XLSX (ambos en streaming) de mantenciones, inspecciones o documentos.
+    Parámetros GET: desde, hasta (AAAA-MM-DD), base, contrato (ID o nombre), unidad (patente) y
+    formato ('csv' por defecto o 'xlsx'). Pide el permiso de ver el modelo exportado.
+    """
+    if tipo not in EXPORTACIONES:
+        raise Http404("Exportación desconocida")
+    if not request.user.has_perm(PERMISOS_EXPORTACION[tipo]):
+        raise PermissionDenied
+    formato = request.GET.get('formato', 'csv').lower()
+    if formato not in ('csv', 'xlsx'):
+        return JsonResponse({'success': False, 'error': "formato debe ser 'csv' o 'xlsx'."}, status=400)
+    try:
+        filtros = {
+            'desde': date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else None,
+            'hasta': date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta') else None,
+            'base': request.GET.get('base', '').upper() or None,
+            'contrato': request.GET.get('contrato') or None,
+            'unidad': request.GET.get('unidad') or None,
+        }
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    nombre = f"{tipo}_{timezone.localdate().strftime('%Y%m%d')}.{formato}"
+    if formato == 'xlsx':
+        response = StreamingHttpResponse(
+            trozos_xlsx(tipo, **filtros),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    else:
+        response = StreamingHttpResponse(lineas_csv(tipo, **filtros), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, nombre)
+    return response
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.humanize',
     "core",
     'mantenciones',
+    'indicadores',
 ]
 
 MIDDLEWARE = [
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.replica.ReplicaMiddleware",
 ]
 
 ROOT_URLCONF = "zmc.urls"
@@ -94,6 +96,43 @@ DATABASES = {
     }
 }
 
+# Réplica de solo lectura para listados, APIs, exportaciones e indicadores (core/replica.py).
+# Sin DB_REPLICA_HOST ni DB_REPLICA_NAME todo se lee de 'default'. Para probar en local basta otra base
+# en el mismo servidor: DB_REPLICA_NAME=App_zmc_replica (restaurada desde un pg_dump de la principal).
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        # En los tests la "réplica" es la misma base de pruebas
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replica.RouterReplica']
+
+# Las pruebas migran completo; las tablas managed=False se crean antes de migrar (core/pruebas.py)
+TEST_RUNNER = 'core.pruebas.RunnerPruebas'
+
+# Segundos que un navegador sigue leyendo de la primaria después de escribir (atraso tolerado de la réplica)
+REPLICA_PRIMARIA_SEGUNDOS = int(os.environ.get('REPLICA_PRIMARIA_SEGUNDOS', 10))
+
+# Caché (core/cache.py): FileBasedCache en disco, compartida por todos los workers para que la invalidación
+# de uno la vean todos (con LocMemCache cada proceso seguiría sirviendo su copia invalidada).
+# CACHE_DIR debe ser la misma carpeta para todos los procesos de la aplicación.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Vigencia de lo cacheado: tope de atraso si algo cambia sin pasar por las señales (ej: SQL directo)
+CACHE_SEGUNDOS = int(os.environ.get('CACHE_SEGUNDOS', 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,7 +159,10 @@ LOGIN_REDIRECT_URL = '/camiones/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 
 # Motor de envío
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Para pruebas: EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend deja cada correo
+# como archivo en EMAIL_FILE_PATH en vez de mandarlo por Gmail.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'correos_enviados'))
 #EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Configuración del servidor de Gmail
@@ -137,6 +179,9 @@ EMAIL_HOST_PASSWORD = 'osnw heaf ybws oarr'
 # Nombre que verán los jefes al recibir el correo
 DEFAULT_FROM_EMAIL = 'Gestión de Flota ZMC <gestion.flota.zmc@gmail.com>'
 
+# Reciben cada reporte al instante mientras no haya Destinatarios de Notificaciones cargados en el admin
+NOTIFICACIONES_DESTINATARIOS_POR_DEFECTO = ['iancuevas7321@gmail.com', 'gestion.flota.zmc@gmail.com', 'bsantanav@gmail.com']
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -168,6 +213,28 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Descargas protegidas (core/descargas.py): vacío = Django envía el archivo (con soporte de Range).
+# En producción detrás de nginx usar 'X-Accel-Redirect' (con una location internal que apunte a MEDIA_ROOT
+# en DESCARGAS_PREFIJO_INTERNO) o 'X-Sendfile' con Apache. Ej. nginx:
+#     location /media-protegida/ { internal; alias /app/media/; }
+# MEDIA_URL la atiende siempre Django (core.views.media_protegida), que valida permisos antes de delegar.
+DESCARGAS_CABECERA_SENDFILE = os.environ.get('DESCARGAS_CABECERA_SENDFILE', '')
+DESCARGAS_PREFIJO_INTERNO = '/media-protegida/'
+# Cache-Control privado de los archivos de MEDIA (el navegador no los vuelve a pedir en ese plazo)
+MEDIA_CACHE_SEGUNDOS = int(os.environ.get('MEDIA_CACHE_SEGUNDOS', 3600))
+
+# Subida por partes de documentos (core/cargas.py): parciales fuera de lo servido por media_protegida,
+# tamaño de cada bloque (menor que DATA_UPLOAD_MAX_MEMORY_SIZE), tamaño máximo del archivo y horas sin
+# actividad tras las que 'limpiar_cargas' borra una sesión abierta.
+CARGAS_DIR = os.environ.get('CARGAS_DIR', os.path.join(MEDIA_ROOT, 'cargas'))
+CARGAS_TAMANO_BLOQUE = int(os.environ.get('CARGAS_TAMANO_BLOQUE', 1024 * 1024))
+CARGAS_TAMANO_MAXIMO = int(os.environ.get('CARGAS_TAMANO_MAXIMO', 50 * 1024 * 1024))
+CARGAS_EXPIRACION_HORAS = int(os.environ.get('CARGAS_EXPIRACION_HORAS', 72))
+
+# Historial en frío (mantenciones/archivo.py): meses que inspecciones, registros diarios e historial de estados
+# quedan en las tablas vivas antes de que 'archivar_historial' los mueva a ArchivoHistorico.
+ARCHIVO_RETENCION_MESES = int(os.environ.get('ARCHIVO_RETENCION_MESES', 24))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -16,9 +16,9 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path, include
 from django.views.generic import RedirectView
+from core.views import media_protegida
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,8 +26,7 @@ urlpatterns = [
     path('', RedirectView.as_view(url='/camiones/', permanent=True)),
     path('', include('core.urls')),
     path('mantenciones/', include('mantenciones.urls')),
+    path('indicadores/', include('indicadores.urls')),
+    # MEDIA siempre pasa por permisos (core/descargas.py); en producción el envío lo delega a nginx/Apache
+    path(settings.MEDIA_URL.lstrip('/') + '<path:nombre>', media_protegida, name='media_protegida'),
 ]
-
-# Esto le dice a Django: "Si estamos en modo desarrollo, sirve los archivos de MEDIA"
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file